@@ -1,8 +1,13 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
+from dataclasses import asdict
 from typing import List, Dict, Any, Optional
 from core.compiler import GLSLCompiler
-from core.glsl_validator import GLSLValidator, ValidationResult
+from core.node_registry import NodeRegistryError, etag_matches, get_registry, serialize_response
+from core.graph_schema import CompilePayload, decode_compile_request, decode_graph, to_compiler_graph
+from core.glsl_validator import ValidationResult
+from core.validation_cache import get_validation_cache
+from core.validation_session import SessionError, TextEdit, ValidationSession, get_session_store
 
 router = APIRouter(prefix="/api/v1/nodes", tags=["nodes"])
 
@@ -22,15 +27,6 @@ class EdgeData(BaseModel):
     sourceHandle: Optional[str] = None
     targetHandle: Optional[str] = None
 
-class NodeGraph(BaseModel):
-    nodes: List[Dict[str, Any]]
-    edges: List[Dict[str, Any]]
-
-class CompileRequest(BaseModel):
-    graph: NodeGraph
-    language: str = "glsl"
-    optimize: bool = True
-
 class CompileResponse(BaseModel):
     success: bool
     code: str
@@ -39,25 +35,37 @@ class CompileResponse(BaseModel):
     functions: List[str]
     error: Optional[str] = None
     warnings: List[str] = []
+    uniformLayout: Optional[Dict[str, Any]] = None
+    stats: Dict[str, int] = {}
     compilationTime: float
 
+# El body de los endpoints de grafos se decodifica con structs tipados
+# (core.graph_schema) en lugar de validar dicts arbitrarios con Pydantic
+async def read_compile_request(request: Request) -> CompilePayload:
+    """Decodifica el body de una petición de compilación"""
+    try:
+        return decode_compile_request(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
 # Endpoints
 @router.post("/graph/compile")
-async def compile_graph(request: CompileRequest):
+async def compile_graph(http_request: Request):
     """Compila un grafo de nodos a código shader"""
     import time
     
     start_time = time.time()
+    request = await read_compile_request(http_request)
     
     try:
-        # Convertir NodeGraph a dict
-        graph_dict = {
-            "nodes": request.graph.nodes,
-            "edges": request.graph.edges
-        }
+        # Convertir el grafo tipado a la estructura del compilador
+        graph_dict = to_compiler_graph(request.graph)
         
-        # Compilar
-        compiler = GLSLCompiler()
+        # Compilar (optimize: extraer subgrafos repetidos a funciones)
+        compiler = GLSLCompiler(
+            uniform_block=request.target == "webgl2",
+            extract_functions=request.optimize
+        )
         result = compiler.compile(graph_dict)
         
         compilation_time = time.time() - start_time
@@ -83,6 +91,8 @@ async def compile_graph(request: CompileRequest):
             functions=result.functions,
             error=None,
             warnings=result.warnings,
+            uniformLayout=result.uniform_layout,
+            stats=result.stats,
             compilationTime=compilation_time
         )
         
@@ -93,132 +103,65 @@ async def compile_graph(request: CompileRequest):
             detail=f"Compilation failed: {str(e)}"
         )
 
+# La librería se sirve pre-serializada desde el registro de nodos, con
+# ETag fuerte para que clientes y proxies revaliden sin volver a descargarla
+LIBRARY_CACHE_CONTROL = "public, max-age=300, must-revalidate"
+
 @router.get("/library")
-async def get_node_library(category: Optional[str] = None):
+async def get_node_library(request: Request, category: Optional[str] = None):
     """Obtiene la librería de nodos disponibles"""
-    
-    node_library = {
-        "Inputs": [
-            {
-                "type": "uv_input",
-                "name": "UV",
-                "description": "Coordenadas UV de pantalla",
-                "category": "input",
-                "inputs": 0,
-                "outputs": 1,
-                "color": "#3b82f6"
-            },
-            {
-                "type": "time_input",
-                "name": "Time",
-                "description": "Tiempo desde inicio",
-                "category": "input",
-                "inputs": 0,
-                "outputs": 1,
-                "color": "#3b82f6"
-            }
-        ],
-        "Math": [
-            {
-                "type": "add",
-                "name": "Add",
-                "description": "Suma dos valores",
-                "category": "operation",
-                "inputs": 2,
-                "outputs": 1,
-                "color": "#8b5cf6"
-            },
-            {
-                "type": "multiply",
-                "name": "Multiply",
-                "description": "Multiplica dos valores",
-                "category": "operation",
-                "inputs": 2,
-                "outputs": 1,
-                "color": "#8b5cf6"
-            },
-            {
-                "type": "lerp",
-                "name": "Lerp",
-                "description": "Interpolación lineal",
-                "category": "operation",
-                "inputs": 3,
-                "outputs": 1,
-                "color": "#8b5cf6"
-            },
-            {
-                "type": "clamp",
-                "name": "Clamp",
-                "description": "Limita valor",
-                "category": "operation",
-                "inputs": 3,
-                "outputs": 1,
-                "color": "#8b5cf6"
-            }
-        ],
-        "Noise": [
-            {
-                "type": "perlin_noise",
-                "name": "Perlin Noise",
-                "description": "Ruido de Perlin",
-                "category": "operation",
-                "inputs": 1,
-                "outputs": 1,
-                "color": "#ec4899"
-            },
-            {
-                "type": "simplex_noise",
-                "name": "Simplex Noise",
-                "description": "Ruido Simplex",
-                "category": "operation",
-                "inputs": 1,
-                "outputs": 1,
-                "color": "#ec4899"
-            }
-        ],
-        "SDF": [
-            {
-                "type": "sdf_sphere",
-                "name": "SDF Sphere",
-                "description": "Función de distancia: Esfera",
-                "category": "operation",
-                "inputs": 2,
-                "outputs": 1,
-                "color": "#f59e0b"
-            }
-        ],
-        "Output": [
-            {
-                "type": "fragment_output",
-                "name": "Fragment Output",
-                "description": "Color final",
-                "category": "output",
-                "inputs": 1,
-                "outputs": 0,
-                "color": "#10b981"
-            }
-        ]
-    }
-    
+    registry = get_registry()
+    try:
+        registry.reload_if_changed()
+    except NodeRegistryError as e:
+        # Un pack personalizado roto no debe tumbar la librería actual
+        print(f"⚠️ Node pack reload failed: {e}")
+
+    snapshot = registry.snapshot
     if category:
-        return {
+        body, etag = snapshot.category_bodies.get(category) or serialize_response({
             "category": category,
-            "nodes": node_library.get(category, [])
-        }
-    
-    return {"library": node_library}
+            "nodes": []
+        })
+    else:
+        body, etag = snapshot.library_body, snapshot.etag
+
+    headers = {"ETag": etag, "Cache-Control": LIBRARY_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.post("/library/reload")
+async def reload_node_library():
+    """Recarga los packs de nodos personalizados (NODE_PACKS_DIR)"""
+    registry = get_registry()
+    try:
+        reloaded = registry.reload_if_changed()
+    except NodeRegistryError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return {
+        "reloaded": reloaded,
+        "packs": list(registry.snapshot.packs),
+        "node_types": len(registry.snapshot.nodes),
+        "etag": registry.snapshot.etag,
+        "error": registry.last_error
+    }
 
 @router.post("/graph/validate")
-async def validate_graph(graph: NodeGraph):
+async def validate_graph(http_request: Request):
     """Valida un grafo sin compilar"""
+    try:
+        graph_dict = decode_graph(await http_request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
     try:
         compiler = GLSLCompiler()
         
         # Solo validar
-        is_valid = compiler._validate_graph({
-            "nodes": graph.nodes,
-            "edges": graph.edges
-        })
+        is_valid = compiler._validate_graph(graph_dict)
         
         return {
             "valid": is_valid,
@@ -258,6 +201,8 @@ class ValidateCodeResponse(BaseModel):
     errors: List[str]
     warnings: List[str]
     suggestions: List[str]
+    truncated: bool = False
+    performance: List[Dict[str, Any]] = []  # rule, severity, message, line, col
 
 @router.post("/shader/validate", response_model=ValidateCodeResponse)
 async def validate_shader_code(request: ValidateCodeRequest):
@@ -270,16 +215,26 @@ async def validate_shader_code(request: ValidateCodeRequest):
     - Tipos consistentes
     - Paréntesis y llaves balanceadas
     - Funciones helper disponibles
+
+    Además devuelve avisos de rendimiento (performance) con severidad y
+    ubicación: pow con exponentes pequeños, llamadas invariantes o texturas
+    dentro de loops, branches por píxel, normalize redundantes y loops sin
+    límite de iteraciones. No afectan a is_valid.
+
+    Con entradas enormes o patológicas el resultado puede ser parcial
+    (truncated=True), ver GLSL_VALIDATION_MAX_SIZE / GLSL_VALIDATION_TIME_BUDGET_MS.
+    Los resultados se cachean por hash del código (ver /shader/validate/stats).
     """
     try:
-        validator = GLSLValidator()
-        result = validator.validate(request.code)
+        result = get_validation_cache().validate(request.code)
 
         return ValidateCodeResponse(
             is_valid=result.is_valid,
             errors=result.errors,
             warnings=result.warnings,
-            suggestions=result.suggestions
+            suggestions=result.suggestions,
+            truncated=result.truncated,
+            performance=[asdict(hint) for hint in result.performance]
         )
 
     except Exception as e:
@@ -289,8 +244,108 @@ async def validate_shader_code(request: ValidateCodeRequest):
         )
 
 
+@router.get("/shader/validate/stats")
+async def get_validation_cache_stats():
+    """Aciertos, fallos y tamaño de la cache de validación de este worker"""
+    return get_validation_cache().stats()
+
+
+# ===== VALIDACIÓN INCREMENTAL (EDITOR) =====
+
+class Position(BaseModel):
+    line: int  # 0-based
+    character: int  # 0-based
+
+class Range(BaseModel):
+    start: Position
+    end: Position
+
+class TextEditModel(BaseModel):
+    range: Optional[Range] = None  # sin rango reemplaza el documento
+    text: str
+
+class SessionOpenRequest(BaseModel):
+    code: str
+
+class SessionEditRequest(BaseModel):
+    version: int  # versión sobre la que se hicieron las ediciones
+    edits: List[TextEditModel]
+
+class SessionResponse(ValidateCodeResponse):
+    session_id: str
+    version: int
+    stats: Dict[str, Any] = {}
+
+
+def _session_response(session: ValidationSession) -> SessionResponse:
+    result = session.diagnostics()
+    return SessionResponse(
+        session_id=session.id,
+        version=session.version,
+        is_valid=result.is_valid,
+        errors=result.errors,
+        warnings=result.warnings,
+        suggestions=result.suggestions,
+        truncated=result.truncated,
+        performance=[asdict(hint) for hint in result.performance],
+        stats=session.stats
+    )
+
+
+@router.post("/shader/sessions", response_model=SessionResponse)
+async def open_validation_session(request: SessionOpenRequest):
+    """
+    Abre una sesión de validación incremental para el editor
+
+    Después solo hay que enviar las ediciones a /shader/sessions/{id}/edits:
+    se revalidan las declaraciones afectadas y se reutiliza el resto.
+    """
+    try:
+        session = get_session_store().open(request.code)
+    except SessionError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    with session.lock:
+        return _session_response(session)
+
+
+@router.post("/shader/sessions/{session_id}/edits", response_model=SessionResponse)
+async def edit_validation_session(session_id: str, request: SessionEditRequest):
+    """Aplica ediciones (rangos 0-based, end exclusivo) y devuelve los diagnósticos"""
+    session = get_session_store().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Session not found: {session_id}")
+
+    with session.lock:
+        if request.version != session.version:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Version mismatch: session is at {session.version}, edits based on {request.version}"
+            )
+        edits = [
+            TextEdit(
+                text=edit.text,
+                start=(edit.range.start.line, edit.range.start.character) if edit.range else None,
+                end=(edit.range.end.line, edit.range.end.character) if edit.range else None
+            )
+            for edit in request.edits
+        ]
+        try:
+            session.apply(edits)
+        except SessionError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        return _session_response(session)
+
+
+@router.delete("/shader/sessions/{session_id}")
+async def close_validation_session(session_id: str):
+    """Cierra una sesión (también expiran solas tras VALIDATION_SESSION_TTL)"""
+    if not get_session_store().close(session_id):
+        raise HTTPException(status_code=404, detail=f"Session not found: {session_id}")
+    return {"closed": session_id}
+
+
 @router.post("/graph/compile-and-validate")
-async def compile_and_validate(request: CompileRequest):
+async def compile_and_validate(http_request: Request):
     """
     Compila un grafo Y valida el código GLSL generado
 
@@ -299,15 +354,16 @@ async def compile_and_validate(request: CompileRequest):
     import time
 
     start_time = time.time()
+    request = await read_compile_request(http_request)
 
     try:
         # 1. Compilar
-        graph_dict = {
-            "nodes": request.graph.nodes,
-            "edges": request.graph.edges
-        }
+        graph_dict = to_compiler_graph(request.graph)
 
-        compiler = GLSLCompiler()
+        compiler = GLSLCompiler(
+            uniform_block=request.target == "webgl2",
+            extract_functions=request.optimize
+        )
         compile_result = compiler.compile(graph_dict)
 
         if compile_result.error:
@@ -322,9 +378,11 @@ async def compile_and_validate(request: CompileRequest):
                 "totalTime": time.time() - start_time
             }
 
-        # 2. Validar código generado
-        validator = GLSLValidator()
-        validation_result = validator.validate(compile_result.code)
+        # 2. Validar código generado: si el compilador lo marcó como correcto
+        # por construcción solo se re-parsea en modo debug o por muestreo
+        validation_result = get_validation_cache().validate_compiled(
+            compile_result.code, compile_result.metadata
+        )
 
         return {
             "success": validation_result.is_valid,
@@ -332,13 +390,17 @@ async def compile_and_validate(request: CompileRequest):
                 "code": compile_result.code,
                 "uniforms": compile_result.uniforms,
                 "functions": compile_result.functions,
-                "warnings": compile_result.warnings
+                "warnings": compile_result.warnings,
+                "uniformLayout": compile_result.uniform_layout,
+                "stats": compile_result.stats
             },
             "validation": {
                 "is_valid": validation_result.is_valid,
                 "errors": validation_result.errors,
                 "warnings": validation_result.warnings,
-                "suggestions": validation_result.suggestions
+                "suggestions": validation_result.suggestions,
+                "truncated": validation_result.truncated,
+                "performance": [asdict(hint) for hint in validation_result.performance]
             },
             "totalTime": time.time() - start_time
         }
@@ -1,7 +1,19 @@
 from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
-import json
-from pathlib import Path
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.code_index import CodeIndex, CodeQuery, CodeQueryError, get_code_index, parse_code_query
+from core.complexity import analyze_complexity
+from core.corpus_columns import CorpusColumns, get_corpus_columns
+from core.facet_index import FACET_TOP, FacetIndex, get_facet_index
+from core.pagination import CursorError, CursorKey, decode_cursor, encode_cursor, id_array, keyset_page, query_fingerprint
+from core.search_cache import get_search_cache
+from core.search_index import SearchIndex, get_search_index
+from core.shader_corpus import get_shader_corpus
+from core.suggest_index import SUGGEST_TOP_K, SuggestIndex, get_suggest_index
+from core.trigram_index import TRIGRAM_SIMILARITY_THRESHOLD, TrigramIndex, get_trigram_index
 
 router = APIRouter(prefix="/api/v1/search", tags=["search"])
 
@@ -266,162 +278,365 @@ void mainImage(out vec4 fragColor, in vec2 fragCoord) {
         }
     ]
 
-def load_shaders_from_disk() -> List[dict]:
-    """Carga shaders desde disco o retorna demos"""
-    shader_dir = Path("../../data/raw/shadertoy")
-    shaders = []
-
-    if shader_dir.exists():
-        for file in shader_dir.glob("*.json"):
-            try:
-                with open(file, encoding='utf-8') as f:
-                    data = json.load(f)
-                    if isinstance(data, dict) and 'info' in data:
-                        info = data['info']
-                        shaders.append({
-                            "id": f"shadertoy_{info.get('id', 'unknown')}",
-                            "name": info.get('name', 'Unknown'),
-                            "description": info.get('description', ''),
-                            "views": info.get('viewed', 0),
-                            "likes": info.get('likes', 0),
-                            "author": info.get('username', 'Anonymous'),
-                            "category": "general",
-                            "tags": info.get('tags', [])
-                        })
-            except Exception as e:
-                print(f"Error loading {file.name}: {e}")
-
-    # Si no hay shaders en disco, usar demos
-    if not shaders:
-        shaders = get_demo_shaders()
-
-    return shaders
+@lru_cache(maxsize=1)
+def demo_records() -> List[dict]:
+    """Demos con el complexity_score que el corpus guarda en cada registro"""
+    return [{**shader, 'complexity_score': analyze_complexity(shader['code']).score} for shader in get_demo_shaders()]
+
+@lru_cache(maxsize=1)
+def demo_shaders_by_id() -> Dict[str, dict]:
+    return {s['id']: s for s in demo_records()}
+
+@lru_cache(maxsize=1)
+def demo_columns() -> CorpusColumns:
+    columns = CorpusColumns()
+    columns.apply(demo_records(), [])
+    return columns
+
+def numeric_columns() -> CorpusColumns:
+    """Columnas de views/likes del corpus residente o de las demos si está vacío (no modificar los registros)"""
+    if len(get_shader_corpus()):
+        return get_corpus_columns()
+    return demo_columns()
+
+@lru_cache(maxsize=1)
+def demo_search_index() -> SearchIndex:
+    index = SearchIndex()
+    index.add_many(demo_records())
+    return index
+
+def text_index() -> Tuple[SearchIndex, Callable[[str], Optional[dict]]]:
+    """Índice BM25 y lookup por id del corpus residente (o de las demos si está vacío)"""
+    corpus = get_shader_corpus()
+    if len(corpus):
+        return get_search_index(), corpus.get
+    return demo_search_index(), demo_shaders_by_id().get
+
+@lru_cache(maxsize=1)
+def demo_trigram_index() -> TrigramIndex:
+    index = TrigramIndex()
+    index.add_many(demo_records())
+    return index
+
+def fuzzy_index() -> Tuple[TrigramIndex, Callable[[str], Optional[dict]]]:
+    """Índice de trigramas y lookup por id del corpus residente (o de las demos si está vacío)"""
+    corpus = get_shader_corpus()
+    if len(corpus):
+        return get_trigram_index(), corpus.get
+    return demo_trigram_index(), demo_shaders_by_id().get
+
+@lru_cache(maxsize=1)
+def demo_facet_index() -> FacetIndex:
+    index = FacetIndex()
+    index.add_many(demo_records())
+    return index
+
+def facet_index() -> Tuple[FacetIndex, Callable[[str], Optional[dict]]]:
+    """Índice de facetas y lookup por id del corpus residente (o de las demos si está vacío)"""
+    corpus = get_shader_corpus()
+    if len(corpus):
+        return get_facet_index(), corpus.get
+    return demo_facet_index(), demo_shaders_by_id().get
+
+@lru_cache(maxsize=1)
+def demo_code_index() -> CodeIndex:
+    index = CodeIndex()
+    index.add_many(demo_records())
+    return index
+
+def code_index() -> Tuple[CodeIndex, Callable[[str], Optional[dict]]]:
+    """Índice de código y lookup por id del corpus residente (o de las demos si está vacío)"""
+    corpus = get_shader_corpus()
+    if len(corpus):
+        return get_code_index(), corpus.get
+    return demo_code_index(), demo_shaders_by_id().get
+
+@lru_cache(maxsize=1)
+def demo_suggest_index() -> SuggestIndex:
+    index = SuggestIndex()
+    index.add_many(demo_records())
+    return index
+
+def suggest_index() -> SuggestIndex:
+    """Índice de autocompletado del corpus residente (o de las demos si está vacío)"""
+    if len(get_shader_corpus()):
+        return get_suggest_index()
+    return demo_suggest_index()
+
+# Campos internos de los índices (nunca salen en las respuestas)
+INTERNAL_FIELDS = ('code_terms',)
+
+def public_shader(shader: dict) -> dict:
+    """Registro sin campos internos (detalle: incluye el código)"""
+    return {k: v for k, v in shader.items() if k not in INTERNAL_FIELDS}
+
+def shader_summary(shader: dict) -> dict:
+    """Registro para listados: sin código ni campos internos"""
+    return {k: v for k, v in shader.items() if k != 'code' and k not in INTERNAL_FIELDS}
+
+def run_search(q: str, limit: int, offset: int, max_complexity: Optional[int], fuzzy: bool,
+               min_similarity: float, filters: Dict[str, List[str]], expression: Optional[CodeQuery],
+               facets: bool, facet_limit: int, fingerprint: Optional[str] = None,
+               after: Optional[CursorKey] = None) -> dict:
+    """
+    Calcula una respuesta de /search/shaders (la cachea search_shaders)
+
+    Con `fingerprint` pagina por cursor desde `after`; si no, por offset.
+    """
+    cursor_mode = fingerprint is not None
+    faceted = facets or any(filters.values())
+    facet_top = facet_limit if facets else None
+    # Con filtros de código, facetas o complejidad (o por cursor) hace falta el resultado completo
+    full = max_complexity is not None or faceted or expression is not None or cursor_mode
+    page_limit = None if full else offset + limit
+    browse_limit = None if max_complexity is not None or cursor_mode else offset + limit
+    match = "text" if q else "all"
+    selection = None
+    ids = None  # None: sin texto, se explora el corpus
+    similarity = None
+    scores = None  # id -> valor de orden del cursor (BM25 o similitud)
+    trigram = bool(q) and fuzzy
+    if q and not fuzzy:
+        # Relevancia BM25 + popularidad; sin filtros solo se ordena la página
+        index, lookup = text_index()
+        ranked, total = index.search(q, limit=page_limit, with_scores=cursor_mode)
+        if cursor_mode:
+            ids, scores = [shader_id for shader_id, _ in ranked], dict(ranked)
+        else:
+            ids = ranked
+        trigram = not total
+    if trigram:
+        # Trigramas: substring sin espacios y erratas, por similitud
+        match = "fuzzy"
+        index, lookup = fuzzy_index()
+        matches, total = index.search(q, threshold=min_similarity, limit=page_limit)
+        ids, similarity = [shader_id for shader_id, _ in matches], dict(matches)
+        scores = similarity
+    if expression is not None:
+        # Código: posting lists de términos extraídos en la ingesta
+        index, lookup = code_index()
+        ids, total = index.select(expression, ids=ids, limit=None if faceted else browse_limit)
+    if faceted and (ids is None or total):
+        # Facetas: bitsets; sin texto ni código se explora por views
+        index, lookup = facet_index()
+        selection = index.select(filters, ids=ids, limit=browse_limit, facet_top=facet_top)
+        ids, total = selection.ids, selection.total
+
+    def decorate(shader: dict) -> dict:
+        if similarity is not None:
+            shader = {**shader, 'similarity': similarity[shader['id']]}
+        return shader
+
+    # complexity_score lo calcula el scorer del corpus: se filtra sobre su columna
+    # (los registros aún sin analizar, -1, no pasan el filtro)
+    columns = numeric_columns()
+    if ids is not None and max_complexity is not None:
+        complexity = columns.complexity_scores(ids)
+        keep = ((complexity >= 0) & (complexity <= max_complexity)).tolist()
+        ids = [shader_id for shader_id, ok in zip(ids, keep) if ok]
+        total = len(ids)
+
+    if cursor_mode:
+        # Keyset: (valor de orden desc, id asc) desde la clave del cursor
+        if ids is None:
+            fetch = lambda key, k: columns.after('views', key, k, max_complexity)
+            total = columns.count(max_complexity)
+        else:
+            records = [shader for shader in map(lookup, ids) if shader is not None]
+            if scores is not None:
+                values = np.array([scores[shader['id']] for shader in records], np.float64)
+            else:
+                values = np.array([max(int(shader.get('views') or 0), 0) for shader in records], np.int64)
+            keys = id_array([shader['id'] for shader in records])
+
+            def fetch(key, k):
+                page, remaining = keyset_page(values, keys, key, k)
+                return [(values[i].item(), records[i]) for i in page], remaining
+
+        chunk, remaining = fetch(after, limit)
+        paginated = [decorate(record) for _, record in chunk]
+        has_more = remaining > len(chunk)
+        key = (chunk[-1][0], chunk[-1][1]['id']) if chunk else after
+        pagination = {
+            "total": total,
+            "limit": limit,
+            "nextCursor": encode_cursor(key, fingerprint) if has_more else None,
+            "hasMore": has_more
+        }
+    else:
+        if ids is not None:
+            filtered = [shader for shader in map(lookup, ids) if shader is not None]
+        else:
+            # Sin texto ni filtros: top-k por views desde las columnas
+            filtered, total = columns.ranked_page('views', offset + limit, max_complexity)
+
+        # Paginar
+        paginated = [decorate(shader) for shader in filtered[offset:offset + limit]]
+        pagination = {
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "hasMore": (offset + limit) < total
+        }
+
+    response = {
+        "success": True,
+        "query": q,
+        "match": match,
+        "results": [shader_summary(shader) for shader in paginated],
+        "pagination": pagination
+    }
+    if facets:
+        response["facets"] = selection.facets if selection is not None else {}
+    return response
 
 @router.get("/shaders")
 def search_shaders(
     q: str = Query("", description="Search query"),
     limit: int = Query(10, ge=1, le=100, description="Number of results"),
-    offset: int = Query(0, ge=0, description="Offset for pagination")
+    offset: int = Query(0, ge=0, description="Offset for pagination"),
+    max_complexity: Optional[int] = Query(None, ge=0, le=100, description="Máximo complexity_score"),
+    fuzzy: bool = Query(False, description="Búsqueda por trigramas en nombre y tags (substring y erratas)"),
+    min_similarity: float = Query(TRIGRAM_SIMILARITY_THRESHOLD, ge=0, le=1, description="Similitud mínima en modo fuzzy"),
+    category: List[str] = Query([], description="Filtra por categoría (repetible)"),
+    author: List[str] = Query([], description="Filtra por autor (repetible)"),
+    tag: List[str] = Query([], description="Filtra por tag (repetible)"),
+    technique: List[str] = Query([], description="Filtra por técnica detectada en el código (repetible)"),
+    code: str = Query("", description="Consulta sobre el código: defines:, calls:, uniform:, technique:, loop:, march: con AND/OR/NOT"),
+    facets: bool = Query(False, description="Incluye conteos por faceta del resultado"),
+    facet_limit: int = Query(FACET_TOP, ge=1, le=100, description="Valores por faceta en los conteos"),
+    cursor: Optional[str] = Query(None, description="Paginación por cursor: vacío en la primera página, después pagination.nextCursor")
 ):
     """
-    Búsqueda simple de shaders por texto
+    Búsqueda de shaders por texto (índice invertido con ranking BM25)
     
-    - **q**: Término de búsqueda (vacío retorna todos)
+    - **q**: Términos de búsqueda en nombre, descripción, tags y autor (vacío retorna todos por views)
     - **limit**: Máximo de resultados (1-100)
     - **offset**: Paginación
+    - **max_complexity**: Descarta shaders más pesados (0-100)
+    - **fuzzy**: Busca por trigramas en nombre y tags ("ray march", "voronio");
+      también se usa automáticamente si la búsqueda por términos no encuentra nada
+    - **min_similarity**: Umbral de similitud de trigramas (0-1)
+    - **category**, **author**, **tag**, **technique**: Filtros de facetas
+      (OR entre valores de la misma faceta, AND entre facetas)
+    - **code**: Consulta booleana sobre el código ("march:smoothstep march:texture",
+      "defines:sdBox", "calls:sd* NOT technique:noise"); usa términos extraídos en la ingesta
+    - **facets**: Añade los conteos por faceta del resultado (antes de max_complexity)
+    - **cursor**: Pagina por clave (relevancia o views desc, id asc) en lugar de
+      offset: las páginas profundas cuestan lo mismo y no se desplazan si el
+      corpus cambia entre una y otra
+    
+    Las respuestas se cachean por consulta normalizada, filtros y página hasta
+    la siguiente recarga del corpus (ver /search/cache/stats).
     
     Returns:
         - query: Término buscado
+        - match: "text" (BM25), "fuzzy" (trigramas) o "all" (sin texto)
         - results: Lista de shaders
         - total: Total de shaders encontrados
+        - facets: Conteos por faceta (solo con facets=true)
         - pagination: Info de paginación
     """
     try:
-        shaders = load_shaders_from_disk()
-        
-        # Filtrar por búsqueda
-        if q:
-            q_lower = q.lower()
-            filtered = [
-                s for s in shaders 
-                if (q_lower in s['name'].lower() or 
-                    q_lower in s['description'].lower() or
-                    any(q_lower in tag.lower() for tag in s.get('tags', [])))
-            ]
-        else:
-            filtered = shaders
-        
-        # Ordenar por views
-        filtered.sort(key=lambda x: x['views'], reverse=True)
-        
-        # Paginar
-        total = len(filtered)
-        paginated = filtered[offset:offset + limit]
-        
+        expression = parse_code_query(code) if code.strip() else None
+        filters = {'category': category, 'author': author, 'tags': tag, 'techniques': technique}
+        # Clave normalizada: los espacios sobrantes y el orden o las mayúsculas de
+        # los filtros no cambian el resultado (el texto sí: camelCase se tokeniza por partes)
+        text = " ".join(q.split())
+        scope = (
+            text, max_complexity, fuzzy, min_similarity,
+            tuple((facet, tuple(sorted({v.strip().lower() for v in values}))) for facet, values in filters.items()),
+            repr(expression)
+        )
+        fingerprint = query_fingerprint(*scope) if cursor is not None else None
+        after = decode_cursor(cursor, fingerprint) if cursor else None
+        key = scope + (limit, offset if cursor is None else cursor, facet_limit if facets else None)
+        response = get_search_cache().get_or_compute(
+            key, get_shader_corpus().snapshot.version,
+            lambda: run_search(text, limit, offset, max_complexity, fuzzy, min_similarity, filters, expression,
+                               facets, facet_limit, fingerprint, after)
+        )
+        return {**response, "query": q}
+    except CodeQueryError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid code query: {str(e)}")
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+@router.get("/suggest")
+def suggest(
+    q: str = Query(..., min_length=1, max_length=100, description="Prefijo escrito por el usuario"),
+    limit: int = Query(8, ge=1, le=SUGGEST_TOP_K, description="Número de sugerencias")
+):
+    """
+    Autocompletado de nombres, tags y autores por prefijo (type-ahead)
+    
+    Las sugerencias se ordenan por popularidad agregada (views + 10·likes de
+    los shaders con ese nombre, tag o autor). Los nombres también completan
+    desde cualquier palabra: "ripple" sugiere "Water Ripple Effect".
+    
+    Returns:
+        - suggestions: [{"text", "type": "name" | "tag" | "author", "count"}]
+    """
+    try:
         return {
             "success": True,
             "query": q,
-            "results": paginated,
-            "pagination": {
-                "total": total,
-                "limit": limit,
-                "offset": offset,
-                "hasMore": (offset + limit) < total
-            }
+            "suggestions": suggest_index().suggest(q, limit)
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Suggest failed: {str(e)}")
 
 @router.get("/shaders/{shader_id}")
 def get_shader(shader_id: str):
     """Obtiene un shader específico por ID"""
     try:
-        shaders = load_shaders_from_disk()
-        
-        for shader in shaders:
-            if shader['id'] == shader_id:
-                return {
-                    "success": True,
-                    "shader": shader
-                }
+        shader = get_shader_corpus().get(shader_id) or demo_shaders_by_id().get(shader_id)
+        if shader is None:
+            raise HTTPException(status_code=404, detail="Shader not found")
         
-        raise HTTPException(status_code=404, detail="Shader not found")
+        return {
+            "success": True,
+            "shader": public_shader(shader)
+        }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching shader: {str(e)}")
 
+@router.get("/cache/stats")
+def get_search_cache_stats():
+    """Aciertos, fallos y peticiones agrupadas de la cache de /search/shaders de este worker"""
+    return {
+        "success": True,
+        "cache": get_search_cache().stats()
+    }
+
 @router.get("/popular")
 def get_popular_shaders(limit: int = Query(10, ge=1, le=50)):
-    """Obtiene shaders populares"""
+    """Obtiene shaders populares (views + likes * 10, top-k sobre columnas)"""
     try:
-        shaders = load_shaders_from_disk()
-        
-        # Ordenar por views + likes
-        shaders.sort(
-            key=lambda x: (x['views'] + x['likes'] * 10), 
-            reverse=True
-        )
+        columns = numeric_columns()
         
         return {
             "success": True,
-            "results": shaders[:limit],
-            "total": len(shaders)
+            "results": [shader_summary(shader) for shader in columns.top('popularity', limit)],
+            "total": len(columns)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching popular shaders: {str(e)}")
 
 @router.get("/stats")
 def get_search_stats():
-    """Obtiene estadísticas de los shaders disponibles"""
+    """Obtiene estadísticas de los shaders disponibles (agregados incrementales)"""
     try:
-        shaders = load_shaders_from_disk()
-        
-        if not shaders:
-            return {
-                "success": True,
-                "stats": {
-                    "total_shaders": 0,
-                    "total_views": 0,
-                    "total_likes": 0,
-                    "avg_views": 0,
-                    "avg_likes": 0
-                }
-            }
-        
-        total_views = sum(s['views'] for s in shaders)
-        total_likes = sum(s['likes'] for s in shaders)
-        
+        stats = numeric_columns().stats()
+        if stats.get("top_shader") is not None:
+            stats = {**stats, "top_shader": shader_summary(stats["top_shader"])}
         return {
             "success": True,
-            "stats": {
-                "total_shaders": len(shaders),
-                "total_views": total_views,
-                "total_likes": total_likes,
-                "avg_views": total_views / len(shaders),
-                "avg_likes": total_likes / len(shaders),
-                "top_shader": max(shaders, key=lambda x: x['views']) if shaders else None
-            }
+            "stats": stats
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching stats: {str(e)}")
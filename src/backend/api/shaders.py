@@ -3,16 +3,31 @@ API endpoints para gestión de shaders
 """
 
 from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from collections import OrderedDict
+import os
+import threading
+import time
 import uuid
 from datetime import datetime
 
 from db.database import get_db
 from db.models import Shader, User, ShaderTag, NodeGraph, ShaderEmbedding
+from core.artifacts import materialize_node_graph, is_stale
+from core.complexity import update_shader_complexity
+from core.pagination import CursorError, decode_cursor, encode_cursor, query_fingerprint
 
 router = APIRouter(prefix="/api/v1/shaders", tags=["shaders"])
 
+# Vida de los totales cacheados de los listados (segundos)
+SHADER_COUNT_CACHE_TTL = float(os.getenv("SHADER_COUNT_CACHE_TTL", 30))
+COUNT_CACHE_SIZE = 256
+
+_count_cache: "OrderedDict[tuple, tuple]" = OrderedDict()  # filtros -> (instante, total)
+_count_cache_lock = threading.Lock()  # los handlers síncronos corren en el threadpool
+
 # Modelos Pydantic
 from pydantic import BaseModel
 
@@ -42,6 +57,10 @@ class ShaderResponse(BaseModel):
     category: Optional[str]
     tags: List[str]
     techniques: List[str]
+    complexity_score: Optional[int] = None  # 0-100, coste estimado por fragmento
+    is_valid: Optional[bool] = None  # None = sin validar
+    uniforms: Optional[List[dict]] = None
+    thumbnail_url: Optional[str] = None
     views: int
     likes: int
     visibility: str
@@ -51,6 +70,32 @@ class ShaderResponse(BaseModel):
     class Config:
         from_attributes = True
 
+def count_shaders(query, scope: tuple, exact: bool = False) -> int:
+    """
+    COUNT(*) de un listado, cacheado por filtros durante SHADER_COUNT_CACHE_TTL
+    segundos: paginar no repite el conteo completo en cada página
+    """
+    now = time.monotonic()
+    with _count_cache_lock:
+        cached = _count_cache.get(scope)
+    if exact or cached is None or now - cached[0] > SHADER_COUNT_CACHE_TTL:
+        # El COUNT corre fuera del lock: solo se protege el OrderedDict
+        cached = (now, query.order_by(None).count())
+        with _count_cache_lock:
+            _count_cache[scope] = cached
+            _count_cache.move_to_end(scope)
+            while len(_count_cache) > COUNT_CACHE_SIZE:
+                _count_cache.popitem(last=False)
+    return cached[1]
+
+def filter_complexity(query, min_complexity: Optional[int], max_complexity: Optional[int]):
+    """Filtro por complexity_score (los shaders sin analizar quedan fuera)"""
+    if min_complexity is not None:
+        query = query.filter(Shader.complexity_score >= min_complexity)
+    if max_complexity is not None:
+        query = query.filter(Shader.complexity_score <= max_complexity, Shader.complexity_version.isnot(None))
+    return query
+
 # Endpoints
 @router.post("", response_model=ShaderResponse)
 def create_shader(
@@ -71,6 +116,9 @@ def create_shader(
             source="user"
         )
         
+        # Complejidad y uniforms usados (filtros de listados y búsqueda)
+        update_shader_complexity(new_shader)
+        
         # Agregar tags
         for tag_name in shader_data.tags:
             tag = ShaderTag(name=tag_name)
@@ -110,28 +158,63 @@ def list_shaders(
     limit: int = Query(10, ge=1, le=100),
     category: Optional[str] = None,
     visibility: str = "public",
+    min_complexity: Optional[int] = Query(None, ge=0, le=100),
+    max_complexity: Optional[int] = Query(None, ge=0, le=100),
+    is_valid: Optional[bool] = Query(None, description="Solo shaders que validan (true) o que no (false); sin validar quedan fuera"),
+    cursor: Optional[str] = Query(None, description="pagination.nextCursor de la página anterior (sustituye a skip)"),
+    exact_total: bool = Query(False, description="COUNT(*) exacto en lugar de la estimación cacheada"),
     db: Session = Depends(get_db)
 ):
-    """Lista shaders con paginación"""
+    """
+    Lista shaders con paginación
+
+    min_complexity / max_complexity filtran por complexity_score (0-100,
+    indexado junto a visibility) para descartar shaders demasiado pesados.
+    is_valid filtra por el resultado de commands.validate_corpus --persist.
+
+    Orden: views e id descendentes. Con `cursor` la página empieza
+    después del último shader de la anterior (keyset sobre el índice
+    visibility/views/id): no escanea las filas saltadas y no se desplaza
+    con escrituras concurrentes. El total es un COUNT(*) cacheado
+    SHADER_COUNT_CACHE_TTL segundos salvo con exact_total.
+    """
     query = db.query(Shader).filter(Shader.visibility == visibility)
     
     if category:
         query = query.filter(Shader.category == category)
+    query = filter_complexity(query, min_complexity, max_complexity)
+    if is_valid is not None:
+        query = query.filter(Shader.is_valid == is_valid)
+    scope = (visibility, category, min_complexity, max_complexity, is_valid)
     
-    # Ordenar por views descendente
-    query = query.order_by(Shader.views.desc())
+    try:
+        total = count_shaders(query, scope, exact=exact_total)
+        fingerprint = query_fingerprint(*scope)
+        if cursor:
+            views, last_id = decode_cursor(cursor, fingerprint)
+            # Misma dirección en las dos claves: el índice se recorre hacia atrás
+            query = query.filter(tuple_(Shader.views, Shader.id) < (views, last_id))
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {str(e)}")
     
-    total = query.count()
-    shaders = query.offset(skip).limit(limit).all()
+    # Ordenar por views descendente (desempate por id: orden total para el cursor)
+    query = query.order_by(Shader.views.desc(), Shader.id.desc())
+    if not cursor:
+        query = query.offset(skip)
+    rows = query.limit(limit + 1).all()
+    shaders, has_more = rows[:limit], len(rows) > limit
+    next_cursor = encode_cursor((shaders[-1].views or 0, shaders[-1].id), fingerprint) if has_more else None
     
     return {
         "success": True,
         "results": shaders,
         "pagination": {
             "total": total,
-            "skip": skip,
+            "totalExact": exact_total,
+            "skip": 0 if cursor else skip,
             "limit": limit,
-            "hasMore": (skip + limit) < total
+            "nextCursor": next_cursor,
+            "hasMore": has_more
         }
     }
 
@@ -153,8 +236,9 @@ def update_shader(
             shader.name = shader_data.name
         if shader_data.description is not None:
             shader.description = shader_data.description
-        if shader_data.code is not None:
+        if shader_data.code is not None and shader_data.code != shader.code:
             shader.code = shader_data.code
+            update_shader_complexity(shader)
         if shader_data.category is not None:
             shader.category = shader_data.category
         if shader_data.visibility is not None:
@@ -233,13 +317,15 @@ def like_shader(
 def search_by_category(
     category: str,
     limit: int = Query(10, ge=1, le=100),
+    max_complexity: Optional[int] = Query(None, ge=0, le=100),
     db: Session = Depends(get_db)
 ):
     """Busca shaders por categoría"""
-    shaders = db.query(Shader).filter(
+    query = db.query(Shader).filter(
         Shader.category == category,
         Shader.visibility == "public"
-    ).order_by(Shader.views.desc()).limit(limit).all()
+    )
+    shaders = filter_complexity(query, None, max_complexity).order_by(Shader.views.desc()).limit(limit).all()
     
     return {
         "success": True,
@@ -284,16 +370,21 @@ def save_node_graph(
         
         if not node_graph:
             node_graph = NodeGraph(shader_id=shader_id, graph_data=graph_data)
+            node_graph.shader = shader
             db.add(node_graph)
         else:
             node_graph.graph_data = graph_data
             node_graph.updated_at = datetime.utcnow()
         
+        # Compilar al guardar (también sincroniza Shader.code)
+        materialize_node_graph(node_graph)
+        
         db.commit()
         
         return {
             "success": True,
-            "message": "Node graph saved"
+            "message": "Node graph saved",
+            "compiled": node_graph.artifact_dict()
         }
         
     except Exception as e:
@@ -311,7 +402,13 @@ def get_node_graph(
     if not node_graph:
         raise HTTPException(status_code=404, detail="Node graph not found")
     
+    # Artefactos de una versión anterior del compilador se regeneran al leer
+    if is_stale(node_graph):
+        materialize_node_graph(node_graph)
+        db.commit()
+    
     return {
         "success": True,
-        "graph": node_graph.graph_data
+        "graph": node_graph.graph_data,
+        "compiled": node_graph.artifact_dict()
     }
@@ -0,0 +1,89 @@
+"""
+Benchmark: consultas por código con core.code_index
+
+Usa el corpus sintético de bench_search_index con un código generado a
+partir de fragmentos (funciones de distancia, ruido, bucles de
+raymarching...) y mide la extracción de términos en la ingesta, la
+construcción del índice y la latencia (p50, top 10) de consultas
+booleanas, frente a recorrer el código con regex en cada consulta.
+
+Uso (desde src/backend):
+    python -m benchmarks.bench_code_index
+"""
+
+import random
+import re
+import time
+
+from benchmarks.bench_search_index import SEED, build_records, percentiles
+from core.code_index import CodeIndex
+from core.code_terms import code_terms
+from core.techniques import detect_techniques
+
+SNIPPETS = [
+    "float sdBox(vec3 p, vec3 b) { vec3 q = abs(p) - b; return length(max(q, 0.0)); }",
+    "float sdSphere(vec3 p, float r) { return length(p) - r; }",
+    "float hash(vec2 p) { return fract(sin(dot(p, vec2(12.9898, 78.233))) * 43758.5453); }",
+    "float noise(vec2 p) { vec2 i = floor(p); return mix(hash(i), hash(i + 1.0), fract(p.x)); }",
+    "float fbm(vec2 p) { float v = 0.0; for (int i = 0; i < 5; i++) { v += noise(p); p *= 2.0; } return v; }",
+    "float map(vec3 p) { return min(sdBox(p, vec3(1.0)), sdSphere(p, 0.5)); }",
+    "vec3 palette(float t) { return 0.5 + 0.5 * cos(6.2831 * (t + vec3(0.0, 0.33, 0.67))); }",
+]
+
+MAIN_BODIES = [
+    "float t = 0.0; for (int i = 0; i < 64; i++) { float d = map(vec3(uv, t)); t += d * smoothstep(0.0, 1.0, d); "
+    "col += texture(iChannel0, uv).rgb; }",
+    "col = palette(fbm(uv * 3.0 + iTime));",
+    "for (int i = 0; i < 8; i++) { uv = abs(uv) / dot(uv, uv) - 0.5; col += texture(iChannel1, uv).rgb; }",
+    "col = vec3(smoothstep(0.2, 0.8, noise(uv * 10.0)));",
+]
+
+
+def build_code(rng: random.Random) -> str:
+    helpers = "\n".join(rng.sample(SNIPPETS, rng.randrange(1, 4)))
+    body = rng.choice(MAIN_BODIES)
+    return (f"{helpers}\nvoid mainImage(out vec4 fragColor, in vec2 fragCoord) {{\n"
+            f"    vec2 uv = fragCoord / iResolution.xy; vec3 col = vec3(0.0);\n    {body}\n"
+            f"    fragColor = vec4(col, 1.0);\n}}")
+
+
+def linear_scan(records, pattern: re.Pattern):
+    return [r for r in records if pattern.search(r['code'])]
+
+
+def main():
+    queries = {
+        "declara": ("defines:sdbox", re.compile(r'float\s+sdBox\s*\(')),
+        "march AND": ("march:smoothstep march:texture", re.compile(r'for\s*\([^)]*\)\s*\{[^}]*map\([^}]*smoothstep[^}]*texture')),
+        "OR + NOT": ("(calls:fbm OR calls:noise) NOT technique:sdf", re.compile(r'(?:fbm|noise)\s*\(')),
+        "prefijo": ("defines:sd*", re.compile(r'float\s+sd\w*\s*\(')),
+    }
+    for count in (100_000, 300_000):
+        rng = random.Random(SEED)
+        records = list(build_records(count, rng))
+        for r in records:
+            r['code'] = build_code(rng)
+
+        start = time.perf_counter()
+        for r in records:
+            r['techniques'] = detect_techniques(r['code'])
+            r['code_terms'] = code_terms(r['code'], r['techniques'])
+        extract_s = time.perf_counter() - start
+
+        index = CodeIndex()
+        start = time.perf_counter()
+        index.add_many(records)
+        build_s = time.perf_counter() - start
+
+        print(f"\n{count:,} shaders: extracción {extract_s:.1f}s, build {build_s:.1f}s, "
+              f"{len(index._postings):,} términos")
+        print(f"{'consulta':>10} {'matches':>9} {'p50 ms':>8} {'p99 ms':>8} {'regex ms':>9}")
+        for label, (query, pattern) in queries.items():
+            total = index.select(query, limit=10)[1]
+            p50, p99 = percentiles(lambda: index.select(query, limit=10), 20)
+            legacy_ms = percentiles(lambda: linear_scan(records, pattern), 1)[0]
+            print(f"{label:>10} {total:>9,} {p50:>8.2f} {p99:>8.2f} {legacy_ms:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: /search/popular y /search/stats con columnas NumPy vs listas de dicts
+
+Compara el sort completo por views + likes*10 y los sum()/max() por
+petición que hacían los endpoints con core.corpus_columns (top-k por
+argpartition cacheado y agregados incrementales), y reporta la memoria
+de las columnas por shader.
+
+Uso (desde src/backend):
+    python -m benchmarks.bench_corpus_columns
+"""
+
+import random
+import time
+
+from core.corpus_columns import CorpusColumns
+
+
+def build_records(count: int, rng: random.Random):
+    return [
+        {"id": f"shadertoy_{i:07d}", "views": int(rng.paretovariate(1.2) * 100), "likes": int(rng.paretovariate(1.5) * 3)}
+        for i in range(count)
+    ]
+
+
+def legacy_popular(records, limit: int):
+    return sorted(records, key=lambda x: (x['views'] + x['likes'] * 10), reverse=True)[:limit]
+
+
+def legacy_stats(records):
+    total_views = sum(s['views'] for s in records)
+    total_likes = sum(s['likes'] for s in records)
+    return total_views, total_likes, max(records, key=lambda x: x['views'])
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    print(f"{'shaders':>9} {'popular ms':>11} {'(lista)':>9} {'recarga+top ms':>15} {'stats ms':>9} {'(lista)':>9} {'B/shader':>9}")
+    for count in (10_000, 100_000, 1_000_000):
+        rng = random.Random(1)
+        records = build_records(count, rng)
+        columns = CorpusColumns()
+        columns.apply(records, [])
+
+        changed = [dict(r, views=r["views"] + 1) for r in rng.sample(records, 100)]
+
+        def reload_and_top():
+            columns.apply(changed, [])
+            columns.top('popularity', 50)
+
+        popular_ms = best_of(lambda: columns.top('popularity', 50), 20)
+        legacy_popular_ms = best_of(lambda: legacy_popular(records, 50), 3)
+        reload_ms = best_of(reload_and_top, 5)
+        stats_ms = best_of(columns.stats, 20)
+        legacy_stats_ms = best_of(lambda: legacy_stats(records), 3)
+        per_shader = columns.stats()["memory"]["bytes_per_shader"]
+        print(f"{count:>9,} {popular_ms:>11.3f} {legacy_popular_ms:>9.1f} {reload_ms:>15.1f} "
+              f"{stats_ms:>9.3f} {legacy_stats_ms:>9.1f} {per_shader:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: arranque del corpus desde JSON vs desde el snapshot con mmap
+
+Genera un directorio temporal con un JSON indentado por shader (como los
+guarda el scraper) y mide la carga en frío de ShaderCorpus leyendo todos
+los JSON, la compactación y la carga partiendo del snapshot (solo se
+escanean los mtime).
+
+Uso (desde src/backend):
+    python -m benchmarks.bench_corpus_snapshot
+"""
+
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_search_index import SEED, build_records
+from core.shader_corpus import ShaderCorpus
+
+CODE_LINES = 60
+
+
+def write_corpus(directory: Path, count: int, rng: random.Random):
+    for record in build_records(count, rng):
+        shader_id = record["id"].split("_", 1)[1]
+        code = "\n".join(f"    float v{i} = sin(uv.x * {rng.random():.4f}) * fbm(uv);" for i in range(CODE_LINES))
+        data = {
+            "info": {"id": shader_id, "name": record["name"], "description": record["description"],
+                     "viewed": record["views"], "likes": record["likes"], "username": record["author"],
+                     "tags": record["tags"]},
+            "renderpass": [{"type": "image", "name": "Image",
+                            "code": f"void mainImage(out vec4 f, in vec2 c) {{\n{code}\n}}"}]
+        }
+        (directory / f"{shader_id}.json").write_text(json.dumps(data, indent=2))
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'shaders':>9} {'JSON s':>8} {'compactar s':>12} {'snapshot s':>11} {'MB':>7}")
+    for count in (10_000, 50_000):
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = Path(tmp) / "shadertoy"
+            directory.mkdir()
+            write_corpus(directory, count, random.Random(SEED))
+            path = Path(tmp) / "corpus.snapshot"
+
+            json_s = timed(lambda: len(ShaderCorpus(directory, reload_interval=0)))
+            compact_s = timed(lambda: ShaderCorpus(directory, reload_interval=0).write_snapshot(path))
+            snapshot_s = timed(lambda: len(ShaderCorpus(directory, reload_interval=0, snapshot_path=path)))
+            print(f"{count:>9,} {json_s:>8.2f} {compact_s:>12.2f} {snapshot_s:>11.2f} {path.stat().st_size / 1e6:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
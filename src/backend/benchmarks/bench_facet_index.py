@@ -0,0 +1,76 @@
+"""
+Benchmark: filtros y conteos de facetas con core.facet_index
+
+Usa el corpus sintético de bench_search_index (con categoría y técnicas
+aleatorias) y mide la latencia (p50) de filtrar por facetas y contar los
+valores de cada faceta del resultado, frente a recorrer la lista de dicts
+con comprensiones y Counter.
+
+Uso (desde src/backend):
+    python -m benchmarks.bench_facet_index
+"""
+
+import random
+import time
+from collections import Counter
+
+from benchmarks.bench_search_index import SEED, build_records, percentiles
+from core.facet_index import FacetIndex
+
+CATEGORIES = ["general", "effects", "fractal", "procedural", "space", "simulation"]
+TECHNIQUES = ["raymarching", "sdf", "noise", "fbm", "voronoi", "fractal", "texture", "feedback"]
+
+
+def faceted_records(count: int, rng: random.Random):
+    for record in build_records(count, rng):
+        record["category"] = rng.choice(CATEGORIES)
+        record["techniques"] = rng.sample(TECHNIQUES, rng.randrange(4))
+        yield record
+
+
+def legacy_select(records, filters, top: int = 10):
+    matched = [
+        r for r in records
+        if all(not values or set(values) & set(r[facet] if isinstance(r[facet], list) else [r[facet]])
+               for facet, values in filters.items())
+    ]
+    counts = {facet: Counter() for facet in ("category", "author", "tags", "techniques")}
+    for r in matched:
+        counts["category"][r["category"]] += 1
+        counts["author"][r["author"]] += 1
+        counts["tags"].update(r["tags"])
+        counts["techniques"].update(r["techniques"])
+    page = sorted(matched, key=lambda r: r["views"], reverse=True)[:10]
+    return page, {facet: c.most_common(top) for facet, c in counts.items()}
+
+
+def main():
+    for count in (100_000, 1_000_000):
+        records = list(faceted_records(count, random.Random(SEED)))
+        common_tag = records[0]["tags"][0]
+        queries = {
+            "sin filtros": {},
+            "categoría": {"category": ["fractal"]},
+            "cat+técnica": {"category": ["fractal", "space"], "techniques": ["sdf"]},
+            "tag común": {"tags": [common_tag]},
+            "autor": {"author": [records[0]["author"]]}
+        }
+
+        index = FacetIndex()
+        start = time.perf_counter()
+        index.add_many(records)
+        index.select({})
+        build_s = time.perf_counter() - start
+
+        print(f"\n{count:,} shaders: build {build_s:.1f}s, {len(index._labels):,} valores, "
+              f"{len(index._bitmaps)} bitsets")
+        print(f"{'filtro':>12} {'matches':>9} {'p50 ms':>8} {'p99 ms':>8} {'lista ms':>9}")
+        for label, filters in queries.items():
+            total = index.select(filters, limit=10, facet_top=10).total
+            p50, p99 = percentiles(lambda: index.select(filters, limit=10, facet_top=10), 20)
+            legacy_ms = percentiles(lambda: legacy_select(records, filters), 1)[0]
+            print(f"{label:>12} {total:>9,} {p50:>8.2f} {p99:>8.2f} {legacy_ms:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: extracción de subgrafos repetidos a funciones compartidas
+
+Genera grafos con N copias del motivo clamp(lerp(a, b, noise(uv * k)), 0, 1)
+y compara el código inline contra el código con funciones extraídas:
+tamaño del source, número de statements en mainImage y, si hay un
+compilador GLSL disponible (glslangValidator en el PATH), el tiempo de
+compilación del driver/frontend.
+
+Uso (desde src/backend):
+    python -m benchmarks.bench_function_extraction
+"""
+
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from core.compiler import GLSLCompiler
+
+# Envoltorio GLSL ES 3.0 para compilar la salida estilo Shadertoy
+FRAGMENT_WRAPPER = """#version 300 es
+precision highp float;
+out vec4 outColor;
+{code}
+void main() {{
+  mainImage(outColor, gl_FragCoord.xy);
+}}
+"""
+
+
+def add_motif(prefix: str, k: float, nodes: list, edges: list) -> str:
+    """Agrega clamp(lerp(a, 1.0, perlin(uv * k)), 0, 1) y retorna el id del clamp"""
+    nodes.extend([
+        {"id": f"{prefix}_k", "data": {"type": "float_constant", "parameters": {"value": k}}},
+        {"id": f"{prefix}_a", "data": {"type": "float_constant", "parameters": {"value": k / 2}}},
+        {"id": f"{prefix}_mul", "data": {"type": "multiply"}},
+        {"id": f"{prefix}_noise", "data": {"type": "perlin_noise"}},
+        {"id": f"{prefix}_lerp", "data": {"type": "lerp", "parameters": {"input1": 1.0}}},
+        {"id": f"{prefix}_clamp", "data": {"type": "clamp", "parameters": {"input1": 0.0, "input2": 1.0}}}
+    ])
+    edges.extend([
+        {"source": "uv", "target": f"{prefix}_mul", "targetHandle": "input"},
+        {"source": f"{prefix}_k", "target": f"{prefix}_mul", "targetHandle": "input1"},
+        {"source": f"{prefix}_mul", "target": f"{prefix}_noise"},
+        {"source": f"{prefix}_a", "target": f"{prefix}_lerp", "targetHandle": "input"},
+        {"source": f"{prefix}_noise", "target": f"{prefix}_lerp", "targetHandle": "input2"},
+        {"source": f"{prefix}_lerp", "target": f"{prefix}_clamp", "targetHandle": "input"}
+    ])
+    return f"{prefix}_clamp"
+
+
+def build_graph(copies: int) -> Dict[str, Any]:
+    """Suma `copies` instancias del motivo y las envía al output"""
+    nodes = [{"id": "uv", "data": {"type": "uv_input"}}]
+    edges = []
+    outputs = [add_motif(f"m{i}", 2.0 + i, nodes, edges) for i in range(copies)]
+
+    acc = outputs[0]
+    for i, out in enumerate(outputs[1:]):
+        nodes.append({"id": f"sum{i}", "data": {"type": "add"}})
+        edges.append({"source": acc, "target": f"sum{i}", "targetHandle": "input"})
+        edges.append({"source": out, "target": f"sum{i}", "targetHandle": "input1"})
+        acc = f"sum{i}"
+
+    nodes.append({"id": "output", "data": {"type": "fragment_output"}})
+    edges.append({"source": acc, "target": "output"})
+    return {"nodes": nodes, "edges": edges}
+
+
+def driver_compile_ms(code: str, repeat: int = 3) -> Optional[float]:
+    """Mejor tiempo de glslangValidator sobre el shader (None si no está instalado)"""
+    validator = shutil.which("glslangValidator")
+    if not validator:
+        return None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "shader.frag"
+        path.write_text(FRAGMENT_WRAPPER.format(code=code))
+
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([validator, str(path)], capture_output=True, check=False)
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+
+def main():
+    has_driver = shutil.which("glslangValidator") is not None
+    header = f"{'copies':>7} {'inline B':>9} {'shared B':>9} {'shrink':>7} {'inline stmts':>13} {'shared stmts':>13}"
+    if has_driver:
+        header += f" {'inline ms':>10} {'shared ms':>10}"
+    print(header)
+
+    for copies in (2, 10, 50, 200, 1000):
+        graph = build_graph(copies)
+        inline = GLSLCompiler(extract_functions=False).compile(graph)
+        shared = GLSLCompiler(extract_functions=True).compile(graph)
+
+        inline_stmts = inline.code.count(";")
+        shared_stmts = shared.code.count(";")
+        shrink = 1 - len(shared.code) / len(inline.code)
+
+        row = (
+            f"{copies:>7} {len(inline.code):>9} {len(shared.code):>9} {shrink:>6.0%} "
+            f"{inline_stmts:>13} {shared_stmts:>13}"
+        )
+        if has_driver:
+            row += f" {driver_compile_ms(inline.code):>10.1f} {driver_compile_ms(shared.code):>10.1f}"
+        print(row)
+
+    if not has_driver:
+        print("\n(glslangValidator no encontrado: se omite el tiempo de compilación del driver)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: tiempo de parseo del body de compilación vs tamaño del grafo
+
+Compara la validación genérica anterior (Pydantic con List[Dict[str, Any]])
+contra la decodificación tipada de core.graph_schema.
+
+Uso (desde src/backend):
+    python -m benchmarks.bench_graph_decode
+"""
+
+import json
+import time
+from typing import Any, Dict, List
+
+from pydantic import BaseModel
+
+from core.graph_schema import decode_compile_request, to_compiler_graph
+
+
+# Modelos tal como estaban antes en api/nodes.py
+class LegacyNodeGraph(BaseModel):
+    nodes: List[Dict[str, Any]]
+    edges: List[Dict[str, Any]]
+
+
+class LegacyCompileRequest(BaseModel):
+    graph: LegacyNodeGraph
+    language: str = "glsl"
+    optimize: bool = True
+
+
+def build_payload(num_nodes: int) -> bytes:
+    """Genera un grafo encadenado con los campos de UI que envía React Flow"""
+    nodes = [{
+        "id": "uv",
+        "type": "custom",
+        "position": {"x": 0.0, "y": 0.0},
+        "data": {"type": "uv_input", "label": "UV", "category": "input", "color": "#3b82f6"}
+    }]
+    edges = []
+    previous = "uv"
+    for i in range(num_nodes):
+        node_id = f"n{i}"
+        nodes.append({
+            "id": node_id,
+            "type": "custom",
+            "position": {"x": float(i * 40), "y": float(i % 7) * 30.0},
+            "selected": False,
+            "dragging": False,
+            "width": 180,
+            "height": 96,
+            "data": {
+                "type": "add",
+                "label": "Add",
+                "description": "Suma dos valores",
+                "category": "operation",
+                "color": "#8b5cf6",
+                "parameters": {"input1": 0.5}
+            }
+        })
+        edges.append({
+            "id": f"e{i}",
+            "source": previous,
+            "target": node_id,
+            "sourceHandle": "output",
+            "targetHandle": "input",
+            "animated": True,
+            "style": {"stroke": "#8b5cf6"}
+        })
+        previous = node_id
+    nodes.append({"id": "output", "position": {"x": 0.0, "y": 0.0}, "data": {"type": "fragment_output"}})
+    edges.append({"id": "e_out", "source": previous, "target": "output"})
+    return json.dumps({"graph": {"nodes": nodes, "edges": edges}, "language": "glsl"}).encode()
+
+
+def time_call(fn, payload: bytes, repeat: int) -> float:
+    """Mejor tiempo (ms) de `repeat` ejecuciones"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(payload)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def legacy_parse(payload: bytes):
+    request = LegacyCompileRequest.model_validate(json.loads(payload))
+    return {"nodes": request.graph.nodes, "edges": request.graph.edges}
+
+
+def typed_parse(payload: bytes):
+    return to_compiler_graph(decode_compile_request(payload).graph)
+
+
+def main():
+    print(f"{'nodes':>8} {'KB':>8} {'pydantic ms':>12} {'typed ms':>10} {'speedup':>8}")
+    for size in (10, 100, 1_000, 10_000, 50_000):
+        payload = build_payload(size)
+        repeat = 20 if size <= 1_000 else 5
+        legacy = time_call(legacy_parse, payload, repeat)
+        typed = time_call(typed_parse, payload, repeat)
+        print(f"{size:>8} {len(payload) / 1024:>8.0f} {legacy:>12.2f} {typed:>10.2f} {legacy / typed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: latencia de /search/shaders con el índice BM25 hasta 1M shaders
+
+Genera un corpus sintético con vocabulario de distribución Zipf (nombres,
+descripciones, tags y autores), construye core.search_index y mide p50/p99
+de consultas de uno y varios términos (top 10), comparando con el escaneo
+lineal por substring que hacía antes el endpoint.
+
+Uso (desde src/backend):
+    python -m benchmarks.bench_search_index
+"""
+
+import itertools
+import random
+import time
+
+from core.search_index import SearchIndex
+
+VOCABULARY_SIZE = 50_000
+AUTHORS = 20_000
+SEED = 7
+
+
+def build_vocabulary(rng: random.Random):
+    common = ["fire", "water", "raymarching", "fractal", "noise", "plasma", "tunnel", "ocean", "galaxy", "voronoi"]
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = common + ["".join(rng.choices(letters, k=rng.randint(4, 9))) for _ in range(VOCABULARY_SIZE - len(common))]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    return words, cum_weights
+
+
+def build_records(count: int, rng: random.Random):
+    words, cum_weights = build_vocabulary(rng)
+    for i in range(count):
+        sample = rng.choices(words, cum_weights=cum_weights, k=16)
+        yield {
+            "id": f"shadertoy_{i:07d}",
+            "name": " ".join(sample[:3]).title(),
+            "description": " ".join(sample[3:13]),
+            "tags": sample[13:16],
+            "author": f"author{rng.randrange(AUTHORS)}",
+            "views": int(rng.paretovariate(1.2) * 100),
+            "likes": int(rng.paretovariate(1.5) * 3)
+        }
+
+
+def legacy_search(records, q: str):
+    q_lower = q.lower()
+    filtered = [
+        s for s in records
+        if (q_lower in s['name'].lower() or
+            q_lower in s['description'].lower() or
+            any(q_lower in tag.lower() for tag in s.get('tags', [])))
+    ]
+    return sorted(filtered, key=lambda x: x['views'], reverse=True)[:10]
+
+
+def percentiles(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def main():
+    queries = {
+        "común": "fire",
+        "rara": None,  # término de la cola de Zipf, se elige tras construir
+        "2 términos": "water noise",
+        "3 términos": "fractal ocean tunnel",
+        "4 términos": "galaxy voronoi plasma noise",
+        "sin match": "zzzzzz"
+    }
+    for count in (100_000, 1_000_000):
+        rng = random.Random(SEED)
+        records = list(build_records(count, rng))
+        queries["rara"] = records[-1]["description"].split()[-1]
+
+        index = SearchIndex()
+        start = time.perf_counter()
+        index.add_many(records)
+        build_s = time.perf_counter() - start
+
+        extra = list(build_records(1_000, random.Random(SEED + 1)))
+        start = time.perf_counter()
+        index.add_many(extra)
+        add_ms = (time.perf_counter() - start) * 1000
+
+        print(f"\n{count:,} shaders: build {build_s:.1f}s, {len(index._postings):,} términos, "
+              f"1000 upserts {add_ms:.0f} ms")
+        print(f"{'consulta':>12} {'matches':>9} {'p50 ms':>8} {'p99 ms':>8} {'lineal ms':>10}")
+        for label, q in queries.items():
+            index.search(q, limit=10)  # calienta la caché de impactos
+            total = index.search(q, limit=10)[1]
+            p50, p99 = percentiles(lambda: index.search(q, limit=10), 200)
+            legacy_ms = percentiles(lambda: legacy_search(records, q), 1)[0]
+            print(f"{label:>12} {total:>9,} {p50:>8.2f} {p99:>8.2f} {legacy_ms:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
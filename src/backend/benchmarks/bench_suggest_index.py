@@ -0,0 +1,61 @@
+"""
+Benchmark: autocompletado con core.suggest_index
+
+Usa el corpus sintético de bench_search_index y mide la construcción del
+índice, la latencia (p50/p99, 8 sugerencias) de prefijos cortos y largos
+frente a un escaneo lineal de nombres, tags y autores, y el coste de
+aplicar una recarga incremental de 1.000 shaders.
+
+Uso (desde src/backend):
+    python -m benchmarks.bench_suggest_index
+"""
+
+import random
+import time
+
+from benchmarks.bench_search_index import SEED, build_records, percentiles
+from core.suggest_index import SuggestIndex, popularity
+from core.trigram_index import normalize
+
+
+def linear_suggest(records, prefix: str, limit: int = 8):
+    totals = {}
+    for r in records:
+        for text in [r['name'], r['author']] + r['tags']:
+            key = normalize(text)
+            if key.startswith(prefix):
+                totals[key] = totals.get(key, 0) + popularity(r)
+    return sorted(totals.items(), key=lambda item: -item[1])[:limit]
+
+
+def main():
+    for count in (100_000, 1_000_000):
+        rng = random.Random(SEED)
+        records = list(build_records(count, rng))
+        sample = normalize(records[5]["name"])
+        prefixes = {"1 letra": sample[:1], "2 letras": sample[:2], "palabra": sample.split()[0],
+                    "nombre": sample[:-1], "sin match": "zzq"}
+
+        index = SuggestIndex()
+        start = time.perf_counter()
+        index.add_many(records)
+        build_s = time.perf_counter() - start
+
+        print(f"\n{count:,} shaders: build {build_s:.1f}s, {len(index._keys):,} claves")
+        print(f"{'prefijo':>10} {'texto':>24} {'p50 ms':>8} {'p99 ms':>8} {'lineal ms':>10}")
+        for label, prefix in prefixes.items():
+            index.suggest(prefix)
+            p50, p99 = percentiles(lambda: index.suggest(prefix), 200)
+            legacy_ms = percentiles(lambda: linear_suggest(records, prefix), 1)[0]
+            print(f"{label:>10} {prefix[:24]:>24} {p50:>8.3f} {p99:>8.3f} {legacy_ms:>10.0f}")
+
+        updated = [{**r, 'views': r['views'] + 1000, 'name': f"{r['name']} v2"} for r in rng.sample(records, 1000)]
+        start = time.perf_counter()
+        index.apply(updated, [])
+        apply_ms = (time.perf_counter() - start) * 1000
+        p50, _ = percentiles(lambda: index.suggest(prefixes["2 letras"]), 200)
+        print(f"recarga de 1.000 shaders: {apply_ms:.0f} ms; después, 2 letras p50 {p50:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark: búsqueda fuzzy/substring con core.trigram_index
+
+Usa el corpus sintético de bench_search_index y mide la construcción del
+índice y la latencia (p50, top 10) de substrings, erratas y consultas con
+espacios, frente a un escaneo lineal con `in` sobre nombre y tags.
+
+Uso (desde src/backend):
+    python -m benchmarks.bench_trigram_index
+"""
+
+import random
+import time
+
+from benchmarks.bench_search_index import SEED, build_records, percentiles
+from core.trigram_index import TrigramIndex, compact
+
+
+def linear_substring(records, q: str):
+    q = compact(q)
+    return [
+        r for r in records
+        if q in compact(r['name']) or any(q in compact(tag) for tag in r['tags'])
+    ]
+
+
+def main():
+    for count in (100_000, 1_000_000):
+        records = list(build_records(count, random.Random(SEED)))
+        sample = records[5]["name"].split()[0].lower()
+        queries = {
+            "substring": sample[:4],
+            "errata": sample[:2] + sample[3] + sample[2] + sample[4:],
+            "con espacio": f"{sample[:3]} {sample[3:]}",
+            "frecuente": "fire",
+            "2 letras": "fi"
+        }
+
+        index = TrigramIndex()
+        start = time.perf_counter()
+        index.add_many(records)
+        build_s = time.perf_counter() - start
+
+        print(f"\n{count:,} shaders: build {build_s:.1f}s, {len(index._entries):,} palabras")
+        print(f"{'consulta':>12} {'texto':>12} {'matches':>9} {'p50 ms':>8} {'p99 ms':>8} {'lineal ms':>10}")
+        for label, q in queries.items():
+            total = index.search(q, limit=10)[1]
+            p50, p99 = percentiles(lambda: index.search(q, limit=10), 20)
+            legacy_ms = percentiles(lambda: linear_substring(records, q), 1)[0]
+            print(f"{label:>12} {q:>12} {total:>9,} {p50:>8.2f} {p99:>8.2f} {legacy_ms:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
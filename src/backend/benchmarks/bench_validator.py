@@ -0,0 +1,81 @@
+"""
+Benchmark: GLSLValidator sobre sources de 100 KB a 5 MB
+
+Genera shaders grandes repitiendo funciones auxiliares realistas y mide el
+tiempo de tokenización, parseo (AST) y validación completa. También mide
+el throughput en shaders/minuto para shaders del tamaño típico de Shadertoy.
+
+Uso (desde src/backend):
+    python -m benchmarks.bench_validator
+"""
+
+import time
+
+from core.glsl_parser import get_driver, parse
+from core.glsl_tokenizer import tokenize
+from core.glsl_validator import GLSLValidator
+
+HELPER_TEMPLATE = """
+// Función auxiliar {i}
+float sdf_{i}(vec3 p, float r) {{
+    vec3 q = abs(p) - vec3(r * 0.5, r, r * 0.25);
+    float d = length(max(q, 0.0)) + min(max(q.x, max(q.y, q.z)), 0.0);
+    /* suavizado */
+    return d - 0.01 * sin(p.x * {i}.0 + iTime);
+}}
+"""
+
+MAIN = """
+void mainImage(out vec4 fragColor, in vec2 fragCoord) {
+    vec2 uv = fragCoord / iResolution.xy;
+    float d = sdf_0(vec3(uv, 0.0), 0.5);
+    fragColor = vec4(vec3(d), 1.0);
+}
+"""
+
+
+def build_source(target_bytes: int) -> str:
+    parts = ["uniform float iTime;\nuniform vec2 iResolution;\n"]
+    size = len(parts[0]) + len(MAIN)
+    i = 0
+    while size < target_bytes:
+        helper = HELPER_TEMPLATE.format(i=i)
+        parts.append(helper)
+        size += len(helper)
+        i += 1
+    parts.append(MAIN)
+    return "".join(parts)
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    get_driver()  # la tabla LALR se construye una vez por proceso
+
+    print(f"{'size':>8} {'tokens':>9} {'tokenize ms':>12} {'parse ms':>9} {'validate ms':>12} {'MB/s':>7}")
+    for kb in (100, 500, 1_000, 2_500):
+        source = build_source(kb * 1024)
+        repeat = 3 if kb <= 500 else 1
+        tokens = len(tokenize(source).tokens)
+        tokenize_ms = best_of(lambda: tokenize(source), repeat)
+        parse_ms = best_of(lambda: parse(source), repeat)
+        validate_ms = best_of(lambda: GLSLValidator().validate(source), repeat)
+        throughput = len(source) / 1024 / 1024 / (validate_ms / 1000)
+        print(f"{kb:>6}KB {tokens:>9} {tokenize_ms:>12.1f} {parse_ms:>9.1f} {validate_ms:>12.1f} {throughput:>7.1f}")
+
+    print(f"\n{'shader':>8} {'validate ms':>12} {'shaders/min':>12}")
+    for kb in (2, 5, 10):
+        source = build_source(kb * 1024)
+        validate_ms = best_of(lambda: GLSLValidator().validate(source), 20)
+        print(f"{kb:>6}KB {validate_ms:>12.2f} {60_000 / validate_ms:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
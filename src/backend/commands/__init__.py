@@ -0,0 +1,4 @@
+"""
+Comandos de mantenimiento para ShaderForge AI
+Se ejecutan desde src/backend con: python -m commands.<nombre>
+"""
@@ -0,0 +1,40 @@
+"""
+Calcula la complejidad estática de los shaders guardados
+
+Solo analiza los Shader sin complejidad o cuyo complexity_version no
+coincide con COMPLEXITY_VERSION. Rellena complexity_score, complexity y
+uniforms (ver core.complexity).
+
+Uso:
+    python -m commands.backfill_complexity [--batch-size 200]
+"""
+
+import argparse
+import time
+
+from core.complexity import COMPLEXITY_VERSION, backfill_complexity
+from db.database import SessionLocal, init_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcula la complejidad de los shaders guardados")
+    parser.add_argument("--batch-size", type=int, default=200, help="Shaders por commit")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    start_time = time.time()
+
+    try:
+        print(f"📊 Analizando complejidad de shaders (modelo {COMPLEXITY_VERSION})...")
+        stats = backfill_complexity(db, batch_size=args.batch_size)
+        print(
+            f"✅ {stats['analyzed']} shaders analizados ({stats['estimated']} estimados desde tokens) "
+            f"en {time.time() - start_time:.2f}s"
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
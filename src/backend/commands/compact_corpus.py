@@ -0,0 +1,47 @@
+"""
+Compacta el corpus scrapeado de Shadertoy en un snapshot binario
+
+Lee los *.json (partiendo del snapshot anterior si existe: solo se
+parsean los archivos nuevos o modificados) y escribe un único archivo con
+columnas de ancho fijo y heaps de strings que la búsqueda abre con mmap.
+Antes de escribir se analiza la complejidad de los shaders pendientes.
+Los JSON se conservan como formato de ingesta.
+
+Uso:
+    python -m commands.compact_corpus [--corpus-dir DIR] [--output FILE]
+                                      [--workers N] [--full]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from core.corpus_snapshot import CORPUS_SNAPSHOT_PATH
+from core.corpus_validation import CORPUS_DIR
+from core.shader_corpus import CORPUS_LOAD_WORKERS, ShaderCorpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compacta el corpus de shaders en un snapshot binario")
+    parser.add_argument("--corpus-dir", type=Path, default=CORPUS_DIR, help="Directorio con *.json de Shadertoy")
+    parser.add_argument("--output", type=Path, default=CORPUS_SNAPSHOT_PATH, help="Archivo del snapshot")
+    parser.add_argument("--workers", type=int, default=CORPUS_LOAD_WORKERS, help="Hilos de lectura de JSON")
+    parser.add_argument("--full", action="store_true", help="Releer todos los JSON (ignora el snapshot anterior)")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    print(f"📦 Compactando {args.corpus_dir} -> {args.output}...")
+    corpus = ShaderCorpus(args.corpus_dir, workers=args.workers, reload_interval=0,
+                          snapshot_path=None if args.full else args.output)
+    corpus.reload_if_changed()
+    scored = corpus.score_pending()  # el snapshot guarda el complexity_score: al arrancar no se recalcula
+    print(f"🧮 complexity_score calculado para {scored} shaders")
+    count = corpus.write_snapshot(args.output)
+
+    elapsed = time.time() - start_time
+    size_mb = args.output.stat().st_size / 1e6
+    print(f"✅ {count} shaders en {elapsed:.2f}s ({size_mb:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
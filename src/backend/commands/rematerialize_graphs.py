@@ -0,0 +1,41 @@
+"""
+Re-materializa los artefactos compilados de node graphs desactualizados
+
+Solo recompila los NodeGraph cuyo compiler_version no coincide con
+COMPILER_VERSION, los compilados con otros packs de nodos (registry_hash)
+o los que nunca se compilaron.
+
+Uso:
+    python -m commands.rematerialize_graphs [--batch-size 100]
+"""
+
+import argparse
+import time
+
+from core.artifacts import rematerialize_stale
+from core.compiler import COMPILER_VERSION
+from db.database import SessionLocal, init_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompila artefactos de node graphs desactualizados")
+    parser.add_argument("--batch-size", type=int, default=100, help="Grafos por commit")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    start_time = time.time()
+
+    try:
+        print(f"🔧 Re-materializando node graphs (compilador {COMPILER_VERSION})...")
+        stats = rematerialize_stale(db, batch_size=args.batch_size)
+        print(
+            f"✅ {stats['recompiled']} recompilados, {stats['failed']} con errores "
+            f"en {time.time() - start_time:.2f}s"
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
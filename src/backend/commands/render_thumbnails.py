@@ -0,0 +1,93 @@
+"""
+Genera previews del corpus scrapeado de Shadertoy sin GPU
+
+Renderiza el pass Image de cada shader con el intérprete NumPy en un pool
+de procesos y guarda un PNG pequeño por shader. Los shaders cuya salida
+es completamente negra o tiene NaN se marcan (render_status) para que la
+ingesta pueda descartarlos. Con --persist también se guarda en la tabla
+Shader (render_status, thumbnail_url).
+
+Uso:
+    python -m commands.render_thumbnails [--corpus-dir DIR] [--output-dir DIR]
+                                         [--workers N] [--width 160] [--height 90]
+                                         [--time 1.0] [--persist] [--batch-size 500]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from core.corpus_validation import CORPUS_DIR, iter_corpus
+from core.thumbnails import (
+    RENDER_STATUSES, THUMBNAIL_HEIGHT, THUMBNAIL_TIME, THUMBNAIL_WIDTH, THUMBNAILS_DIR,
+    persist_thumbnails, render_corpus
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera previews de los shaders scrapeados")
+    parser.add_argument("--corpus-dir", type=Path, default=CORPUS_DIR, help="Directorio con *.json de Shadertoy")
+    parser.add_argument("--output-dir", type=Path, default=THUMBNAILS_DIR, help="Directorio de los PNG")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (default: CPUs)")
+    parser.add_argument("--chunksize", type=int, default=4, help="Shaders por tarea del pool")
+    parser.add_argument("--width", type=int, default=THUMBNAIL_WIDTH, help="Ancho del preview")
+    parser.add_argument("--height", type=int, default=THUMBNAIL_HEIGHT, help="Alto del preview")
+    parser.add_argument("--time", type=float, default=THUMBNAIL_TIME, help="iTime del frame renderizado")
+    parser.add_argument("--persist", action="store_true", help="Guardar resultados en la tabla Shader")
+    parser.add_argument("--batch-size", type=int, default=500, help="Resultados por commit con --persist")
+    args = parser.parse_args()
+
+    db = None
+    if args.persist:
+        from db.database import SessionLocal, init_db
+        init_db()
+        db = SessionLocal()
+
+    stats = {status: 0 for status in RENDER_STATUSES}
+    stats.update(skipped=0, persisted=0)
+    pending = []
+    start_time = time.time()
+
+    print(f"🖼️ Renderizando previews de {args.corpus_dir} ({args.width}x{args.height})...")
+    try:
+        results = render_corpus(
+            iter_corpus(args.corpus_dir), args.output_dir, args.workers, args.chunksize,
+            args.width, args.height, args.time
+        )
+        for result in results:
+            if "skipped" in result:
+                stats["skipped"] += 1
+                print(f"  ⚠️ {result['id']}: {result['skipped']}")
+                continue
+            stats[result["status"]] += 1
+            if result["status"] in ("black", "nan"):
+                print(f"  ⚠️ {result['id']}: salida {result['status']}")
+
+            if db is not None:
+                pending.append(result)
+                if len(pending) >= args.batch_size:
+                    stats["persisted"] += persist_thumbnails(db, pending)
+                    db.commit()
+                    pending = []
+
+        if db is not None and pending:
+            stats["persisted"] += persist_thumbnails(db, pending)
+            db.commit()
+    finally:
+        if db is not None:
+            db.close()
+
+    total = sum(stats[status] for status in RENDER_STATUSES)
+    elapsed = time.time() - start_time
+    print(
+        f"✅ {total} shaders en {elapsed:.2f}s: {stats['ok']} previews, {stats['black']} negros, "
+        f"{stats['nan']} con NaN, {stats['unsupported']} no soportados, {stats['error']} con errores, "
+        f"{stats['skipped']} omitidos"
+    )
+    if args.persist:
+        print(f"💾 {stats['persisted']} shaders actualizados en la base de datos")
+    print(f"📁 Previews: {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
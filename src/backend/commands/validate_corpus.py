@@ -0,0 +1,82 @@
+"""
+Valida el corpus scrapeado de Shadertoy (etapa Validate del pipeline)
+
+Valida cada render pass en un pool de procesos y escribe un resultado
+compacto por shader en JSONL. Con --persist también lo guarda en la tabla
+Shader (is_valid, validation) para que los listados de /api/v1/shaders
+puedan descartar shaders rotos (?is_valid=true) sin revalidarlos.
+
+Uso:
+    python -m commands.validate_corpus [--corpus-dir DIR] [--output FILE]
+                                       [--workers N] [--persist] [--batch-size 500]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from core.corpus_validation import CORPUS_DIR, iter_corpus, persist_results, validate_corpus
+from core.glsl_validator import VALIDATOR_VERSION
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida el corpus de shaders scrapeados")
+    parser.add_argument("--corpus-dir", type=Path, default=CORPUS_DIR, help="Directorio con *.json de Shadertoy")
+    parser.add_argument("--output", type=Path, default=CORPUS_DIR.parents[1] / "processed" / "validation.jsonl",
+                        help="Resultados por shader (JSONL)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (default: CPUs)")
+    parser.add_argument("--chunksize", type=int, default=16, help="Shaders por tarea del pool")
+    parser.add_argument("--persist", action="store_true", help="Guardar resultados en la tabla Shader")
+    parser.add_argument("--batch-size", type=int, default=500, help="Resultados por commit con --persist")
+    args = parser.parse_args()
+
+    db = None
+    if args.persist:
+        from db.database import SessionLocal, init_db
+        init_db()
+        db = SessionLocal()
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    stats = {"valid": 0, "invalid": 0, "skipped": 0, "persisted": 0}
+    pending = []
+    start_time = time.time()
+
+    print(f"🔍 Validando {args.corpus_dir} (validador {VALIDATOR_VERSION})...")
+    try:
+        with open(args.output, "w", encoding="utf-8") as out:
+            for result in validate_corpus(iter_corpus(args.corpus_dir), args.workers, args.chunksize):
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                if "skipped" in result:
+                    stats["skipped"] += 1
+                    print(f"  ⚠️ {result['id']}: {result['skipped']}")
+                    continue
+                stats["valid" if result["is_valid"] else "invalid"] += 1
+
+                if db is not None:
+                    pending.append(result)
+                    if len(pending) >= args.batch_size:
+                        stats["persisted"] += persist_results(db, pending)
+                        db.commit()
+                        pending = []
+
+        if db is not None and pending:
+            stats["persisted"] += persist_results(db, pending)
+            db.commit()
+    finally:
+        if db is not None:
+            db.close()
+
+    total = stats["valid"] + stats["invalid"]
+    elapsed = time.time() - start_time
+    print(
+        f"✅ {total} shaders en {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f}/s): "
+        f"{stats['valid']} válidos, {stats['invalid']} con errores, {stats['skipped']} omitidos"
+    )
+    if args.persist:
+        print(f"💾 {stats['persisted']} shaders actualizados en la base de datos")
+    print(f"📄 Resultados: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
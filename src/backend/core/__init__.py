@@ -3,12 +3,14 @@ Core module for ShaderForge AI backend
 Contains compilers, AI engine, and utilities
 """
 
-from .compiler import GLSLCompiler, CompiledShader
+from .compiler import GLSLCompiler, CompiledShader, ShaderMetadata, COMPILER_VERSION
 from .ai_engine import AIShaderGenerator, GeneratedShader
 
 __all__ = [
     "GLSLCompiler",
     "CompiledShader",
+    "ShaderMetadata",
+    "COMPILER_VERSION",
     "AIShaderGenerator", 
     "GeneratedShader"
 ]
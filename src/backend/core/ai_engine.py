@@ -3,6 +3,8 @@ from typing import Optional, Dict, Any, List
 from anthropic import Anthropic
 from dataclasses import dataclass
 
+from core.techniques import detect_techniques
+
 @dataclass
 class GeneratedShader:
     code: str
@@ -249,22 +251,8 @@ Mantén la misma funcionalidad visual."""
         if "iResolution" in code:
             uniforms.append("iResolution")
         
-        # Extraer técnicas
-        techniques = []
-        techniques_map = {
-            "raymarching": "raymarching",
-            "sdSphere": "sdf",
-            "noise": "noise",
-            "fbm": "fbm",
-            "perlin": "perlin",
-            "voronoi": "voronoi",
-            "mix": "lerp",
-            "fractal": "fractals"
-        }
-        
-        for keyword, technique in techniques_map.items():
-            if keyword in code and technique not in techniques:
-                techniques.append(technique)
+        # Extraer técnicas (mismo vocabulario que el índice de código de la búsqueda)
+        techniques = detect_techniques(code)
         
         return GeneratedShader(
             code=code,
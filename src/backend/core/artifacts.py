@@ -0,0 +1,120 @@
+"""
+Artefactos compilados de node graphs
+Materializa el código GLSL de un grafo guardado y lo persiste en NodeGraph
+"""
+
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from core.compiler import GLSLCompiler, CompiledShader, COMPILER_VERSION
+from core.complexity import update_shader_complexity
+from core.graph_schema import graph_content_hash, normalize_graph
+from core.node_registry import get_registry
+from db.models import NodeGraph
+
+
+def is_stale(node_graph: NodeGraph) -> bool:
+    """
+    True si el artefacto no existe o fue generado por otra versión del
+    compilador o con otros packs de nodos (recargados en caliente)
+    """
+    return (node_graph.compiler_version != COMPILER_VERSION or
+            node_graph.registry_hash != get_registry().snapshot.codegen_hash)
+
+
+def materialize_node_graph(node_graph: NodeGraph, force: bool = False) -> CompiledShader:
+    """
+    Compila el grafo y guarda el artefacto en el NodeGraph (sin commit)
+
+    Si el contenido, la versión del compilador y los packs no cambiaron, reutiliza el
+    artefacto existente. Cuando la compilación es correcta también
+    sincroniza Shader.code y recalcula su complejidad y uniforms.
+    """
+    try:
+        graph = normalize_graph(node_graph.graph_data)
+    except ValueError as e:
+        result = CompiledShader(code="", uniforms=[], functions=[], error=str(e))
+        _store_artifact(node_graph, result, None, get_registry().snapshot.codegen_hash)
+        return result
+
+    content_hash = graph_content_hash(graph)
+
+    # Tras un fallo el resultado guardado es el de failed_hash (el código
+    # sigue siendo el último correcto, que es el de content_hash)
+    stored_hash = node_graph.failed_hash if node_graph.compile_error else node_graph.content_hash
+    if not force and not is_stale(node_graph) and stored_hash == content_hash:
+        return CompiledShader(
+            code=node_graph.compiled_code or "",
+            uniforms=node_graph.compiled_uniforms or [],
+            functions=[],
+            error=node_graph.compile_error
+        )
+
+    compiler = GLSLCompiler()
+    result = compiler.compile(graph)
+    _store_artifact(node_graph, result, content_hash, compiler.registry_hash)
+
+    if not result.error and node_graph.shader is not None:
+        node_graph.shader.code = result.code
+        update_shader_complexity(node_graph.shader)
+
+    return result
+
+
+def _store_artifact(node_graph: NodeGraph, result: CompiledShader, content_hash: Optional[str],
+                    registry_hash: str):
+    """
+    Copia el resultado de compilación a las columnas del NodeGraph
+
+    Si la compilación falla se guarda el error pero se conserva el último
+    código correcto (el que sigue teniendo Shader.code) junto con su hash;
+    el hash del grafo que falló va en failed_hash.
+    """
+    if result.error:
+        node_graph.failed_hash = content_hash
+    else:
+        node_graph.compiled_code = result.code
+        node_graph.compiled_uniforms = result.uniforms
+        node_graph.content_hash = content_hash
+        node_graph.failed_hash = None
+    node_graph.compile_error = result.error
+    node_graph.compiler_version = COMPILER_VERSION
+    node_graph.registry_hash = registry_hash
+    node_graph.compiled_at = datetime.utcnow()
+
+
+def rematerialize_stale(db: Session, batch_size: int = 100) -> Dict[str, int]:
+    """
+    Recompila solo los artefactos cuya versión de compilador o de packs está desactualizada
+
+    Returns:
+        {"recompiled": n, "failed": n}
+    """
+    stats = {"recompiled": 0, "failed": 0}
+
+    while True:
+        # Cada lote que se materializa deja de ser stale, así que siempre
+        # se consulta desde el principio
+        registry_hash = get_registry().snapshot.codegen_hash
+        batch = db.query(NodeGraph).filter(
+            (NodeGraph.compiler_version != COMPILER_VERSION) |
+            (NodeGraph.compiler_version.is_(None)) |
+            (NodeGraph.registry_hash != registry_hash) |
+            (NodeGraph.registry_hash.is_(None))
+        ).limit(batch_size).all()
+
+        if not batch:
+            break
+
+        for node_graph in batch:
+            result = materialize_node_graph(node_graph, force=True)
+            if result.error:
+                stats["failed"] += 1
+            else:
+                stats["recompiled"] += 1
+
+        db.commit()
+
+    return stats
@@ -0,0 +1,308 @@
+"""
+Índice de código de los shaders
+Posting lists de los términos de código de cada shader (funciones
+declaradas, llamadas, uniforms, técnicas y llamadas dentro de bucles y de
+bucles de raymarching, ver core.code_terms), extraídos en la ingesta. Las
+consultas combinan términos con AND/OR/NOT sobre máscaras de documentos:
+nunca se lee el código al consultar.
+
+Sintaxis de consulta:
+    defines:sdBox                       declara sdBox
+    march:smoothstep march:texture      ambas dentro de un bucle de raymarching
+    calls:texture OR calls:texelFetch
+    technique:noise NOT technique:fbm   (también -technique:fbm)
+    calls:sd*                           prefijo sobre el vocabulario
+    smoothstep                          sin campo: defines, calls, uniform o technique
+"""
+
+import bisect
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from core.code_terms import CODE_TERM_FIELDS, code_terms
+from core.shader_corpus import get_shader_corpus
+from core.techniques import detect_techniques
+
+# Campos que busca un término sin campo
+DEFAULT_CODE_FIELDS = ('defines', 'calls', 'uniform', 'technique')
+
+# Longitud máxima de una consulta (términos y operadores)
+MAX_QUERY_TOKENS = 64
+
+# Reconstruye cuando los shaders borrados superan esta fracción
+REBUILD_DEAD_RATIO = 0.25
+REBUILD_MIN_DOCS = 1024
+
+_QUERY_TOKEN_RE = re.compile(r'[()]|[^\s()]+')
+
+# Árbol de consulta: ('term', campos, valor) | ('and'|'or', [nodos]) | ('not', nodo)
+CodeQuery = Tuple
+
+
+class CodeQueryError(ValueError):
+    """Consulta de código mal formada"""
+    pass
+
+
+class _Parser:
+    """Descenso recursivo: OR < AND (explícito o implícito) < NOT < término o paréntesis"""
+
+    def __init__(self, text: str):
+        self.tokens = _QUERY_TOKEN_RE.findall(text or "")
+        if len(self.tokens) > MAX_QUERY_TOKENS:
+            raise CodeQueryError(f"Consulta demasiado larga (máximo {MAX_QUERY_TOKENS} elementos)")
+        self.pos = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self) -> str:
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self) -> CodeQuery:
+        if not self.tokens:
+            raise CodeQueryError("Consulta vacía")
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise CodeQueryError(f"Elemento inesperado: {self.peek()!r}")
+        return node
+
+    def parse_or(self) -> CodeQuery:
+        nodes = [self.parse_and()]
+        while self.peek() == 'OR':
+            self.next()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def parse_and(self) -> CodeQuery:
+        nodes = [self.parse_not()]
+        while self.peek() not in (None, ')', 'OR'):
+            if self.peek() == 'AND':
+                self.next()
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    def parse_not(self) -> CodeQuery:
+        token = self.peek()
+        if token == 'NOT':
+            self.next()
+            return ('not', self.parse_not())
+        if token is not None and token.startswith('-') and len(token) > 1:
+            self.tokens[self.pos] = token[1:]
+            return ('not', self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self) -> CodeQuery:
+        token = self.next()
+        if token is None:
+            raise CodeQueryError("La consulta termina antes de tiempo")
+        if token == '(':
+            node = self.parse_or()
+            if self.next() != ')':
+                raise CodeQueryError("Falta ')'")
+            return node
+        if token in (')', 'AND', 'OR'):
+            raise CodeQueryError(f"Elemento inesperado: {token!r}")
+        field, sep, value = token.partition(':')
+        if not sep:
+            return ('term', DEFAULT_CODE_FIELDS, token.lower())
+        field = field.lower()
+        if field not in CODE_TERM_FIELDS:
+            raise CodeQueryError(f"Campo desconocido: {field!r} (válidos: {', '.join(CODE_TERM_FIELDS)})")
+        if not value or value == '*':
+            raise CodeQueryError(f"Falta el valor de {field}:")
+        return ('term', (field,), value.lower())
+
+
+def parse_code_query(text: str) -> CodeQuery:
+    """Árbol de una consulta de código (CodeQueryError si está mal formada)"""
+    return _Parser(text).parse()
+
+
+def record_code_terms(record: dict) -> List[str]:
+    """Términos de código de un registro (se extraen si el registro no los trae)"""
+    terms = record.get('code_terms')
+    if terms is None:
+        code = record.get('code') or ""
+        techniques = record.get('techniques')
+        terms = code_terms(code, detect_techniques(code) if techniques is None else techniques)
+    return terms
+
+
+class CodeIndex:
+    """
+    Posting lists de términos de código por documento
+
+    Las listas solo crecen (ids ascendentes); los shaders borrados quedan
+    como tombstones hasta la siguiente reconstrucción.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._records: List[Optional[dict]] = []  # documento -> registro
+        self._docs: Dict[str, int] = {}  # id del shader -> documento
+        self._views = array('q')  # documento -> views (orden al explorar)
+        self._dead: Set[int] = set()
+
+        self._postings: Dict[str, array] = {}  # término -> documentos
+        self._sorted_terms: List[str] = []  # vocabulario ordenado (consultas por prefijo)
+        self._arrays: Dict[str, Tuple[int, np.ndarray]] = {}  # término -> (longitud, array)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # ----- Actualización -----
+
+    def add_many(self, records: Iterable[dict]):
+        with self._lock:
+            for record in records:
+                if record['id'] in self._docs:
+                    self._remove(record['id'])
+                doc = len(self._records)
+                self._records.append(record)
+                self._views.append(max(int(record.get('views') or 0), 0))
+                self._docs[record['id']] = doc
+                for term in record_code_terms(record):
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = array('i')
+                    postings.append(doc)
+
+    def add(self, record: dict):
+        self.add_many([record])
+
+    def remove(self, shader_id: str) -> bool:
+        with self._lock:
+            if shader_id not in self._docs:
+                return False
+            self._remove(shader_id)
+            self._maybe_rebuild()
+            return True
+
+    def apply(self, upserted: List[dict], removed: List[str]):
+        """Listener de ShaderCorpus: aplica los cambios de una recarga"""
+        with self._lock:
+            for shader_id in removed:
+                if shader_id in self._docs:
+                    self._remove(shader_id)
+            self.add_many(upserted)
+            self._maybe_rebuild()
+
+    def _remove(self, shader_id: str):
+        doc = self._docs.pop(shader_id)
+        self._records[doc] = None
+        self._dead.add(doc)
+
+    def _maybe_rebuild(self):
+        total = len(self._records)
+        if total >= REBUILD_MIN_DOCS and len(self._dead) > REBUILD_DEAD_RATIO * total:
+            records = [record for record in self._records if record is not None]
+            self._reset()
+            self.add_many(records)
+
+    # ----- Consulta -----
+
+    def _array(self, term: str) -> np.ndarray:
+        """Copia NumPy cacheada de una lista (válida mientras no crezca: solo se añade al final)"""
+        postings = self._postings[term]
+        cached = self._arrays.get(term)
+        if cached is None or cached[0] != len(postings):
+            cached = self._arrays[term] = (len(postings), np.frombuffer(postings, np.int32).copy())
+        return cached[1]
+
+    def _terms(self, fields: Tuple[str, ...], value: str) -> List[str]:
+        """Términos del vocabulario para un valor ("sd*": todos los que empiezan por "sd")"""
+        if not value.endswith('*'):
+            return [term for term in (f"{field}:{value}" for field in fields) if term in self._postings]
+        if len(self._sorted_terms) != len(self._postings):
+            self._sorted_terms = sorted(self._postings)
+        found = []
+        for field in fields:
+            prefix = f"{field}:{value[:-1]}"
+            start = bisect.bisect_left(self._sorted_terms, prefix)
+            for term in self._sorted_terms[start:]:
+                if not term.startswith(prefix):
+                    break
+                found.append(term)
+        return found
+
+    def _mask(self, node: CodeQuery, n: int) -> np.ndarray:
+        """Documentos que cumplen un nodo (máscara booleana, tombstones incluidos)"""
+        kind = node[0]
+        if kind == 'term':
+            mask = np.zeros(n, bool)
+            for term in self._terms(node[1], node[2]):
+                mask[self._array(term)] = True
+            return mask
+        if kind == 'not':
+            return ~self._mask(node[1], n)
+        masks = (self._mask(child, n) for child in node[1])
+        mask = next(masks)
+        for other in masks:
+            if kind == 'and':
+                mask &= other
+            else:
+                mask |= other
+        return mask
+
+    def select(self, query: Union[str, CodeQuery], ids: Optional[List[str]] = None,
+               limit: Optional[int] = None) -> Tuple[List[str], int]:
+        """
+        Shaders cuyo código cumple la consulta
+
+        Args:
+            query: Consulta de texto o árbol de parse_code_query
+            ids: Resultado de una búsqueda por texto, en su orden; None
+                recorre todo el corpus por views
+            limit: Máximo de ids devueltos al recorrer el corpus
+
+        Returns:
+            (ids que cumplen la consulta, total)
+        """
+        if isinstance(query, str):
+            query = parse_code_query(query)
+        with self._lock:
+            n = len(self._records)
+            mask = self._mask(query, n)
+            if self._dead:
+                mask[np.fromiter(self._dead, np.int64, len(self._dead))] = False
+            if ids is not None:
+                lookup = self._docs.get
+                docs = np.fromiter((lookup(shader_id, -1) for shader_id in ids), np.int64, len(ids))
+                keep = (docs >= 0) & mask[np.maximum(docs, 0)] if n else np.zeros(len(ids), bool)
+                selected = [ids[i] for i in np.flatnonzero(keep).tolist()]
+                return selected, len(selected)
+
+            docs = np.flatnonzero(mask)
+            total = len(docs)
+            views = np.frombuffer(self._views, np.int64)[docs] if n else np.zeros(0, np.int64)
+            if limit is not None and limit < total:
+                keep = np.argpartition(-views, limit - 1)[:limit] if limit > 0 else []
+                docs, views = docs[keep], views[keep]
+            order = docs[np.lexsort((docs, -views))]
+            records = self._records
+            return [records[doc]['id'] for doc in order.tolist()], total
+
+
+_index: Optional[CodeIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_code_index() -> CodeIndex:
+    """Obtiene o crea el índice de código del corpus global (se suscribe a sus recargas)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = CodeIndex()
+            get_shader_corpus().subscribe(index.apply)
+            _index = index
+    return _index
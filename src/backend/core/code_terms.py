@@ -0,0 +1,108 @@
+"""
+Términos de código para la búsqueda
+Extrae de un shader, en la ingesta, qué funciones declara, qué funciones
+llama (built-ins y propias), qué inputs de Shadertoy y uniforms usa, sus
+técnicas y qué llamadas ocurren dentro de bucles y de bucles de
+raymarching. Las consultas por código solo miran estos términos.
+
+Cada término es "campo:valor" en minúsculas ("defines:sdbox",
+"march:texture"). Basta un escaneo ligero de identificadores y signos de
+bloque: no hace falta el tokenizador completo ni el parser.
+"""
+
+import re
+from typing import Iterable, List, Optional, Set
+
+from core.glsl_analyzer import SHADERTOY_INPUTS
+from core.glsl_parser import TYPE_NAMES
+
+CODE_TERM_FIELDS = ('defines', 'calls', 'uniform', 'technique', 'loop', 'march')
+
+_SCAN_RE = re.compile(r'//[^\n]*|/\*[\s\S]*?(?:\*/|\Z)|#[^\n]*|\d[\w.]*|([A-Za-z_]\w*|[{}();])')
+
+_KEYWORDS = frozenset({'if', 'else', 'for', 'while', 'do', 'switch', 'return', 'case', 'default'})
+
+# Un bucle es de raymarching si llama a una función de distancia o está en
+# una función de march/trace
+_DISTANCE_FUNCTION_RE = re.compile(r'(?i:map|scene|sdf|get_?dist)\w*|(?i:de|df)|sd[A-Z0-9]\w*')
+_MARCH_FUNCTION_RE = re.compile(r'march|trace|raycast|cast_?ray|intersect', re.IGNORECASE)
+
+
+class _Loop:
+    __slots__ = ('depth', 'braced', 'calls')
+
+    def __init__(self, depth: int, braced: bool):
+        self.depth = depth  # profundidad de llaves del cuerpo
+        self.braced = braced
+        self.calls: Set[str] = set()
+
+
+def _closing_paren(tokens: List[str], start: int) -> int:
+    """Índice del ')' que cierra el '(' de `start` (o el último token)"""
+    level = 0
+    for j in range(start, len(tokens)):
+        if tokens[j] == '(':
+            level += 1
+        elif tokens[j] == ')':
+            level -= 1
+            if level == 0:
+                return j
+    return len(tokens) - 1
+
+
+def code_terms(code: str, techniques: Optional[Iterable[str]] = None) -> List[str]:
+    """Términos de código de un shader, ordenados y sin repetir"""
+    tokens = [token for token in _SCAN_RE.findall(code or "") if token]
+    terms: Set[str] = {f"technique:{t.lower()}" for t in techniques or []}
+    loops: List[_Loop] = []
+    function: Optional[str] = None
+    depth = paren = 0
+
+    def close(loop: _Loop):
+        march = (function is not None and _MARCH_FUNCTION_RE.search(function)) or any(
+            _DISTANCE_FUNCTION_RE.fullmatch(call) for call in loop.calls
+        )
+        for call in loop.calls:
+            terms.add(f"loop:{call.lower()}")
+            if march:
+                terms.add(f"march:{call.lower()}")
+
+    count = len(tokens)
+    for i, token in enumerate(tokens):
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            depth -= 1
+            while loops and loops[-1].depth > depth:
+                close(loops.pop())
+            if depth <= 0:
+                depth, function = 0, None
+        elif token == '(':
+            paren += 1
+        elif token == ')':
+            paren = max(paren - 1, 0)
+        elif token == ';':
+            while paren == 0 and loops and not loops[-1].braced and loops[-1].depth == depth:
+                close(loops.pop())
+        elif i + 1 < count and tokens[i + 1] == '(':
+            if token in ('for', 'while'):
+                end = _closing_paren(tokens, i + 1)
+                braced = end + 1 < count and tokens[end + 1] == '{'
+                loops.append(_Loop(depth + 1 if braced else depth, braced))
+            elif depth == 0:
+                # tipo nombre(...) { -> definición
+                end = _closing_paren(tokens, i + 1)
+                if i > 0 and tokens[i - 1] not in '{}();' and end + 1 < count and tokens[end + 1] == '{':
+                    terms.add(f"defines:{token.lower()}")
+                    function = token
+            elif token not in _KEYWORDS and token not in TYPE_NAMES:
+                terms.add(f"calls:{token.lower()}")
+                for loop in loops:
+                    loop.calls.add(token)
+        elif token in SHADERTOY_INPUTS:
+            terms.add(f"uniform:{token.lower()}")
+        elif token == 'uniform' and i + 2 < count:
+            terms.add(f"uniform:{tokens[i + 2].lower()}")
+    for loop in loops:
+        close(loop)
+    return sorted(terms)
@@ -2,6 +2,33 @@ from typing import Dict, List, Tuple, Set, Any, Optional
 from dataclasses import dataclass, field
 import re
 
+from core.node_registry import get_registry
+
+# Versión del generador de código: incrementar cuando cambie la salida GLSL
+# para que los artefactos persistidos se vuelvan a materializar
+COMPILER_VERSION = "1.1.0"
+
+_IDENTIFIER_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+_GEN_TYPES = {'float', 'vec2', 'vec3', 'vec4'}
+_FLOAT_LITERAL_RE = re.compile(r'[-+]?(?:\d+\.\d*|\.\d+)(?:[eE][-+]?\d+)?|[-+]?\d+[eE][-+]?\d+')
+
+
+@dataclass
+class ShaderMetadata:
+    """
+    Lo que el compilador ya sabe del código que generó
+
+    trusted=True significa correcto por construcción: solo templates del
+    pack builtin, tipos de inputs exactos y parámetros que son literales
+    float. GLSLValidator.validate_compiled lo usa para no re-parsear.
+    """
+    variables: Dict[str, str]  # variable de mainImage -> tipo
+    uniforms: Dict[str, str]  # uniform -> tipo
+    functions: Dict[str, str]  # helper o función extraída -> tipo de retorno
+    trusted: bool
+    issues: List[str] = field(default_factory=list)  # por qué no es trusted
+
+
 @dataclass
 class CompiledShader:
     code: str
@@ -9,137 +36,58 @@ class CompiledShader:
     functions: List[str]
     error: Optional[str] = None
     warnings: List[str] = field(default_factory=list)
+    uniform_layout: Optional[Dict[str, Any]] = None  # Solo en modo std140
+    stats: Dict[str, int] = field(default_factory=dict)  # Tamaño inline vs final, funciones extraídas
+    metadata: Optional[ShaderMetadata] = None
 
 class GLSLCompiler:
     """Compila grafos de nodos a cรณdigo GLSL"""
     
-    # Definiciones de nodos y sus funciones GLSL
-    NODE_FUNCTIONS = {
-        'uv_input': {
-            'glsl': 'vec2 {output} = fragCoord / iResolution.xy;',
-            'inputs': 0,
-            'outputs': 1,
-            'uniforms': ['iResolution'],
-            'output_type': 'vec2'
-        },
-        'time_input': {
-            'glsl': 'float {output} = iTime;',
-            'inputs': 0,
-            'outputs': 1,
-            'uniforms': ['iTime'],
-            'output_type': 'float'
-        },
-        'add': {
-            'glsl': '{type} {output} = {input1} + {input2};',
-            'inputs': 2,
-            'outputs': 1,
-            'infer_type': True,
-            'output_type': 'mixed'
-        },
-        'multiply': {
-            'glsl': '{type} {output} = {input1} * {input2};',
-            'inputs': 2,
-            'outputs': 1,
-            'infer_type': True,
-            'output_type': 'mixed'
-        },
-        'lerp': {
-            'glsl': '{type} {output} = mix({input1}, {input2}, {input3});',
-            'inputs': 3,
-            'outputs': 1,
-            'infer_type': True,
-            'output_type': 'mixed'
-        },
-        'clamp': {
-            'glsl': '{type} {output} = clamp({input1}, {input2}, {input3});',
-            'inputs': 3,
-            'outputs': 1,
-            'infer_type': True,
-            'output_type': 'mixed'
-        },
-        'perlin_noise': {
-            'glsl': 'float {output} = perlin({input1});',
-            'inputs': 1,
-            'outputs': 1,
-            'functions': ['perlin'],
-            'output_type': 'float'
-        },
-        'simplex_noise': {
-            'glsl': 'float {output} = simplex({input1});',
-            'inputs': 1,
-            'outputs': 1,
-            'functions': ['simplex'],
-            'output_type': 'float'
-        },
-        'sdf_sphere': {
-            'glsl': 'float {output} = length({input1}) - {input2};',
-            'inputs': 2,
-            'outputs': 1,
-            'output_type': 'float'
-        },
-        'fragment_output': {
-            'glsl': 'fragColor = vec4({input1}, 1.0);',
-            'inputs': 1,
-            'outputs': 0,
-            'output_type': 'void'
-        },
-        'float_constant': {
-            'glsl': 'float {output} = {value};',
-            'inputs': 0,
-            'outputs': 1,
-            'output_type': 'float'
-        },
-        'vec2_constant': {
-            'glsl': 'vec2 {output} = vec2({x}, {y});',
-            'inputs': 0,
-            'outputs': 1,
-            'output_type': 'vec2'
-        },
-        'vec3_constant': {
-            'glsl': 'vec3 {output} = vec3({x}, {y}, {z});',
-            'inputs': 0,
-            'outputs': 1,
-            'output_type': 'vec3'
-        }
+    # Tipos de los uniforms por frame (default: float)
+    UNIFORM_TYPES = {
+        'iResolution': 'vec2',
+        'iTime': 'float',
     }
-    
-    # Funciones GLSL helper
-    HELPER_FUNCTIONS = {
-        'perlin': '''
-float perlin(vec2 p) {
-    vec2 i = floor(p);
-    vec2 f = fract(p);
-    f = f * f * (3.0 - 2.0 * f);
-    
-    float a = sin(i.x * 12.9898 + i.y * 78.233) * 43758.5453;
-    float b = sin((i.x + 1.0) * 12.9898 + i.y * 78.233) * 43758.5453;
-    float c = sin(i.x * 12.9898 + (i.y + 1.0) * 78.233) * 43758.5453;
-    float d = sin((i.x + 1.0) * 12.9898 + (i.y + 1.0) * 78.233) * 43758.5453;
-    
-    a = fract(a);
-    b = fract(b);
-    c = fract(c);
-    d = fract(d);
-    
-    float ab = mix(a, b, f.x);
-    float cd = mix(c, d, f.x);
-    return mix(ab, cd, f.y);
-}
-''',
-        'simplex': '''
-float simplex(vec2 p) {
-    return sin(p.x * 12.9898 + sin(p.y * 78.233) * 43758.5453);
-}
-'''
+
+    # Reglas std140: tipo -> (alineación base, tamaño) en bytes
+    STD140_LAYOUT = {
+        'float': (4, 4),
+        'int': (4, 4),
+        'uint': (4, 4),
+        'bool': (4, 4),
+        'vec2': (8, 8),
+        'vec3': (16, 12),
+        'vec4': (16, 16),
+        'mat4': (16, 64),
     }
-    
-    def __init__(self):
+
+    UNIFORM_BLOCK_NAME = 'ShaderUniforms'
+
+    def __init__(self, uniform_block: bool = False, extract_functions: bool = True):
+        # uniform_block=True: salida WebGL2 con todos los uniforms empaquetados
+        # en un único bloque std140 (un solo upload por frame)
+        self.uniform_block = uniform_block
+        # extract_functions=True: subgrafos repetidos se emiten como una función compartida
+        self.extract_functions = extract_functions
+        self.stats: Dict[str, int] = {}
+
+        # Definiciones de nodos y helpers GLSL desde el registro declarativo
+        # (core/node_packs); se toma un snapshot para toda la compilación
+        registry = get_registry().snapshot
+        self.NODE_FUNCTIONS: Dict[str, Dict[str, Any]] = registry.node_functions
+        self.HELPER_FUNCTIONS: Dict[str, str] = registry.helper_functions
+        self.node_packs: Dict[str, str] = {t: spec.pack for t, spec in registry.nodes.items()}
+        self.registry_hash = registry.codegen_hash  # parte de la clave de los artefactos guardados
+
         self.errors: List[str] = []
         self.warnings: List[str] = []
         self.required_uniforms: Set[str] = set()
         self.required_functions: Set[str] = set()
         self.node_outputs: Dict[str, Tuple[str, str]] = {}  # node_id -> (var_name, type)
         self.node_input_types: Dict[str, List[str]] = {}  # node_id -> [input_types]
+        self.trust_issues: List[str] = []
+        self.inlined_nodes: Set[str] = set()  # nodos absorbidos por funciones extraídas
+        self.shared_functions: Dict[str, str] = {}  # función extraída -> tipo de retorno
     
     def compile(self, graph: Dict[str, Any]) -> CompiledShader:
         """Compila un grafo de nodos a GLSL"""
@@ -149,6 +97,10 @@ float simplex(vec2 p) {
         self.required_functions = set()
         self.node_outputs = {}
         self.node_input_types = {}
+        self.stats = {}
+        self.trust_issues = []
+        self.inlined_nodes = set()
+        self.shared_functions = {}
         
         try:
             # Validar grafo
@@ -178,7 +130,7 @@ float simplex(vec2 p) {
             
             # Crear uniforms list
             uniforms = [
-                {"name": u, "type": "vec2" if u == "iResolution" else "float"}
+                {"name": u, "type": self._get_uniform_type(u)}
                 for u in sorted(self.required_uniforms)
             ]
             
@@ -186,7 +138,10 @@ float simplex(vec2 p) {
                 code=glsl_code,
                 uniforms=uniforms,
                 functions=list(self.required_functions),
-                warnings=self.warnings
+                warnings=self.warnings,
+                stats=self.stats,
+                uniform_layout=self.build_std140_layout(uniforms) if self.uniform_block else None,
+                metadata=self._build_metadata(sorted_nodes, uniforms)
             )
             
         except Exception as e:
@@ -361,6 +316,48 @@ float simplex(vec2 p) {
                     else:
                         self.node_input_types[node_id].append('float')
     
+    def _get_uniform_type(self, name: str) -> str:
+        """Retorna el tipo GLSL de un uniform"""
+        return self.UNIFORM_TYPES.get(name, 'float')
+
+    def build_std140_layout(self, uniforms: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Calcula el layout std140 de un bloque de uniforms
+
+        Los miembros se ordenan por alineación descendente (y luego por nombre)
+        para minimizar el padding. Los offsets están en bytes; el cliente puede
+        usar offset // 4 como índice en un único Float32Array de size // 4.
+
+        Returns:
+            {"block", "size", "members": [{"name", "type", "offset", "size"}]}
+        """
+        members = sorted(
+            uniforms,
+            key=lambda u: (-self.STD140_LAYOUT[u['type']][0], u['name'])
+        )
+
+        layout = []
+        offset = 0
+        for member in members:
+            align, size = self.STD140_LAYOUT[member['type']]
+            offset = (offset + align - 1) // align * align
+            layout.append({
+                "name": member['name'],
+                "type": member['type'],
+                "offset": offset,
+                "size": size
+            })
+            offset += size
+
+        # El tamaño del bloque se redondea a múltiplo de vec4
+        block_size = (offset + 15) // 16 * 16
+
+        return {
+            "block": self.UNIFORM_BLOCK_NAME,
+            "size": block_size,
+            "members": layout
+        }
+
     def _get_default_value_for_type(self, glsl_type: str) -> str:
         """Retorna el valor default apropiado para un tipo GLSL"""
         type_defaults = {
@@ -403,6 +400,8 @@ float simplex(vec2 p) {
         
         # Generar lรญneas de cรณdigo
         code_lines = []
+        node_lines: Dict[str, str] = {}  # node_id -> línea generada
+        node_inputs: Dict[str, List[Tuple[str, Optional[str], str]]] = {}  # node_id -> [(expr, source_id, tipo)]
         
         for node in sorted_nodes:
             node_id = node['id']
@@ -432,68 +431,11 @@ float simplex(vec2 p) {
                 output_type = node_def.get('output_type', 'float')
                 self.node_outputs[node_id] = (output_var, output_type)
             
-            # Generar cรณdigo del nodo
-            glsl_template = node_def['glsl']
-            glsl_line = glsl_template.replace('{output}', output_var)
-            glsl_line = glsl_line.replace('{type}', output_type)
-            
-            # Reemplazar inputs
-            for i in range(node_def.get('inputs', 0)):
-                input_num = i + 1
-                # Handles: 'input' para el primero, 'input1', 'input2', etc. para los demás
-                handle = f'input{i}' if i > 0 else 'input'
-                # Placeholders siempre numerados: {input1}, {input2}, etc.
-                placeholder = f'{{input{input_num}}}'
-
-                # Determinar tipo esperado para este input
-                expected_type = 'float'
-                if node_id in self.node_input_types and i < len(self.node_input_types[node_id]):
-                    expected_type = self.node_input_types[node_id][i]
-
-                # Buscar variable de entrada desde el grafo
-                if node_id in input_connections and handle in input_connections[node_id]:
-                    source_node_id, source_handle = input_connections[node_id][handle]
-                    if source_node_id in self.node_outputs:
-                        input_var, _ = self.node_outputs[source_node_id]
-                        glsl_line = glsl_line.replace(placeholder, input_var)
-                    else:
-                        # Usar valor default apropiado para el tipo
-                        default_value = self._get_default_value_for_type(expected_type)
-                        glsl_line = glsl_line.replace(placeholder, default_value)
-                else:
-                    # Usar parámetro del nodo si existe
-                    params = node['data'].get('parameters', {})
-                    param_key = f'input{i}' if i > 0 else 'input'
-                    if param_key in params:
-                        glsl_line = glsl_line.replace(placeholder, str(params[param_key]))
-                    else:
-                        # Usar valor default apropiado para el tipo
-                        default_value = self._get_default_value_for_type(expected_type)
-                        glsl_line = glsl_line.replace(placeholder, default_value)
-            
-            # Reemplazar todos los parรกmetros en el template
-            node_params = node['data'].get('parameters', {})
-            for param_name, param_value in node_params.items():
-                placeholder = f'{{{param_name}}}'
-                glsl_line = glsl_line.replace(placeholder, str(param_value))
-            
-            # Reemplazar parรกmetros constantes (para nodos de constantes)
-            if node_type == 'float_constant':
-                value = node_params.get('value', 0.0)
-                glsl_line = glsl_line.replace('{value}', str(value))
-            elif node_type == 'vec2_constant':
-                x = node_params.get('x', 0.0)
-                y = node_params.get('y', 0.0)
-                glsl_line = glsl_line.replace('{x}', str(x))
-                glsl_line = glsl_line.replace('{y}', str(y))
-            elif node_type == 'vec3_constant':
-                x = node_params.get('x', 0.0)
-                y = node_params.get('y', 0.0)
-                z = node_params.get('z', 0.0)
-                glsl_line = glsl_line.replace('{x}', str(x))
-                glsl_line = glsl_line.replace('{y}', str(y))
-                glsl_line = glsl_line.replace('{z}', str(z))
-            
+            # Resolver inputs y generar cรณdigo del nodo
+            inputs = self._resolve_inputs(node, node_def, input_connections)
+            node_inputs[node_id] = inputs
+            self._check_trusted(node, node_def, inputs)
+            glsl_line = self._render_node(node, node_def, output_var, output_type, [expr for expr, _, _ in inputs])
 
             # Fix especial para fragment_output: convertir input a vec4 correctamente
             if node_type == 'fragment_output':
@@ -507,8 +449,7 @@ float simplex(vec2 p) {
                 # Buscar la variable de input en la línea generada
                 # El template es: fragColor = vec4({input1}, 1.0);
                 # Necesitamos extraer el nombre de la variable
-                import re as regex_module
-                match = regex_module.search(r'fragColor = vec4\((.+?), 1\.0\);', glsl_line)
+                match = re.search(r'fragColor = vec4\((.+?), 1\.0\);', glsl_line)
                 if match:
                     input_var = match.group(1)
 
@@ -527,6 +468,7 @@ float simplex(vec2 p) {
                         glsl_line = f"fragColor = {input_var};"
 
             code_lines.append(glsl_line)
+            node_lines[node_id] = glsl_line
         
         # Armar cรณdigo final
         helper_funcs = "\n".join([
@@ -535,26 +477,390 @@ float simplex(vec2 p) {
             if func in self.HELPER_FUNCTIONS
         ])
         
-        main_code = "\n  ".join(code_lines)
-        
         # Declaraciones de uniformes
         uniforms_decl = []
-        for u in sorted(self.required_uniforms):
-            uniform_type = 'vec2' if u == 'iResolution' else 'float'
-            uniforms_decl.append(f"uniform {uniform_type} {u};")
+        if self.uniform_block and self.required_uniforms:
+            layout = self.build_std140_layout([
+                {"name": u, "type": self._get_uniform_type(u)}
+                for u in self.required_uniforms
+            ])
+            uniforms_decl.append(f"layout(std140) uniform {layout['block']} {{")
+            for member in layout['members']:
+                uniforms_decl.append(f"  {member['type']} {member['name']};")
+            uniforms_decl.append("};")
+        else:
+            for u in sorted(self.required_uniforms):
+                uniforms_decl.append(f"uniform {self._get_uniform_type(u)} {u};")
         uniforms_str = "\n".join(uniforms_decl)
         
+        inline_code = self._assemble_code(uniforms_str, helper_funcs, [], code_lines)
+        self.stats = {
+            "inline_size": len(inline_code),
+            "size": len(inline_code),
+            "extracted_functions": 0,
+            "call_sites": 0
+        }
+        
+        if not self.extract_functions:
+            return inline_code
+        
+        # Extraer subgrafos repetidos a funciones compartidas
+        try:
+            shared_funcs, code_lines = self._extract_shared_functions(
+                sorted_nodes, node_lines, node_inputs, output_connections
+            )
+        except RecursionError:
+            self.warnings.append("Function extraction skipped: repeated subgraph too deep")
+            return inline_code
+        if not shared_funcs:
+            return inline_code
+        
+        full_code = self._assemble_code(uniforms_str, helper_funcs, shared_funcs, code_lines)
+        self.stats["size"] = len(full_code)
+        
+        return full_code
+
+    def _assemble_code(
+        self,
+        uniforms_str: str,
+        helper_funcs: str,
+        shared_funcs: List[str],
+        code_lines: List[str]
+    ) -> str:
+        """Arma el shader completo: uniforms, helpers, funciones extraídas y mainImage"""
+        main_code = "\n  ".join(code_lines)
+        
         # Construir cรณdigo completo con uniforms
         parts = []
         if uniforms_str:
             parts.append(uniforms_str)
         if helper_funcs:
             parts.append(helper_funcs)
+        parts.extend(shared_funcs)
         
         parts.append(f"""void mainImage(out vec4 fragColor, in vec2 fragCoord) {{
   {main_code}
 }}""")
         
-        full_code = "\n\n".join(parts).strip()
+        return "\n\n".join(parts).strip()
+
+    def _resolve_inputs(
+        self,
+        node: Dict,
+        node_def: Dict[str, Any],
+        input_connections: Dict[str, Dict[str, Tuple[str, str]]]
+    ) -> List[Tuple[str, Optional[str], str]]:
+        """
+        Resuelve la expresión de cada input de un nodo
+
+        Returns:
+            Lista de (expresión, id del nodo origen o None, tipo esperado)
+        """
+        node_id = node['id']
+        inputs = []
+
+        for i in range(node_def.get('inputs', 0)):
+            # Handles: 'input' para el primero, 'input1', 'input2', etc. para los demás
+            handle = f'input{i}' if i > 0 else 'input'
+
+            # Determinar tipo esperado para este input
+            expected_type = 'float'
+            if node_id in self.node_input_types and i < len(self.node_input_types[node_id]):
+                expected_type = self.node_input_types[node_id][i]
+
+            # Buscar variable de entrada desde el grafo
+            if node_id in input_connections and handle in input_connections[node_id]:
+                source_node_id, source_handle = input_connections[node_id][handle]
+                if source_node_id in self.node_outputs:
+                    input_var, _ = self.node_outputs[source_node_id]
+                    inputs.append((input_var, source_node_id, expected_type))
+                else:
+                    # Usar valor default apropiado para el tipo
+                    inputs.append((self._get_default_value_for_type(expected_type), None, expected_type))
+            else:
+                # Usar parámetro del nodo si existe
+                params = node['data'].get('parameters', {})
+                if handle in params:
+                    inputs.append((str(params[handle]), None, expected_type))
+                else:
+                    # Usar valor default apropiado para el tipo
+                    inputs.append((self._get_default_value_for_type(expected_type), None, expected_type))
+
+        return inputs
+
+    def _render_node(
+        self,
+        node: Dict,
+        node_def: Dict[str, Any],
+        output_var: str,
+        output_type: str,
+        inputs: List[str]
+    ) -> str:
+        """Genera la línea GLSL de un nodo a partir de su template"""
+        node_type = node['data'].get('type', '')
+
+        glsl_template = node_def['glsl']
+        glsl_line = glsl_template.replace('{output}', output_var)
+        glsl_line = glsl_line.replace('{type}', output_type)
         
-        return full_code
+        # Reemplazar inputs (placeholders siempre numerados: {input1}, {input2}, etc.)
+        for i, input_expr in enumerate(inputs):
+            glsl_line = glsl_line.replace(f'{{input{i + 1}}}', input_expr)
+        
+        # Reemplazar todos los parรกmetros en el template
+        node_params = node['data'].get('parameters', {})
+        for param_name, param_value in node_params.items():
+            placeholder = f'{{{param_name}}}'
+            glsl_line = glsl_line.replace(placeholder, str(param_value))
+        
+        # Reemplazar parรกmetros constantes (para nodos de constantes)
+        if node_type == 'float_constant':
+            value = node_params.get('value', 0.0)
+            glsl_line = glsl_line.replace('{value}', str(value))
+        elif node_type == 'vec2_constant':
+            x = node_params.get('x', 0.0)
+            y = node_params.get('y', 0.0)
+            glsl_line = glsl_line.replace('{x}', str(x))
+            glsl_line = glsl_line.replace('{y}', str(y))
+        elif node_type == 'vec3_constant':
+            x = node_params.get('x', 0.0)
+            y = node_params.get('y', 0.0)
+            z = node_params.get('z', 0.0)
+            glsl_line = glsl_line.replace('{x}', str(x))
+            glsl_line = glsl_line.replace('{y}', str(y))
+            glsl_line = glsl_line.replace('{z}', str(z))
+
+        return glsl_line
+
+    def _check_trusted(self, node: Dict, node_def: Dict[str, Any], inputs: List[Tuple[str, Optional[str], str]]):
+        """Registra por qué la línea de un nodo podría no ser GLSL válido"""
+        node_id = node['id']
+        node_type = node['data'].get('type', '')
+
+        if self.node_packs.get(node_type) != 'builtin':
+            self.trust_issues.append(f"Node {node_id}: type '{node_type}' from custom pack")
+        if not _IDENTIFIER_RE.fullmatch(self.node_outputs[node_id][0]) or '__' in node_id:
+            self.trust_issues.append(f"Node {node_id}: id is not a valid GLSL identifier")
+
+        # Tipo que acepta cada input: el inferido o el declarado en el registro
+        if node_def.get('infer_type'):
+            accepted = [expected_type for _, _, expected_type in inputs]
+        elif node_def.get('input_types') or not inputs:
+            accepted = node_def.get('input_types', [])
+        else:
+            self.trust_issues.append(f"Node {node_id}: input types not declared")
+            accepted = []
+
+        for i, ((expr, source, expected_type), accepted_type) in enumerate(zip(inputs, accepted)):
+            if source is not None:
+                actual_type = self.node_outputs[source][1]
+            elif expr == self._get_default_value_for_type(expected_type):
+                actual_type = expected_type
+            elif _is_float_literal(expr):
+                actual_type = 'float'
+            else:
+                self.trust_issues.append(f"Node {node_id}: input {i + 1} is not a literal")
+                continue
+            if actual_type != accepted_type and not (accepted_type == 'genType' and actual_type in _GEN_TYPES):
+                self.trust_issues.append(
+                    f"Node {node_id}: input {i + 1} is {actual_type}, expected {accepted_type}"
+                )
+
+        # Parámetros que se interpolan tal cual en el template
+        for name, value in node['data'].get('parameters', {}).items():
+            if f'{{{name}}}' in node_def['glsl'] and not _is_float_literal(value):
+                self.trust_issues.append(f"Node {node_id}: parameter '{name}' is not a float literal")
+
+    def _build_metadata(self, sorted_nodes: List[Dict], uniforms: List[Dict[str, str]]) -> ShaderMetadata:
+        """Tabla de símbolos del código generado"""
+        variables = {}
+        for node in sorted_nodes:
+            node_id = node['id']
+            node_def = self.NODE_FUNCTIONS.get(node['data'].get('type', ''))
+            if node_def and '{output}' in node_def['glsl'] and node_id not in self.inlined_nodes:
+                var_name, var_type = self.node_outputs[node_id]
+                variables[var_name] = var_type
+
+        functions = {**self.shared_functions, 'mainImage': 'void'}
+        for name in self.required_functions:
+            match = re.search(rf'(\w+)\s+{re.escape(name)}\s*\(', self.HELPER_FUNCTIONS.get(name, ''))
+            if match:
+                functions[name] = match.group(1)
+            else:
+                self.trust_issues.append(f"Helper '{name}' not found")
+
+        issues = self.trust_issues + [f"Compiler warning: {w}" for w in self.warnings]
+        return ShaderMetadata(
+            variables=variables,
+            uniforms={u['name']: u['type'] for u in uniforms},
+            functions=functions,
+            trusted=not issues,
+            issues=issues
+        )
+
+    def _extract_shared_functions(
+        self,
+        sorted_nodes: List[Dict],
+        node_lines: Dict[str, str],
+        node_inputs: Dict[str, List[Tuple[str, Optional[str], str]]],
+        output_connections: Dict[str, List[Dict[str, str]]]
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Detecta subgrafos isomorfos y los emite como una función GLSL compartida
+
+        Un subárbol absorbe los nodos de origen que solo alimentan a un nodo.
+        Los demás nodos conectados (UV, tiempo, constantes, nodos con varios
+        consumidores) pasan a ser parámetros de la función; los inputs sin
+        conectar se quedan como literales dentro de ella. Dos subárboles con
+        la misma firma comparten función aunque sus inputs sean distintos.
+
+        Returns:
+            (definiciones de funciones, nuevas líneas de mainImage)
+        """
+        node_map = {n['id']: n for n in sorted_nodes}
+
+        # Nodos que pueden formar parte de una función: con inputs y output
+        candidates = set()
+        for node_id in node_inputs:
+            node_def = self.NODE_FUNCTIONS[node_map[node_id]['data'].get('type', '')]
+            if node_def.get('inputs', 0) > 0 and node_def.get('outputs', 0) > 0:
+                candidates.add(node_id)
+
+        def is_absorbed(node_id: str) -> bool:
+            # Un nodo se integra en el subárbol de su único consumidor
+            consumers = output_connections.get(node_id, [])
+            return (
+                node_id in candidates
+                and len(consumers) == 1
+                and consumers[0]['target'] in candidates
+            )
+
+        # Firmas internadas: (tipo, tipo de salida, parámetros, inputs) -> id
+        interned: Dict[Tuple, int] = {}
+        signatures: Dict[str, int] = {}
+        sizes: Dict[str, int] = {}
+
+        # Firmas de abajo hacia arriba (el orden topológico garantiza hijos primero)
+        for node in sorted_nodes:
+            node_id = node['id']
+            if node_id not in candidates:
+                continue
+
+            parts = []
+            size = 1
+            for expr, source, _ in node_inputs[node_id]:
+                if source is None:
+                    parts.append(('literal', expr))
+                elif is_absorbed(source):
+                    parts.append(('node', signatures[source]))
+                    size += sizes[source]
+                else:
+                    parts.append(('param', self.node_outputs[source][1]))
+
+            static_params = tuple(sorted(
+                (k, str(v)) for k, v in node['data'].get('parameters', {}).items()
+                if not k.startswith('input')
+            ))
+            _, output_type = self.node_outputs[node_id]
+            key = (node['data'].get('type', ''), output_type, static_params, tuple(parts))
+            signatures[node_id] = interned.setdefault(key, len(interned))
+            sizes[node_id] = size
+
+        occurrences: Dict[int, int] = {}
+        for node_id, signature in signatures.items():
+            if sizes[node_id] >= 2:
+                occurrences[signature] = occurrences.get(signature, 0) + 1
+
+        # Selección de arriba hacia abajo: el subárbol repetido más grande gana
+        selected: Dict[int, List[str]] = {}  # firma -> [raíces]
+
+        for node in sorted_nodes:
+            if node['id'] not in candidates or is_absorbed(node['id']):
+                continue
+
+            # Recorrido iterativo (las cadenas de nodos pueden ser muy largas)
+            stack = [node['id']]
+            while stack:
+                node_id = stack.pop()
+                signature = signatures[node_id]
+                if sizes[node_id] >= 2 and occurrences.get(signature, 0) >= 2:
+                    selected.setdefault(signature, []).append(node_id)
+                    continue
+                for _, source, _ in node_inputs[node_id]:
+                    if source is not None and is_absorbed(source):
+                        stack.append(source)
+
+        selected = {sig: roots for sig, roots in selected.items() if len(roots) >= 2}
+        if not selected:
+            return [], [node_lines[n['id']] for n in sorted_nodes if n['id'] in node_lines]
+
+        def emit(node_id: str, args: List[Tuple[str, str]], members: List[str], body: List[str]) -> str:
+            # Recorrido post-orden: acumula parámetros (expr, tipo), nodos y cuerpo
+            member_inputs = []
+            for expr, source, _ in node_inputs[node_id]:
+                if source is None:
+                    member_inputs.append(expr)
+                elif is_absorbed(source):
+                    member_inputs.append(emit(source, args, members, body))
+                else:
+                    member_inputs.append(f"a{len(args)}")
+                    args.append((expr, self.node_outputs[source][1]))
+
+            local_var = f"t{len(members)}"
+            members.append(node_id)
+            node = node_map[node_id]
+            _, output_type = self.node_outputs[node_id]
+            body.append(self._render_node(
+                node, self.NODE_FUNCTIONS[node['data'].get('type', '')],
+                local_var, output_type, member_inputs
+            ))
+            return local_var
+
+        shared_funcs = []
+        call_lines: Dict[str, str] = {}
+        inlined: Set[str] = set()
+
+        for index, roots in enumerate(selected.values()):
+            func_name = f"sf_fn{index}"
+
+            for position, root in enumerate(roots):
+                args, members, body = [], [], []
+                result_var = emit(root, args, members, body)
+                output_var, output_type = self.node_outputs[root]
+
+                # El cuerpo de la función sale de la primera ocurrencia
+                if position == 0:
+                    params = ", ".join(f"{arg_type} a{i}" for i, (_, arg_type) in enumerate(args))
+                    body.append(f"return {result_var};")
+                    shared_funcs.append(
+                        f"{output_type} {func_name}({params}) {{\n  " + "\n  ".join(body) + "\n}"
+                    )
+
+                call_args = ", ".join(expr for expr, _ in args)
+                call_lines[root] = f"{output_type} {output_var} = {func_name}({call_args});"
+                inlined.update(m for m in members if m != root)
+
+        self.stats["extracted_functions"] = len(shared_funcs)
+        self.stats["call_sites"] = len(call_lines)
+        self.inlined_nodes = inlined
+        self.shared_functions = {
+            f"sf_fn{index}": self.node_outputs[roots[0]][1] for index, roots in enumerate(selected.values())
+        }
+
+        new_lines = []
+        for node in sorted_nodes:
+            node_id = node['id']
+            if node_id in inlined or node_id not in node_lines:
+                continue
+            new_lines.append(call_lines.get(node_id, node_lines[node_id]))
+
+        return shared_funcs, new_lines
+
+
+def _is_float_literal(value: Any) -> bool:
+    """True si str(value) es un literal float GLSL (1.0, .5, 2e3); los enteros no lo son"""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, float):
+        return value == value and value not in (float('inf'), float('-inf'))
+    return isinstance(value, str) and _FLOAT_LITERAL_RE.fullmatch(value) is not None
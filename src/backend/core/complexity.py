@@ -0,0 +1,394 @@
+"""
+Complejidad estática de shaders
+Estima el coste por fragmento de código GLSL arbitrario (iteraciones de
+loops × operaciones del cuerpo, funciones trascendentales y lecturas de
+texturas) y extrae los uniforms que usa. El resultado se guarda en
+Shader.complexity_score / Shader.uniforms para poder filtrar shaders
+demasiado pesados para un dispositivo sin volver a analizarlos.
+"""
+
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from core import glsl_ast as ast
+from core.glsl_analyzer import BUILTIN_FUNCTIONS, SHADERTOY_INPUTS, GLSLAnalyzer, component_count
+from core.glsl_parser import BudgetExceeded, GLSLSyntaxError, parse_tokens
+from core.glsl_tokenizer import Token, tokenize
+from core.glsl_validator import TIME_BUDGET_MS
+from db.models import Shader
+
+# Versión del modelo de coste: incrementar cuando cambien los pesos, así
+# el backfill recalcula los shaders analizados con la anterior
+COMPLEXITY_VERSION = "1.0.0"
+
+# Iteraciones supuestas cuando el límite de un loop no es constante
+DEFAULT_LOOP_ITERATIONS = 64
+MAX_LOOP_ITERATIONS = 4096
+
+# Coste con el que el score llega a 100 (escala logarítmica)
+SCORE_CEILING_COST = 1_000_000
+
+# Pesos por componente
+TRANSCENDENTAL_FUNCTIONS = {
+    'sin', 'cos', 'tan', 'asin', 'acos', 'atan', 'sinh', 'cosh', 'tanh', 'asinh', 'acosh', 'atanh',
+    'pow', 'exp', 'exp2', 'log', 'log2', 'sqrt', 'inversesqrt'
+}
+TRANSCENDENTAL_COST = 4
+TEXTURE_COST = 8
+BUILTIN_CALL_COST = 2
+
+
+@dataclass
+class ShaderComplexity:
+    """Coste estimado por fragmento"""
+    score: int  # 0-100
+    cost: int  # operaciones ponderadas por fragmento
+    transcendentals: int
+    texture_fetches: int
+    max_loop_iterations: int
+    uniforms: List[Dict[str, str]] = field(default_factory=list)  # [{"name", "type"}] en orden de uso
+    exact: bool = True  # False si el código no parsea y se estimó desde los tokens
+
+    def to_dict(self) -> Dict[str, object]:
+        """Desglose para Shader.complexity (los uniforms van en su propia columna)"""
+        return {
+            "cost": self.cost,
+            "transcendentals": self.transcendentals,
+            "texture_fetches": self.texture_fetches,
+            "max_loop_iterations": self.max_loop_iterations,
+            "exact": self.exact
+        }
+
+
+def complexity_score(cost: float) -> int:
+    """Coste -> 0-100 en escala logarítmica (cada x10 de coste suma lo mismo)"""
+    if cost <= 0:
+        return 0
+    return min(100, round(100 * math.log10(1 + cost) / math.log10(1 + SCORE_CEILING_COST)))
+
+
+@dataclass
+class _Cost:
+    ops: float = 0
+    transcendentals: float = 0
+    textures: float = 0
+
+    def __add__(self, other: '_Cost') -> '_Cost':
+        return _Cost(self.ops + other.ops, self.transcendentals + other.transcendentals,
+                     self.textures + other.textures)
+
+    def __mul__(self, factor: float) -> '_Cost':
+        return _Cost(self.ops * factor, self.transcendentals * factor, self.textures * factor)
+
+    def max(self, other: '_Cost') -> '_Cost':
+        return self if self.ops >= other.ops else other
+
+
+def _is_texture(name: str) -> bool:
+    return (name.startswith('texture') and name != 'textureSize') or name.startswith('texelFetch')
+
+
+def _number(expr: Optional[ast.Expr], constants: Dict[str, float]) -> Optional[float]:
+    if isinstance(expr, ast.Literal) and expr.literal_type in ('float', 'int', 'uint'):
+        try:
+            return float(expr.value.rstrip('fFuU'))
+        except ValueError:
+            return None
+    if isinstance(expr, ast.Identifier):
+        return constants.get(expr.name)
+    if isinstance(expr, ast.UnaryOp) and expr.op == '-':
+        value = _number(expr.operand, constants)
+        return -value if value is not None else None
+    if isinstance(expr, ast.Call) and expr.is_constructor and len(expr.args) == 1:
+        return _number(expr.args[0], constants)  # float(N), int(N)
+    return None
+
+
+class CostModel:
+    """Coste de las funciones de una unidad ya analizada (tipos completados)"""
+
+    def __init__(self, unit: ast.TranslationUnit):
+        self.functions: Dict[str, ast.FunctionDecl] = {f.name: f for f in unit.functions}
+        self.constants: Dict[str, float] = {}
+        for declaration in unit.declarations:
+            if isinstance(declaration, ast.VarDecl) and 'const' in declaration.qualifiers:
+                for declarator in declaration.declarators:
+                    value = _number(declarator.initializer, self.constants)
+                    if value is not None:
+                        self.constants[declarator.name] = value
+        self.max_iterations = 0
+        self._costs: Dict[str, _Cost] = {}
+        self._active: Set[str] = set()
+
+    def entry_cost(self) -> _Cost:
+        """Coste de mainImage/main, o de todas las funciones si no hay entry point"""
+        for name in ('mainImage', 'main'):
+            if name in self.functions:
+                return self.function(name)
+        total = _Cost()
+        for name in self.functions:
+            total = total + self.function(name)
+        return total
+
+    def function(self, name: str) -> _Cost:
+        if name in self._costs:
+            return self._costs[name]
+        if name in self._active:  # recursión (no válida en GLSL)
+            return _Cost()
+        self._active.add(name)
+        cost = self.statement(self.functions[name].body)
+        self._active.discard(name)
+        self._costs[name] = cost
+        return cost
+
+    # ----- Statements -----
+
+    def statement(self, node: Optional[ast.Stmt]) -> _Cost:
+        if node is None:
+            return _Cost()
+        if isinstance(node, ast.If):
+            return self.expr(node.condition) + self.statement(node.then).max(self.statement(node.otherwise))
+        if isinstance(node, ast.For):
+            iterations = self._for_iterations(node)
+            body = self.statement(node.body) + self.expr(node.condition) + self.expr(node.step)
+            return self.statement(node.init) + body * iterations
+        if isinstance(node, (ast.While, ast.DoWhile)):
+            self.max_iterations = max(self.max_iterations, DEFAULT_LOOP_ITERATIONS)
+            return (self.statement(node.body) + self.expr(node.condition)) * DEFAULT_LOOP_ITERATIONS
+
+        total = _Cost()
+        for child in node.children():
+            if isinstance(child, ast.Stmt):
+                total = total + self.statement(child)
+            elif isinstance(child, ast.Declarator):
+                total = total + self.expr(child.initializer)
+            elif isinstance(child, ast.Expr):
+                total = total + self.expr(child)
+        return total
+
+    def _for_iterations(self, node: ast.For) -> int:
+        iterations = DEFAULT_LOOP_ITERATIONS
+        condition = node.condition
+        if isinstance(condition, ast.BinaryOp) and condition.op in ('<', '<=', '>', '>=', '!='):
+            start, counter = 0.0, None
+            if isinstance(node.init, ast.VarDecl) and node.init.declarators:
+                counter = node.init.declarators[0].name
+                start = _number(node.init.declarators[0].initializer, self.constants) or 0.0
+            if isinstance(condition.left, ast.Identifier) and condition.left.name == counter:
+                bound = _number(condition.right, self.constants)
+            else:
+                bound = _number(condition.left, self.constants)
+            step = self._step(node.step)
+            if bound is not None and step:
+                inclusive = 1 if condition.op in ('<=', '>=') else 0
+                iterations = max(int(abs(bound - start) / step) + inclusive, 0)
+        iterations = min(iterations, MAX_LOOP_ITERATIONS)
+        self.max_iterations = max(self.max_iterations, iterations)
+        return iterations
+
+    def _step(self, step: Optional[ast.Expr]) -> Optional[float]:
+        if isinstance(step, ast.UnaryOp) and step.op in ('++', '--'):
+            return 1.0
+        if isinstance(step, ast.Assignment) and step.op in ('+=', '-='):
+            value = _number(step.value, self.constants)
+            return abs(value) if value else None
+        return None  # paso geométrico o no constante: se asume el valor por defecto
+
+    # ----- Expresiones -----
+
+    def expr(self, node: Optional[ast.Expr]) -> _Cost:
+        total = _Cost()
+        if node is None:
+            return total
+        for n in ast.walk(node):
+            width = component_count(getattr(n, 'type', None)) or 1
+            if isinstance(n, (ast.BinaryOp, ast.UnaryOp, ast.Ternary)):
+                total.ops += width
+            elif isinstance(n, ast.Assignment) and n.op != '=':
+                total.ops += width
+            elif isinstance(n, ast.Call) and not n.is_constructor:
+                if n.callee in self.functions:
+                    total = total + self.function(n.callee)
+                elif _is_texture(n.callee):
+                    total.ops += TEXTURE_COST
+                    total.textures += 1
+                elif n.callee in TRANSCENDENTAL_FUNCTIONS:
+                    total.ops += TRANSCENDENTAL_COST * width
+                    total.transcendentals += width
+                elif n.callee in BUILTIN_FUNCTIONS:
+                    total.ops += BUILTIN_CALL_COST * width
+        return total
+
+
+def _used_uniforms(unit: ast.TranslationUnit, declared: Dict[str, str]) -> List[Dict[str, str]]:
+    """Uniforms declarados o inputs de Shadertoy que el código referencia"""
+    available = {**SHADERTOY_INPUTS, **declared}
+    used: Dict[str, str] = {}
+    for node in ast.walk(unit):
+        if isinstance(node, ast.Identifier) and node.name in available and node.name not in used:
+            used[node.name] = available[node.name]
+    return [{"name": name, "type": type_name} for name, type_name in used.items()]
+
+
+def estimate_from_tokens(tokens: List[Token]) -> ShaderComplexity:
+    """
+    Estimación para código que no parsea
+
+    Pesos por token; los cuerpos entre llaves de for/while se multiplican
+    por DEFAULT_LOOP_ITERATIONS.
+    """
+    cost = _Cost()
+    multipliers = [1]
+    loop_pending = False
+    has_loops = False
+    used: Dict[str, str] = {}
+    for i, token in enumerate(tokens):
+        value = token.value
+        weight = multipliers[-1]
+        if token.kind == 'ident':
+            if value in ('for', 'while'):
+                loop_pending = has_loops = True
+            elif value in SHADERTOY_INPUTS and value not in used:
+                used[value] = SHADERTOY_INPUTS[value]
+            elif i + 1 < len(tokens) and tokens[i + 1].value == '(':
+                if _is_texture(value):
+                    cost = cost + _Cost(TEXTURE_COST, 0, 1) * weight
+                elif value in TRANSCENDENTAL_FUNCTIONS:
+                    cost = cost + _Cost(TRANSCENDENTAL_COST, 1, 0) * weight
+                elif value in BUILTIN_FUNCTIONS:
+                    cost.ops += BUILTIN_CALL_COST * weight
+            if value == 'uniform' and i + 2 < len(tokens) and tokens[i + 2].kind == 'ident':
+                used.setdefault(tokens[i + 2].value, tokens[i + 1].value)
+        elif token.kind == 'op':
+            if value == '{':
+                multipliers.append(weight * DEFAULT_LOOP_ITERATIONS if loop_pending else weight)
+                loop_pending = False
+            elif value == '}' and len(multipliers) > 1:
+                multipliers.pop()
+            elif value in ('+', '-', '*', '/', '+=', '-=', '*=', '/=', '<', '>', '<=', '>=', '==', '!='):
+                cost.ops += weight
+
+    return ShaderComplexity(
+        score=complexity_score(cost.ops),
+        cost=round(cost.ops),
+        transcendentals=round(cost.transcendentals),
+        texture_fetches=round(cost.textures),
+        max_loop_iterations=DEFAULT_LOOP_ITERATIONS if has_loops else 0,
+        uniforms=[{"name": name, "type": type_name} for name, type_name in used.items()],
+        exact=False
+    )
+
+
+def analyze_complexity(code: str, time_budget_ms: float = TIME_BUDGET_MS) -> ShaderComplexity:
+    """
+    Coste estimado por fragmento y uniforms usados
+
+    Funciona con cualquier código guardado: si no parsea (o agota el
+    presupuesto de tiempo) se estima desde los tokens con exact=False.
+    """
+    deadline = time.perf_counter() + time_budget_ms / 1000 if time_budget_ms > 0 else None
+    tokens = tokenize(code or "").tokens
+    try:
+        parsed = parse_tokens(tokens, code, deadline)
+        analyzer = GLSLAnalyzer(deadline)
+        analysis = analyzer.analyze(parsed.unit)
+    except (GLSLSyntaxError, BudgetExceeded, RecursionError):
+        return estimate_from_tokens(tokens)
+    return unit_complexity(parsed.unit, analysis.uniforms)
+
+
+def unit_complexity(unit: ast.TranslationUnit, declared_uniforms: Dict[str, str]) -> ShaderComplexity:
+    """Complejidad de un AST ya analizado (p. ej. el de GLSLValidator.parsed)"""
+    model = CostModel(unit)
+    cost = model.entry_cost()
+    return ShaderComplexity(
+        score=complexity_score(cost.ops),
+        cost=round(cost.ops),
+        transcendentals=round(cost.transcendentals),
+        texture_fetches=round(cost.textures),
+        max_loop_iterations=model.max_iterations,
+        uniforms=_used_uniforms(unit, declared_uniforms)
+    )
+
+
+def combine_complexity(passes: Iterable[ShaderComplexity]) -> ShaderComplexity:
+    """Varios render passes se ejecutan por frame: se suman sus costes"""
+    passes = list(passes)
+    uniforms: Dict[str, str] = {}
+    for result in passes:
+        for uniform in result.uniforms:
+            uniforms.setdefault(uniform["name"], uniform["type"])
+    cost = sum(p.cost for p in passes)
+    return ShaderComplexity(
+        score=complexity_score(cost),
+        cost=cost,
+        transcendentals=sum(p.transcendentals for p in passes),
+        texture_fetches=sum(p.texture_fetches for p in passes),
+        max_loop_iterations=max((p.max_loop_iterations for p in passes), default=0),
+        uniforms=[{"name": name, "type": type_name} for name, type_name in uniforms.items()],
+        exact=all(p.exact for p in passes)
+    )
+
+
+# ===== PERSISTENCIA =====
+
+def apply_complexity(shader: Shader, result: ShaderComplexity):
+    """Copia el resultado a las columnas del Shader (sin commit)"""
+    shader.complexity_score = result.score
+    shader.complexity = result.to_dict()
+    shader.uniforms = result.uniforms
+    shader.complexity_version = COMPLEXITY_VERSION
+
+
+def complexity_from_dict(data: Dict[str, object]) -> ShaderComplexity:
+    """Inverso de to_dict + score/uniforms (resultados en JSONL del corpus)"""
+    return ShaderComplexity(
+        score=data["score"],
+        cost=data["cost"],
+        transcendentals=data["transcendentals"],
+        texture_fetches=data["texture_fetches"],
+        max_loop_iterations=data["max_loop_iterations"],
+        uniforms=data.get("uniforms", []),
+        exact=data.get("exact", True)
+    )
+
+
+def update_shader_complexity(shader: Shader) -> ShaderComplexity:
+    """Analiza Shader.code y guarda el resultado (sin commit)"""
+    result = analyze_complexity(shader.code or "")
+    apply_complexity(shader, result)
+    return result
+
+
+def backfill_complexity(db: Session, batch_size: int = 200) -> Dict[str, int]:
+    """
+    Analiza los shaders sin complejidad o calculada con otra versión del modelo
+
+    Returns:
+        {"analyzed": n, "estimated": n} (estimated: código que no parsea)
+    """
+    stats = {"analyzed": 0, "estimated": 0}
+
+    while True:
+        # Cada lote analizado deja de ser stale: siempre desde el principio
+        batch = db.query(Shader).filter(
+            (Shader.complexity_version != COMPLEXITY_VERSION) |
+            (Shader.complexity_version.is_(None))
+        ).limit(batch_size).all()
+
+        if not batch:
+            break
+
+        for shader in batch:
+            result = update_shader_complexity(shader)
+            stats["analyzed"] += 1
+            if not result.exact:
+                stats["estimated"] += 1
+
+        db.commit()
+
+    return stats
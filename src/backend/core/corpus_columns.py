@@ -0,0 +1,231 @@
+"""
+Columnas numéricas del corpus residente
+views, likes, popularidad (views + 10·likes) y complexity_score en arrays
+NumPy alineados por slot con los registros del corpus. Los agregados se
+mantienen con cada recarga (stats en tiempo constante) y los top-k salen
+de argpartition, cacheados hasta el siguiente cambio.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.pagination import CursorKey, id_array, keyset_page
+from core.shader_corpus import get_shader_corpus
+
+# Columnas ordenables
+RANK_FIELDS = ('views', 'likes', 'popularity')
+
+# Columnas de filtro (calculadas en la ingesta; -1: sin analizar)
+FILTER_FIELDS = ('complexity_score',)
+
+# Tamaño del top cacheado por columna (cubre /popular, limit <= 50)
+TOP_CACHE_SIZE = 100
+
+_INITIAL_CAPACITY = 1024
+
+
+class CorpusColumns:
+    """
+    Columnas por slot; un shader actualizado conserva su slot y los slots
+    de los borrados se reutilizan. Los slots libres valen -1 en todas las
+    columnas, así que nunca entran en un top.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._slots: Dict[str, int] = {}  # id del shader -> slot
+        self._records: List[Optional[Dict[str, Any]]] = []  # slot -> registro
+        self._free: List[int] = []
+        self._columns = {field: np.full(_INITIAL_CAPACITY, -1, np.int64) for field in RANK_FIELDS + FILTER_FIELDS}
+        self._total_views = 0
+        self._total_likes = 0
+        self._version = 0
+        self._top_cache: Dict[str, tuple] = {}  # campo -> (versión, slots ordenados)
+        self._order_cache: Dict[str, tuple] = {}  # campo -> (versión, orden completo)
+        self._live_cache: Optional[tuple] = None  # (versión, slots vivos, sus ids)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def apply(self, upserted: List[Dict[str, Any]], removed: List[str]):
+        """Listener de ShaderCorpus: actualiza columnas y agregados"""
+        with self._lock:
+            for shader_id in removed:
+                slot = self._slots.pop(shader_id, None)
+                if slot is None:
+                    continue
+                self._account(slot, -1)
+                for column in self._columns.values():
+                    column[slot] = -1
+                self._records[slot] = None
+                self._free.append(slot)
+
+            for record in upserted:
+                slot = self._slots.get(record['id'])
+                if slot is not None:
+                    self._account(slot, -1)
+                else:
+                    slot = self._allocate()
+                    self._slots[record['id']] = slot
+                views = max(int(record.get('views') or 0), 0)
+                likes = max(int(record.get('likes') or 0), 0)
+                self._columns['views'][slot] = views
+                self._columns['likes'][slot] = likes
+                self._columns['popularity'][slot] = views + likes * 10
+                score = record.get('complexity_score')
+                self._columns['complexity_score'][slot] = -1 if score is None else int(score)
+                self._records[slot] = record
+                self._account(slot, 1)
+            self._version += 1
+
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        slot = len(self._records)
+        self._records.append(None)
+        capacity = len(self._columns['views'])
+        if slot >= capacity:
+            for field, column in self._columns.items():
+                grown = np.full(2 * capacity, -1, np.int64)
+                grown[:capacity] = column
+                self._columns[field] = grown
+        return slot
+
+    def _account(self, slot: int, sign: int):
+        self._total_views += sign * int(self._columns['views'][slot])
+        self._total_likes += sign * int(self._columns['likes'][slot])
+
+    def top(self, field: str, k: int) -> List[Dict[str, Any]]:
+        """Los k registros con mayor valor en `field` (empates: por slot)"""
+        with self._lock:
+            return [self._records[slot] for slot in self._top_slots(field, k)]
+
+    def _top_slots(self, field: str, k: int) -> np.ndarray:
+        k = min(k, len(self._slots))
+        cached = self._top_cache.get(field)
+        if cached is not None and cached[0] == self._version and k <= len(cached[1]):
+            return cached[1][:k]
+        order = self._order_cache.get(field)
+        if order is not None and order[0] == self._version:
+            return order[1][:k]
+
+        values = self._columns[field][:len(self._records)]
+        size = min(max(k, TOP_CACHE_SIZE), len(self._slots))
+        if size == 0:
+            return np.zeros(0, np.int64)
+        if size < len(values):
+            part = np.argpartition(-values, size - 1)[:size]
+        else:
+            part = np.arange(len(values))
+        slots = part[np.lexsort((part, -values[part]))][:size]
+        self._top_cache[field] = (self._version, slots)
+        return slots[:k]
+
+    def ranked(self, field: str) -> List[Dict[str, Any]]:
+        """Todos los registros por `field` descendente (orden completo cacheado hasta el siguiente cambio)"""
+        with self._lock:
+            order = self._order_cache.get(field)
+            if order is None or order[0] != self._version:
+                values = self._columns[field][:len(self._records)]
+                slots = np.argsort(-values, kind='stable')[:len(self._slots)]
+                order = self._order_cache[field] = (self._version, slots)
+            return [self._records[slot] for slot in order[1]]
+
+    def _complexity_mask(self, slots: np.ndarray, max_complexity: int) -> np.ndarray:
+        """Slots analizados con complexity_score <= max_complexity"""
+        scores = self._columns['complexity_score'][slots]
+        return (scores >= 0) & (scores <= max_complexity)
+
+    def ranked_page(self, field: str, k: int,
+                    max_complexity: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Los k primeros por `field` descendente, opcionalmente filtrados por
+        complexity_score sobre la columna (sin analizar código)
+
+        Returns:
+            (registros, total que pasa el filtro)
+        """
+        with self._lock:
+            if max_complexity is None:
+                return self.top(field, k), len(self._slots)
+            slots = np.flatnonzero(self._complexity_mask(np.arange(len(self._records)), max_complexity))
+            values = self._columns[field][slots]
+            if 0 < k < len(slots):
+                part = np.argpartition(-values, k - 1)[:k]
+            else:
+                part = np.arange(len(slots))
+            order = part[np.lexsort((slots[part], -values[part]))][:k]
+            return [self._records[slot] for slot in slots[order].tolist()], len(slots)
+
+    def count(self, max_complexity: Optional[int] = None) -> int:
+        """Shaders del corpus (con complexity_score <= max_complexity si se indica)"""
+        with self._lock:
+            if max_complexity is None:
+                return len(self._slots)
+            return int(np.count_nonzero(self._complexity_mask(np.arange(len(self._records)), max_complexity)))
+
+    def complexity_scores(self, ids: List[str]) -> np.ndarray:
+        """complexity_score de cada id (-1 si no está o no se analizó)"""
+        with self._lock:
+            slots = [self._slots.get(shader_id, -1) for shader_id in ids]
+            column = self._columns['complexity_score']
+            return np.array([column[slot] if slot >= 0 else -1 for slot in slots], np.int64)
+
+    def after(self, field: str, key: Optional[CursorKey], k: int,
+              max_complexity: Optional[int] = None) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+        """
+        Página por cursor: los k registros siguientes a `key` por `field`
+        descendente e id ascendente (opcionalmente filtrados por complejidad)
+
+        Returns:
+            ([(valor, registro)], registros que quedan tras el cursor)
+        """
+        with self._lock:
+            if self._live_cache is None or self._live_cache[0] != self._version:
+                slots = np.flatnonzero(self._columns['views'][:len(self._records)] >= 0)
+                ids = id_array([self._records[slot]['id'] for slot in slots.tolist()])
+                self._live_cache = (self._version, slots, ids)
+            _, slots, ids = self._live_cache
+            if max_complexity is not None:
+                keep = self._complexity_mask(slots, max_complexity)
+                slots, ids = slots[keep], ids[keep]
+            values = self._columns[field][slots]
+            page, remaining = keyset_page(values, ids, key, k)
+            return [(int(values[i]), self._records[slots[i]]) for i in page], remaining
+
+    def stats(self) -> Dict[str, Any]:
+        """Agregados mantenidos incrementalmente (sin recorrer el corpus)"""
+        with self._lock:
+            count = len(self._slots)
+            nbytes = sum(column.nbytes for column in self._columns.values())
+            stats = {
+                "total_shaders": count,
+                "total_views": self._total_views,
+                "total_likes": self._total_likes,
+                "avg_views": self._total_views / count if count else 0,
+                "avg_likes": self._total_likes / count if count else 0,
+                "memory": {
+                    "column_bytes": nbytes,
+                    "bytes_per_shader": round(nbytes / count, 1) if count else 0
+                }
+            }
+            if count:
+                stats["top_shader"] = self.top('views', 1)[0]
+            return stats
+
+
+_columns: Optional[CorpusColumns] = None
+_columns_lock = threading.Lock()
+
+
+def get_corpus_columns() -> CorpusColumns:
+    """Obtiene o crea las columnas del corpus global (se suscriben a sus recargas)"""
+    global _columns
+    with _columns_lock:
+        if _columns is None:
+            columns = CorpusColumns()
+            get_shader_corpus().subscribe(columns.apply)
+            _columns = columns
+    return _columns
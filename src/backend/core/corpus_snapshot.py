@@ -0,0 +1,257 @@
+"""
+Snapshot binario del corpus de búsqueda
+Un solo archivo con columnas numéricas de ancho fijo, heaps de strings
+indexados por offsets (nombre, descripción, código...) y diccionarios de
+tags, técnicas y términos de código. El corpus lo abre con mmap: arrancar
+no parsea JSON y las páginas (sobre todo el código) se comparten entre
+procesos worker.
+
+El directorio de JSON sigue siendo el formato de ingesta; el snapshot se
+genera con `python -m commands.compact_corpus` y el corpus solo relee los
+JSON modificados después de la compactación.
+
+Formato (little-endian):
+    magic (8 bytes) | offset de la cabecera (u64) | longitud (u64)
+    secciones alineadas a 8 bytes | cabecera JSON (secciones y conteo)
+"""
+
+import json
+import mmap
+import os
+from collections.abc import Mapping
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from core.corpus_validation import CORPUS_DIR
+
+CORPUS_SNAPSHOT_PATH = Path(
+    os.getenv("SEARCH_CORPUS_SNAPSHOT") or CORPUS_DIR.parents[1] / "processed" / "shadertoy_corpus.snapshot"
+)
+
+SNAPSHOT_MAGIC = b"SFCORPUS"
+SNAPSHOT_VERSION = 3
+
+# Campos del registro de búsqueda (mismo orden que shader_record)
+NUMERIC_FIELDS = ('views', 'likes', 'complexity_score')
+STRING_FIELDS = ('id', 'name', 'description', 'author', 'category', 'code')
+LIST_FIELDS = ('tags', 'techniques', 'code_terms')  # con diccionario de valores
+RECORD_FIELDS = (
+    'id', 'name', 'description', 'views', 'likes', 'author', 'category', 'tags', 'techniques', 'code_terms',
+    'complexity_score', 'code'
+)
+
+_PREFIX = len(SNAPSHOT_MAGIC) + 16
+
+# (archivo JSON, (mtime_ns, tamaño), registro)
+SnapshotEntry = Tuple[str, Tuple[int, int], Mapping]
+
+
+class SnapshotError(ValueError):
+    """Snapshot ilegible o de otra versión del formato"""
+    pass
+
+
+def _as_int(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _heap(strings: List[str]) -> Tuple[np.ndarray, bytes]:
+    encoded = [s.encode('utf-8', 'surrogatepass') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, np.uint64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+
+def write_snapshot(path: Path, entries: Iterable[SnapshotEntry]) -> int:
+    """
+    Escribe el snapshot (archivo temporal + rename: los procesos que ya
+    tienen el anterior mapeado siguen leyéndolo)
+
+    Returns:
+        Número de shaders escritos
+    """
+    entries = list(entries)
+    sections: List[Tuple[str, str, bytes]] = []  # (nombre, dtype, contenido)
+
+    sections.append(('mtime_ns', '<i8', np.array([e[1][0] for e in entries], np.int64).tobytes()))
+    sections.append(('size', '<i8', np.array([e[1][1] for e in entries], np.int64).tobytes()))
+    for field in NUMERIC_FIELDS:
+        values = np.array([_as_int(e[2].get(field)) for e in entries], np.int64)
+        sections.append((field, '<i8', values.tobytes()))
+
+    for field, strings in [('file', [e[0] for e in entries])] + [
+        (field, [str(e[2].get(field) or "") for e in entries]) for field in STRING_FIELDS
+    ]:
+        offsets, heap = _heap(strings)
+        sections.append((f"{field}.offsets", '<u8', offsets.tobytes()))
+        sections.append((f"{field}.heap", '|u1', heap))
+
+    for field in LIST_FIELDS:
+        dictionary: Dict[str, int] = {}
+        ids: List[int] = []
+        lengths: List[int] = []
+        for e in entries:
+            values = [v for v in (e[2].get(field) or []) if isinstance(v, str)]
+            ids.extend(dictionary.setdefault(v, len(dictionary)) for v in values)
+            lengths.append(len(values))
+        offsets, heap = _heap(list(dictionary))
+        sections.append((f"{field}.dict.offsets", '<u8', offsets.tobytes()))
+        sections.append((f"{field}.dict.heap", '|u1', heap))
+        list_offsets = np.zeros(len(entries) + 1, np.uint64)
+        np.cumsum(lengths, out=list_offsets[1:])
+        sections.append((f"{field}.offsets", '<u8', list_offsets.tobytes()))
+        sections.append((f"{field}.ids", '<u4', np.array(ids, np.uint32).tobytes()))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, 'wb') as f:
+        f.write(b"\0" * _PREFIX)
+        layout = {}
+        for name, dtype, content in sections:
+            f.write(b"\0" * (-f.tell() % 8))
+            layout[name] = [f.tell(), len(content), dtype]
+            f.write(content)
+        header = json.dumps({"version": SNAPSHOT_VERSION, "count": len(entries), "sections": layout}).encode()
+        header_offset = f.tell()
+        f.write(header)
+        f.seek(0)
+        f.write(SNAPSHOT_MAGIC + np.array([header_offset, len(header)], '<u8').tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(entries)
+
+
+class SnapshotRecord(Mapping):
+    """
+    Registro de solo lectura sobre el snapshot mapeado: los campos se
+    decodifican al acceder (el código nunca se copia al heap de Python)
+    """
+
+    __slots__ = ('_snapshot', '_index')
+
+    def __init__(self, snapshot: 'CorpusSnapshotFile', index: int):
+        self._snapshot = snapshot
+        self._index = index
+
+    def __getitem__(self, key: str) -> Any:
+        return self._snapshot.field(self._index, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(RECORD_FIELDS)
+
+    def __len__(self) -> int:
+        return len(RECORD_FIELDS)
+
+    def __repr__(self) -> str:
+        return f"SnapshotRecord({self['id']!r})"
+
+
+class CorpusSnapshotFile:
+    """Snapshot abierto con mmap (las columnas son vistas NumPy sobre el archivo)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:  # archivo vacío
+                raise SnapshotError(f"Snapshot vacío: {self.path}") from e
+        if len(self._mmap) < _PREFIX or self._mmap[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise SnapshotError(f"No es un snapshot del corpus: {self.path}")
+        header_offset, header_length = np.frombuffer(self._mmap, '<u8', 2, len(SNAPSHOT_MAGIC)).tolist()
+        try:
+            header = json.loads(self._mmap[header_offset:header_offset + header_length])
+        except ValueError as e:
+            raise SnapshotError(f"Cabecera ilegible en {self.path}: {e}") from e
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Versión de snapshot no soportada: {header.get('version')}")
+
+        self.count: int = header["count"]
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._heaps: Dict[str, int] = {}  # nombre -> offset absoluto
+        for name, (offset, length, dtype) in header["sections"].items():
+            if name.endswith(".heap"):
+                self._heaps[name] = offset
+            else:
+                dtype = np.dtype(dtype)
+                self._arrays[name] = np.frombuffer(self._mmap, dtype, length // dtype.itemsize, offset)
+        self._dictionaries = {field: self._strings(f"{field}.dict") for field in LIST_FIELDS}
+        self._ids = self._strings('id')  # claves del índice por id: se decodifican una vez
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _string(self, name: str, index: int) -> str:
+        offsets = self._arrays[f"{name}.offsets"]
+        start = self._heaps[f"{name}.heap"]
+        return self._mmap[start + int(offsets[index]):start + int(offsets[index + 1])].decode('utf-8', 'surrogatepass')
+
+    def _strings(self, name: str) -> List[str]:
+        """Todo un heap de una vez (un solo decode si es ASCII)"""
+        offsets = self._arrays[f"{name}.offsets"].tolist()
+        start = self._heaps[f"{name}.heap"]
+        heap = self._mmap[start:start + offsets[-1]]
+        if heap.isascii():
+            text = heap.decode('ascii')
+            return [text[a:b] for a, b in zip(offsets, offsets[1:])]
+        return [heap[a:b].decode('utf-8', 'surrogatepass') for a, b in zip(offsets, offsets[1:])]
+
+    def field(self, index: int, key: str) -> Any:
+        if key == 'id':
+            return self._ids[index]
+        if key in NUMERIC_FIELDS:
+            return int(self._arrays[key][index])
+        if key in STRING_FIELDS:
+            return self._string(key, index)
+        if key in LIST_FIELDS:
+            offsets = self._arrays[f"{key}.offsets"]
+            values = self._dictionaries[key]
+            return [values[i] for i in self._arrays[f"{key}.ids"][int(offsets[index]):int(offsets[index + 1])].tolist()]
+        raise KeyError(key)
+
+    def column(self, field: str) -> np.ndarray:
+        """Columna numérica completa (vista de solo lectura sobre el mmap)"""
+        return self._arrays[field]
+
+    @cached_property
+    def files(self) -> List[str]:
+        """Archivo JSON de cada registro (ordenados por nombre)"""
+        return self._strings('file')
+
+    @cached_property
+    def _rows(self) -> Dict[str, int]:
+        return dict(zip(self._ids, range(self.count)))
+
+    def signatures(self) -> Dict[str, Tuple[int, int]]:
+        """Archivo -> (mtime_ns, tamaño) al compactar"""
+        return dict(zip(self.files, zip(self._arrays['mtime_ns'].tolist(), self._arrays['size'].tolist())))
+
+    def find(self, shader_id: str) -> Optional[int]:
+        """Fila de un id (el índice por id se arma en la primera búsqueda)"""
+        return self._rows.get(shader_id)
+
+    def record(self, index: int) -> SnapshotRecord:
+        return SnapshotRecord(self, index)
+
+    def entries(self) -> Iterator[SnapshotEntry]:
+        """(archivo, firma, registro) en el orden del snapshot"""
+        mtimes = self._arrays['mtime_ns'].tolist()
+        sizes = self._arrays['size'].tolist()
+        for i, name in enumerate(self.files):
+            yield name, (mtimes[i], sizes[i]), SnapshotRecord(self, i)
+
+
+def open_snapshot(path: Path) -> CorpusSnapshotFile:
+    """Abre un snapshot (SnapshotError si no es válido, OSError si no existe)"""
+    try:
+        return CorpusSnapshotFile(path)
+    except (KeyError, TypeError, IndexError) as e:
+        raise SnapshotError(f"Snapshot incompleto {path}: {e}") from e
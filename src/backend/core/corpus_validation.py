@@ -0,0 +1,177 @@
+"""
+Validación masiva del corpus scrapeado (etapa Validate del pipeline)
+Recorre data/raw/shadertoy/*.json en streaming, valida cada render pass
+en un pool de procesos y produce un resultado compacto por shader que se
+puede persistir en la tabla Shader.
+"""
+
+import json
+import re
+import time
+from datetime import datetime
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from core.complexity import (
+    ShaderComplexity, apply_complexity, combine_complexity, complexity_from_dict, estimate_from_tokens,
+    unit_complexity
+)
+from core.glsl_parser import get_driver
+from core.glsl_validator import GLSLValidator, VALIDATOR_VERSION
+from db.models import Shader
+
+CORPUS_DIR = Path(__file__).resolve().parents[3] / "data" / "raw" / "shadertoy"
+
+# Passes con mainImage; sound (mainSound) y cubemap (mainCubemap) no se validan
+VALIDATED_PASSES = {'image', 'buffer'}
+
+MAX_REPORTED_MESSAGES = 20  # por shader; los contadores llevan el total
+
+_LINE_RE = re.compile(r'(\b[Ll]ine )(\d+)')
+
+
+def iter_corpus(corpus_dir: Path = CORPUS_DIR) -> Iterator[Path]:
+    """Archivos del corpus en orden estable, sin cargarlos"""
+    return iter(sorted(corpus_dir.glob("*.json")))
+
+
+def _relocate(message: str, offset: int, pass_name: str) -> str:
+    """
+    Líneas del source concatenado (Common + pass) -> líneas del pass
+
+    El mensaje se prefija con el pass, o con "Common" si el error está en el
+    código compartido.
+    """
+    lines = [int(m.group(2)) for m in _LINE_RE.finditer(message)]
+    if lines and lines[0] <= offset:
+        return f"Common: {message}"
+    relocated = _LINE_RE.sub(lambda m: f"{m.group(1)}{int(m.group(2)) - offset}", message)
+    return f"{pass_name}: {relocated}"
+
+
+def validate_shader_file(path: Path) -> Dict[str, Any]:
+    """
+    Valida todos los passes de un shader de Shadertoy
+
+    El código del pass Common se antepone a cada pass (así lo compila
+    Shadertoy); los mensajes que caen en Common se marcan y se reportan
+    una sola vez.
+
+    También estima la complejidad (suma de los passes) reutilizando el
+    AST de la validación.
+
+    Returns:
+        {"id", "is_valid", "errors", "warnings", "error_count",
+         "warning_count", "truncated", "passes", "complexity", "time_ms"} o
+        {"id", "skipped"} si el archivo no es un shader válido
+    """
+    start_time = time.perf_counter()
+    path = Path(path)
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        info = data['info']
+        render_passes = data['renderpass']
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return {"id": path.stem, "skipped": f"Invalid shader file: {e}"}
+
+    common = "".join(p.get('code', '') for p in render_passes if p.get('type') == 'common')
+    prefix = common + "\n" if common else ""
+    offset = prefix.count("\n")
+
+    errors: List[str] = []
+    warnings: List[str] = []
+    truncated = False
+    passes = 0
+    complexities: List[ShaderComplexity] = []
+
+    for render_pass in render_passes:
+        if render_pass.get('type') not in VALIDATED_PASSES:
+            continue
+        passes += 1
+        name = render_pass.get('name') or render_pass['type'].title()
+        validator = GLSLValidator()
+        result = validator.validate(prefix + render_pass.get('code', ''))
+        truncated = truncated or result.truncated
+        if validator.parsed is not None:
+            complexities.append(unit_complexity(validator.parsed.unit, validator.declared_uniforms))
+        else:
+            complexities.append(estimate_from_tokens(validator.tokens))
+        for target, messages in ((errors, result.errors), (warnings, result.warnings)):
+            for message in messages:
+                message = _relocate(message, offset, name)
+                # Los errores de Common se repiten en cada pass
+                if message not in target:
+                    target.append(message)
+
+    complexity = combine_complexity(complexities)
+    return {
+        "id": info.get('id', path.stem),
+        "is_valid": passes > 0 and not errors,
+        "errors": errors[:MAX_REPORTED_MESSAGES],
+        "warnings": warnings[:MAX_REPORTED_MESSAGES],
+        "error_count": len(errors),
+        "warning_count": len(warnings),
+        "truncated": truncated,
+        "passes": passes,
+        "complexity": {"score": complexity.score, **complexity.to_dict(), "uniforms": complexity.uniforms},
+        "time_ms": round((time.perf_counter() - start_time) * 1000, 2)
+    }
+
+
+def _init_worker():
+    # La tabla LALR se construye una vez por proceso, no por shader
+    get_driver()
+
+
+def validate_corpus(
+    paths: Iterable[Path],
+    workers: Optional[int] = None,
+    chunksize: int = 16
+) -> Iterator[Dict[str, Any]]:
+    """
+    Valida el corpus en paralelo y produce resultados a medida que terminan
+
+    Los paths se consumen en streaming: el corpus nunca está entero en memoria.
+    workers=1 valida en el proceso actual (útil para depurar).
+    """
+    if workers == 1:
+        _init_worker()
+        yield from map(validate_shader_file, paths)
+        return
+
+    with Pool(processes=workers, initializer=_init_worker) as pool:
+        yield from pool.imap_unordered(validate_shader_file, paths, chunksize=chunksize)
+
+
+def persist_results(db: Session, results: List[Dict[str, Any]]) -> int:
+    """
+    Copia los resultados (validación y complejidad) a los Shader de Shadertoy
+    correspondientes (sin commit)
+
+    Returns:
+        Número de shaders actualizados
+    """
+    by_id = {r['id']: r for r in results if 'skipped' not in r}
+    if not by_id:
+        return 0
+
+    now = datetime.utcnow()
+    shaders = db.query(Shader).filter(
+        Shader.source == "shadertoy",
+        Shader.source_id.in_(list(by_id))
+    ).all()
+
+    for shader in shaders:
+        result = by_id[shader.source_id]
+        shader.is_valid = result['is_valid']
+        shader.validation = {k: v for k, v in result.items() if k not in ('id', 'is_valid', 'complexity')}
+        shader.validator_version = VALIDATOR_VERSION
+        shader.validated_at = now
+        if 'complexity' in result:
+            apply_complexity(shader, complexity_from_dict(result['complexity']))
+
+    return len(shaders)
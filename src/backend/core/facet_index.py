@@ -0,0 +1,402 @@
+"""
+Facetas del corpus con bitmaps: categoría, autor, tags y técnicas
+Al estilo de roaring bitmaps, cada valor usa el contenedor que le
+conviene: los frecuentes (al menos 1/256 del corpus) un bitset de uint64
+y los raros su posting list de documentos. Los filtros son OR dentro de
+una faceta y AND entre facetas sobre bitsets, y los conteos de facetas
+del resultado actual son popcounts (valores frecuentes) más un bincount
+de los valores raros de los documentos del resultado.
+"""
+
+import heapq
+import threading
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from core.shader_corpus import get_shader_corpus
+from core.techniques import detect_techniques
+
+FACETS = ('category', 'author', 'tags', 'techniques')
+
+# Valores por faceta en los conteos
+FACET_TOP = 10
+
+# Un valor pasa a bitset cuando está en esta fracción del corpus
+DENSE_MIN_FRACTION = 1 / 256
+DENSE_MIN_DOCS = 64
+
+# Reconstruye cuando los shaders borrados superan esta fracción
+REBUILD_DEAD_RATIO = 0.25
+REBUILD_MIN_DOCS = 1024
+
+# Al explorar sin texto, recorre el orden global por views si pasa al menos 1/16 del corpus
+BROWSE_WALK_RATIO = 16
+
+_INITIAL_CAPACITY = 1024  # múltiplo de 64
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def popcount(bits: np.ndarray) -> int:
+    """Bits a 1 de un bitset de uint64 (SWAR)"""
+    v = bits - ((bits >> np.uint64(1)) & _M1)
+    v = (v & _M2) + ((v >> np.uint64(2)) & _M2)
+    v = (v + (v >> np.uint64(4))) & _M4
+    return int(((v * _H01) >> np.uint64(56)).sum())
+
+
+def pack(docs: np.ndarray, words: int) -> np.ndarray:
+    """Bitset de `words` uint64 con los documentos dados"""
+    flags = np.zeros(words * 64, bool)
+    flags[docs] = True
+    return np.packbits(flags, bitorder='little').view(np.uint64)
+
+
+def unpack(bits: np.ndarray, words: Optional[np.ndarray] = None) -> np.ndarray:
+    """Documentos con su bit a 1, ascendentes (`words`: posiciones de las palabras no nulas)"""
+    if words is None:
+        words = np.flatnonzero(bits)
+    positions = np.flatnonzero(np.unpackbits(bits[words].view(np.uint8), bitorder='little'))
+    return words[positions >> 6] * 64 + (positions & 63)
+
+
+def facet_values(record: Dict[str, Any], facet: str) -> List[str]:
+    """Valores de una faceta en un registro (las técnicas se detectan si el registro no las trae)"""
+    if facet == 'techniques':
+        values = record.get('techniques')
+        if values is None:
+            values = detect_techniques(record.get('code') or "")
+    elif facet == 'tags':
+        values = record.get('tags') or []
+    else:
+        values = [record.get(facet)]
+    seen = {}
+    for value in values:
+        if isinstance(value, str) and value.strip():
+            seen.setdefault(value.strip().lower(), value.strip())
+    return list(seen.values())
+
+
+@dataclass
+class FacetSelection:
+    """Resultado de FacetIndex.select"""
+    ids: List[str]
+    total: int
+    facets: Optional[Dict[str, List[Dict[str, Any]]]] = None
+
+
+class FacetIndex:
+    """
+    Bitsets y posting lists por valor de faceta
+
+    Los documentos solo se añaden (un shader actualizado recibe documento
+    nuevo); los borrados se apagan en el bitset de vivos hasta la
+    siguiente reconstrucción. Los valores se comparan sin mayúsculas.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._records: List[Optional[dict]] = []  # documento -> registro
+        self._docs: Dict[str, int] = {}  # id del shader -> documento
+        self._capacity = _INITIAL_CAPACITY
+        self._alive = np.zeros(self._capacity // 64, np.uint64)
+        self._views = np.zeros(self._capacity, np.int64)
+        self._by_views: Optional[np.ndarray] = None  # documentos por views (hasta el siguiente cambio)
+
+        self._vocab: Dict[Tuple[str, str], int] = {}  # (faceta, valor en minúsculas) -> id
+        self._labels: List[str] = []
+        self._facet_of = array('b')  # id de valor -> posición en FACETS
+        self._counts = array('q')  # id de valor -> documentos vivos
+        self._postings: List[array] = []  # id de valor -> documentos (incluye borrados)
+        self._bitmaps: Dict[int, np.ndarray] = {}  # valores frecuentes -> bitset
+
+        # Valores raros de cada documento (CSR): los frecuentes solo están en su bitset
+        self._pair_values = array('i')
+        self._pair_docs = array('i')
+        self._pair_offsets = array('q', [0])
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # ----- Actualización -----
+
+    def add_many(self, records: Iterable[dict]):
+        with self._lock:
+            for record in records:
+                if record['id'] in self._docs:
+                    self._remove(record['id'])
+                doc = len(self._records)
+                if doc >= self._capacity:
+                    self._grow()
+                self._records.append(record)
+                self._docs[record['id']] = doc
+                self._by_views = None
+                self._alive[doc >> 6] |= np.uint64(1 << (doc & 63))
+                self._views[doc] = max(int(record.get('views') or 0), 0)
+                for value in self._value_ids(record):
+                    self._counts[value] += 1
+                    self._postings[value].append(doc)
+                    bitmap = self._bitmaps.get(value)
+                    if bitmap is not None:
+                        bitmap[doc >> 6] |= np.uint64(1 << (doc & 63))
+                    else:
+                        self._pair_values.append(value)
+                        self._pair_docs.append(doc)
+                self._pair_offsets.append(len(self._pair_values))
+
+    def add(self, record: dict):
+        self.add_many([record])
+
+    def remove(self, shader_id: str) -> bool:
+        with self._lock:
+            if shader_id not in self._docs:
+                return False
+            self._remove(shader_id)
+            self._maybe_rebuild()
+            return True
+
+    def apply(self, upserted: List[dict], removed: List[str]):
+        """Listener de ShaderCorpus: aplica los cambios de una recarga"""
+        with self._lock:
+            for shader_id in removed:
+                if shader_id in self._docs:
+                    self._remove(shader_id)
+            self.add_many(upserted)
+            self._maybe_rebuild()
+
+    def _remove(self, shader_id: str):
+        doc = self._docs.pop(shader_id)
+        for value in self._value_ids(self._records[doc]):
+            self._counts[value] -= 1
+        self._records[doc] = None
+        self._alive[doc >> 6] &= ~np.uint64(1 << (doc & 63))
+        self._by_views = None
+
+    def _maybe_rebuild(self):
+        total = len(self._records)
+        if total >= REBUILD_MIN_DOCS and total - len(self._docs) > REBUILD_DEAD_RATIO * total:
+            records = [record for record in self._records if record is not None]
+            self._reset()
+            self.add_many(records)
+
+    def _grow(self):
+        words = self._capacity // 64
+        self._capacity *= 2
+        self._alive = np.concatenate((self._alive, np.zeros(words, np.uint64)))
+        self._views = np.concatenate((self._views, np.zeros(self._capacity // 2, np.int64)))
+        for value, bitmap in self._bitmaps.items():
+            self._bitmaps[value] = np.concatenate((bitmap, np.zeros(words, np.uint64)))
+
+    def _value_ids(self, record: dict) -> List[int]:
+        ids = []
+        for position, facet in enumerate(FACETS):
+            for value in facet_values(record, facet):
+                key = (facet, value.lower())
+                value_id = self._vocab.get(key)
+                if value_id is None:
+                    value_id = self._vocab[key] = len(self._labels)
+                    self._labels.append(value)
+                    self._facet_of.append(position)
+                    self._counts.append(0)
+                    self._postings.append(array('i'))
+                ids.append(value_id)
+        return ids
+
+    def _sync(self):
+        """
+        Pasa a bitset los valores que ya son frecuentes y los quita del CSR
+        (se hace al consultar: durante la carga inicial todo va al CSR)
+        """
+        threshold = max(DENSE_MIN_DOCS, int(len(self._docs) * DENSE_MIN_FRACTION))
+        counts = np.frombuffer(self._counts, np.int64)
+        promoted = [int(v) for v in np.flatnonzero(counts >= threshold) if int(v) not in self._bitmaps]
+        if not promoted:
+            return
+        words = self._capacity // 64
+        for value in promoted:
+            self._bitmaps[value] = pack(np.frombuffer(self._postings[value], np.int32), words)
+
+        dense = np.zeros(len(self._labels), bool)
+        dense[list(self._bitmaps)] = True
+        values = np.frombuffer(self._pair_values, np.int32)
+        owners = np.frombuffer(self._pair_docs, np.int32)
+        keep = ~dense[values]
+        kept_offsets = np.zeros(len(self._pair_offsets), np.int64)
+        np.cumsum(np.bincount(owners[keep], minlength=len(kept_offsets) - 1), out=kept_offsets[1:])
+        kept_values, kept_owners = values[keep], owners[keep]
+        del values, owners  # liberan los buffers antes de reemplazar los arrays
+        self._pair_values = array('i', kept_values.tobytes())
+        self._pair_docs = array('i', kept_owners.tobytes())
+        self._pair_offsets = array('q', kept_offsets.tobytes())
+
+    # ----- Consulta -----
+
+    def _matching(self, filters: Mapping[str, Iterable[str]]) -> np.ndarray:
+        """Bitset de documentos vivos que cumplen los filtros"""
+        words = self._capacity // 64
+        bits = self._alive.copy()
+        for facet, values in filters.items():
+            if facet not in FACETS:
+                raise ValueError(f"Faceta desconocida: {facet}")
+            values = list(values or [])
+            if not values:
+                continue
+            union = np.zeros(words, np.uint64)
+            for value in values:
+                value_id = self._vocab.get((facet, value.strip().lower()))
+                if value_id is None:
+                    continue
+                bitmap = self._bitmaps.get(value_id)
+                if bitmap is None:
+                    bitmap = pack(np.frombuffer(self._postings[value_id], np.int32), words)
+                union |= bitmap
+            bits &= union
+        return bits
+
+    def _facet_counts(self, bits: Optional[np.ndarray], top: int) -> Dict[str, List[Dict[str, Any]]]:
+        """Top valores por faceta en el resultado (None: todo el corpus, conteos mantenidos)"""
+        facet_of = np.frombuffer(self._facet_of, np.int8)
+        if bits is None:
+            counts = np.frombuffer(self._counts, np.int64).copy()
+        else:
+            # Valores raros: bincount de los pares de los documentos del resultado
+            words = np.flatnonzero(bits)
+            values = np.frombuffer(self._pair_values, np.int32)
+            if len(words) * 64 < len(self._records) // 8:
+                docs = unpack(bits, words)
+                offsets = np.frombuffer(self._pair_offsets, np.int64)
+                starts = offsets[docs]
+                lengths = offsets[docs + 1] - starts
+                positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+                values = values[positions]
+            else:
+                # Resultado amplio: máscara sobre todos los pares
+                flags = np.unpackbits(bits.view(np.uint8), bitorder='little').view(bool)
+                values = values[flags[np.frombuffer(self._pair_docs, np.int32)]]
+            counts = np.bincount(values, minlength=len(self._labels)).astype(np.int64)
+            self._dense_counts(counts, bits, words, facet_of, top)
+
+        labels = self._labels
+        result = {}
+        for position, facet in enumerate(FACETS):
+            candidates = np.flatnonzero((facet_of == position) & (counts > 0))
+            if len(candidates) > top:
+                kth = np.partition(counts[candidates], len(candidates) - top)[len(candidates) - top]
+                candidates = candidates[counts[candidates] >= kth]
+            ranked = sorted(candidates.tolist(), key=lambda v: (-counts[v], labels[v].lower()))[:top]
+            result[facet] = [{"value": labels[v], "count": int(counts[v])} for v in ranked]
+        return result
+
+    def _dense_counts(self, counts: np.ndarray, bits: np.ndarray, words: np.ndarray,
+                      facet_of: np.ndarray, top: int):
+        """
+        Popcounts de los valores frecuentes, de más a menos documentos en el
+        corpus: se para cuando ni el total del valor llega al top actual
+        """
+        totals = np.frombuffer(self._counts, np.int64)
+        subset = bits[words] if 2 * len(words) < len(bits) else None
+        by_facet: Dict[int, List[int]] = {}
+        for value in self._bitmaps:
+            by_facet.setdefault(int(facet_of[value]), []).append(value)
+        for position, values in by_facet.items():
+            best = counts[facet_of == position]
+            if len(best) > top:
+                best = np.partition(best, len(best) - top)[len(best) - top:]
+            best = [int(c) for c in best if c > 0]
+            heapq.heapify(best)
+            for value in sorted(values, key=lambda v: -totals[v]):
+                if len(best) >= top and totals[value] < best[0]:
+                    break
+                bitmap = self._bitmaps[value]
+                count = popcount(bitmap & bits) if subset is None else popcount(bitmap[words] & subset)
+                counts[value] = count
+                if len(best) < top:
+                    heapq.heappush(best, count)
+                elif count > best[0]:
+                    heapq.heapreplace(best, count)
+
+    def select(self, filters: Mapping[str, Iterable[str]], ids: Optional[List[str]] = None,
+               limit: Optional[int] = None, facet_top: Optional[int] = None) -> FacetSelection:
+        """
+        Aplica filtros de facetas y cuenta valores del resultado
+
+        Args:
+            filters: faceta -> valores aceptados (OR dentro de la faceta, AND entre facetas)
+            ids: Resultado de una búsqueda por texto, en su orden; None recorre
+                todo el corpus por views
+            limit: Máximo de ids devueltos al recorrer el corpus
+            facet_top: Valores por faceta en los conteos (None: sin conteos)
+
+        Returns:
+            FacetSelection con los ids que pasan los filtros y el total
+        """
+        with self._lock:
+            self._sync()
+            active = any(values for values in filters.values())
+            bits = self._matching(filters)
+            if ids is None:
+                total = popcount(bits)
+                order = self._browse(bits, total, limit)
+                selected = [self._records[doc]['id'] for doc in order.tolist()]
+                result_bits = bits if active else None
+            else:
+                lookup = self._docs.get
+                docs = np.fromiter((lookup(shader_id, -1) for shader_id in ids), np.int64, len(ids))
+                known = np.flatnonzero(docs >= 0)
+                hits = known[((bits[docs[known] >> 6] >> (docs[known] & 63).astype(np.uint64)) & np.uint64(1)) == 1]
+                selected = [ids[i] for i in hits.tolist()]
+                total = len(selected)
+                result_bits = pack(docs[hits], self._capacity // 64)
+
+            facets = self._facet_counts(result_bits, facet_top) if facet_top is not None else None
+            return FacetSelection(ids=selected, total=total, facets=facets)
+
+    def _browse(self, bits: np.ndarray, total: int, limit: Optional[int]) -> np.ndarray:
+        """
+        Documentos del bitset por views descendentes (empates: por documento)
+
+        Con filtros amplios recorre por bloques el orden global cacheado
+        hasta reunir `limit`; con filtros selectivos ordena solo los que pasan.
+        """
+        n = len(self._records)
+        if limit is not None and total * BROWSE_WALK_RATIO >= n:
+            if self._by_views is None:
+                self._by_views = np.lexsort((np.arange(n), -self._views[:n]))
+            found, start, block = [], 0, max(4 * limit * n // max(total, 1), 1024)
+            while start < n and sum(len(f) for f in found) < limit:
+                chunk = self._by_views[start:start + block]
+                found.append(chunk[((bits[chunk >> 6] >> (chunk & 63).astype(np.uint64)) & np.uint64(1)) == 1])
+                start += block
+                block *= 2
+            return np.concatenate(found)[:limit] if found else np.zeros(0, np.int64)
+
+        docs = unpack(bits)
+        views = self._views[docs]
+        if limit is not None and limit < len(docs):
+            keep = np.argpartition(-views, limit - 1)[:limit] if limit > 0 else []
+            docs, views = docs[keep], views[keep]
+        return docs[np.lexsort((docs, -views))]
+
+
+_index: Optional[FacetIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_facet_index() -> FacetIndex:
+    """Obtiene o crea el índice de facetas del corpus global (se suscribe a sus recargas)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = FacetIndex()
+            get_shader_corpus().subscribe(index.apply)
+            _index = index
+    return _index
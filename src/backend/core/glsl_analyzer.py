@@ -0,0 +1,659 @@
+"""
+Análisis semántico de GLSL
+Recorre el AST de core.glsl_parser con tablas de símbolos por scope,
+completa el tipo de cada expresión y reporta errores de declaración,
+tipos y control de flujo.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from core import glsl_ast as ast
+from core.glsl_parser import TYPE_NAMES, TimeBudgetExceeded
+
+# ===== SISTEMA DE TIPOS =====
+
+_VECTOR_PREFIX = {'float': 'vec', 'int': 'ivec', 'uint': 'uvec', 'bool': 'bvec', 'double': 'dvec'}
+_PREFIX_BASE = {prefix: base for base, prefix in _VECTOR_PREFIX.items()}
+
+_SWIZZLE_SETS = ('xyzw', 'rgba', 'stpq')
+
+
+def vector_type(base: str, size: int) -> str:
+    """vector_type('float', 3) -> 'vec3'; tamaño 1 -> escalar"""
+    return base if size == 1 else f"{_VECTOR_PREFIX[base]}{size}"
+
+
+def scalar_info(type_name: Optional[str]) -> Optional[Tuple[str, int]]:
+    """(tipo base, componentes) para escalares y vectores; None para el resto"""
+    if type_name in _VECTOR_PREFIX:
+        return type_name, 1
+    if type_name and type_name[-1] in '234' and type_name[:-1] in _PREFIX_BASE:
+        return _PREFIX_BASE[type_name[:-1]], int(type_name[-1])
+    return None
+
+
+def matrix_info(type_name: Optional[str]) -> Optional[Tuple[int, int]]:
+    """(columnas, filas) de un tipo matN / matCxR"""
+    if not type_name or not type_name.startswith('mat'):
+        return None
+    dims = type_name[3:]
+    if len(dims) == 1 and dims in '234':
+        return int(dims), int(dims)
+    if len(dims) == 3 and dims[1] == 'x':
+        return int(dims[0]), int(dims[2])
+    return None
+
+
+def component_count(type_name: Optional[str]) -> Optional[int]:
+    info = scalar_info(type_name)
+    if info:
+        return info[1]
+    dims = matrix_info(type_name)
+    if dims:
+        return dims[0] * dims[1]
+    return None
+
+
+# ===== BUILT-INS =====
+
+_GEN = 'genType'  # Tipo del argumento más ancho: min(vec3, float) -> vec3
+_BVEC = 'bvec'  # Vector bool del tamaño del argumento más ancho
+
+BUILTIN_FUNCTIONS: Dict[str, str] = {
+    **{name: _GEN for name in (
+        'radians', 'degrees', 'sin', 'cos', 'tan', 'asin', 'acos', 'atan',
+        'sinh', 'cosh', 'tanh', 'asinh', 'acosh', 'atanh',
+        'pow', 'exp', 'log', 'exp2', 'log2', 'sqrt', 'inversesqrt',
+        'abs', 'sign', 'floor', 'trunc', 'round', 'roundEven', 'ceil', 'fract',
+        'mod', 'modf', 'min', 'max', 'clamp', 'mix', 'step', 'smoothstep',
+        'normalize', 'faceforward', 'reflect', 'refract',
+        'dFdx', 'dFdy', 'fwidth', 'matrixCompMult', 'inverse', 'transpose'
+    )},
+    **{name: 'float' for name in ('length', 'distance', 'dot', 'determinant')},
+    **{name: _BVEC for name in (
+        'isnan', 'isinf', 'lessThan', 'lessThanEqual', 'greaterThan',
+        'greaterThanEqual', 'equal', 'notEqual', 'not'
+    )},
+    **{name: 'vec4' for name in (
+        'texture', 'texture2D', 'textureCube', 'texture2DLod', 'textureCubeLod',
+        'texture2DProj', 'textureLod', 'textureGrad', 'textureOffset', 'textureProj',
+        'textureProjLod', 'textureLodOffset', 'textureGradOffset', 'texelFetch', 'texelFetchOffset'
+    )},
+    'cross': 'vec3',
+    'any': 'bool',
+    'all': 'bool',
+    'textureSize': 'ivec2',
+    'floatBitsToInt': 'int',
+    'floatBitsToUint': 'uint',
+    'intBitsToFloat': 'float',
+    'uintBitsToFloat': 'float',
+    'packSnorm2x16': 'uint',
+    'packUnorm2x16': 'uint',
+    'packHalf2x16': 'uint',
+    'unpackSnorm2x16': 'vec2',
+    'unpackUnorm2x16': 'vec2',
+    'unpackHalf2x16': 'vec2',
+}
+
+BUILTIN_VARIABLES: Dict[str, str] = {
+    'gl_FragCoord': 'vec4', 'gl_FragColor': 'vec4', 'gl_FragDepth': 'float',
+    'gl_FrontFacing': 'bool', 'gl_PointCoord': 'vec2', 'gl_Position': 'vec4',
+    'gl_PointSize': 'float', 'gl_VertexID': 'int', 'gl_InstanceID': 'int',
+}
+
+# Inputs implícitos de Shadertoy (el código puede redeclararlos)
+SHADERTOY_INPUTS: Dict[str, str] = {
+    'iResolution': 'vec3', 'iTime': 'float', 'iTimeDelta': 'float', 'iFrameRate': 'float',
+    'iFrame': 'int', 'iChannelTime': 'float[]', 'iChannelResolution': 'vec3[]',
+    'iMouse': 'vec4', 'iDate': 'vec4', 'iSampleRate': 'float',
+    'iChannel0': 'sampler2D', 'iChannel1': 'sampler2D', 'iChannel2': 'sampler2D', 'iChannel3': 'sampler2D',
+}
+
+_READ_ONLY_QUALIFIERS = {'const', 'uniform', 'in', 'attribute', 'varying'}
+
+
+# ===== TABLAS DE SÍMBOLOS =====
+
+@dataclass
+class Symbol:
+    name: str
+    kind: str  # variable, parameter, uniform, builtin
+    type: Optional[str]
+    qualifiers: Tuple[str, ...] = ()
+    node: Optional[ast.Node] = None
+
+
+class Scope:
+    """Scope léxico: bloque, función o global"""
+
+    def __init__(self, parent: Optional['Scope'] = None):
+        self.parent = parent
+        self.symbols: Dict[str, Symbol] = {}
+
+    def declare(self, symbol: Symbol) -> Optional[Symbol]:
+        """Declara el símbolo; retorna el anterior si ya existía en este scope"""
+        previous = self.symbols.get(symbol.name)
+        self.symbols[symbol.name] = symbol
+        return previous
+
+    def lookup(self, name: str) -> Optional[Symbol]:
+        scope = self
+        while scope is not None:
+            symbol = scope.symbols.get(name)
+            if symbol is not None:
+                return symbol
+            scope = scope.parent
+        return None
+
+
+@dataclass
+class FunctionSignature:
+    name: str
+    return_type: str
+    param_types: List[Optional[str]]
+    node: ast.FunctionDecl
+    defined: bool
+
+
+@dataclass
+class AnalysisResult:
+    errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+    global_scope: Optional[Scope] = None
+    functions: Dict[str, List[FunctionSignature]] = field(default_factory=dict)
+    structs: Dict[str, Dict[str, str]] = field(default_factory=dict)  # struct -> miembro -> tipo
+    uniforms: Dict[str, str] = field(default_factory=dict)
+    variables: Dict[str, str] = field(default_factory=dict)  # variables locales (todas las funciones)
+
+
+class GLSLAnalyzer:
+    """
+    Analizador semántico
+
+    Completa `expr.type` en todo el AST. Los tipos desconocidos quedan en
+    None y no generan errores en cascada. Si se agota el deadline lanza
+    TimeBudgetExceeded; lo reportado hasta ese momento queda en `result`.
+    """
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.result = AnalysisResult()
+        self.deadline = deadline  # time.perf_counter() absoluto
+        self._builtin_scope = Scope()
+        for name, type_name in {**BUILTIN_VARIABLES, **SHADERTOY_INPUTS}.items():
+            self._builtin_scope.declare(Symbol(name, 'builtin', type_name))
+        self._function: Optional[FunctionSignature] = None
+        self._loop_depth = 0
+        self._switch_depth = 0
+        self._reported: set = set()
+
+    def analyze(self, unit: ast.TranslationUnit) -> AnalysisResult:
+        scope = self.new_global_scope()
+        for declaration in unit.declarations:
+            self.declaration(declaration, scope)
+        return self.result
+
+    def new_global_scope(self) -> Scope:
+        scope = Scope(self._builtin_scope)
+        self.result.global_scope = scope
+        return scope
+
+    def declaration(self, node: ast.Stmt, scope: Scope, isolated: bool = False):
+        """
+        Analiza una declaración de nivel superior (permite analizar por partes)
+
+        isolated=True deduplica los identificadores no declarados solo dentro
+        de esta declaración, así sus errores no dependen de las anteriores.
+        """
+        if isolated:
+            self._reported = set()
+        if isinstance(node, ast.FunctionDecl):
+            self._function_decl(node, scope)
+        else:
+            self._statement(node, scope)
+
+    # ----- Utilidades -----
+
+    def _error(self, message: str, node: ast.Node):
+        self.result.errors.append(f"{message} (line {node.location})")
+
+    def _warning(self, message: str, node: ast.Node):
+        self.result.warnings.append(f"{message} (line {node.location})")
+
+    def _resolve_type(self, type_spec: ast.TypeSpec, scope: Scope, array: bool = False) -> Optional[str]:
+        """Nombre del tipo (registra structs declarados en línea)"""
+        if type_spec.struct is not None:
+            self._struct_decl(type_spec.struct, scope)
+        for size in type_spec.array_sizes:
+            if size is not None:
+                self._expr(size, scope)
+
+        name = type_spec.name
+        if name not in TYPE_NAMES and name not in self.result.structs:
+            self._error(f"Unknown type '{name}'", type_spec)
+            return None
+        return name + '[]' if (array or type_spec.is_array) else name
+
+    def _struct_decl(self, struct: ast.StructDecl, scope: Scope):
+        members: Dict[str, str] = {}
+        for member in struct.members:
+            for declarator in member.declarators:
+                members[declarator.name] = self._resolve_type(member.type, scope, bool(declarator.array_sizes))
+        if struct.name:
+            self.result.structs[struct.name] = members
+
+    def _declare(self, scope: Scope, symbol: Symbol, node: ast.Node):
+        if scope.declare(symbol) is not None:
+            self._error(f"Redefinition of '{symbol.name}'", node)
+
+    # ----- Declaraciones -----
+
+    def _function_decl(self, node: ast.FunctionDecl, scope: Scope):
+        return_type = self._resolve_type(node.return_type, scope) or 'void'
+        function_scope = Scope(scope)
+        param_types = []
+        for param in node.params:
+            param_type = self._resolve_type(param.type, scope, bool(param.array_sizes))
+            if param.name is None:
+                # f(void)
+                if param_type != 'void':
+                    param_types.append(param_type)
+                continue
+            param_types.append(param_type)
+            self._declare(
+                function_scope,
+                Symbol(param.name, 'parameter', param_type, tuple(param.qualifiers), param),
+                param
+            )
+
+        signature = FunctionSignature(node.name, return_type, param_types, node, node.body is not None)
+        overloads = self.result.functions.setdefault(node.name, [])
+        for existing in overloads:
+            if existing.param_types == param_types:
+                if existing.defined and signature.defined:
+                    self._error(f"Redefinition of function '{node.name}'", node)
+                if signature.defined:
+                    overloads.remove(existing)
+                    overloads.append(signature)
+                break
+        else:
+            overloads.append(signature)
+
+        if node.body is None:
+            return
+
+        self._function = signature
+        # Parámetros y cuerpo comparten scope (redeclarar un parámetro es error)
+        for statement in node.body.statements:
+            self._statement(statement, function_scope)
+        self._function = None
+
+    def _var_decl(self, node: ast.VarDecl, scope: Scope):
+        base_type = self._resolve_type(node.type, scope)
+        is_global = scope.parent is self._builtin_scope
+        kind = 'uniform' if 'uniform' in node.qualifiers else 'variable'
+
+        for declarator in node.declarators:
+            var_type = base_type
+            if base_type and declarator.array_sizes and not base_type.endswith('[]'):
+                var_type = base_type + '[]'
+            for size in declarator.array_sizes:
+                if size is not None:
+                    self._expr(size, scope)
+
+            # El nombre es visible después de su inicializador
+            if declarator.initializer is not None:
+                value_type = self._expr(declarator.initializer, scope)
+                if var_type and value_type and var_type != value_type:
+                    self.result.errors.append(
+                        f"Type mismatch: Cannot assign {value_type} to {var_type} variable "
+                        f"'{declarator.name}' (line {node.location})"
+                    )
+            elif 'const' in node.qualifiers:
+                self._error(f"Const variable '{declarator.name}' must be initialized", declarator)
+
+            self._declare(scope, Symbol(declarator.name, kind, var_type, tuple(node.qualifiers), declarator), declarator)
+            if kind == 'uniform':
+                self.result.uniforms[declarator.name] = var_type
+            elif not is_global:
+                self.result.variables[declarator.name] = var_type
+
+    def _interface_block(self, node: ast.InterfaceBlock, scope: Scope):
+        members: Dict[str, str] = {}
+        for member in node.members:
+            member_type = self._resolve_type(member.type, scope)
+            for declarator in member.declarators:
+                member_types = member_type + '[]' if member_type and declarator.array_sizes else member_type
+                members[declarator.name] = member_types
+
+        is_uniform = 'uniform' in node.qualifiers
+        if node.instance is None:
+            # Sin nombre de instancia los miembros son globales
+            for name, member_type in members.items():
+                self._declare(scope, Symbol(name, 'uniform', member_type, tuple(node.qualifiers), node), node)
+                if is_uniform:
+                    self.result.uniforms[name] = member_type
+        else:
+            self.result.structs[node.name] = members
+            block_type = node.name + '[]' if node.instance.array_sizes else node.name
+            self._declare(scope, Symbol(node.instance.name, 'uniform', block_type, tuple(node.qualifiers), node), node)
+            if is_uniform:
+                self.result.uniforms[node.instance.name] = block_type
+
+    # ----- Statements -----
+
+    def _statement(self, node: ast.Stmt, scope: Scope):
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise TimeBudgetExceeded("time budget exceeded during semantic analysis")
+
+        if isinstance(node, ast.ExprStmt):
+            self._expr(node.expr, scope)
+        elif isinstance(node, ast.VarDecl):
+            self._var_decl(node, scope)
+        elif isinstance(node, ast.Block):
+            block_scope = Scope(scope)
+            for statement in node.statements:
+                self._statement(statement, block_scope)
+        elif isinstance(node, ast.If):
+            self._condition(node.condition, scope)
+            self._statement(node.then, Scope(scope))
+            if node.otherwise is not None:
+                self._statement(node.otherwise, Scope(scope))
+        elif isinstance(node, ast.For):
+            loop_scope = Scope(scope)
+            if node.init is not None:
+                self._statement(node.init, loop_scope)
+            if node.condition is not None:
+                self._condition(node.condition, loop_scope)
+            if node.step is not None:
+                self._expr(node.step, loop_scope)
+            self._loop_body(node.body, loop_scope)
+        elif isinstance(node, ast.While):
+            self._condition(node.condition, scope)
+            self._loop_body(node.body, Scope(scope))
+        elif isinstance(node, ast.DoWhile):
+            self._loop_body(node.body, Scope(scope))
+            self._condition(node.condition, scope)
+        elif isinstance(node, ast.Switch):
+            self._expr(node.expr, scope)
+            switch_scope = Scope(scope)
+            self._switch_depth += 1
+            for statement in node.body:
+                self._statement(statement, switch_scope)
+            self._switch_depth -= 1
+        elif isinstance(node, ast.CaseLabel):
+            if node.value is not None:
+                self._expr(node.value, scope)
+        elif isinstance(node, ast.Return):
+            self._return(node, scope)
+        elif isinstance(node, ast.Jump):
+            if node.kind == 'continue' and self._loop_depth == 0:
+                self._error("'continue' outside of a loop", node)
+            elif node.kind == 'break' and self._loop_depth == 0 and self._switch_depth == 0:
+                self._error("'break' outside of a loop or switch", node)
+        elif isinstance(node, ast.InterfaceBlock):
+            self._interface_block(node, scope)
+        elif isinstance(node, ast.FunctionDecl):
+            self._error(f"Function '{node.name}' cannot be declared inside another function", node)
+        # PrecisionDecl y EmptyStmt no afectan al análisis
+
+    def _loop_body(self, body: ast.Stmt, scope: Scope):
+        self._loop_depth += 1
+        self._statement(body, scope)
+        self._loop_depth -= 1
+
+    def _condition(self, expr: ast.Expr, scope: Scope):
+        condition_type = self._expr(expr, scope)
+        if condition_type is not None and condition_type != 'bool':
+            self._error(f"Condition must be bool, got {condition_type}", expr)
+
+    def _return(self, node: ast.Return, scope: Scope):
+        value_type = self._expr(node.value, scope) if node.value is not None else None
+        function = self._function
+        if function is None:
+            return
+        if function.return_type == 'void':
+            if node.value is not None:
+                self._error(f"Void function '{function.name}' cannot return a value", node)
+        elif node.value is None:
+            self._error(f"Function '{function.name}' must return a {function.return_type}", node)
+        elif value_type is not None and value_type != function.return_type:
+            self._error(
+                f"Type mismatch: Function '{function.name}' returns {function.return_type}, got {value_type}", node
+            )
+
+    # ----- Expresiones -----
+
+    def _expr(self, node: ast.Expr, scope: Scope) -> Optional[str]:
+        """Infiere y guarda el tipo de la expresión"""
+        method = getattr(self, '_expr_' + type(node).__name__)
+        node.type = method(node, scope)
+        return node.type
+
+    def _expr_Literal(self, node: ast.Literal, scope: Scope) -> Optional[str]:
+        return node.literal_type
+
+    def _expr_Identifier(self, node: ast.Identifier, scope: Scope) -> Optional[str]:
+        symbol = scope.lookup(node.name)
+        if symbol is None:
+            if node.name not in self._reported:
+                self._reported.add(node.name)
+                self._error(f"Undeclared identifier '{node.name}'", node)
+            return None
+        return symbol.type
+
+    def _expr_FieldAccess(self, node: ast.FieldAccess, scope: Scope) -> Optional[str]:
+        base_type = self._expr(node.base, scope)
+        if base_type is None:
+            return None
+
+        if base_type in self.result.structs:
+            members = self.result.structs[base_type]
+            if node.name not in members:
+                self._error(f"'{base_type}' has no member '{node.name}'", node)
+                return None
+            return members[node.name]
+
+        info = scalar_info(base_type)
+        if info is None:
+            self._error(f"Cannot access field '{node.name}' of {base_type}", node)
+            return None
+
+        base, size = info
+        name = node.name
+        for components in _SWIZZLE_SETS:
+            indexes = [components.find(c) for c in name]
+            if all(i >= 0 for i in indexes):
+                if len(name) > 4 or max(indexes) >= size or size == 1:
+                    break
+                return vector_type(base, len(name))
+        self._error(f"Invalid swizzle '.{name}' on {base_type}", node)
+        return None
+
+    def _expr_Index(self, node: ast.Index, scope: Scope) -> Optional[str]:
+        base_type = self._expr(node.base, scope)
+        self._expr(node.index, scope)
+        if base_type is None:
+            return None
+        if base_type.endswith('[]'):
+            return base_type[:-2]
+        info = scalar_info(base_type)
+        if info and info[1] > 1:
+            return info[0]
+        dims = matrix_info(base_type)
+        if dims:
+            return vector_type('float', dims[1])
+        self._error(f"Cannot index {base_type}", node)
+        return None
+
+    def _expr_Call(self, node: ast.Call, scope: Scope) -> Optional[str]:
+        arg_types = [self._expr(arg, scope) for arg in node.args]
+
+        if node.method_of is not None:
+            self._expr(node.method_of, scope)
+            return 'int' if node.callee == 'length' else None
+
+        if node.is_constructor:
+            return self._constructor(node, arg_types, scope)
+
+        overloads = self.result.functions.get(node.callee)
+        if overloads:
+            return self._user_call(node, overloads, arg_types)
+
+        rule = BUILTIN_FUNCTIONS.get(node.callee)
+        if rule is None:
+            if node.callee not in self._reported:
+                self._reported.add(node.callee)
+                self._error(f"Undeclared function '{node.callee}'", node)
+            return None
+        return self._builtin_result(rule, arg_types)
+
+    def _constructor(self, node: ast.Call, arg_types: List[Optional[str]], scope: Scope) -> Optional[str]:
+        for size in node.array_sizes:
+            if size is not None:
+                self._expr(size, scope)
+        if node.array_sizes:
+            return node.callee + '[]'
+
+        target = component_count(node.callee)
+        if target is not None and len(arg_types) > 1 and None not in arg_types:
+            provided = sum(component_count(t) or 0 for t in arg_types)
+            if provided < target:
+                self._error(f"Not enough components in {node.callee} constructor ({provided} of {target})", node)
+        return node.callee
+
+    def _user_call(self, node: ast.Call, overloads: List[FunctionSignature],
+                   arg_types: List[Optional[str]]) -> Optional[str]:
+        candidates = [o for o in overloads if len(o.param_types) == len(arg_types)]
+        if not candidates:
+            self._error(f"No overload of '{node.callee}' takes {len(arg_types)} arguments", node)
+            return None
+        for candidate in candidates:
+            if all(a is None or p is None or a == p for a, p in zip(arg_types, candidate.param_types)):
+                return candidate.return_type
+        if None not in arg_types:
+            self._error(
+                f"No matching overload for '{node.callee}({', '.join(arg_types)})'", node
+            )
+        return candidates[0].return_type
+
+    def _builtin_result(self, rule: str, arg_types: List[Optional[str]]) -> Optional[str]:
+        if rule not in (_GEN, _BVEC):
+            return rule
+        widest = None
+        widest_size = 0
+        for arg_type in arg_types:
+            size = component_count(arg_type)
+            if size is None:
+                if arg_type is None:
+                    return None
+                continue
+            if size > widest_size:
+                widest, widest_size = arg_type, size
+        if rule == _GEN:
+            return widest
+        info = scalar_info(widest)
+        return vector_type('bool', info[1]) if info else None
+
+    def _expr_BinaryOp(self, node: ast.BinaryOp, scope: Scope) -> Optional[str]:
+        left = self._expr(node.left, scope)
+        right = self._expr(node.right, scope)
+        op = node.op
+
+        if op in ('&&', '||', '^^', '<', '>', '<=', '>=', '==', '!='):
+            return 'bool'
+        if left is None or right is None:
+            return None
+        return self._arithmetic_result(op, left, right, node)
+
+    def _arithmetic_result(self, op: str, left: str, right: str, node: ast.Node) -> Optional[str]:
+        if left == right:
+            return left
+
+        left_info, right_info = scalar_info(left), scalar_info(right)
+        left_dims, right_dims = matrix_info(left), matrix_info(right)
+
+        if left_info and right_info:
+            if left_info[0] != right_info[0]:
+                self._error(f"Cannot apply '{op}' to {left} and {right}", node)
+                return None
+            if left_info[1] == 1:
+                return right
+            if right_info[1] == 1:
+                return left
+            self._error(f"Cannot apply '{op}' to {left} and {right}", node)
+            return None
+
+        if op == '*':
+            # matriz * vector y vector * matriz
+            if left_dims and right_info and right_info[1] == left_dims[0]:
+                return vector_type('float', left_dims[1])
+            if right_dims and left_info and left_info[1] == right_dims[1]:
+                return vector_type('float', right_dims[0])
+            if left_dims and right_dims and left_dims[0] == right_dims[1]:
+                return f"mat{right_dims[0]}x{left_dims[1]}" if right_dims[0] != left_dims[1] else f"mat{right_dims[0]}"
+        # matriz op escalar
+        if left_dims and right_info and right_info[1] == 1:
+            return left
+        if right_dims and left_info and left_info[1] == 1:
+            return right
+        return None
+
+    def _expr_UnaryOp(self, node: ast.UnaryOp, scope: Scope) -> Optional[str]:
+        operand = self._expr(node.operand, scope)
+        if node.op == '!':
+            return 'bool'
+        if node.op in ('++', '--'):
+            self._check_writable(node.operand, scope)
+        return operand
+
+    def _expr_Assignment(self, node: ast.Assignment, scope: Scope) -> Optional[str]:
+        target = self._expr(node.target, scope)
+        value = self._expr(node.value, scope)
+        self._check_writable(node.target, scope)
+
+        if target is None or value is None:
+            return target
+        if node.op != '=':
+            value = self._arithmetic_result(node.op[:-1], target, value, node)
+            if value is None:
+                return target
+        if value != target:
+            self._error(f"Type mismatch: Cannot assign {value} to {target}", node)
+        return target
+
+    def _check_writable(self, target: ast.Expr, scope: Scope):
+        """Asignar a const/uniform/in global es error"""
+        root = target
+        while isinstance(root, (ast.FieldAccess, ast.Index)):
+            root = root.base
+        if not isinstance(root, ast.Identifier):
+            return
+        symbol = scope.lookup(root.name)
+        if symbol is None or symbol.kind == 'parameter':
+            return  # los parámetros `in` son copias locales
+        if _READ_ONLY_QUALIFIERS.intersection(symbol.qualifiers):
+            self._error(f"Cannot assign to read-only variable '{root.name}'", target)
+
+    def _expr_Ternary(self, node: ast.Ternary, scope: Scope) -> Optional[str]:
+        self._condition(node.condition, scope)
+        if_true = self._expr(node.if_true, scope)
+        if_false = self._expr(node.if_false, scope)
+        return if_true if if_true is not None else if_false
+
+    def _expr_Sequence(self, node: ast.Sequence, scope: Scope) -> Optional[str]:
+        result = None
+        for expr in node.exprs:
+            result = self._expr(expr, scope)
+        return result
+
+    def _expr_InitializerList(self, node: ast.InitializerList, scope: Scope) -> Optional[str]:
+        for item in node.items:
+            self._expr(item, scope)
+        return None
+
+
+def analyze(unit: ast.TranslationUnit) -> AnalysisResult:
+    """Analiza una unidad ya parseada"""
+    return GLSLAnalyzer().analyze(unit)
@@ -0,0 +1,272 @@
+"""
+AST de GLSL ES 3.0
+Nodos que produce core.glsl_parser. Las expresiones llevan un campo `type`
+que completa core.glsl_analyzer (None si no se pudo inferir).
+"""
+
+from dataclasses import dataclass, field, fields
+from typing import Iterator, List, Optional
+
+
+@dataclass(eq=False)
+class Node:
+    """Nodo base con ubicación 1-based en el source"""
+    line: int
+    col: int
+
+    @property
+    def location(self) -> str:
+        return f"{self.line}:{self.col}"
+
+    def children(self) -> Iterator['Node']:
+        """Hijos directos en orden de aparición"""
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if isinstance(value, Node):
+                yield value
+            elif isinstance(value, list):
+                for item in value:
+                    if isinstance(item, Node):
+                        yield item
+
+
+def walk(node: Node) -> Iterator[Node]:
+    """Recorre el subárbol en preorden (iterativo, sin límite de recursión)"""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        yield current
+        stack.extend(reversed(list(current.children())))
+
+
+# ===== TIPOS =====
+
+@dataclass(eq=False)
+class TypeSpec(Node):
+    """Especificador de tipo: float, vec3, MyStruct, float[4]..."""
+    name: str
+    array_sizes: List[Optional['Expr']] = field(default_factory=list)
+    struct: Optional['StructDecl'] = None  # struct declarado en línea
+
+    @property
+    def is_array(self) -> bool:
+        return bool(self.array_sizes)
+
+
+@dataclass(eq=False)
+class Declarator(Node):
+    """Nombre declarado con su tamaño de array e inicializador opcionales"""
+    name: str
+    array_sizes: List[Optional['Expr']] = field(default_factory=list)
+    initializer: Optional['Expr'] = None
+
+
+# ===== EXPRESIONES =====
+
+@dataclass(eq=False)
+class Expr(Node):
+    """Expresión (type lo completa el analizador)"""
+
+    def __post_init__(self):
+        self.type: Optional[str] = None
+
+
+@dataclass(eq=False)
+class Identifier(Expr):
+    name: str
+
+
+@dataclass(eq=False)
+class Literal(Expr):
+    value: str
+    literal_type: str  # float, int, uint, bool
+
+
+@dataclass(eq=False)
+class UnaryOp(Expr):
+    op: str
+    operand: Expr
+    postfix: bool = False
+
+
+@dataclass(eq=False)
+class BinaryOp(Expr):
+    op: str
+    left: Expr
+    right: Expr
+
+
+@dataclass(eq=False)
+class Assignment(Expr):
+    op: str  # =, +=, -=...
+    target: Expr
+    value: Expr
+
+
+@dataclass(eq=False)
+class Ternary(Expr):
+    condition: Expr
+    if_true: Expr
+    if_false: Expr
+
+
+@dataclass(eq=False)
+class Call(Expr):
+    """Llamada a función o constructor (callee es el nombre)"""
+    callee: str
+    args: List[Expr]
+    is_constructor: bool = False
+    array_sizes: List[Optional[Expr]] = field(default_factory=list)  # float[2](...)
+    method_of: Optional[Expr] = None  # arr.length()
+
+
+@dataclass(eq=False)
+class FieldAccess(Expr):
+    """Swizzle (v.xy) o miembro de struct (s.field)"""
+    base: Expr
+    name: str
+
+
+@dataclass(eq=False)
+class Index(Expr):
+    base: Expr
+    index: Expr
+
+
+@dataclass(eq=False)
+class Sequence(Expr):
+    """Operador coma"""
+    exprs: List[Expr]
+
+
+@dataclass(eq=False)
+class InitializerList(Expr):
+    """{a, b, c}"""
+    items: List[Expr]
+
+
+# ===== STATEMENTS =====
+
+@dataclass(eq=False)
+class Stmt(Node):
+    pass
+
+
+@dataclass(eq=False)
+class Block(Stmt):
+    statements: List[Stmt]
+
+
+@dataclass(eq=False)
+class VarDecl(Stmt):
+    """Declaración de variables: [qualifiers] type a = 1.0, b[2];"""
+    qualifiers: List[str]
+    type: TypeSpec
+    declarators: List[Declarator]
+
+
+@dataclass(eq=False)
+class ExprStmt(Stmt):
+    expr: Expr
+
+
+@dataclass(eq=False)
+class EmptyStmt(Stmt):
+    pass
+
+
+@dataclass(eq=False)
+class If(Stmt):
+    condition: Expr
+    then: Stmt
+    otherwise: Optional[Stmt] = None
+
+
+@dataclass(eq=False)
+class For(Stmt):
+    init: Optional[Stmt]
+    condition: Optional[Expr]
+    step: Optional[Expr]
+    body: Stmt
+
+
+@dataclass(eq=False)
+class While(Stmt):
+    condition: Expr
+    body: Stmt
+
+
+@dataclass(eq=False)
+class DoWhile(Stmt):
+    body: Stmt
+    condition: Expr
+
+
+@dataclass(eq=False)
+class Switch(Stmt):
+    expr: Expr
+    body: List[Stmt]
+
+
+@dataclass(eq=False)
+class CaseLabel(Stmt):
+    value: Optional[Expr]  # None para default
+
+
+@dataclass(eq=False)
+class Return(Stmt):
+    value: Optional[Expr] = None
+
+
+@dataclass(eq=False)
+class Jump(Stmt):
+    kind: str  # break, continue, discard
+
+
+# ===== DECLARACIONES GLOBALES =====
+
+@dataclass(eq=False)
+class StructDecl(Stmt):
+    name: Optional[str]
+    members: List[VarDecl]
+
+
+@dataclass(eq=False)
+class InterfaceBlock(Stmt):
+    """layout(std140) uniform Name { ... } instance;"""
+    qualifiers: List[str]
+    name: str
+    members: List[VarDecl]
+    instance: Optional[Declarator] = None
+
+
+@dataclass(eq=False)
+class PrecisionDecl(Stmt):
+    precision: str
+    type: TypeSpec
+
+
+@dataclass(eq=False)
+class Param(Node):
+    qualifiers: List[str]
+    type: TypeSpec
+    name: Optional[str]
+    array_sizes: List[Optional[Expr]] = field(default_factory=list)
+
+
+@dataclass(eq=False)
+class FunctionDecl(Stmt):
+    """Definición (body) o prototipo (body None)"""
+    return_type: TypeSpec
+    name: str
+    params: List[Param]
+    body: Optional[Block] = None
+
+
+@dataclass(eq=False)
+class TranslationUnit(Node):
+    declarations: List[Stmt]
+
+    @property
+    def functions(self) -> List[FunctionDecl]:
+        return [d for d in self.declarations if isinstance(d, FunctionDecl) and d.body is not None]
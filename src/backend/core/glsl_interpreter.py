@@ -0,0 +1,964 @@
+"""
+Intérprete de GLSL sobre NumPy
+Ejecuta un subconjunto práctico de GLSL (aritmética escalar, vectorial y
+matricial, los built-ins de GLSLValidator.GLSL_BUILTINS, loops, funciones
+de usuario y structs) para todos los píxeles a la vez: cada valor es un
+array cuya primera dimensión son los fragmentos, o 1 si es uniforme en
+todo el frame. El control de flujo divergente se ejecuta con máscaras,
+como una GPU en SIMD.
+
+Sirve para renderizar previews sin GPU (ver core.thumbnails).
+"""
+
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core import glsl_ast as ast
+from core.glsl_analyzer import matrix_info, scalar_info
+from core.glsl_parser import BudgetExceeded, GLSLSyntaxError, parse_tokens
+from core.glsl_tokenizer import tokenize
+
+# Iteraciones máximas de una ejecución de loop (for(;;) sin break, etc.)
+MAX_LOOP_ITERATIONS = 1024
+MAX_CALL_DEPTH = 64
+
+RENDER_TIME_BUDGET_MS = float(os.getenv("RENDER_TIME_BUDGET_MS", 10000))
+
+_DTYPES = {'float': np.float32, 'int': np.int32, 'uint': np.uint32, 'bool': np.bool_}
+_KINDS = {'float': 'f', 'int': 'i', 'uint': 'u', 'bool': 'b'}
+_SWIZZLE_SETS = ('xyzw', 'rgba', 'stpq')
+
+
+class RenderError(ValueError):
+    """El shader no se pudo ejecutar (error de ejecución o presupuesto agotado)"""
+    pass
+
+
+class UnsupportedFeature(RenderError):
+    """El shader usa algo fuera del subconjunto soportado"""
+    pass
+
+
+class _Struct(dict):
+    """Valor de un struct: campo -> valor"""
+
+    def __init__(self, name: str, fields: Dict[str, object]):
+        super().__init__(fields)
+        self.name = name
+
+
+@dataclass
+class _Frame:
+    scopes: List[Dict[str, object]]
+    returned: np.ndarray  # fragmentos que ya ejecutaron return
+    value: object = None
+
+
+@dataclass
+class _Loop:
+    broken: np.ndarray  # fragmentos que ejecutaron break (loop o switch)
+
+
+# ===== VALORES =====
+
+def _align(*values: np.ndarray) -> List[np.ndarray]:
+    """Añade ejes a los escalares para operar componente a componente con vectores"""
+    ndim = max(v.ndim for v in values)
+    return [v.reshape(v.shape + (1,) * (ndim - v.ndim)) if v.ndim < ndim else v for v in values]
+
+
+def _cast(value: np.ndarray, base: str) -> np.ndarray:
+    """Conversión de constructor: float(i), int(f) trunca, bool(x) es x != 0"""
+    dtype = _DTYPES[base]
+    if value.dtype == dtype:
+        return value
+    if base == 'bool':
+        return value != 0
+    if base == 'uint' and value.dtype.kind == 'f':
+        return value.astype(np.int64).astype(np.uint32)
+    return value.astype(dtype)
+
+
+def _merge(mask: np.ndarray, new, old):
+    """Valor nuevo en los fragmentos activos, el anterior en el resto"""
+    if old is None or mask.all():
+        return new
+    if isinstance(new, _Struct):
+        return _Struct(new.name, {k: _merge(mask, new[k], old[k]) for k in new})
+    if isinstance(new, list):
+        return [_merge(mask, n, o) for n, o in zip(new, old)]
+    if not isinstance(new, np.ndarray):
+        return new  # samplers
+    ndim = max(new.ndim, old.ndim)
+    selected = mask.reshape(mask.shape + (1,) * (ndim - 1))
+    return np.where(selected, new, old).astype(old.dtype, copy=False)
+
+
+def _swizzle(name: str) -> List[int]:
+    for components in _SWIZZLE_SETS:
+        if all(c in components for c in name):
+            return [components.index(c) for c in name]
+    raise RenderError(f"Invalid swizzle '.{name}'")
+
+
+def _literal(node: ast.Literal) -> np.ndarray:
+    text = node.value
+    if node.literal_type == 'float':
+        return np.array([float(text.rstrip('fF'))], np.float32)
+    if node.literal_type == 'bool':
+        return np.array([text == 'true'])
+    text = text.rstrip('uU')
+    if text[:2].lower() == '0x':
+        number = int(text, 16)
+    elif len(text) > 1 and text.startswith('0'):
+        number = int(text, 8)
+    else:
+        number = int(text)
+    wrapped = np.array([number & 0xFFFFFFFF], np.uint32)
+    return wrapped if node.literal_type == 'uint' else wrapped.view(np.int32)
+
+
+# ===== BUILT-INS =====
+
+def _float(value: np.ndarray) -> np.ndarray:
+    return value if value.dtype.kind == 'f' else value.astype(np.float32)
+
+
+def _math(fn: Callable) -> Callable:
+    """Función componente a componente sobre floats"""
+    return lambda *args: fn(*_align(*(_float(a) for a in args)))
+
+
+def _dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return a * b if a.ndim == 1 else np.sum(a * b, axis=-1)
+
+
+def _length(x: np.ndarray) -> np.ndarray:
+    x = _float(x)
+    return np.abs(x) if x.ndim == 1 else np.sqrt(np.sum(x * x, axis=-1))
+
+
+def _per_vector(scalar: np.ndarray, like: np.ndarray) -> np.ndarray:
+    """Escalar por fragmento -> operable con el vector `like`"""
+    return scalar[..., None] if like.ndim > scalar.ndim else scalar
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    x = _float(x)
+    return x / _per_vector(_length(x), x)
+
+
+def _reflect(i: np.ndarray, n: np.ndarray) -> np.ndarray:
+    return i - 2 * _per_vector(_dot(n, i), n) * n
+
+
+def _refract(i: np.ndarray, n: np.ndarray, eta: np.ndarray) -> np.ndarray:
+    d = _per_vector(_dot(n, i), n)
+    eta = _per_vector(eta, n) if eta.ndim < n.ndim else eta
+    k = 1 - eta * eta * (1 - d * d)
+    return np.where(k < 0, 0, eta * i - (eta * d + np.sqrt(np.maximum(k, 0))) * n).astype(np.float32)
+
+
+def _mix(x: np.ndarray, y: np.ndarray, a: np.ndarray) -> np.ndarray:
+    if a.dtype.kind == 'b':
+        x, y, a = _align(x, y, a)
+        return np.where(a, y, x)
+    x, y, a = _align(_float(x), _float(y), _float(a))
+    return x * (1 - a) + y * a
+
+
+def _smoothstep(edge0: np.ndarray, edge1: np.ndarray, x: np.ndarray) -> np.ndarray:
+    edge0, edge1, x = _align(_float(edge0), _float(edge1), _float(x))
+    t = np.clip((x - edge0) / (edge1 - edge0), 0, 1)
+    return t * t * (3 - 2 * t)
+
+
+def _mod(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    x, y = _align(_float(x), _float(y))
+    return x - y * np.floor(x / y)
+
+
+def _inverse(m: np.ndarray) -> np.ndarray:
+    try:
+        return np.linalg.inv(m.astype(np.float64)).astype(np.float32)
+    except np.linalg.LinAlgError:
+        return np.full(m.shape, np.nan, np.float32)
+
+
+def _bits(dtype) -> Callable:
+    return lambda x: np.ascontiguousarray(x).view(dtype)
+
+
+BUILTINS: Dict[str, Callable] = {
+    'radians': _math(np.radians), 'degrees': _math(np.degrees),
+    'sin': _math(np.sin), 'cos': _math(np.cos), 'tan': _math(np.tan),
+    'asin': _math(np.arcsin), 'acos': _math(np.arccos),
+    'atan': _math(lambda y, x=None: np.arctan(y) if x is None else np.arctan2(y, x)),
+    'sinh': _math(np.sinh), 'cosh': _math(np.cosh), 'tanh': _math(np.tanh),
+    'asinh': _math(np.arcsinh), 'acosh': _math(np.arccosh), 'atanh': _math(np.arctanh),
+    'pow': _math(np.power), 'exp': _math(np.exp), 'log': _math(np.log),
+    'exp2': _math(np.exp2), 'log2': _math(np.log2), 'sqrt': _math(np.sqrt),
+    'inversesqrt': _math(lambda x: 1 / np.sqrt(x)),
+    'abs': np.abs, 'sign': np.sign,
+    'floor': _math(np.floor), 'ceil': _math(np.ceil), 'trunc': _math(np.trunc),
+    'round': _math(lambda x: np.floor(x + 0.5)), 'roundEven': _math(np.rint),
+    'fract': _math(lambda x: x - np.floor(x)), 'mod': _mod,
+    'min': lambda x, y: np.minimum(*_align(x, y)),
+    'max': lambda x, y: np.maximum(*_align(x, y)),
+    'clamp': lambda x, lo, hi: np.minimum(*_align(np.maximum(*_align(x, lo)), hi)),
+    'mix': _mix,
+    'step': _math(lambda edge, x: (x >= edge).astype(np.float32)),
+    'smoothstep': _smoothstep,
+    'length': _length,
+    'distance': lambda a, b: _length(_float(a) - _float(b)),
+    'dot': lambda a, b: _dot(_float(a), _float(b)),
+    'cross': lambda a, b: np.cross(_float(a), _float(b)),
+    'normalize': _normalize,
+    'faceforward': lambda n, i, nref: np.where(_per_vector(_dot(nref, i), n) < 0, n, -n),
+    'reflect': _reflect, 'refract': _refract,
+    'lessThan': np.less, 'lessThanEqual': np.less_equal,
+    'greaterThan': np.greater, 'greaterThanEqual': np.greater_equal,
+    'equal': np.equal, 'notEqual': np.not_equal,
+    'any': lambda x: np.any(x, axis=-1), 'all': lambda x: np.all(x, axis=-1),
+    'not': np.logical_not,
+    'isnan': np.isnan, 'isinf': np.isinf,
+    'matrixCompMult': lambda a, b: a * b,
+    'transpose': lambda m: np.swapaxes(m, -1, -2),
+    'determinant': lambda m: np.linalg.det(m.astype(np.float64)).astype(np.float32),
+    'inverse': _inverse,
+    'floatBitsToInt': _bits(np.int32), 'floatBitsToUint': _bits(np.uint32),
+    'intBitsToFloat': _bits(np.float32), 'uintBitsToFloat': _bits(np.float32),
+}
+
+# Sin texturas: los canales se leen como un iChannel vacío de Shadertoy
+TEXTURE_FUNCTIONS = {
+    'texture', 'texture2D', 'textureCube', 'texture2DLod', 'textureCubeLod', 'texture2DProj',
+    'textureLod', 'textureGrad', 'textureOffset', 'textureProj', 'textureProjLod',
+    'textureLodOffset', 'textureGradOffset', 'texelFetch', 'texelFetchOffset'
+}
+
+
+def shadertoy_inputs(width: int, height: int, time_s: float) -> Dict[str, object]:
+    """Uniforms implícitos de Shadertoy para un frame a 60 fps"""
+    scalar = lambda value, dtype=np.float32: np.array([value], dtype)
+    return {
+        'iResolution': np.array([[width, height, 1.0]], np.float32),
+        'iTime': scalar(time_s),
+        'iTimeDelta': scalar(1 / 60),
+        'iFrameRate': scalar(60.0),
+        'iFrame': scalar(int(time_s * 60), np.int32),
+        'iChannelTime': [scalar(time_s) for _ in range(4)],
+        'iChannelResolution': [np.zeros((1, 3), np.float32) for _ in range(4)],
+        'iMouse': np.zeros((1, 4), np.float32),
+        'iDate': np.array([[2024.0, 0.0, 1.0, time_s]], np.float32),
+        'iSampleRate': scalar(44100.0),
+        **{f'iChannel{i}': 'sampler2D' for i in range(4)},
+    }
+
+
+# ===== INTÉRPRETE =====
+
+class GLSLInterpreter:
+    """
+    Ejecuta mainImage de una unidad ya parseada sobre una rejilla de píxeles
+
+    Los valores son arrays (fragmentos, *componentes): escalares (L,),
+    vectores (L, n) y matrices (L, columnas, filas); los arrays de GLSL
+    son listas y los structs _Struct. L es el número de píxeles o 1.
+    """
+
+    def __init__(self, unit: ast.TranslationUnit, width: int, height: int,
+                 deadline: Optional[float] = None):
+        self.unit = unit
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.deadline = deadline
+        self.functions: Dict[str, List[ast.FunctionDecl]] = {}
+        self.structs: Dict[str, List[ast.VarDecl]] = {}
+        self.globals: Dict[str, object] = {}
+        self.full = np.ones(self.size, bool)
+        self.discarded = np.zeros(self.size, bool)
+        self._frames: List[_Frame] = []
+        self._loops: List[_Loop] = []
+        self._literals: Dict[int, np.ndarray] = {}
+        self._dispatch: Dict[type, Callable] = {}
+
+    def run(self, inputs: Dict[str, object]) -> np.ndarray:
+        """
+        Ejecuta el shader y devuelve fragColor como (alto, ancho, 4) float32
+
+        La fila 0 es la de arriba; los fragmentos descartados quedan a 0.
+        """
+        with np.errstate(all='ignore'):
+            self.globals.update(inputs)
+            self._frames.append(_Frame([self.globals], np.zeros(self.size, bool)))
+            for declaration in self.unit.declarations:
+                self._global(declaration)
+
+            entry = next((f for f in self.functions.get('mainImage', []) if len(f.params) == 2), None)
+            if entry is None:
+                raise UnsupportedFeature("No mainImage(out vec4, in vec2) entry point")
+
+            x = np.arange(self.width, dtype=np.float32) + 0.5
+            y = np.arange(self.height, dtype=np.float32) + 0.5
+            frag_coord = np.stack([np.tile(x, self.height), np.repeat(y, self.width)], axis=-1)
+            _, outputs = self._invoke(entry, [np.zeros((1, 4), np.float32), frag_coord], self.full)
+
+        color = np.broadcast_to(_float(outputs[0]), (self.size, 4)).astype(np.float32)
+        color[self.discarded] = 0
+        return color.reshape(self.height, self.width, 4)[::-1]
+
+    def _check_deadline(self):
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise RenderError("Render time budget exceeded")
+
+    # ----- Declaraciones -----
+
+    def _global(self, node: ast.Stmt):
+        if isinstance(node, ast.FunctionDecl):
+            if node.return_type.struct is not None:
+                self._struct(node.return_type.struct)
+            if node.body is not None:
+                self.functions.setdefault(node.name, []).append(node)
+        elif isinstance(node, ast.VarDecl):
+            if 'uniform' in node.qualifiers:
+                # Inputs de Shadertoy redeclarados o uniforms propios (a 0)
+                for declarator in node.declarators:
+                    if declarator.name not in self.globals:
+                        self.globals[declarator.name] = self._zero(node.type, declarator, None)
+                return
+            self._exec(node, self.full)
+        elif isinstance(node, ast.StructDecl):
+            self._struct(node)
+        elif isinstance(node, ast.InterfaceBlock):
+            for member in node.members:
+                for declarator in member.declarators:
+                    self.globals[declarator.name] = self._zero(member.type, declarator, None)
+        elif not isinstance(node, ast.PrecisionDecl):
+            raise UnsupportedFeature(f"Unsupported declaration at line {node.line}")
+
+    def _struct(self, node: ast.StructDecl):
+        if node.name:
+            self.structs[node.name] = node.members
+
+    def _array_sizes(self, type_spec: ast.TypeSpec, declarator: Optional[ast.Declarator],
+                     initial) -> List[int]:
+        sizes = list(type_spec.array_sizes) + (list(declarator.array_sizes) if declarator else [])
+        result = []
+        for depth, size in enumerate(sizes):
+            if size is None:
+                value = initial
+                for _ in range(depth):
+                    value = value[0] if isinstance(value, list) and value else None
+                if not isinstance(value, list):
+                    raise RenderError(f"Unsized array without initializer at line {type_spec.line}")
+                result.append(len(value))
+            else:
+                result.append(int(self._eval(size, self.full).reshape(-1)[0]))
+        return result
+
+    def _zero(self, type_spec: ast.TypeSpec, declarator: Optional[ast.Declarator], initial):
+        if type_spec.struct is not None:
+            self._struct(type_spec.struct)
+        return self._zero_value(type_spec.name, self._array_sizes(type_spec, declarator, initial))
+
+    def _zero_value(self, type_name: str, sizes: List[int]):
+        if sizes:
+            return [self._zero_value(type_name, sizes[1:]) for _ in range(sizes[0])]
+        if type_name in self.structs:
+            fields = {}
+            for member in self.structs[type_name]:
+                for declarator in member.declarators:
+                    fields[declarator.name] = self._zero(member.type, declarator, None)
+            return _Struct(type_name, fields)
+        info = scalar_info(type_name)
+        if info:
+            base, size = info
+            return np.zeros((1,) if size == 1 else (1, size), _DTYPES[base])
+        dims = matrix_info(type_name)
+        if dims:
+            return np.zeros((1,) + dims, np.float32)
+        if type_name.startswith(('sampler', 'isampler', 'usampler')):
+            return type_name
+        if type_name == 'void':
+            return None
+        raise UnsupportedFeature(f"Unsupported type '{type_name}'")
+
+    def _convert(self, value, type_name: str):
+        """Convierte numéricos al tipo declarado (p. ej. inicializadores int en float)"""
+        info = scalar_info(type_name)
+        if info and isinstance(value, np.ndarray) and value.dtype.kind != _KINDS[info[0]]:
+            return _cast(value, info[0])
+        return value
+
+    # ----- Funciones de usuario -----
+
+    def _resolve(self, node: ast.Call, args: List[object]) -> ast.FunctionDecl:
+        candidates = [f for f in self.functions[node.callee] if len(f.params) == len(args)]
+        if len(candidates) > 1:
+            matching = [f for f in candidates
+                        if all(self._matches(a, p) for a, p in zip(args, f.params))]
+            candidates = matching or candidates
+        if not candidates:
+            raise RenderError(f"No overload of '{node.callee}' for {len(args)} arguments at line {node.line}")
+        return candidates[0]
+
+    def _matches(self, value, param: ast.Param) -> bool:
+        if param.array_sizes or param.type.array_sizes:
+            return isinstance(value, list)
+        type_name = param.type.name
+        if isinstance(value, _Struct):
+            return value.name == type_name
+        if not isinstance(value, np.ndarray):
+            return type_name.startswith('sampler')
+        info = scalar_info(type_name)
+        if info:
+            size = 1 if value.ndim == 1 else value.shape[-1] if value.ndim == 2 else -1
+            return size == info[1] and value.dtype.kind == _KINDS[info[0]]
+        return value.ndim == 3 and value.shape[1:] == matrix_info(type_name)
+
+    def _invoke(self, function: ast.FunctionDecl, args: List[object],
+                mask: np.ndarray) -> Tuple[object, Dict[int, object]]:
+        """Ejecuta la función; devuelve (valor de retorno, parámetros out/inout por índice)"""
+        if len(self._frames) > MAX_CALL_DEPTH:
+            raise RenderError(f"Call depth exceeded in '{function.name}' (recursion is not allowed)")
+        self._check_deadline()
+
+        params: Dict[str, object] = {}
+        for param, value in zip(function.params, args):
+            if param.name is None:
+                continue
+            if 'out' in param.qualifiers:
+                value = self._zero(param.type, param, value)
+            elif not (param.array_sizes or param.type.array_sizes):
+                value = self._convert(value, param.type.name)
+            params[param.name] = value
+
+        frame = _Frame([self.globals, params], np.zeros(self.size, bool))
+        self._frames.append(frame)
+        try:
+            self._exec(function.body, mask)
+        finally:
+            self._frames.pop()
+
+        outputs = {
+            i: params[p.name] for i, p in enumerate(function.params)
+            if p.name is not None and ('out' in p.qualifiers or 'inout' in p.qualifiers)
+        }
+        value = frame.value
+        if value is not None:
+            value = self._convert(value, function.return_type.name)
+        return value, outputs
+
+    # ----- Variables -----
+
+    def _lookup(self, name: str, line: int):
+        for scope in reversed(self._frames[-1].scopes):
+            if name in scope:
+                return scope[name]
+        raise RenderError(f"Undefined variable '{name}' at line {line}")
+
+    def _assign(self, name: str, value, mask: np.ndarray, line: int):
+        for scope in reversed(self._frames[-1].scopes):
+            if name in scope:
+                scope[name] = _merge(mask, value, scope[name])
+                return
+        raise RenderError(f"Undefined variable '{name}' at line {line}")
+
+    def _store(self, target: ast.Expr, value, mask: np.ndarray):
+        """Escribe en una variable, componente, campo o elemento (lvalue)"""
+        if isinstance(target, ast.Identifier):
+            self._assign(target.name, value, mask, target.line)
+            return
+
+        if isinstance(target, ast.FieldAccess):
+            base = self._eval(target.base, mask)
+            if isinstance(base, _Struct):
+                updated = _Struct(base.name, base)
+                updated[target.name] = value
+            else:
+                indices = _swizzle(target.name)
+                updated = self._writable(base, value, value)
+                updated[:, indices[0] if len(indices) == 1 else indices] = value
+        elif isinstance(target, ast.Index):
+            base = self._eval(target.base, mask)
+            index = self._eval(target.index, mask).astype(np.int64)
+            count = len(base) if isinstance(base, list) else base.shape[1]
+            index = np.clip(index, 0, count - 1)
+            if isinstance(base, list):
+                updated = list(base)
+                if index.shape[0] == 1 or (index == index[0]).all():
+                    updated[int(index[0])] = value
+                else:
+                    lanes = np.broadcast_to(index, (self.size,))
+                    updated = [_merge(lanes == k, value, old) for k, old in enumerate(base)]
+            else:
+                updated = self._writable(base, value, index)
+                if index.shape[0] == 1 or (index == index[0]).all():
+                    updated[:, int(index[0])] = value
+                else:
+                    lanes = updated.shape[0]
+                    value = np.broadcast_to(value, (lanes,) + updated.shape[2:])
+                    updated[np.arange(lanes), np.broadcast_to(index, (lanes,))] = value
+        else:
+            raise RenderError(f"Invalid assignment target at line {target.line}")
+        self._store(target.base, updated, mask)
+
+    def _writable(self, base: np.ndarray, *sources: np.ndarray) -> np.ndarray:
+        """Copia de base con los fragmentos suficientes para recibir sources"""
+        lanes = max([base.shape[0]] + [s.shape[0] for s in sources if isinstance(s, np.ndarray)])
+        return np.array(np.broadcast_to(base, (lanes,) + base.shape[1:]))
+
+    # ----- Statements -----
+
+    def _exec(self, node: Optional[ast.Stmt], mask: np.ndarray) -> np.ndarray:
+        """Ejecuta node para los fragmentos de mask; devuelve los que siguen activos"""
+        if node is None or not mask.any():
+            return mask
+        frame = self._frames[-1]
+
+        if isinstance(node, ast.Block):
+            frame.scopes.append({})
+            try:
+                for statement in node.statements:
+                    mask = self._exec(statement, mask)
+                    if not mask.any():
+                        break
+            finally:
+                frame.scopes.pop()
+            return mask
+
+        if isinstance(node, ast.VarDecl):
+            if node.type.struct is not None:
+                self._struct(node.type.struct)
+            for declarator in node.declarators:
+                if declarator.initializer is not None:
+                    value = self._eval(declarator.initializer, mask)
+                    if not isinstance(value, list):
+                        value = self._convert(value, node.type.name)
+                else:
+                    value = self._zero(node.type, declarator, None)
+                frame.scopes[-1][declarator.name] = value
+            return mask & ~self.discarded
+
+        if isinstance(node, ast.ExprStmt):
+            self._eval(node.expr, mask)
+            return mask & ~self.discarded
+
+        if isinstance(node, ast.If):
+            condition = self._truth(self._eval(node.condition, mask))
+            then_mask = self._exec(node.then, mask & condition)
+            else_mask = self._exec(node.otherwise, mask & ~condition)
+            return then_mask | else_mask
+
+        if isinstance(node, ast.For):
+            frame.scopes.append({})
+            try:
+                mask = self._exec(node.init, mask)
+                return self._loop(node.condition, node.body, node.step, mask, check_first=True)
+            finally:
+                frame.scopes.pop()
+
+        if isinstance(node, ast.While):
+            return self._loop(node.condition, node.body, None, mask, check_first=True)
+
+        if isinstance(node, ast.DoWhile):
+            return self._loop(node.condition, node.body, None, mask, check_first=False)
+
+        if isinstance(node, ast.Switch):
+            return self._switch(node, mask)
+
+        if isinstance(node, ast.Return):
+            if node.value is not None:
+                frame.value = _merge(mask, self._eval(node.value, mask), frame.value)
+            frame.returned = frame.returned | mask
+            return np.zeros_like(mask)
+
+        if isinstance(node, ast.Jump):
+            if node.kind == 'break':
+                self._loops[-1].broken |= mask
+            elif node.kind == 'discard':
+                self.discarded = self.discarded | mask
+            return np.zeros_like(mask)  # continue: vuelven en la siguiente iteración
+
+        if isinstance(node, ast.StructDecl):
+            self._struct(node)
+            return mask
+
+        if isinstance(node, (ast.EmptyStmt, ast.PrecisionDecl, ast.CaseLabel)):
+            return mask
+
+        raise UnsupportedFeature(f"Unsupported statement at line {node.line}")
+
+    def _loop(self, condition: Optional[ast.Expr], body: ast.Stmt, step: Optional[ast.Expr],
+              mask: np.ndarray, check_first: bool) -> np.ndarray:
+        frame = self._frames[-1]
+        loop = _Loop(np.zeros(self.size, bool))
+        self._loops.append(loop)
+        active = mask
+        try:
+            for iteration in range(MAX_LOOP_ITERATIONS + 1):
+                if condition is not None and (check_first or iteration > 0):
+                    active = active & self._truth(self._eval(condition, active))
+                if not active.any():
+                    break
+                if iteration == MAX_LOOP_ITERATIONS:
+                    raise RenderError(f"Loop exceeded {MAX_LOOP_ITERATIONS} iterations at line {body.line}")
+                self._check_deadline()
+                self._exec(body, active)
+                active = active & ~loop.broken & ~frame.returned & ~self.discarded
+                if step is not None and active.any():
+                    self._eval(step, active)
+        finally:
+            self._loops.pop()
+        return mask & ~frame.returned & ~self.discarded
+
+    def _switch(self, node: ast.Switch, mask: np.ndarray) -> np.ndarray:
+        value = self._eval(node.expr, mask)
+        labels = [s for s in node.body if isinstance(s, ast.CaseLabel) and s.value is not None]
+        matched_any = np.zeros(self.size, bool)
+        for label in labels:
+            matched_any |= self._truth(value == self._eval(label.value, mask))
+
+        switch = _Loop(np.zeros(self.size, bool))
+        self._loops.append(switch)
+        active = np.zeros(self.size, bool)
+        try:
+            for statement in node.body:
+                if isinstance(statement, ast.CaseLabel):
+                    # Fall-through: los fragmentos que ya entraron siguen activos
+                    if statement.value is None:
+                        active = active | (mask & ~matched_any)
+                    else:
+                        active = active | (mask & self._truth(value == self._eval(statement.value, mask)))
+                else:
+                    active = self._exec(statement, active)
+        finally:
+            self._loops.pop()
+        return active | switch.broken
+
+    def _truth(self, value) -> np.ndarray:
+        """Condición -> máscara bool de todos los fragmentos"""
+        if not isinstance(value, np.ndarray) or value.ndim != 1:
+            raise RenderError("Condition must be a scalar")
+        if value.dtype.kind != 'b':
+            value = value != 0
+        return np.broadcast_to(value, (self.size,))
+
+    # ----- Expresiones -----
+
+    def _eval(self, node: ast.Expr, mask: np.ndarray):
+        handler = self._dispatch.get(type(node))
+        if handler is None:
+            handler = getattr(self, f"_eval_{type(node).__name__}", None)
+            if handler is None:
+                raise UnsupportedFeature(f"Unsupported expression at line {node.line}")
+            self._dispatch[type(node)] = handler
+        return handler(node, mask)
+
+    def _eval_Literal(self, node: ast.Literal, mask: np.ndarray) -> np.ndarray:
+        value = self._literals.get(id(node))
+        if value is None:
+            value = self._literals[id(node)] = _literal(node)
+        return value
+
+    def _eval_Identifier(self, node: ast.Identifier, mask: np.ndarray):
+        return self._lookup(node.name, node.line)
+
+    def _eval_Sequence(self, node: ast.Sequence, mask: np.ndarray):
+        value = None
+        for expr in node.exprs:
+            value = self._eval(expr, mask)
+        return value
+
+    def _eval_InitializerList(self, node: ast.InitializerList, mask: np.ndarray):
+        return [self._eval(item, mask) for item in node.items]
+
+    def _eval_FieldAccess(self, node: ast.FieldAccess, mask: np.ndarray):
+        base = self._eval(node.base, mask)
+        if isinstance(base, _Struct):
+            if node.name not in base:
+                raise RenderError(f"No field '{node.name}' in struct {base.name} at line {node.line}")
+            return base[node.name]
+        if not isinstance(base, np.ndarray) or base.ndim > 2:
+            raise RenderError(f"Invalid field access '.{node.name}' at line {node.line}")
+        indices = _swizzle(node.name)
+        if base.ndim == 1:
+            return base if len(indices) == 1 else np.stack([base] * len(indices), axis=-1)
+        return base[:, indices[0]] if len(indices) == 1 else base[:, indices]
+
+    def _eval_Index(self, node: ast.Index, mask: np.ndarray):
+        base = self._eval(node.base, mask)
+        index = self._eval(node.index, mask).astype(np.int64)
+        count = len(base) if isinstance(base, list) else base.shape[1]
+        index = np.clip(index, 0, count - 1)
+        if index.shape[0] == 1 or (index == index[0]).all():
+            i = int(index[0])
+            return base[i] if isinstance(base, list) else base[:, i]
+        if isinstance(base, list):
+            lanes = np.broadcast_to(index, (self.size,))
+            result = base[0]
+            for k in range(1, count):
+                result = _merge(lanes == k, base[k], result)
+            return result
+        lanes = max(base.shape[0], index.shape[0])
+        base = np.broadcast_to(base, (lanes,) + base.shape[1:])
+        return base[np.arange(lanes), np.broadcast_to(index, (lanes,))]
+
+    def _eval_UnaryOp(self, node: ast.UnaryOp, mask: np.ndarray):
+        value = self._eval(node.operand, mask)
+        op = node.op
+        if op in ('++', '--'):
+            one = np.ones(1, value.dtype)
+            updated = value + one if op == '++' else value - one
+            self._store(node.operand, updated, mask)
+            return value if node.postfix else updated
+        if op == '-':
+            return -value
+        if op == '+':
+            return value
+        if op == '!':
+            return np.logical_not(value)
+        if op == '~':
+            return np.invert(value)
+        raise UnsupportedFeature(f"Unsupported operator '{op}' at line {node.line}")
+
+    def _eval_BinaryOp(self, node: ast.BinaryOp, mask: np.ndarray):
+        if node.op in ('&&', '||'):
+            left = self._truth(self._eval(node.left, mask))
+            # Cortocircuito: la derecha solo se evalúa donde hace falta
+            inner = mask & left if node.op == '&&' else mask & ~left
+            right = self._truth(self._eval(node.right, inner)) if inner.any() else left
+            return (left & right if node.op == '&&' else left | right)
+        left = self._eval(node.left, mask)
+        right = self._eval(node.right, mask)
+        return self._binary(node.op, left, right, node.line)
+
+    def _binary(self, op: str, a, b, line: int):
+        if not isinstance(a, np.ndarray) or not isinstance(b, np.ndarray):
+            if op in ('==', '!=') and isinstance(a, (list, _Struct)):
+                equal = self._aggregate_equal(a, b)
+                return equal if op == '==' else ~equal
+            raise UnsupportedFeature(f"Unsupported operands for '{op}' at line {line}")
+
+        # int/float mezclados (conversión implícita de GLSL de escritorio)
+        if a.dtype != b.dtype and 'f' in (a.dtype.kind, b.dtype.kind):
+            a, b = _float(a), _float(b)
+        elif a.dtype != b.dtype and a.dtype.kind in 'iu' and b.dtype.kind in 'iu':
+            b = b.astype(a.dtype)
+
+        if op == '*' and (a.ndim == 3 or b.ndim == 3) and a.ndim > 1 and b.ndim > 1:
+            # Álgebra lineal con matrices column-major (L, columnas, filas)
+            if a.ndim == 3 and b.ndim == 3:
+                return np.einsum('...kr,...ck->...cr', a, b)
+            if a.ndim == 3:
+                return np.einsum('...cr,...c->...r', a, b)
+            return np.einsum('...r,...cr->...c', a, b)
+
+        if op in ('==', '!='):
+            x, y = np.broadcast_arrays(*_align(a, b))
+            equal = x == y if x.ndim == 1 else np.all(x == y, axis=tuple(range(1, x.ndim)))
+            return equal if op == '==' else ~equal
+
+        a, b = _align(a, b)
+        if op == '+':
+            return a + b
+        if op == '-':
+            return a - b
+        if op == '*':
+            return a * b
+        if op == '/':
+            if a.dtype.kind in 'iu':
+                safe = np.where(b == 0, 1, b)
+                return np.where(b == 0, 0, np.trunc(a / safe)).astype(a.dtype)
+            return a / b
+        if op == '%':
+            return np.where(b == 0, 0, np.fmod(a, np.where(b == 0, 1, b))).astype(a.dtype)
+        if op == '<':
+            return a < b
+        if op == '>':
+            return a > b
+        if op == '<=':
+            return a <= b
+        if op == '>=':
+            return a >= b
+        if op == '&':
+            return a & b
+        if op == '|':
+            return a | b
+        if op == '^':
+            return a ^ b
+        if op == '^^':
+            return a != b
+        if op == '<<':
+            return np.left_shift(a, b)
+        if op == '>>':
+            return np.right_shift(a, b)
+        raise UnsupportedFeature(f"Unsupported operator '{op}' at line {line}")
+
+    def _aggregate_equal(self, a, b) -> np.ndarray:
+        pairs = zip(a.values(), b.values()) if isinstance(a, _Struct) else zip(a, b)
+        equal = np.ones(1, bool)
+        for x, y in pairs:
+            item = self._aggregate_equal(x, y) if isinstance(x, (list, _Struct)) else self._binary('==', x, y, 0)
+            equal = equal & item
+        return equal
+
+    def _eval_Assignment(self, node: ast.Assignment, mask: np.ndarray):
+        value = self._eval(node.value, mask)
+        if node.op != '=':
+            current = self._eval(node.target, mask)
+            value = self._binary(node.op[:-1], current, value, node.line)
+            if isinstance(current, np.ndarray) and value.dtype != current.dtype:
+                value = value.astype(current.dtype)
+        self._store(node.target, value, mask)
+        return value
+
+    def _eval_Ternary(self, node: ast.Ternary, mask: np.ndarray):
+        condition = self._eval(node.condition, mask)
+        if isinstance(condition, np.ndarray) and condition.shape == (1,):
+            # Condición uniforme: solo se evalúa una rama
+            return self._eval(node.if_true if condition[0] else node.if_false, mask)
+        selected = self._truth(condition)
+        if_true = self._eval(node.if_true, mask & selected)
+        if_false = self._eval(node.if_false, mask & ~selected)
+        if isinstance(if_true, np.ndarray) and isinstance(if_false, np.ndarray):
+            ndim = max(if_true.ndim, if_false.ndim)
+            return np.where(selected.reshape((-1,) + (1,) * (ndim - 1)), if_true, if_false)
+        return _merge(selected, if_true, if_false)
+
+    def _eval_Call(self, node: ast.Call, mask: np.ndarray):
+        if node.method_of is not None:
+            base = self._eval(node.method_of, mask)
+            if node.callee != 'length':
+                raise UnsupportedFeature(f"Unsupported method '{node.callee}' at line {node.line}")
+            return np.array([len(base) if isinstance(base, list) else base.shape[-1]], np.int32)
+
+        args = [self._eval(arg, mask) for arg in node.args]
+
+        if node.is_constructor:
+            if node.array_sizes:
+                return [self._convert(arg, node.callee) for arg in args]
+            if node.callee in self.structs:
+                names = [d.name for member in self.structs[node.callee] for d in member.declarators]
+                return _Struct(node.callee, dict(zip(names, args)))
+            return self._construct(node.callee, args, node.line)
+
+        if node.callee in self.functions:
+            function = self._resolve(node, args)
+            value, outputs = self._invoke(function, args, mask)
+            active = mask & ~self.discarded
+            for i, output in outputs.items():
+                self._store(node.args[i], output, active)
+            return value
+
+        if node.callee in TEXTURE_FUNCTIONS:
+            return np.zeros((1, 4), np.float32)
+        if node.callee == 'textureSize':
+            return np.zeros((1, 2), np.int32)
+        if node.callee in ('dFdx', 'dFdy', 'fwidth'):
+            return self._derivative(node.callee, args[0])
+
+        builtin = BUILTINS.get(node.callee)
+        if builtin is None:
+            raise UnsupportedFeature(f"Unsupported function '{node.callee}' at line {node.line}")
+        try:
+            return builtin(*args)
+        except (TypeError, ValueError) as e:
+            raise RenderError(f"Invalid arguments for '{node.callee}' at line {node.line}: {e}")
+
+    def _construct(self, type_name: str, args: List[np.ndarray], line: int) -> np.ndarray:
+        """vecN/ivecN/matN/escalares a partir de componentes (column-major)"""
+        if any(not isinstance(arg, np.ndarray) for arg in args) or not args:
+            raise RenderError(f"Invalid constructor arguments for {type_name} at line {line}")
+
+        components: List[np.ndarray] = []
+        for arg in args:
+            if arg.ndim == 1:
+                components.append(arg)
+            else:
+                flat = arg.reshape(arg.shape[0], -1)
+                components.extend(flat[:, k] for k in range(flat.shape[1]))
+
+        info = scalar_info(type_name)
+        if info:
+            base, size = info
+            if size == 1:
+                return _cast(components[0], base)
+            if len(components) == 1:
+                components = components * size
+            if len(components) < size:
+                raise RenderError(f"Not enough components for {type_name} at line {line}")
+            return np.stack(np.broadcast_arrays(*(_cast(c, base) for c in components[:size])), axis=-1)
+
+        dims = matrix_info(type_name)
+        if dims is None:
+            raise UnsupportedFeature(f"Unsupported constructor '{type_name}' at line {line}")
+        columns, rows = dims
+        if len(args) == 1 and args[0].ndim == 1:
+            # mat3(s): diagonal
+            matrix = np.zeros((args[0].shape[0], columns, rows), np.float32)
+            for i in range(min(columns, rows)):
+                matrix[:, i, i] = args[0]
+            return matrix
+        if len(args) == 1 and args[0].ndim == 3:
+            # mat3(mat4): esquina superior izquierda, resto identidad
+            source = args[0]
+            matrix = np.zeros((source.shape[0], columns, rows), np.float32)
+            for i in range(min(columns, rows)):
+                matrix[:, i, i] = 1
+            c, r = min(columns, source.shape[1]), min(rows, source.shape[2])
+            matrix[:, :c, :r] = source[:, :c, :r]
+            return matrix
+        if len(components) < columns * rows:
+            raise RenderError(f"Not enough components for {type_name} at line {line}")
+        flat = np.stack(np.broadcast_arrays(*(_float(c) for c in components[:columns * rows])), axis=-1)
+        return flat.reshape(flat.shape[0], columns, rows)
+
+    def _derivative(self, name: str, value: np.ndarray) -> np.ndarray:
+        """dFdx/dFdy como diferencias hacia delante entre píxeles vecinos"""
+        value = _float(value)
+        if value.shape[0] == 1:
+            return np.zeros_like(value)
+        grid = value.reshape((self.height, self.width) + value.shape[1:])
+        dx = np.diff(grid, axis=1, append=grid[:, -1:]).reshape(value.shape)
+        dy = np.diff(grid, axis=0, append=grid[-1:]).reshape(value.shape)
+        if name == 'dFdx':
+            return dx
+        if name == 'dFdy':
+            return dy
+        return np.abs(dx) + np.abs(dy)
+
+
+def render_shader(code: str, width: int, height: int, time_s: float = 0.0,
+                  time_budget_ms: float = RENDER_TIME_BUDGET_MS) -> np.ndarray:
+    """
+    Renderiza mainImage de un shader de Shadertoy sin GPU
+
+    Returns:
+        fragColor como (alto, ancho, 4) float32, fila 0 arriba (sin
+        recortar: puede contener NaN o valores fuera de [0, 1])
+
+    Raises:
+        UnsupportedFeature: el shader usa algo fuera del subconjunto
+        RenderError: error de sintaxis o de ejecución, o presupuesto agotado
+    """
+    deadline = time.perf_counter() + time_budget_ms / 1000 if time_budget_ms > 0 else None
+    tokens = tokenize(code or "").tokens
+    try:
+        parsed = parse_tokens(tokens, code, deadline)
+    except GLSLSyntaxError as e:
+        raise RenderError(f"Syntax error: {e}")
+    except BudgetExceeded:
+        raise RenderError("Render time budget exceeded")
+
+    interpreter = GLSLInterpreter(parsed.unit, width, height, deadline)
+    try:
+        return interpreter.run(shadertoy_inputs(width, height, time_s))
+    except RecursionError:
+        raise UnsupportedFeature("Expression nesting too deep")
@@ -0,0 +1,335 @@
+"""
+Lint de rendimiento para GPU
+Patrones que compilan pero cuestan caro en un fragment shader (se ejecuta
+por píxel). Recorre el AST ya tipado por core.glsl_analyzer y devuelve
+avisos con severidad y ubicación, sin pasar por el LLM de /ai/optimize.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from core import glsl_ast as ast
+from core.glsl_analyzer import BUILTIN_FUNCTIONS, FunctionSignature, Scope
+
+SEVERITIES = ('info', 'warning', 'critical')
+
+# Por encima de esto un loop por píxel suele ser el cuello de botella
+MAX_LOOP_ITERATIONS = 512
+
+# Un branch por píxel con menos statements que esto no merece aviso
+HEAVY_BRANCH_STATEMENTS = 8
+
+EXPENSIVE_FUNCTIONS = {
+    'pow', 'exp', 'exp2', 'log', 'log2', 'sqrt', 'inversesqrt',
+    'sin', 'cos', 'tan', 'asin', 'acos', 'atan', 'sinh', 'cosh', 'tanh',
+    'normalize', 'length', 'distance', 'inverse', 'determinant'
+}
+
+_POW_REWRITES = {1.0: "x", 2.0: "x * x", 3.0: "x * x * x", 4.0: "(x * x) * (x * x)", 0.5: "sqrt(x)"}
+
+
+@dataclass
+class PerformanceHint:
+    """Aviso de rendimiento (no afecta a is_valid)"""
+    rule: str  # pow-small-exponent, loop-invariant-call, texture-in-loop...
+    severity: str  # info, warning, critical
+    message: str
+    line: int
+    col: int
+
+    @property
+    def location(self) -> str:
+        return f"{self.line}:{self.col}"
+
+
+def _is_texture_call(call: ast.Call) -> bool:
+    return (call.callee.startswith('texture') and call.callee != 'textureSize') or call.callee.startswith('texelFetch')
+
+
+def _literal_value(expr: ast.Expr) -> Optional[float]:
+    if isinstance(expr, ast.Literal) and expr.literal_type in ('float', 'int', 'uint'):
+        try:
+            return float(expr.value.rstrip('fFuU'))
+        except ValueError:
+            return None
+    return None
+
+
+def _identifiers(expr: ast.Node) -> Set[str]:
+    return {n.name for n in ast.walk(expr) if isinstance(n, ast.Identifier)}
+
+
+def _target_name(expr: ast.Expr) -> Optional[str]:
+    """Variable escrita por `v = `, `v.x = `, `v[i] = `"""
+    while isinstance(expr, (ast.FieldAccess, ast.Index)):
+        expr = expr.base
+    return expr.name if isinstance(expr, ast.Identifier) else None
+
+
+def _out_arguments(call: ast.Call, out_indices: Callable[[str], Optional[Set[int]]]) -> List[ast.Expr]:
+    """Argumentos que la llamada puede escribir (todos si la función no se conoce)"""
+    if call.is_constructor or call.callee in BUILTIN_FUNCTIONS:
+        return []
+    indices = out_indices(call.callee)
+    if indices is None:
+        return call.args
+    return [arg for i, arg in enumerate(call.args) if i in indices]
+
+
+def _written_names(node: ast.Node, out_indices: Callable[[str], Optional[Set[int]]]) -> Set[str]:
+    """Variables declaradas, asignadas o pasadas como out en el subárbol"""
+    names = set()
+    for n in ast.walk(node):
+        if isinstance(n, ast.Declarator):
+            names.add(n.name)
+        elif isinstance(n, ast.Assignment):
+            names.add(_target_name(n.target))
+        elif isinstance(n, ast.UnaryOp) and n.op in ('++', '--'):
+            names.add(_target_name(n.operand))
+        elif isinstance(n, ast.Call):
+            names.update(_target_name(arg) for arg in _out_arguments(n, out_indices))
+    names.discard(None)
+    return names
+
+
+class PerformanceLinter:
+    """Recorre las funciones del shader acumulando PerformanceHint"""
+
+    def __init__(self, scope: Optional[Scope] = None,
+                 functions: Optional[Dict[str, List[FunctionSignature]]] = None):
+        # Declarado fuera de las declaraciones a revisar (validación incremental)
+        self.scope = scope
+        self.functions = functions or {}
+        self.constants: Set[str] = set()
+        self.hints: List[PerformanceHint] = []
+        self.out_params: Dict[str, Set[int]] = {}  # función -> índices de parámetros out/inout
+
+    def _declare(self, function: ast.FunctionDecl):
+        self.out_params.setdefault(function.name, set()).update(
+            i for i, p in enumerate(function.params) if {'out', 'inout'} & set(p.qualifiers)
+        )
+
+    def _is_constant(self, name: str) -> bool:
+        if name in self.constants:
+            return True
+        symbol = self.scope.lookup(name) if self.scope is not None else None
+        return symbol is not None and 'const' in symbol.qualifiers
+
+    def _out_indices(self, name: str) -> Optional[Set[int]]:
+        if name not in self.out_params and name in self.functions:
+            for signature in self.functions[name]:
+                self._declare(signature.node)
+        return self.out_params.get(name)
+
+    def lint(self, declarations: Iterable[ast.Stmt]) -> List[PerformanceHint]:
+        declarations = list(declarations)
+        for declaration in declarations:
+            if isinstance(declaration, ast.VarDecl) and 'const' in declaration.qualifiers:
+                self.constants.update(d.name for d in declaration.declarators)
+            elif isinstance(declaration, ast.FunctionDecl):
+                self._declare(declaration)
+        for declaration in declarations:
+            if isinstance(declaration, ast.FunctionDecl) and declaration.body is not None:
+                self._function(declaration)
+        self.hints.sort(key=lambda h: (h.line, h.col))
+        return self.hints
+
+    def _hint(self, rule: str, severity: str, message: str, node: ast.Node):
+        self.hints.append(PerformanceHint(rule, severity, message, node.line, node.col))
+
+    # ----- Funciones -----
+
+    def _function(self, node: ast.FunctionDecl):
+        self._normalized = self._normalized_variables(node.body)
+        self._per_pixel = self._per_pixel_variables(node)
+        self._statement(node.body, [])
+
+    def _normalized_variables(self, body: ast.Block) -> Set[str]:
+        """Variables cuyas escrituras son todas `= normalize(...)`"""
+        normalized, other = set(), set()
+
+        def record(name: Optional[str], value: Optional[ast.Expr], whole: bool):
+            if name is None:
+                return
+            if whole and isinstance(value, ast.Call) and value.callee == 'normalize':
+                normalized.add(name)
+            else:
+                other.add(name)
+
+        for n in ast.walk(body):
+            if isinstance(n, ast.Declarator):
+                record(n.name, n.initializer, n.initializer is not None)
+            elif isinstance(n, ast.Assignment):
+                record(_target_name(n.target), n.value, n.op == '=' and isinstance(n.target, ast.Identifier))
+            elif isinstance(n, ast.UnaryOp) and n.op in ('++', '--'):
+                record(_target_name(n.operand), None, False)
+            elif isinstance(n, ast.Call):
+                for arg in _out_arguments(n, self._out_indices):
+                    record(_target_name(arg), None, False)
+        return normalized - other
+
+    @staticmethod
+    def _per_pixel_variables(node: ast.FunctionDecl) -> Set[str]:
+        """
+        Variables que dependen de la posición del píxel
+
+        Semillas: gl_FragCoord, el fragCoord de mainImage y las lecturas de
+        texturas; se propagan por declaraciones y asignaciones (dos pasadas
+        cubren las dependencias dentro de loops).
+        """
+        tainted = {'gl_FragCoord'}
+        if node.name == 'mainImage':
+            tainted.update(p.name for p in node.params if p.name and 'out' not in p.qualifiers)
+
+        def depends(expr: Optional[ast.Expr]) -> bool:
+            return expr is not None and any(
+                (isinstance(n, ast.Identifier) and n.name in tainted)
+                or (isinstance(n, ast.Call) and _is_texture_call(n))
+                for n in ast.walk(expr)
+            )
+
+        for _ in range(2):
+            for n in ast.walk(node.body):
+                if isinstance(n, ast.Declarator) and depends(n.initializer):
+                    tainted.add(n.name)
+                elif isinstance(n, ast.Assignment) and depends(n.value):
+                    name = _target_name(n.target)
+                    if name:
+                        tainted.add(name)
+        return tainted
+
+    def _depends_on_pixel(self, expr: ast.Expr) -> bool:
+        return any(
+            (isinstance(n, ast.Identifier) and n.name in self._per_pixel)
+            or (isinstance(n, ast.Call) and _is_texture_call(n))
+            for n in ast.walk(expr)
+        )
+
+    # ----- Statements -----
+
+    def _statement(self, node: ast.Stmt, loops: List[Set[str]]):
+        inner = loops
+        if isinstance(node, (ast.For, ast.While, ast.DoWhile)):
+            self._loop(node)
+            inner = loops + [_written_names(node, self._out_indices)]
+        elif isinstance(node, ast.If):
+            self._branch(node)
+
+        for child in node.children():
+            # El init de un for se ejecuta una sola vez
+            child_loops = loops if isinstance(node, ast.For) and child is node.init else inner
+            if isinstance(child, ast.Stmt):
+                self._statement(child, child_loops)
+            else:
+                for n in ast.walk(child):
+                    if isinstance(n, ast.Call):
+                        self._call(n, child_loops)
+
+    def _loop(self, node: ast.Stmt):
+        if isinstance(node, ast.For):
+            self._for_bound(node)
+            return
+
+        condition = node.condition
+        if isinstance(condition, ast.Literal) and condition.value == 'true':
+            self._hint("unbounded-loop", "critical",
+                       "Unbounded loop: while(true) relies on break; use a for loop with a constant maximum", node)
+        else:
+            self._hint("unbounded-loop", "warning",
+                       "Loop without iteration limit; use a for loop with a constant maximum and break", node)
+
+    def _for_bound(self, node: ast.For):
+        condition = node.condition
+        if condition is None or (isinstance(condition, ast.Literal) and condition.value == 'true'):
+            self._hint("unbounded-loop", "critical", "Loop without exit condition", node)
+            return
+        if not isinstance(condition, ast.BinaryOp) or condition.op not in ('<', '<=', '>', '>=', '!='):
+            return
+
+        counters = _written_names(node.init, self._out_indices) if node.init is not None else set()
+        if node.step is not None:
+            counters |= _written_names(node.step, self._out_indices)
+        left_vars = _identifiers(condition.left) & counters
+        bound = condition.right if left_vars else condition.left
+
+        value = _literal_value(bound)
+        if value is not None:
+            if value > MAX_LOOP_ITERATIONS:
+                self._hint("loop-iterations", "warning",
+                           f"Loop bound {bound.value} exceeds {MAX_LOOP_ITERATIONS} iterations per pixel", node)
+            return
+
+        names = {name for name in _identifiers(bound) if not self._is_constant(name)}
+        if names:
+            self._hint("unbounded-loop", "warning",
+                       f"Loop bound depends on '{sorted(names)[0]}' (not a compile-time constant)", node)
+
+    def _branch(self, node: ast.If):
+        if not self._depends_on_pixel(node.condition):
+            return
+        for branch in (node.then, node.otherwise):
+            if branch is not None and self._is_heavy(branch):
+                self._hint("divergent-branch", "info",
+                           "Expensive branch on a per-pixel value: neighbouring pixels may execute both sides", node)
+                return
+
+    @staticmethod
+    def _is_heavy(node: ast.Stmt) -> bool:
+        statements = 0
+        for n in ast.walk(node):
+            if isinstance(n, (ast.For, ast.While, ast.DoWhile)):
+                return True
+            if isinstance(n, ast.Call) and (
+                _is_texture_call(n) or (not n.is_constructor and n.callee not in BUILTIN_FUNCTIONS)
+            ):
+                return True
+            if isinstance(n, ast.Stmt) and not isinstance(n, ast.Block):
+                statements += 1
+        return statements >= HEAVY_BRANCH_STATEMENTS
+
+    # ----- Llamadas -----
+
+    def _call(self, node: ast.Call, loops: List[Set[str]]):
+        if node.callee == 'pow' and len(node.args) == 2:
+            exponent = _literal_value(node.args[1])
+            if exponent in _POW_REWRITES:
+                self._hint("pow-small-exponent", "info",
+                           f"pow(x, {node.args[1].value}) is slower than {_POW_REWRITES[exponent]}", node)
+
+        if node.callee == 'normalize' and len(node.args) == 1:
+            arg = node.args[0]
+            if (isinstance(arg, ast.Call) and arg.callee == 'normalize') or \
+                    (isinstance(arg, ast.Identifier) and arg.name in self._normalized):
+                self._hint("redundant-normalize", "info", "normalize() of an already normalized vector", node)
+
+        if not loops:
+            return
+        if _is_texture_call(node):
+            self._hint("texture-in-loop", "info",
+                       f"{node.callee}() inside a loop: each iteration is a memory fetch", node)
+        elif node.callee in EXPENSIVE_FUNCTIONS and self._is_loop_invariant(node, loops[-1]):
+            self._hint("loop-invariant-call", "warning",
+                       f"{node.callee}() gives the same result on every iteration; move it before the loop", node)
+
+    @staticmethod
+    def _is_loop_invariant(node: ast.Call, written: Set[str]) -> bool:
+        names = _identifiers(node)
+        if not names or names & written:
+            return False
+        # Solo built-ins puros (una función del usuario podría tener efectos)
+        return all(
+            n.is_constructor or n.callee in BUILTIN_FUNCTIONS
+            for n in ast.walk(node) if isinstance(n, ast.Call)
+        )
+
+
+def lint_performance(declarations: Iterable[ast.Stmt], scope: Optional[Scope] = None,
+                     functions: Optional[Dict[str, List[FunctionSignature]]] = None) -> List[PerformanceHint]:
+    """
+    Avisos de rendimiento de las declaraciones de un shader (ya analizadas)
+
+    scope y functions (del GLSLAnalyzer) aportan las constantes y firmas
+    declaradas en otra parte (validación incremental); las de las propias
+    declaraciones se detectan solas.
+    """
+    return PerformanceLinter(scope, functions).lint(declarations)
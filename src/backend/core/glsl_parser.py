@@ -0,0 +1,1066 @@
+"""
+Parser GLSL ES 3.0
+Gramática LALR (lark) alimentada por el tokenizador de una sola pasada.
+Incluye un preprocesador simple (#define con y sin parámetros, #if/#ifdef)
+y construye el AST de core.glsl_ast directamente durante el parseo, sin
+árbol intermedio. La tabla LALR se construye una vez por proceso.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from lark import Lark, Transformer, v_args
+from lark.parsers.lalr_analysis import Shift
+
+from core import glsl_ast as ast
+from core.glsl_tokenizer import Token, tokenize
+
+# Tipos built-in (GLSL ES 3.0 + los de desktop más comunes en Shadertoy)
+TYPE_NAMES = frozenset({
+    'void', 'bool', 'int', 'uint', 'float', 'double',
+    'vec2', 'vec3', 'vec4', 'bvec2', 'bvec3', 'bvec4',
+    'ivec2', 'ivec3', 'ivec4', 'uvec2', 'uvec3', 'uvec4',
+    'dvec2', 'dvec3', 'dvec4',
+    'mat2', 'mat3', 'mat4',
+    'mat2x2', 'mat2x3', 'mat2x4', 'mat3x2', 'mat3x3', 'mat3x4',
+    'mat4x2', 'mat4x3', 'mat4x4',
+    'sampler1D', 'sampler2D', 'sampler3D', 'samplerCube', 'sampler2DRect',
+    'sampler2DShadow', 'samplerCubeShadow', 'sampler2DArray', 'sampler2DArrayShadow',
+    'isampler2D', 'isampler3D', 'isamplerCube', 'isampler2DArray',
+    'usampler2D', 'usampler3D', 'usamplerCube', 'usampler2DArray',
+})
+
+STORAGE_QUALIFIERS = frozenset({
+    'const', 'in', 'out', 'inout', 'uniform', 'attribute', 'varying',
+    'centroid', 'flat', 'smooth', 'noperspective', 'invariant', 'buffer'
+})
+
+PRECISION_QUALIFIERS = frozenset({'highp', 'mediump', 'lowp'})
+
+# Keywords con terminal propio (se conservan en el árbol para ubicar errores)
+_KEYWORD_TERMINALS = {
+    'if': 'IF', 'else': 'ELSE', 'for': 'FOR', 'while': 'WHILE', 'do': 'DO',
+    'switch': 'SWITCH', 'case': 'CASE', 'default': 'DEFAULT',
+    'return': 'RETURN', 'break': 'BREAK', 'continue': 'CONTINUE', 'discard': 'DISCARD',
+    'struct': 'STRUCT', 'precision': 'PRECISION', 'layout': 'LAYOUT',
+    'true': 'BOOLCONSTANT', 'false': 'BOOLCONSTANT',
+    **{q: 'STORAGE' for q in STORAGE_QUALIFIERS},
+    **{q: 'PRECISION_Q' for q in PRECISION_QUALIFIERS},
+}
+
+# Operadores que el AST necesita conservar; la puntuación ("(", ";"...)
+# se toma de los terminales anónimos de la gramática
+_OPERATOR_TERMINALS = {
+    '+': 'ADD_OP', '-': 'ADD_OP',
+    '*': 'MUL_OP', '/': 'MUL_OP', '%': 'MUL_OP',
+    '<<': 'SHIFT_OP', '>>': 'SHIFT_OP',
+    '<': 'REL_OP', '>': 'REL_OP', '<=': 'REL_OP', '>=': 'REL_OP',
+    '==': 'EQ_OP', '!=': 'EQ_OP',
+    '++': 'INC_OP', '--': 'INC_OP',
+    '!': 'UNARY_OP', '~': 'UNARY_OP',
+    '&&': 'AND_OP', '||': 'OR_OP', '^^': 'XOR_OP',
+    '&': 'BITAND', '|': 'BITOR', '^': 'BITXOR',
+    '=': 'EQUAL',
+    '+=': 'ASSIGN_OP', '-=': 'ASSIGN_OP', '*=': 'ASSIGN_OP', '/=': 'ASSIGN_OP',
+    '%=': 'ASSIGN_OP', '<<=': 'ASSIGN_OP', '>>=': 'ASSIGN_OP',
+    '&=': 'ASSIGN_OP', '|=': 'ASSIGN_OP', '^=': 'ASSIGN_OP',
+}
+
+GRAMMAR = r"""
+start: _external*
+
+_external: function_definition
+         | declaration
+         | ";"
+
+function_definition: function_prototype compound_statement
+function_prototype: fully_specified_type IDENT "(" [parameter_list] ")"
+parameter_list: parameter ("," parameter)*
+parameter: qualifier* type_specifier [param_declarator]
+param_declarator: IDENT [array_spec]
+
+declaration: function_prototype ";"                                  -> prototype
+           | fully_specified_type [init_declarator_list] ";"          -> var_declaration
+           | qualifiers IDENT "{" struct_member+ "}" [block_instance] ";" -> interface_block
+           | PRECISION PRECISION_Q type_specifier ";"                 -> precision_declaration
+           | qualifiers ";"                                           -> qualifier_declaration
+
+fully_specified_type: [qualifiers] type_specifier
+qualifiers: qualifier+
+qualifier: STORAGE | PRECISION_Q | layout_qualifier
+layout_qualifier: LAYOUT "(" layout_id ("," layout_id)* ")"
+layout_id: IDENT [layout_value]
+layout_value: EQUAL INTCONSTANT
+
+type_specifier: (TYPE_NAME | struct_specifier) [array_spec]
+struct_specifier: STRUCT [TYPE_NAME] "{" struct_member+ "}"
+struct_member: fully_specified_type struct_declarator ("," struct_declarator)* ";"
+struct_declarator: IDENT [array_spec]
+block_instance: IDENT [array_spec]
+array_spec: array_dim+
+array_dim: "[" [conditional] "]"
+
+init_declarator_list: init_declarator ("," init_declarator)*
+init_declarator: IDENT [array_spec] [initializer_part]
+initializer_part: EQUAL initializer
+?initializer: assignment
+            | "{" initializer ("," initializer)* ","? "}"             -> initializer_list
+
+// ===== Statements =====
+
+?statement: compound_statement
+          | declaration
+          | expression ";"                                            -> expression_statement
+          | ";"                                                       -> empty_statement
+          | IF "(" expression ")" statement [else_branch]             -> if_statement
+          | SWITCH "(" expression ")" "{" statement* "}"              -> switch_statement
+          | CASE expression ":"                                       -> case_label
+          | DEFAULT ":"                                               -> default_label
+          | WHILE "(" expression ")" statement                        -> while_statement
+          | DO statement WHILE "(" expression ")" ";"                 -> do_statement
+          | FOR "(" for_init [expression] ";" [expression] ")" statement -> for_statement
+          | RETURN [expression] ";"                                   -> return_statement
+          | (BREAK | CONTINUE | DISCARD) ";"                          -> jump_statement
+
+else_branch: ELSE statement
+compound_statement: "{" statement* "}"
+
+?for_init: declaration
+         | expression ";"                                             -> expression_statement
+         | ";"                                                        -> empty_statement
+
+// ===== Expresiones (de menor a mayor precedencia) =====
+
+?expression: assignment
+           | expression "," assignment                                -> sequence
+?assignment: conditional
+           | unary (EQUAL | ASSIGN_OP) assignment                     -> assign
+?conditional: logical_or
+            | logical_or "?" expression ":" assignment                -> ternary
+?logical_or: logical_xor | logical_or OR_OP logical_xor               -> binary
+?logical_xor: logical_and | logical_xor XOR_OP logical_and            -> binary
+?logical_and: bit_or | logical_and AND_OP bit_or                      -> binary
+?bit_or: bit_xor | bit_or BITOR bit_xor                               -> binary
+?bit_xor: bit_and | bit_xor BITXOR bit_and                            -> binary
+?bit_and: equality | bit_and BITAND equality                          -> binary
+?equality: relational | equality EQ_OP relational                     -> binary
+?relational: shift | relational REL_OP shift                          -> binary
+?shift: additive | shift SHIFT_OP additive                            -> binary
+?additive: multiplicative | additive ADD_OP multiplicative            -> binary
+?multiplicative: unary | multiplicative MUL_OP unary                  -> binary
+?unary: postfix
+      | (INC_OP | ADD_OP | UNARY_OP) unary                            -> prefix_op
+?postfix: primary
+        | postfix "[" expression "]"                                  -> index
+        | postfix "." IDENT                                           -> field
+        | postfix INC_OP                                              -> postfix_op
+        | IDENT "(" [arguments] ")"                                   -> call
+        | postfix "." IDENT "(" [arguments] ")"                       -> method_call
+        | TYPE_NAME [array_spec] "(" [arguments] ")"                  -> constructor
+?primary: IDENT                                                       -> identifier
+        | INTCONSTANT                                                 -> int_literal
+        | UINTCONSTANT                                                -> uint_literal
+        | FLOATCONSTANT                                               -> float_literal
+        | BOOLCONSTANT                                                -> bool_literal
+        | "(" expression ")"
+arguments: assignment ("," assignment)*
+
+%declare IDENT TYPE_NAME INTCONSTANT UINTCONSTANT FLOATCONSTANT BOOLCONSTANT
+%declare STORAGE PRECISION_Q IF ELSE FOR WHILE DO SWITCH CASE DEFAULT RETURN
+%declare BREAK CONTINUE DISCARD STRUCT PRECISION LAYOUT
+%declare ADD_OP MUL_OP SHIFT_OP REL_OP EQ_OP INC_OP UNARY_OP AND_OP OR_OP XOR_OP
+%declare BITAND BITOR BITXOR EQUAL ASSIGN_OP
+"""
+
+
+class BudgetExceeded(Exception):
+    """Se superó el presupuesto de tiempo o de expansión de macros"""
+
+
+class TimeBudgetExceeded(BudgetExceeded):
+    """Se agotó el deadline (depende de la carga de la máquina, no solo del source)"""
+
+
+class GLSLSyntaxError(ValueError):
+    """Error de sintaxis con ubicación 1-based"""
+
+    def __init__(self, message: str, line: int = 0, col: int = 0):
+        super().__init__(message)
+        self.line = line
+        self.col = col
+
+
+@dataclass
+class Macro:
+    name: str
+    params: Optional[List[str]]  # None: macro sin paréntesis
+    body: List[Token]
+
+
+@dataclass
+class ParseResult:
+    unit: ast.TranslationUnit
+    tokens: List[Token]  # Stream ya preprocesado
+    macros: Dict[str, Macro] = field(default_factory=dict)
+    warnings: List[str] = field(default_factory=list)
+
+
+# ===== PREPROCESADOR =====
+
+# Macros predefinidas (HW_PERFORMANCE la define Shadertoy)
+PREDEFINED_MACROS = {'GL_ES': '1', '__VERSION__': '300', 'HW_PERFORMANCE': '1'}
+
+# Tope de tokens generados por expansión de macros (evita "macro bombs")
+MAX_EXPANDED_TOKENS = 250_000
+
+_PREDEFINED = {
+    name: Macro(name, None, tokenize(value).tokens)
+    for name, value in PREDEFINED_MACROS.items()
+}
+
+# Condiciones de #if/#elif: enteros de 64 bits como el preprocesador de C
+MAX_CONDITION_DEPTH = 64  # paréntesis y ternarios anidados
+MAX_CONDITION_LENGTH = 4096  # caracteres; más largas ni se tokenizan (se toma la rama)
+_CONDITION_PRECEDENCE = {
+    '||': 1, '&&': 2, '|': 3, '^': 4, '&': 5, '==': 6, '!=': 6,
+    '<': 7, '>': 7, '<=': 7, '>=': 7, '<<': 8, '>>': 8, '+': 9, '-': 9, '*': 10, '/': 10, '%': 10
+}
+
+
+class _ConditionError(ValueError):
+    """Condición de #if que no es una expresión entera válida"""
+    pass
+
+
+def _wrap_int64(value: int) -> int:
+    value &= 0xFFFF_FFFF_FFFF_FFFF
+    return value - (1 << 64) if value >> 63 else value
+
+
+def _int_literal(text: str) -> int:
+    digits = text.rstrip('uUlL')
+    if not digits or len(digits) > 24:
+        raise _ConditionError(f"invalid integer '{text}'")
+    try:
+        if digits[:2] in ('0x', '0X'):
+            value = int(digits[2:], 16)
+        elif digits[0] == '0':
+            value = int(digits, 8)
+        else:
+            value = int(digits, 10)
+    except ValueError:
+        raise _ConditionError(f"invalid integer '{text}'") from None
+    return _wrap_int64(value)
+
+
+def _apply_condition_op(op: str, left: int, right: int) -> int:
+    if op in ('/', '%'):
+        if right == 0:
+            raise _ConditionError("division by zero")
+        quotient = abs(left) // abs(right) * (1 if (left < 0) == (right < 0) else -1)  # trunca hacia 0
+        return _wrap_int64(quotient if op == '/' else left - quotient * right)
+    if op in ('<<', '>>'):
+        if not 0 <= right < 64:
+            raise _ConditionError(f"shift count {right} out of range")
+        return _wrap_int64(left << right) if op == '<<' else left >> right
+    if op == '+':
+        return _wrap_int64(left + right)
+    if op == '-':
+        return _wrap_int64(left - right)
+    if op == '*':
+        return _wrap_int64(left * right)
+    if op == '&':
+        return left & right
+    if op == '|':
+        return left | right
+    if op == '^':
+        return left ^ right
+    if op == '&&':
+        return int(bool(left) and bool(right))
+    if op == '||':
+        return int(bool(left) or bool(right))
+    return int({
+        '==': left == right, '!=': left != right, '<': left < right,
+        '>': left > right, '<=': left <= right, '>=': left >= right
+    }[op])
+
+
+class _ConditionParser:
+    """
+    Evaluador de la gramática de #if (literales, unarios y binarios de C,
+    ternario). Todo se calcula en 64 bits: ningún operando crece sin límite.
+    """
+
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.i = 0
+
+    def evaluate(self) -> int:
+        value = self._ternary(0)
+        if self.i != len(self.tokens):
+            raise _ConditionError(f"unexpected '{self.tokens[self.i].value}'")
+        return value
+
+    def _peek(self) -> Optional[Token]:
+        return self.tokens[self.i] if self.i < len(self.tokens) else None
+
+    def _expect(self, value: str):
+        token = self._peek()
+        if token is None or token.value != value:
+            raise _ConditionError(f"expected '{value}'")
+        self.i += 1
+
+    def _ternary(self, depth: int) -> int:
+        if depth > MAX_CONDITION_DEPTH:
+            raise _ConditionError("condition nested too deeply")
+        condition = self._binary(1, depth)
+        token = self._peek()
+        if token is None or token.value != '?':
+            return condition
+        self.i += 1
+        when_true = self._ternary(depth + 1)
+        self._expect(':')
+        when_false = self._ternary(depth + 1)
+        return when_true if condition else when_false
+
+    def _binary(self, min_precedence: int, depth: int) -> int:
+        left = self._unary(depth)
+        while True:
+            token = self._peek()
+            precedence = _CONDITION_PRECEDENCE.get(token.value) if token is not None and token.kind == 'op' else None
+            if precedence is None or precedence < min_precedence:
+                return left
+            self.i += 1
+            right = self._binary(precedence + 1, depth)
+            left = _apply_condition_op(token.value, left, right)
+
+    def _unary(self, depth: int) -> int:
+        prefix: List[str] = []
+        token = self._peek()
+        while token is not None and token.kind == 'op' and token.value in ('+', '-', '!', '~'):
+            prefix.append(token.value)
+            self.i += 1
+            token = self._peek()
+        value = self._primary(depth)
+        for op in reversed(prefix):
+            if op == '-':
+                value = _wrap_int64(-value)
+            elif op == '!':
+                value = int(not value)
+            elif op == '~':
+                value = ~value
+        return value
+
+    def _primary(self, depth: int) -> int:
+        token = self._peek()
+        if token is None:
+            raise _ConditionError("unexpected end of condition")
+        self.i += 1
+        if token.value == '(':
+            value = self._ternary(depth + 1)
+            self._expect(')')
+            return value
+        if token.kind == 'number':
+            return _int_literal(token.value)
+        if token.kind == 'ident':
+            return 0  # identificadores no definidos valen 0
+        raise _ConditionError(f"unexpected '{token.value}'")
+
+
+class Preprocessor:
+    """
+    Preprocesador GLSL mínimo
+
+    Expande macros a nivel de tokens (los tokens expandidos conservan la
+    ubicación del uso) y descarta las ramas inactivas de #if/#ifdef.
+    No soporta pegado (##) ni stringificación (#).
+    """
+
+    def __init__(self, max_expanded_tokens: int = MAX_EXPANDED_TOKENS, deadline: Optional[float] = None,
+                 macros: Optional[Dict[str, Macro]] = None):
+        self.macros: Dict[str, Macro] = dict(_PREDEFINED if macros is None else macros)
+        self.warnings: List[str] = []
+        self.max_expanded_tokens = max_expanded_tokens
+        self.deadline = deadline  # time.perf_counter() absoluto
+        self._expanded = 0
+
+    def run(self, tokens: List[Token]) -> List[Token]:
+        output: List[Token] = []
+        run: List[Token] = []
+        # Pila de condicionales: (rama activa, alguna rama ya tomada)
+        conditions: List[Tuple[bool, bool]] = []
+        active = True
+
+        for token in tokens:
+            if token.kind != 'preproc':
+                if active:
+                    run.append(token)
+                continue
+
+            self._expand(run, output, frozenset())
+            run = []
+            self._check_deadline()
+            source = token.value[1:].replace('\\\n', ' ')
+            head = source.split(None, 1)
+            if head and head[0] in ('if', 'elif') and len(source) > MAX_CONDITION_LENGTH:
+                self.warnings.append(f"#{head[0]} condition too long at line {token.location}")
+                source = head[0]
+                long_condition = True
+            else:
+                long_condition = False
+            words = tokenize(source).tokens
+            if not words:
+                continue
+            directive = words[0].value
+            args = None if long_condition else words[1:]
+
+            if directive in ('if', 'ifdef', 'ifndef'):
+                if not active:
+                    taken = True  # todo el bloque queda inactivo
+                    branch = False
+                elif directive == 'if':
+                    branch = self._evaluate(args)
+                    taken = branch
+                else:
+                    branch = bool(args) and (args[0].value in self.macros) == (directive == 'ifdef')
+                    taken = branch
+                conditions.append((active, taken))
+                active = active and branch
+            elif directive in ('elif', 'else'):
+                if not conditions:
+                    self.warnings.append(f"#{directive} without #if at line {token.location}")
+                    continue
+                parent_active, taken = conditions[-1]
+                branch = not taken and (directive == 'else' or self._evaluate(args))
+                conditions[-1] = (parent_active, taken or branch)
+                active = parent_active and branch
+            elif directive == 'endif':
+                if not conditions:
+                    self.warnings.append(f"#endif without #if at line {token.location}")
+                    continue
+                active = conditions.pop()[0]
+            elif not active:
+                continue
+            elif directive == 'define' and args:
+                self._define(token, args)
+            elif directive == 'undef' and args:
+                self.macros.pop(args[0].value, None)
+            # version, extension, pragma, line, error: no afectan al parseo
+
+        self._expand(run, output, frozenset())
+        if conditions:
+            self.warnings.append(f"Unterminated #if ({len(conditions)} open)")
+        return output
+
+    def _define(self, directive: Token, args: List[Token]):
+        name_token = args[0]
+        source = directive.value[1:].replace('\\\n', ' ')
+        name_end = name_token.pos + len(name_token.value)
+
+        # Macro con parámetros solo si '(' va pegado al nombre
+        if name_end < len(source) and source[name_end] == '(':
+            params = []
+            i = 2
+            while i < len(args) and args[i].value != ')':
+                if args[i].kind == 'ident':
+                    params.append(args[i].value)
+                i += 1
+            self.macros[name_token.value] = Macro(name_token.value, params, args[i + 1:])
+        else:
+            self.macros[name_token.value] = Macro(name_token.value, None, args[1:])
+
+    def _expand(self, tokens: List[Token], output: List[Token], disabled: frozenset,
+                site: Optional[Token] = None):
+        """Expande macros de `tokens` en `output` (site: ubicación del uso original)"""
+        macros = self.macros
+        append = output.append
+        parens = None  # paréntesis emparejados, solo si hay macros con parámetros
+        i = 0
+        count = len(tokens)
+        while i < count:
+            token = tokens[i]
+            macro = macros.get(token.value) if token.kind == 'ident' else None
+
+            if macro is None or token.value in disabled:
+                append(_relocate(token, site) if site else token)
+                i += 1
+                continue
+
+            use_site = site or token
+            if macro.params is None:
+                self._charge(len(macro.body))
+                self._expand(macro.body, output, disabled | {macro.name}, use_site)
+                i += 1
+                continue
+
+            # Macro con parámetros sin '(' a continuación: es un identificador normal
+            if i + 1 >= count or tokens[i + 1].value != '(':
+                append(_relocate(token, site) if site else token)
+                i += 1
+                continue
+
+            if parens is None:
+                parens = _match_parens(tokens)
+            end = parens.get(i + 1)
+            if end is None:
+                append(_relocate(token, site) if site else token)
+                i += 1
+                continue
+
+            # Los argumentos se expanden antes de sustituir
+            expanded = []
+            for arg in _split_macro_args(tokens, i + 2, end):
+                arg_tokens: List[Token] = []
+                self._expand(arg, arg_tokens, disabled, site)
+                expanded.append(arg_tokens)
+
+            body: List[Token] = []
+            for body_token in macro.body:
+                if body_token.kind == 'ident' and body_token.value in macro.params:
+                    index = macro.params.index(body_token.value)
+                    if index < len(expanded):
+                        body.extend(expanded[index])
+                        continue
+                body.append(body_token)
+
+            self._charge(len(body))
+            self._expand(body, output, disabled | {macro.name}, use_site)
+            i = end + 1
+
+    def _charge(self, count: int):
+        """Cuenta tokens generados por expansión y verifica los presupuestos"""
+        self._expanded += count
+        if self._expanded > self.max_expanded_tokens:
+            raise BudgetExceeded(f"macro expansion exceeds {self.max_expanded_tokens} tokens")
+        self._check_deadline()
+
+    def _check_deadline(self):
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise TimeBudgetExceeded("time budget exceeded during preprocessing")
+
+    def _evaluate(self, args: Optional[List[Token]]) -> bool:
+        """Evalúa la condición de un #if/#elif (si no se puede, se toma la rama)"""
+        if args is None:
+            return True
+        # defined NAME / defined(NAME) se resuelven antes de expandir macros
+        resolved: List[Token] = []
+        i = 0
+        while i < len(args):
+            token = args[i]
+            if token.value != 'defined':
+                resolved.append(token)
+                i += 1
+                continue
+            parenthesized = i + 1 < len(args) and args[i + 1].value == '('
+            j = i + 2 if parenthesized else i + 1
+            name = args[j].value if j < len(args) else ''
+            value = '1' if name in self.macros else '0'
+            resolved.append(tuple.__new__(Token, ('number', value, token.pos, token.line, token.col)))
+            i = j + 2 if parenthesized else j + 1
+
+        expanded: List[Token] = []
+        self._expand(resolved, expanded, frozenset())
+
+        # Sin eval: el texto del shader nunca llega a Python
+        try:
+            return bool(_ConditionParser(expanded).evaluate()) if expanded else False
+        except _ConditionError:
+            return True
+
+
+def _relocate(token: Token, site: Token) -> Token:
+    return tuple.__new__(Token, (token.kind, token.value, site.pos, site.line, site.col))
+
+
+def _match_parens(tokens: List[Token]) -> Dict[int, int]:
+    """Índice de '(' -> índice de su ')' en una sola pasada"""
+    matches: Dict[int, int] = {}
+    stack: List[int] = []
+    for i, token in enumerate(tokens):
+        if token.kind != 'op':
+            continue
+        if token.value == '(':
+            stack.append(i)
+        elif token.value == ')' and stack:
+            matches[stack.pop()] = i
+    return matches
+
+
+def _split_macro_args(tokens: List[Token], start: int, end: int) -> List[List[Token]]:
+    """Separa los argumentos de tokens[start:end] por las comas de nivel superior"""
+    if start == end:
+        return []
+    args: List[List[Token]] = [[]]
+    depth = 0
+    for i in range(start, end):
+        value = tokens[i].value
+        if value == '(':
+            depth += 1
+        elif value == ')':
+            depth -= 1
+        elif value == ',' and depth == 0:
+            args.append([])
+            continue
+        args[-1].append(tokens[i])
+    return args
+
+
+# ===== CONSTRUCCIÓN DEL AST =====
+
+def _loc(item) -> Tuple[int, int]:
+    """Ubicación de un token o de un nodo del AST"""
+    if isinstance(item, Token):
+        return item.line, item.col
+    if isinstance(item, ast.Node):
+        return item.line, item.col
+    return 0, 0
+
+
+def _leftmost(expr: ast.Expr) -> Tuple[int, int]:
+    """Inicio de una expresión (los operadores binarios se ubican en el operador)"""
+    while True:
+        if isinstance(expr, (ast.BinaryOp, ast.Assignment)):
+            expr = expr.left if isinstance(expr, ast.BinaryOp) else expr.target
+        elif isinstance(expr, (ast.Index, ast.FieldAccess)):
+            expr = expr.base
+        elif isinstance(expr, ast.UnaryOp) and expr.postfix:
+            expr = expr.operand
+        elif isinstance(expr, ast.Call) and expr.method_of is not None:
+            expr = expr.method_of
+        elif isinstance(expr, ast.Sequence):
+            expr = expr.exprs[0]
+        else:
+            return expr.line, expr.col
+
+
+@v_args(inline=True)
+class _ASTBuilder(Transformer):
+    """Callbacks de la gramática: cada regla produce su nodo del AST"""
+
+    def start(self, *declarations):
+        return ast.TranslationUnit(1, 1, [d for d in declarations if d is not None])
+
+    # ----- Funciones -----
+
+    def function_prototype(self, full_type, name, params):
+        return_type = full_type[1]
+        return ast.FunctionDecl(name.line, name.col, return_type, name.value, params or [])
+
+    def function_definition(self, prototype, body):
+        prototype.body = body
+        return prototype
+
+    def prototype(self, prototype):
+        return prototype
+
+    def parameter_list(self, *params):
+        return list(params)
+
+    def parameter(self, *args):
+        *qualifiers, type_spec, declarator = args
+        name, array_sizes = declarator or (None, [])
+        return ast.Param(type_spec.line, type_spec.col, list(qualifiers), type_spec, name, array_sizes)
+
+    def param_declarator(self, name, array_sizes):
+        return name.value, array_sizes or []
+
+    # ----- Declaraciones -----
+
+    def var_declaration(self, full_type, declarators):
+        qualifiers, type_spec = full_type
+        line, col = _loc(type_spec)
+        return ast.VarDecl(line, col, qualifiers, type_spec, declarators or [])
+
+    def interface_block(self, qualifiers, name, *rest):
+        *members, instance = rest
+        return ast.InterfaceBlock(name.line, name.col, qualifiers, name.value, members, instance)
+
+    def block_instance(self, name, array_sizes):
+        return ast.Declarator(name.line, name.col, name.value, array_sizes or [])
+
+    def precision_declaration(self, keyword, precision, type_spec):
+        return ast.PrecisionDecl(keyword.line, keyword.col, precision.value, type_spec)
+
+    def qualifier_declaration(self, qualifiers):
+        return ast.EmptyStmt(0, 0)
+
+    def fully_specified_type(self, qualifiers, type_spec):
+        return qualifiers or [], type_spec
+
+    def qualifiers(self, *qualifiers):
+        return list(qualifiers)
+
+    def qualifier(self, value):
+        return value if isinstance(value, str) else value.value
+
+    def layout_qualifier(self, keyword, *ids):
+        return f"layout({', '.join(ids)})"
+
+    def layout_id(self, name, value):
+        return f"{name.value}={value}" if value is not None else name.value
+
+    def layout_value(self, equal, value):
+        return value.value
+
+    def type_specifier(self, base, array_sizes):
+        if isinstance(base, ast.StructDecl):
+            name = base.name or ''
+            return ast.TypeSpec(base.line, base.col, name, array_sizes or [], base)
+        return ast.TypeSpec(base.line, base.col, base.value, array_sizes or [])
+
+    def struct_specifier(self, keyword, name, *members):
+        return ast.StructDecl(keyword.line, keyword.col, name.value if name is not None else None, list(members))
+
+    def struct_member(self, full_type, *declarators):
+        qualifiers, type_spec = full_type
+        return ast.VarDecl(type_spec.line, type_spec.col, qualifiers, type_spec, list(declarators))
+
+    def struct_declarator(self, name, array_sizes):
+        return ast.Declarator(name.line, name.col, name.value, array_sizes or [])
+
+    def array_spec(self, *dims):
+        return list(dims)
+
+    def array_dim(self, size):
+        return size
+
+    def init_declarator_list(self, *declarators):
+        return list(declarators)
+
+    def init_declarator(self, name, array_sizes, initializer):
+        return ast.Declarator(name.line, name.col, name.value, array_sizes or [], initializer)
+
+    def initializer_part(self, equal, initializer):
+        return initializer
+
+    def initializer_list(self, *items):
+        line, col = _loc(items[0])
+        return ast.InitializerList(line, col, list(items))
+
+    # ----- Statements -----
+
+    def compound_statement(self, *statements):
+        line, col = _loc(statements[0]) if statements else (0, 0)
+        return ast.Block(line, col, list(statements))
+
+    def expression_statement(self, expr):
+        line, col = _leftmost(expr)
+        return ast.ExprStmt(line, col, expr)
+
+    def empty_statement(self):
+        return ast.EmptyStmt(0, 0)
+
+    def if_statement(self, keyword, condition, then, otherwise):
+        return ast.If(keyword.line, keyword.col, condition, then, otherwise)
+
+    def else_branch(self, keyword, statement):
+        return statement
+
+    def switch_statement(self, keyword, expr, *body):
+        return ast.Switch(keyword.line, keyword.col, expr, list(body))
+
+    def case_label(self, keyword, value):
+        return ast.CaseLabel(keyword.line, keyword.col, value)
+
+    def default_label(self, keyword):
+        return ast.CaseLabel(keyword.line, keyword.col, None)
+
+    def while_statement(self, keyword, condition, body):
+        return ast.While(keyword.line, keyword.col, condition, body)
+
+    def do_statement(self, keyword, body, while_keyword, condition):
+        return ast.DoWhile(keyword.line, keyword.col, body, condition)
+
+    def for_statement(self, keyword, init, condition, step, body):
+        if isinstance(init, ast.EmptyStmt):
+            init = None
+        return ast.For(keyword.line, keyword.col, init, condition, step, body)
+
+    def return_statement(self, keyword, value):
+        return ast.Return(keyword.line, keyword.col, value)
+
+    def jump_statement(self, keyword):
+        return ast.Jump(keyword.line, keyword.col, keyword.value)
+
+    # ----- Expresiones -----
+
+    def sequence(self, left, right):
+        if isinstance(left, ast.Sequence):
+            left.exprs.append(right)
+            return left
+        return ast.Sequence(left.line, left.col, [left, right])
+
+    def assign(self, target, op, value):
+        return ast.Assignment(op.line, op.col, op.value, target, value)
+
+    def ternary(self, condition, if_true, if_false):
+        return ast.Ternary(condition.line, condition.col, condition, if_true, if_false)
+
+    def binary(self, left, op, right):
+        return ast.BinaryOp(op.line, op.col, op.value, left, right)
+
+    def prefix_op(self, op, operand):
+        return ast.UnaryOp(op.line, op.col, op.value, operand)
+
+    def postfix_op(self, operand, op):
+        return ast.UnaryOp(op.line, op.col, op.value, operand, postfix=True)
+
+    def index(self, base, index):
+        return ast.Index(base.line, base.col, base, index)
+
+    def field(self, base, name):
+        return ast.FieldAccess(name.line, name.col, base, name.value)
+
+    def call(self, name, args):
+        return ast.Call(name.line, name.col, name.value, args or [])
+
+    def method_call(self, base, name, args):
+        return ast.Call(name.line, name.col, name.value, args or [], method_of=base)
+
+    def constructor(self, type_name, array_sizes, args):
+        return ast.Call(
+            type_name.line, type_name.col, type_name.value, args or [],
+            is_constructor=True, array_sizes=array_sizes or []
+        )
+
+    def arguments(self, *args):
+        return list(args)
+
+    def identifier(self, name):
+        return ast.Identifier(name.line, name.col, name.value)
+
+    def int_literal(self, token):
+        return ast.Literal(token.line, token.col, token.value, 'int')
+
+    def uint_literal(self, token):
+        return ast.Literal(token.line, token.col, token.value, 'uint')
+
+    def float_literal(self, token):
+        return ast.Literal(token.line, token.col, token.value, 'float')
+
+    def bool_literal(self, token):
+        return ast.Literal(token.line, token.col, token.value, 'bool')
+
+
+class _LALRDriver:
+    """
+    Ejecuta la tabla LALR de lark sobre el stream de tokens
+
+    lark construye la tabla y los callbacks del transformer; este driver
+    evita el lexer de lark y no invoca callbacks en las reducciones
+    unitarias de la cascada de precedencia (expression -> ... -> primary),
+    que son la mayoría de las reducciones en código real.
+    """
+
+    def __init__(self, lark: Lark):
+        parser = lark.parser.parser.parser
+        table = parser.parse_table
+        callbacks = parser.callbacks
+
+        self.start_state = table.start_states['start']
+        self.end_state = table.end_states['start']
+        self.states: Dict[int, Dict[str, Tuple[bool, object]]] = {}
+        for state, actions in table.states.items():
+            compiled = {}
+            for symbol, (action, arg) in actions.items():
+                if action is Shift:
+                    compiled[symbol] = (True, arg)
+                else:
+                    callback = None if _is_passthrough(arg) else callbacks[arg]
+                    compiled[symbol] = (False, (len(arg.expansion), arg.origin.name, callback))
+            self.states[state] = compiled
+
+        # Terminales anónimos de la puntuación: "(" -> LPAR, ";" -> SEMICOLON...
+        self.terminals = {t.pattern.value: t.name for t in lark.terminals if t.pattern.type == 'str'}
+        self.terminals.update(_OPERATOR_TERMINALS)
+
+    def terminal_types(self, tokens: List[Token], type_names: Set[str]) -> List[str]:
+        """Terminal de la gramática para cada token"""
+        keywords = _KEYWORD_TERMINALS
+        terminals = self.terminals
+        result = []
+        append = result.append
+
+        for token in tokens:
+            kind, value = token[0], token[1]
+            if kind == 'ident':
+                terminal = keywords.get(value)
+                if terminal is None:
+                    terminal = 'TYPE_NAME' if value in TYPE_NAMES or value in type_names else 'IDENT'
+            elif kind == 'number':
+                terminal = _number_terminal(value)
+            else:
+                terminal = terminals.get(value)
+                if terminal is None:
+                    raise GLSLSyntaxError(
+                        f"Unexpected token '{value}' at line {token.location}", token.line, token.col
+                    )
+            append(terminal)
+        return result
+
+    def parse(self, tokens: List[Token], terminals: List[str], source: Optional[str],
+              deadline: Optional[float] = None) -> ast.TranslationUnit:
+        states = self.states
+        state_stack = [self.start_state]
+        value_stack: list = []
+
+        for index, terminal in enumerate(terminals):
+            if deadline is not None and not index & 4095 and time.perf_counter() > deadline:
+                raise TimeBudgetExceeded("time budget exceeded while parsing")
+            while True:
+                try:
+                    is_shift, arg = states[state_stack[-1]][terminal]
+                except KeyError:
+                    raise _syntax_error(index, states[state_stack[-1]], tokens, source) from None
+
+                if is_shift:
+                    state_stack.append(arg)
+                    value_stack.append(tokens[index])
+                    break
+
+                size, origin, callback = arg
+                if size:
+                    children = value_stack[-size:]
+                    del state_stack[-size:]
+                    del value_stack[-size:]
+                else:
+                    children = []
+                value_stack.append(children[0] if callback is None else callback(children))
+                state_stack.append(states[state_stack[-1]][origin][1])
+
+        # Fin del input: reducir hasta el estado de aceptación
+        while state_stack[-1] != self.end_state:
+            try:
+                is_shift, arg = states[state_stack[-1]]['$END']
+            except KeyError:
+                raise _syntax_error(len(tokens), states[state_stack[-1]], tokens, source) from None
+            size, origin, callback = arg
+            if size:
+                children = value_stack[-size:]
+                del state_stack[-size:]
+                del value_stack[-size:]
+            else:
+                children = []
+            value_stack.append(children[0] if callback is None else callback(children))
+            state_stack.append(states[state_stack[-1]][origin][1])
+
+        return value_stack[-1]
+
+
+def _is_passthrough(rule) -> bool:
+    """Regla `?x: y` de un solo no-terminal: el callback retornaría el hijo tal cual"""
+    if not rule.options.expand1 or rule.alias is not None or len(rule.expansion) != 1:
+        return False
+    symbol = rule.expansion[0]
+    return not symbol.is_term and not symbol.name.startswith('_')
+
+
+def _number_terminal(value: str) -> str:
+    if value[:2] in ('0x', '0X'):
+        return 'UINTCONSTANT' if value[-1] in 'uU' else 'INTCONSTANT'
+    if value[-1] in 'uU':
+        return 'UINTCONSTANT'
+    if '.' in value or 'e' in value or 'E' in value or value[-1] in 'fF':
+        return 'FLOATCONSTANT'
+    return 'INTCONSTANT'
+
+
+_driver: Optional[_LALRDriver] = None
+_driver_lock = threading.Lock()
+
+
+def get_driver() -> _LALRDriver:
+    """Parser LALR compartido (la tabla se construye una sola vez por proceso)"""
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                lark = Lark(
+                    GRAMMAR,
+                    parser='lalr',
+                    lexer='standard',  # no se usa: los tokens vienen de core.glsl_tokenizer
+                    transformer=_ASTBuilder(),
+                    maybe_placeholders=True
+                )
+                _driver = _LALRDriver(lark)
+    return _driver
+
+
+def _struct_names(tokens: List[Token]) -> Set[str]:
+    """Nombres declarados con `struct Name`: el lexer los trata como tipos"""
+    names = set()
+    for i in range(len(tokens) - 1):
+        if tokens[i].value == 'struct' and tokens[i + 1].kind == 'ident':
+            names.add(tokens[i + 1].value)
+    return names
+
+
+def parse(code: str) -> ParseResult:
+    """
+    Parsea código GLSL
+
+    Raises:
+        GLSLSyntaxError: con la ubicación del primer error
+    """
+    return parse_tokens(tokenize(code).tokens, code)
+
+
+def parse_tokens(tokens: List[Token], source: Optional[str] = None, deadline: Optional[float] = None,
+                 max_expanded_tokens: int = MAX_EXPANDED_TOKENS,
+                 macros: Optional[Dict[str, Macro]] = None,
+                 struct_names: Optional[Set[str]] = None) -> ParseResult:
+    """
+    Parsea tokens ya producidos por core.glsl_tokenizer.tokenize
+
+    El source (opcional) solo se usa para citar la línea en los errores.
+    deadline es un time.perf_counter() absoluto. macros y struct_names son
+    los declarados antes de estos tokens (por defecto solo las macros
+    predefinidas y ningún struct).
+
+    Raises:
+        GLSLSyntaxError: con la ubicación del primer error
+        BudgetExceeded: si se agota el tiempo o la expansión de macros
+    """
+    driver = get_driver()
+    preprocessor = Preprocessor(max_expanded_tokens, deadline, macros)
+    try:
+        expanded = preprocessor.run(tokens)
+    except RecursionError:
+        raise BudgetExceeded("macro expansion too deep") from None
+    structs = _struct_names(expanded)
+    if struct_names:
+        structs |= struct_names
+    terminals = driver.terminal_types(expanded, structs)
+    unit = driver.parse(expanded, terminals, source, deadline)
+    return ParseResult(unit=unit, tokens=expanded, macros=preprocessor.macros, warnings=preprocessor.warnings)
+
+
+def _syntax_error(index: int, actions: Dict[str, object], tokens: List[Token],
+                  source: Optional[str]) -> GLSLSyntaxError:
+    """Error legible para el token `index` (len(tokens) = fin del input)"""
+    if index >= len(tokens):
+        line = tokens[-1].line if tokens else 1
+        return GLSLSyntaxError(f"Unexpected end of input at line {line}", line, 0)
+
+    token = tokens[index]
+    previous = tokens[index - 1] if index else None
+
+    # El statement anterior terminó en otra línea sin ';'
+    if previous is not None and 'SEMICOLON' in actions and previous.line < token.line:
+        line_text = ''
+        if source is not None:
+            lines = source.split('\n')
+            if previous.line <= len(lines):
+                line_text = lines[previous.line - 1].strip()
+        return GLSLSyntaxError(f"Line {previous.line}: Missing semicolon: '{line_text}'", previous.line, previous.col)
+
+    # `foo x;` donde foo no es un tipo conocido
+    if token.kind == 'ident' and previous is not None and previous.kind == 'ident' \
+            and previous.value not in _KEYWORD_TERMINALS and previous.value not in TYPE_NAMES:
+        return GLSLSyntaxError(
+            f"Unknown type '{previous.value}' at line {previous.location}", previous.line, previous.col
+        )
+
+    return GLSLSyntaxError(f"Unexpected token '{token.value}' at line {token.location}", token.line, token.col)
@@ -0,0 +1,81 @@
+"""
+Tokenizador GLSL de una sola pasada
+Produce el stream de tokens (con línea y columna) sobre el que corren las
+reglas de GLSLValidator. Tiempo lineal: ninguna alternativa del patrón
+puede hacer backtracking sobre más de un token.
+"""
+
+import re
+from typing import List, NamedTuple
+
+
+class Token(NamedTuple):
+    kind: str  # ident, number, op, preproc, invalid
+    value: str
+    pos: int  # offset en el source
+    line: int  # 1-based
+    col: int  # 1-based
+
+    @property
+    def location(self) -> str:
+        return f"{self.line}:{self.col}"
+
+
+# Operadores de varios caracteres primero (longest match)
+_OPERATORS = (
+    r'<<=|>>=|\+\+|--|<<|>>|<=|>=|==|!=|&&|\|\||\^\^|\+=|-=|\*=|/=|%=|&=|\|=|\^='
+    r'|[-+*/%<>=!&|^~?:.,;(){}\[\]]'
+)
+
+_TOKEN_RE = re.compile(
+    r'(?P<space>\s+|//[^\n]*)'
+    r'|(?P<block_comment>/\*[\s\S]*?(?:\*/|\Z))'
+    r'|(?P<preproc>#(?:[^\n\\]|\\[\s\S])*)'
+    r'|(?P<number>0[xX][0-9a-fA-F]+[uU]?|(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?[uUfF]?)'
+    r'|(?P<ident>[A-Za-z_]\w*)'
+    rf'|(?P<op>{_OPERATORS})'
+    r'|(?P<invalid>.)',
+    re.DOTALL
+)
+
+
+class TokenizeResult(NamedTuple):
+    tokens: List[Token]
+    unterminated_comment: bool
+    line_count: int
+
+
+def tokenize(code: str) -> TokenizeResult:
+    """
+    Tokeniza código GLSL en una sola pasada
+
+    Comentarios y espacios se descartan; las directivas de preprocesador
+    se conservan como un único token 'preproc'.
+    """
+    tokens: List[Token] = []
+    append = tokens.append
+    new_token = tuple.__new__  # evita el overhead del constructor de NamedTuple
+    line = 1
+    line_start = 0
+    unterminated_comment = False
+
+    for match in _TOKEN_RE.finditer(code):
+        kind = match.lastgroup
+        value = match.group()
+        start = match.start()
+
+        if kind == 'space' or kind == 'block_comment' or kind == 'preproc':
+            if kind == 'block_comment' and not value.endswith('*/'):
+                unterminated_comment = True
+            elif kind == 'preproc':
+                append(new_token(Token, (kind, value, start, line, start - line_start + 1)))
+            # Espacios, comentarios y directivas pueden abarcar varias líneas
+            newlines = value.count('\n')
+            if newlines:
+                line += newlines
+                line_start = start + value.rfind('\n') + 1
+            continue
+
+        append(new_token(Token, (kind, value, start, line, start - line_start + 1)))
+
+    return TokenizeResult(tokens, unterminated_comment, line)
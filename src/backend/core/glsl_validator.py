@@ -1,11 +1,34 @@
 """
 Validador de sintaxis GLSL
-Verifica que el código GLSL generado sea sintácticamente correcto
+Verifica que el código GLSL generado sea sintácticamente correcto.
+Las reglas corren sobre el AST de core.glsl_parser (gramática LALR) y el
+análisis de scopes y tipos de core.glsl_analyzer.
+
+Cada validación tiene un presupuesto de tamaño y de tiempo: si se agota,
+el resultado cubre solo lo analizado hasta ese punto y sale con
+truncated=True en lugar de bloquear el worker.
 """
 
-import re
-from typing import List, Dict, Tuple, Optional
-from dataclasses import dataclass
+import os
+import time
+from typing import List, Dict, Optional, Tuple
+from dataclasses import dataclass, field
+
+from core.compiler import ShaderMetadata
+from core.glsl_analyzer import GLSLAnalyzer
+from core.glsl_lint import PerformanceHint, lint_performance
+from core.glsl_parser import BudgetExceeded, GLSLSyntaxError, ParseResult, TimeBudgetExceeded, parse_tokens
+from core.glsl_tokenizer import Token, tokenize
+
+# Versión de las reglas: incrementar cuando cambie el resultado para un
+# mismo source, así se invalidan los resultados cacheados
+VALIDATOR_VERSION = "2.2.0"
+
+# Presupuestos por validación (0 desactiva el límite)
+MAX_SOURCE_SIZE = int(os.getenv("GLSL_VALIDATION_MAX_SIZE", 256 * 1024))
+TIME_BUDGET_MS = float(os.getenv("GLSL_VALIDATION_TIME_BUDGET_MS", 750))
+MAX_BRACKET_ERRORS = 50
+MAX_NESTING_DEPTH = 256  # mismo orden que el límite de complejidad de expresiones de ANGLE
 
 @dataclass
 class ValidationResult:
@@ -14,6 +37,9 @@ class ValidationResult:
     errors: List[str]
     warnings: List[str]
     suggestions: List[str]
+    truncated: bool = False  # True si se agotó el presupuesto de tamaño o tiempo
+    timed_out: bool = False  # Truncado por tiempo: depende de la carga, no es reproducible
+    performance: List[PerformanceHint] = field(default_factory=list)  # lint de rendimiento (ver core.glsl_lint)
 
 class GLSLValidator:
     """
@@ -62,52 +88,99 @@ class GLSLValidator:
         'attribute', 'highp', 'mediump', 'lowp'
     }
 
-    def __init__(self):
+    # Keywords de control (nunca son nombres de función ni variables)
+    GLSL_KEYWORDS = {
+        'if', 'else', 'for', 'while', 'do', 'return', 'break', 'continue',
+        'discard', 'switch', 'case', 'default', 'struct', 'true', 'false'
+    }
+
+    BRACKET_PAIRS = {'(': ')', '{': '}', '[': ']'}
+
+    def __init__(self, max_source_size: Optional[int] = None, time_budget_ms: Optional[float] = None):
+        self.max_source_size = MAX_SOURCE_SIZE if max_source_size is None else max_source_size
+        self.time_budget_ms = TIME_BUDGET_MS if time_budget_ms is None else time_budget_ms
+        self.truncated = False
+        self.timed_out = False
         self.errors: List[str] = []
         self.warnings: List[str] = []
         self.suggestions: List[str] = []
         self.declared_variables: Dict[str, str] = {}  # var_name -> type
         self.declared_functions: Dict[str, Dict] = {}  # func_name -> metadata
         self.declared_uniforms: Dict[str, str] = {}  # uniform_name -> type
+        self.tokens: List[Token] = []
+        self.parsed: Optional[ParseResult] = None
+        self.bracket_matches: Dict[int, int] = {}  # índice de apertura -> índice de cierre
+        self.bracket_errors: List[str] = []
 
     def validate(self, code: str) -> ValidationResult:
         """
         Valida código GLSL
 
+        El source se tokeniza una sola vez; el mismo stream alimenta el
+        chequeo de paréntesis, el parser LALR y el análisis semántico sobre
+        el AST. Las ubicaciones se reportan como línea:columna.
+
         Returns:
-            ValidationResult con is_valid, errors, warnings, suggestions
+            ValidationResult con is_valid, errors, warnings, suggestions, truncated
         """
+        deadline = time.perf_counter() + self.time_budget_ms / 1000 if self.time_budget_ms > 0 else None
+        self.truncated = False
+        self.timed_out = False
         self.errors = []
         self.warnings = []
         self.suggestions = []
+        self.performance = []
         self.declared_variables = {}
         self.declared_functions = {}
         self.declared_uniforms = {}
+        self.bracket_matches = {}
+        self.bracket_errors = []
 
         if not code or not code.strip():
             self.errors.append("Empty shader code")
             return self._build_result()
 
-        # 1. Validar estructura básica
-        self._validate_structure(code)
-
-        # 2. Validar declaraciones de uniforms
-        self._validate_uniforms(code)
-
-        # 3. Validar funciones
-        self._validate_functions(code)
-
-        # 4. Validar sintaxis de statements
-        self._validate_statements(code)
-
-        # 5. Validar uso de variables
-        self._validate_variable_usage(code)
+        source = code
+        if 0 < self.max_source_size < len(code):
+            # Cortar en la última línea completa antes del límite
+            cut = code.rfind('\n', 0, self.max_source_size)
+            source = code[:cut if cut > 0 else self.max_source_size]
+            self._truncate(f"source exceeds {self.max_source_size} bytes")
+
+        tokenized = tokenize(source)
+        self.tokens = tokenized.tokens
+        self.parsed = None
+        if self.truncated:
+            self.tokens = self._complete_prefix(self.tokens)
+
+        if tokenized.unterminated_comment:
+            self.warnings.append("Unterminated block comment")
+        for token in self.tokens:
+            if token.kind == 'invalid':
+                self.errors.append(f"Unexpected character '{token.value}' at line {token.location}")
+
+        # 1. Paréntesis y llaves: errores más precisos que los del parser
+        self._match_brackets()
+
+        # 2. Validar estructura básica
+        self._validate_structure()
+        self.errors.extend(self.bracket_errors)
+        if self.bracket_errors or any(t.kind == 'invalid' for t in self.tokens):
+            return self._build_result()
 
-        # 6. Validar tipos
-        self._validate_types(code)
+        # 3. Parsear (el primer error de sintaxis corta la validación)
+        try:
+            self.parsed = parse_tokens(self.tokens, source, deadline)
+        except GLSLSyntaxError as e:
+            self.errors.append(str(e))
+            return self._build_result()
+        except BudgetExceeded as e:
+            self._truncate(str(e), isinstance(e, TimeBudgetExceeded))
+            return self._build_result()
+        self.warnings.extend(self.parsed.warnings)
 
-        # 7. Validar paréntesis y llaves
-        self._validate_brackets(code)
+        # 4. Scopes, declaraciones y tipos sobre el AST
+        self._validate_semantics(self.parsed, deadline)
 
         return self._build_result()
 
@@ -117,166 +190,113 @@ class GLSLValidator:
             is_valid=len(self.errors) == 0,
             errors=self.errors,
             warnings=self.warnings,
-            suggestions=self.suggestions
+            suggestions=self.suggestions,
+            truncated=self.truncated,
+            timed_out=self.timed_out,
+            performance=self.performance
         )
 
-    def _validate_structure(self, code: str):
+    def _truncate(self, reason: str, timed_out: bool = False):
+        self.truncated = True
+        self.timed_out = self.timed_out or timed_out
+        self.warnings.append(f"Validation truncated: {reason}")
+
+    @staticmethod
+    def _complete_prefix(tokens: List[Token]) -> List[Token]:
+        """Tokens hasta el último `;` o `}` de nivel superior (descarta la declaración cortada)"""
+        depth = 0
+        end = 0
+        for i, token in enumerate(tokens):
+            if token.kind != 'op':
+                continue
+            value = token.value
+            if value in '({[':
+                depth += 1
+            elif value in ')}]':
+                depth -= 1
+                if depth == 0 and value == '}':
+                    end = i + 1
+            elif value == ';' and depth == 0:
+                end = i + 1
+        return tokens[:end]
+
+    def _match_brackets(self):
+        """Empareja paréntesis, llaves y corchetes en una pasada sobre los tokens"""
+        self.bracket_matches, self.bracket_errors = match_brackets(self.tokens)
+
+    def _validate_structure(self):
         """Valida estructura básica del shader"""
-        # Verificar función main
-        if 'void mainImage' not in code and 'void main' not in code:
+        # Verificar función main (en un source truncado puede estar después del corte)
+        if not self.truncated and self._find_main_index() is None:
             self.errors.append("Missing main function (void mainImage or void main)")
 
         # Verificar que tenga llaves balanceadas en general
-        open_braces = code.count('{')
-        close_braces = code.count('}')
+        open_braces = sum(1 for t in self.tokens if t.value == '{' and t.kind == 'op')
+        close_braces = sum(1 for t in self.tokens if t.value == '}' and t.kind == 'op')
         if open_braces != close_braces:
             self.errors.append(f"Unbalanced braces: {open_braces} open, {close_braces} close")
 
-    def _validate_uniforms(self, code: str):
-        """Valida declaraciones de uniforms"""
-        # Patrón: uniform type name;
-        uniform_pattern = r'uniform\s+(\w+)\s+(\w+)\s*;'
-
-        for match in re.finditer(uniform_pattern, code):
-            uniform_type = match.group(1)
-            uniform_name = match.group(2)
-
-            if uniform_type not in self.GLSL_TYPES:
-                self.warnings.append(f"Unknown uniform type: {uniform_type}")
-
-            self.declared_uniforms[uniform_name] = uniform_type
-
-    def _validate_functions(self, code: str):
-        """Valida declaraciones de funciones"""
-        # Patrón: type name(params) { ... }
-        func_pattern = r'(\w+)\s+(\w+)\s*\([^)]*\)\s*\{'
-
-        for match in re.finditer(func_pattern, code):
-            return_type = match.group(1)
-            func_name = match.group(2)
-
-            # Validar tipo de retorno
-            if return_type not in self.GLSL_TYPES:
-                self.warnings.append(f"Unknown return type '{return_type}' in function '{func_name}'")
-
-            self.declared_functions[func_name] = {
-                'return_type': return_type
-            }
-
-    def _validate_statements(self, code: str):
-        """Valida statements individuales"""
-        # Extraer main function body
-        main_match = re.search(r'void\s+(mainImage|main)\s*\([^)]*\)\s*\{(.*)\}', code, re.DOTALL)
-        if not main_match:
-            return
-
-        main_body = main_match.group(2)
-
-        # Validar cada línea
-        lines = main_body.split('\n')
-        for i, line in enumerate(lines, start=1):
-            line = line.strip()
-            if not line or line.startswith('//'):
-                continue
-
-            # Verificar punto y coma al final (excepto llaves)
-            if line and not line.endswith((';', '{', '}')) and not line.startswith('//'):
-                if '=' in line or '(' in line:  # Solo si parece statement
-                    self.warnings.append(f"Line {i}: Missing semicolon: '{line}'")
-
-    def _validate_variable_usage(self, code: str):
-        """Valida que las variables se declaren antes de usarse"""
-        # Extraer main function
-        main_match = re.search(r'void\s+(mainImage|main)\s*\([^)]*\)\s*\{(.*)\}', code, re.DOTALL)
-        if not main_match:
+    def _find_main_index(self) -> Optional[int]:
+        """Índice del token 'void' de `void mainImage(` / `void main(`"""
+        tokens = self.tokens
+        for i in range(len(tokens) - 2):
+            if (
+                tokens[i].value == 'void'
+                and tokens[i + 1].value in ('mainImage', 'main')
+                and tokens[i + 2].value == '('
+            ):
+                return i
+        return None
+
+    def _validate_semantics(self, parsed: ParseResult, deadline: Optional[float] = None):
+        """Declaraciones, uso de variables y tipos (ver core.glsl_analyzer)"""
+        analyzer = GLSLAnalyzer(deadline)
+        try:
+            analysis = analyzer.analyze(parsed.unit)
+        except RecursionError:
+            self.warnings.append("Shader too deeply nested for semantic analysis")
             return
+        except BudgetExceeded as e:
+            # Lo reportado antes de agotar el tiempo sigue siendo válido
+            analysis = analyzer.result
+            self._truncate(str(e), isinstance(e, TimeBudgetExceeded))
+        else:
+            # Sobre el AST ya tipado; con el análisis a medias no aplica
+            self.performance = lint_performance(parsed.unit.declarations)
+
+        self.errors.extend(analysis.errors)
+        self.warnings.extend(analysis.warnings)
+        self.declared_uniforms = dict(analysis.uniforms)
+        self.declared_variables = dict(analysis.variables)
+        self.declared_functions = {
+            name: {'return_type': overloads[0].return_type}
+            for name, overloads in analysis.functions.items()
+        }
+
+    def validate_compiled(self, code: str, metadata: Optional[ShaderMetadata]) -> ValidationResult:
+        """
+        Valida la salida de GLSLCompiler
 
-        main_body = main_match.group(2)
-
-        # Encontrar todas las declaraciones: type name = value;
-        decl_pattern = r'(\w+)\s+(\w+)\s*='
-        for match in re.finditer(decl_pattern, main_body):
-            var_type = match.group(1)
-            var_name = match.group(2)
-
-            if var_type in self.GLSL_TYPES:
-                self.declared_variables[var_name] = var_type
-
-        # Encontrar usos de variables (lado derecho de =)
-        usage_pattern = r'=\s*([^;]+);'
-        for match in re.finditer(usage_pattern, main_body):
-            expression = match.group(1)
-            # Buscar identificadores en la expresión
-            identifiers = re.findall(r'\b([a-zA-Z_]\w*)\b', expression)
-
-            for identifier in identifiers:
-                # Ignorar keywords, tipos, funciones builtin
-                if identifier in self.GLSL_TYPES:
-                    continue
-                if identifier in self.GLSL_BUILTINS:
-                    continue
-                if identifier in self.declared_functions:
-                    continue
-                if identifier in self.declared_uniforms:
-                    continue
-                if identifier in self.declared_variables:
-                    continue
-
-                # Puede ser parámetro de función
-                if identifier in ['fragCoord', 'fragColor']:
-                    continue
-
-                self.warnings.append(f"Variable '{identifier}' may be used before declaration")
-
-    def _validate_types(self, code: str):
-        """Valida consistencia de tipos"""
-        # Extraer assignments: type var = expression;
-        assignment_pattern = r'(\w+)\s+(\w+)\s*=\s*([^;]+);'
-
-        for match in re.finditer(assignment_pattern, code):
-            var_type = match.group(1)
-            var_name = match.group(2)
-            expression = match.group(3).strip()
-
-            if var_type not in self.GLSL_TYPES:
-                continue
+        Si el compilador la marcó como correcta por construcción se usa su
+        tabla de símbolos sin re-parsear; si no, validación completa.
+        """
+        if metadata is None or not metadata.trusted or not code.strip():
+            return self.validate(code)
 
-            # Verificar tipos obvios
-            if var_type == 'float':
-                # Si asigna vec*, advertir
-                if 'vec2(' in expression or 'vec3(' in expression or 'vec4(' in expression:
-                    self.errors.append(
-                        f"Type mismatch: Cannot assign vector to float variable '{var_name}'"
-                    )
-            elif var_type.startswith('vec'):
-                # Si asigna float simple, advertir
-                if expression.replace('.', '').replace('-', '').replace('+', '').isdigit():
-                    self.warnings.append(
-                        f"Implicit conversion: Assigning scalar to vector '{var_name}' of type '{var_type}'"
-                    )
-
-    def _validate_brackets(self, code: str):
-        """Valida paréntesis, llaves y corchetes balanceados"""
-        stack = []
-        pairs = {'(': ')', '{': '}', '[': ']'}
-
-        for i, char in enumerate(code):
-            if char in pairs:
-                stack.append((char, i))
-            elif char in pairs.values():
-                if not stack:
-                    self.errors.append(f"Unmatched closing bracket '{char}' at position {i}")
-                    continue
-
-                open_char, open_pos = stack.pop()
-                if pairs[open_char] != char:
-                    self.errors.append(
-                        f"Mismatched brackets: '{open_char}' at {open_pos} closed with '{char}' at {i}"
-                    )
-
-        if stack:
-            for char, pos in stack:
-                self.errors.append(f"Unclosed bracket '{char}' at position {pos}")
+        self.truncated = False
+        self.timed_out = False
+        self.errors = []
+        self.warnings = []
+        self.suggestions = []
+        self.performance = []
+        self.tokens = []
+        self.parsed = None
+        self.declared_uniforms = dict(metadata.uniforms)
+        self.declared_variables = dict(metadata.variables)
+        self.declared_functions = {
+            name: {'return_type': return_type} for name, return_type in metadata.functions.items()
+        }
+        return self._build_result()
 
     def quick_validate(self, code: str) -> bool:
         """
@@ -350,3 +370,57 @@ def is_valid_glsl(code: str) -> bool:
     """
     validator = GLSLValidator()
     return validator.quick_validate(code)
+
+
+def match_brackets(tokens: List[Token]) -> Tuple[Dict[int, int], List[str]]:
+    """
+    Empareja paréntesis, llaves y corchetes en una pasada sobre los tokens
+
+    Returns:
+        (índice de apertura -> índice de cierre, errores)
+    """
+    pairs = GLSLValidator.BRACKET_PAIRS
+    matches: Dict[int, int] = {}
+    errors: List[str] = []
+    stack = []
+    closing = {v: k for k, v in pairs.items()}
+
+    for i, token in enumerate(tokens):
+        if token.kind != 'op':
+            continue
+        if token.value in pairs:
+            stack.append(i)
+            if len(stack) == MAX_NESTING_DEPTH + 1:
+                errors.append(
+                    f"Brackets nested deeper than {MAX_NESTING_DEPTH} levels at line {token.location}"
+                )
+        elif token.value in closing:
+            if not stack:
+                errors.append(
+                    f"Unmatched closing bracket '{token.value}' at line {token.location}"
+                )
+                continue
+
+            open_index = stack.pop()
+            open_token = tokens[open_index]
+            if pairs[open_token.value] != token.value:
+                errors.append(
+                    f"Mismatched brackets: '{open_token.value}' at {open_token.location} "
+                    f"closed with '{token.value}' at {token.location}"
+                )
+            else:
+                matches[open_index] = i
+
+    # Miles de paréntesis sin cerrar no aportan nada más que los primeros
+    reported = len(errors)
+    for open_index in stack[:max(MAX_BRACKET_ERRORS - reported, 0)]:
+        open_token = tokens[open_index]
+        errors.append(
+            f"Unclosed bracket '{open_token.value}' at line {open_token.location}"
+        )
+    hidden = reported + len(stack) - MAX_BRACKET_ERRORS
+    if hidden > 0:
+        del errors[MAX_BRACKET_ERRORS:]
+        errors.append(f"... and {hidden} more bracket errors")
+
+    return matches, errors
@@ -0,0 +1,109 @@
+"""
+Decodificación tipada de grafos de nodos
+Convierte el JSON del editor directamente a la estructura que usa GLSLCompiler
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+import msgspec
+
+
+class GraphNodeData(msgspec.Struct, omit_defaults=True):
+    """Datos de un nodo relevantes para la compilación"""
+    type: str = ""
+    parameters: Dict[str, Any] = {}
+
+
+class GraphNode(msgspec.Struct, omit_defaults=True):
+    """Nodo del grafo (los campos de UI como position o label se descartan)"""
+    id: str
+    data: GraphNodeData = msgspec.field(default_factory=GraphNodeData)
+
+
+class GraphEdge(msgspec.Struct, omit_defaults=True):
+    """Conexión entre dos nodos"""
+    source: str
+    target: str
+    sourceHandle: Optional[str] = None
+    targetHandle: Optional[str] = None
+
+
+class GraphPayload(msgspec.Struct):
+    """Grafo completo: {nodes: [...], edges: [...]}"""
+    nodes: list[GraphNode]
+    edges: list[GraphEdge] = []
+
+
+class CompilePayload(msgspec.Struct):
+    """Body de los endpoints de compilación"""
+    graph: GraphPayload
+    language: str = "glsl"
+    optimize: bool = True
+    target: str = "webgl1"  # webgl2: uniforms empaquetados en un bloque std140
+
+
+# Decoders construidos una sola vez (reutilizables entre requests)
+_graph_decoder = msgspec.json.Decoder(GraphPayload)
+_compile_decoder = msgspec.json.Decoder(CompilePayload)
+
+
+def to_compiler_graph(graph: GraphPayload) -> Dict[str, Any]:
+    """
+    Convierte un grafo tipado al dict que espera GLSLCompiler.compile
+
+    Los campos opcionales vacíos se omiten, así el compilador aplica
+    sus defaults ('input', 'output', parameters={}).
+    """
+    return msgspec.to_builtins(graph)
+
+
+def decode_graph(payload: bytes) -> Dict[str, Any]:
+    """
+    Decodifica y valida el JSON de un grafo
+
+    Raises:
+        ValueError: si el JSON es inválido o no cumple el esquema
+    """
+    try:
+        return to_compiler_graph(_graph_decoder.decode(payload))
+    except msgspec.MsgspecError as e:
+        raise ValueError(f"Invalid node graph: {e}") from e
+
+
+def decode_compile_request(payload: bytes) -> CompilePayload:
+    """
+    Decodifica y valida el body de una petición de compilación
+
+    Raises:
+        ValueError: si el JSON es inválido o no cumple el esquema
+    """
+    try:
+        return _compile_decoder.decode(payload)
+    except msgspec.MsgspecError as e:
+        raise ValueError(f"Invalid compile request: {e}") from e
+
+
+def normalize_graph(graph_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normaliza un grafo ya decodificado (p.ej. el JSON guardado en BD)
+
+    Raises:
+        ValueError: si el grafo no cumple el esquema
+    """
+    try:
+        return to_compiler_graph(msgspec.convert(graph_data, GraphPayload))
+    except msgspec.MsgspecError as e:
+        raise ValueError(f"Invalid node graph: {e}") from e
+
+
+def graph_content_hash(graph: Dict[str, Any]) -> str:
+    """
+    Hash sha256 de un grafo normalizado
+
+    Solo incluye lo que afecta a la compilación: mover nodos en el editor
+    no cambia el hash.
+    """
+    canonical = json.dumps(graph, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
@@ -0,0 +1,339 @@
+"""
+Registro declarativo de nodos
+Fuente única del catálogo: alimenta los templates del compilador y el
+endpoint /api/v1/nodes/library. Se carga y valida una vez; los packs de
+nodos personalizados se pueden recargar en caliente.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+BUILTIN_PACK = Path(__file__).parent / "node_packs" / "builtin.json"
+
+GLSL_OUTPUT_TYPES = {'float', 'vec2', 'vec3', 'vec4', 'int', 'bool', 'void', 'mixed'}
+# genType: cualquiera de float, vec2, vec3, vec4 (como en la especificación GLSL)
+GLSL_INPUT_TYPES = {'float', 'vec2', 'vec3', 'vec4', 'int', 'bool', 'genType'}
+
+
+class NodeRegistryError(ValueError):
+    """Pack de nodos inválido"""
+
+
+@dataclass(frozen=True)
+class NodeSpec:
+    """Definición de un tipo de nodo"""
+    type: str
+    name: str
+    description: str
+    category: str  # input, operation, output
+    group: str  # Grupo en la librería: Inputs, Math, Noise...
+    color: str
+    inputs: int
+    outputs: int
+    output_type: str
+    glsl: str
+    infer_type: bool = False
+    input_types: Tuple[str, ...] = ()  # Tipo de cada input que acepta el template (opcional)
+    uniforms: Tuple[str, ...] = ()
+    functions: Tuple[str, ...] = ()
+    pack: str = "builtin"
+
+    def to_compiler_def(self) -> Dict[str, Any]:
+        """Formato que usa GLSLCompiler.NODE_FUNCTIONS"""
+        node_def = {
+            'glsl': self.glsl,
+            'inputs': self.inputs,
+            'outputs': self.outputs,
+            'output_type': self.output_type
+        }
+        if self.infer_type:
+            node_def['infer_type'] = True
+        if self.input_types:
+            node_def['input_types'] = list(self.input_types)
+        if self.uniforms:
+            node_def['uniforms'] = list(self.uniforms)
+        if self.functions:
+            node_def['functions'] = list(self.functions)
+        return node_def
+
+    def to_library_entry(self) -> Dict[str, Any]:
+        """Formato de la librería que consume el editor"""
+        return {
+            "type": self.type,
+            "name": self.name,
+            "description": self.description,
+            "category": self.category,
+            "inputs": self.inputs,
+            "outputs": self.outputs,
+            "color": self.color
+        }
+
+
+@dataclass(frozen=True)
+class RegistrySnapshot:
+    """Estado inmutable del registro (se reemplaza completo al recargar)"""
+    nodes: Dict[str, NodeSpec]
+    node_functions: Dict[str, Dict[str, Any]]
+    helper_functions: Dict[str, str]
+    library_body: bytes  # {"library": {...}} ya serializado
+    etag: str  # ETag fuerte de library_body
+    category_bodies: Dict[str, Tuple[bytes, str]] = field(default_factory=dict)  # grupo -> (body, etag)
+    packs: Tuple[str, ...] = ()
+    codegen_hash: str = ""  # sha256 de templates y helpers: cambia si cambia el GLSL generado
+
+
+def _parse_node(raw: Dict[str, Any], pack: str) -> NodeSpec:
+    """Valida y convierte un nodo del JSON del pack"""
+    required = {
+        'type': str, 'name': str, 'category': str, 'group': str,
+        'inputs': int, 'outputs': int, 'output_type': str, 'glsl': str
+    }
+    for key, expected in required.items():
+        if not isinstance(raw.get(key), expected):
+            raise NodeRegistryError(
+                f"Pack '{pack}': node {raw.get('type', '?')!r} field '{key}' must be {expected.__name__}"
+            )
+
+    node_type = raw['type']
+    if raw['output_type'] not in GLSL_OUTPUT_TYPES:
+        raise NodeRegistryError(f"Pack '{pack}': node '{node_type}' has unknown output_type '{raw['output_type']}'")
+
+    # Los placeholders {inputN} del template deben coincidir con el número de inputs
+    placeholders = {int(n) for n in re.findall(r'\{input(\d+)\}', raw['glsl'])}
+    if placeholders - set(range(1, raw['inputs'] + 1)):
+        raise NodeRegistryError(
+            f"Pack '{pack}': node '{node_type}' template uses inputs {sorted(placeholders)} "
+            f"but declares {raw['inputs']}"
+        )
+    input_types = raw.get('input_types', [])
+    if input_types and (len(input_types) != raw['inputs'] or not set(input_types) <= GLSL_INPUT_TYPES):
+        raise NodeRegistryError(
+            f"Pack '{pack}': node '{node_type}' input_types must list one of "
+            f"{sorted(GLSL_INPUT_TYPES)} per input"
+        )
+    if raw['outputs'] > 0 and '{output}' not in raw['glsl']:
+        raise NodeRegistryError(f"Pack '{pack}': node '{node_type}' template is missing {{output}}")
+
+    return NodeSpec(
+        type=node_type,
+        name=raw['name'],
+        description=raw.get('description', ''),
+        category=raw['category'],
+        group=raw['group'],
+        color=raw.get('color', '#8b5cf6'),
+        inputs=raw['inputs'],
+        outputs=raw['outputs'],
+        output_type=raw['output_type'],
+        glsl=raw['glsl'],
+        infer_type=bool(raw.get('infer_type', False)),
+        input_types=tuple(input_types),
+        uniforms=tuple(raw.get('uniforms', [])),
+        functions=tuple(raw.get('functions', [])),
+        pack=pack
+    )
+
+
+def serialize_response(payload: Dict[str, Any]) -> Tuple[bytes, str]:
+    """Serializa un payload JSON y calcula su ETag fuerte"""
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    True si el If-None-Match del cliente incluye el ETag: acepta listas
+    separadas por comas, '*' y etiquetas débiles (W/"..."), con la
+    comparación débil que exige If-None-Match
+    """
+    if not if_none_match:
+        return False
+    tag = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == '*' or candidate == tag:
+            return True
+    return False
+
+
+def build_snapshot(packs: List[Dict[str, Any]]) -> RegistrySnapshot:
+    """
+    Construye un snapshot validado a partir de packs ya parseados
+
+    Raises:
+        NodeRegistryError: si algún pack es inválido o hay tipos duplicados
+    """
+    nodes: Dict[str, NodeSpec] = {}
+    helpers: Dict[str, str] = {}
+
+    for pack in packs:
+        pack_name = pack.get('name', 'unnamed')
+
+        for name, lines in pack.get('helpers', {}).items():
+            if name in helpers:
+                raise NodeRegistryError(f"Pack '{pack_name}': helper '{name}' already defined")
+            source = "\n".join(lines) if isinstance(lines, list) else str(lines)
+            helpers[name] = f"\n{source}\n"
+
+        for raw in pack.get('nodes', []):
+            spec = _parse_node(raw, pack_name)
+            if spec.type in nodes:
+                raise NodeRegistryError(
+                    f"Pack '{pack_name}': node type '{spec.type}' already defined by pack '{nodes[spec.type].pack}'"
+                )
+            nodes[spec.type] = spec
+
+    for spec in nodes.values():
+        missing = [f for f in spec.functions if f not in helpers]
+        if missing:
+            raise NodeRegistryError(f"Node '{spec.type}' requires undefined helpers: {missing}")
+
+    # Librería agrupada (respeta el orden de aparición de los grupos)
+    library: Dict[str, List[Dict[str, Any]]] = {}
+    for spec in nodes.values():
+        library.setdefault(spec.group, []).append(spec.to_library_entry())
+
+    library_body, etag = serialize_response({"library": library})
+    category_bodies = {
+        group: serialize_response({"category": group, "nodes": entries})
+        for group, entries in library.items()
+    }
+
+    node_functions = {t: spec.to_compiler_def() for t, spec in nodes.items()}
+    codegen = json.dumps({"nodes": node_functions, "helpers": helpers}, sort_keys=True).encode("utf-8")
+
+    return RegistrySnapshot(
+        nodes=nodes,
+        node_functions=node_functions,
+        helper_functions=helpers,
+        library_body=library_body,
+        etag=etag,
+        category_bodies=category_bodies,
+        packs=tuple(p.get('name', 'unnamed') for p in packs),
+        codegen_hash=hashlib.sha256(codegen).hexdigest()
+    )
+
+
+class NodeRegistry:
+    """
+    Registro de nodos: pack builtin + packs personalizados (*.json)
+
+    El snapshot actual se reemplaza de forma atómica al recargar, así los
+    compiladores en curso siguen usando una versión consistente.
+    """
+
+    def __init__(self, builtin_path: Path = BUILTIN_PACK, packs_dir: Optional[Path] = None,
+                 strict: bool = True):
+        """
+        Args:
+            strict: Si es False, un pack personalizado inválido no impide
+                arrancar: se usa solo el pack builtin (con un aviso) hasta
+                que los packs cambien y se recarguen bien
+        """
+        self.builtin_path = builtin_path
+        self.packs_dir = packs_dir
+        self._lock = threading.Lock()
+        self._mtimes: Dict[str, float] = {}
+        self.last_error: Optional[str] = None
+        try:
+            self._snapshot = self._load()
+        except NodeRegistryError as e:
+            if strict:
+                raise
+            print(f"⚠️ Node packs failed to load, using builtin pack only: {e}")
+            mtimes = self._current_mtimes()
+            self._snapshot = self._load([self.builtin_path])
+            self._mtimes = mtimes
+            self.last_error = str(e)
+
+    @property
+    def snapshot(self) -> RegistrySnapshot:
+        return self._snapshot
+
+    def _pack_files(self) -> List[Path]:
+        files = [self.builtin_path]
+        if self.packs_dir and self.packs_dir.is_dir():
+            files.extend(sorted(self.packs_dir.glob("*.json")))
+        return files
+
+    def _current_mtimes(self) -> Dict[str, float]:
+        mtimes = {}
+        for path in self._pack_files():
+            try:
+                mtimes[str(path)] = path.stat().st_mtime
+            except FileNotFoundError:
+                continue  # borrado entre el glob y el stat: cuenta como ausente
+        return mtimes
+
+    def _load(self, files: Optional[List[Path]] = None) -> RegistrySnapshot:
+        mtimes = self._current_mtimes()
+        packs = []
+        for path in files or self._pack_files():
+            try:
+                with open(path, encoding='utf-8') as f:
+                    pack = json.load(f)
+            except FileNotFoundError as e:
+                if path != self.builtin_path:
+                    continue  # pack borrado mientras se recargaba
+                raise NodeRegistryError(f"Cannot load node pack {path.name}: {e}") from e
+            except (OSError, json.JSONDecodeError) as e:
+                raise NodeRegistryError(f"Cannot load node pack {path.name}: {e}") from e
+            pack.setdefault('name', path.stem)
+            packs.append(pack)
+
+        snapshot = build_snapshot(packs)
+        self._mtimes = mtimes
+        self.last_error = None
+        return snapshot
+
+    def reload_if_changed(self) -> bool:
+        """
+        Recarga los packs si algún archivo cambió, se agregó o se borró
+
+        Si el pack nuevo es inválido se mantiene el snapshot anterior y se
+        recuerda el escaneo fallido: no se vuelve a intentar (ni a avisar)
+        hasta que los archivos cambien otra vez.
+
+        Returns:
+            True si se recargó
+
+        Raises:
+            NodeRegistryError: si algún pack modificado es inválido
+        """
+        if self._current_mtimes() == self._mtimes:
+            return False
+
+        with self._lock:
+            mtimes = self._current_mtimes()
+            if mtimes == self._mtimes:
+                return False
+            try:
+                self._snapshot = self._load()
+            except NodeRegistryError as e:
+                self._mtimes = mtimes
+                self.last_error = str(e)
+                raise
+            return True
+
+
+_registry: Optional[NodeRegistry] = None
+
+
+def get_registry() -> NodeRegistry:
+    """
+    Obtiene o crea el registro global (packs extra en NODE_PACKS_DIR)
+
+    Un pack personalizado roto no tumba el arranque: se sirve el builtin.
+    """
+    global _registry
+    if _registry is None:
+        packs_dir = os.getenv("NODE_PACKS_DIR")
+        _registry = NodeRegistry(packs_dir=Path(packs_dir) if packs_dir else None, strict=False)
+    return _registry
@@ -0,0 +1,88 @@
+"""
+Paginación por cursor (keyset)
+El cursor es opaco para el cliente: base64url de la clave de orden del
+último resultado (valor, id) y una huella de la consulta que lo generó.
+La página siguiente empieza en lo que va después de esa clave, así que no
+depende de cuántos resultados haya antes ni se desplaza si se insertan o
+borran shaders entre página y página.
+
+Orden: valor descendente y, a igualdad, id ascendente.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (valor de la clave de orden, id)
+CursorKey = Tuple[Any, str]
+
+
+class CursorError(ValueError):
+    """Cursor ilegible o de otra consulta"""
+    pass
+
+
+def query_fingerprint(*parts: Any) -> str:
+    """Huella corta de los parámetros que definen el orden y el conjunto de resultados"""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:12]
+
+
+def encode_cursor(key: CursorKey, fingerprint: str) -> str:
+    payload = json.dumps([fingerprint, key[0], key[1]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, fingerprint: str) -> CursorKey:
+    """Clave de un cursor (CursorError si no es válido para esta consulta)"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        owner, value, shader_id = json.loads(payload)
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise CursorError(f"Cursor inválido: {e}") from e
+    if owner != fingerprint:
+        raise CursorError("El cursor pertenece a otra consulta")
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or not isinstance(shader_id, str):
+        raise CursorError("Cursor inválido")
+    return value, shader_id
+
+
+def keyset_page(values: np.ndarray, ids: np.ndarray, after: Optional[CursorKey],
+                k: int) -> Tuple[List[int], int]:
+    """
+    Posiciones de los `k` siguientes a `after` por (valor desc, id asc)
+
+    Args:
+        values: Valor de orden de cada resultado
+        ids: Ids de los resultados (array de strings: se comparan en NumPy)
+        after: Clave del último resultado de la página anterior (None: primera)
+
+    Returns:
+        (posiciones de la página en orden, resultados que quedan tras el cursor)
+    """
+    if after is None:
+        eligible = np.ones(len(values), bool)
+    else:
+        value, last = after
+        eligible = values < value
+        tied = np.flatnonzero(values == value)
+        eligible[tied[ids[tied] > last]] = True
+    positions = np.flatnonzero(eligible)
+    remaining = len(positions)
+    if k <= 0 or not remaining:
+        return [], remaining
+    if k < remaining:
+        # Los empatados con el k-ésimo entran todos: el id decide
+        candidate_values = values[positions]
+        kth = np.partition(candidate_values, remaining - k)[remaining - k]
+        positions = positions[candidate_values >= kth]
+    order = np.lexsort((ids[positions], -values[positions]))[:k]
+    return positions[order].tolist(), remaining
+
+
+def id_array(ids: Sequence[str]) -> np.ndarray:
+    """Ids como array de strings de NumPy (comparaciones y ordenación vectorizadas)"""
+    return np.array(ids, dtype=str) if len(ids) else np.zeros(0, dtype='<U1')
@@ -0,0 +1,141 @@
+"""
+Cache de respuestas de /search/shaders
+Unas pocas consultas ("fire", "water", la primera página sin texto)
+concentran el tráfico. Las respuestas se guardan por consulta normalizada,
+filtros y página, junto con la versión del corpus: cuando una recarga
+publica una versión nueva, todas las entradas anteriores dejan de valer
+(sin TTL).
+
+Single-flight: si llegan a la vez varias peticiones iguales sin entrada,
+solo la primera calcula y las demás esperan su resultado.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", 1024))
+
+
+class _Flight:
+    """Cálculo en curso de una clave"""
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SearchCache:
+    """LRU de respuestas por (clave, versión del corpus) con single-flight"""
+
+    def __init__(self, max_entries: int = SEARCH_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._flights: Dict[tuple, _Flight] = {}
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def _check_version(self, version: int) -> bool:
+        """
+        Una versión nueva del corpus invalida todas las entradas (con el
+        lock tomado); False si la petición leyó una versión ya superada
+        """
+        if self._version is not None and version < self._version:
+            return False
+        if version != self._version:
+            if self._version is not None:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+        return True
+
+    def get_or_compute(self, key: Hashable, version: int, compute: Callable[[], Any]) -> Any:
+        """
+        Respuesta cacheada o calculada (una sola vez por clave y versión)
+
+        Las respuestas se comparten entre peticiones: no modificarlas. Si el
+        cálculo falla, el error llega a todas las peticiones que lo esperaban
+        y no se cachea.
+        """
+        if self.max_entries <= 0:
+            return compute()
+        flight_key = (key, version)
+        with self._lock:
+            current = self._check_version(version)
+            if current and key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            flight = self._flights.get(flight_key) if current else None
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                if current:
+                    flight = self._flights[flight_key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not current:
+            # Petición con una versión ya superada: se calcula sin cachear
+            return compute()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(flight_key, None)
+                # Una recarga durante el cálculo deja la respuesta obsoleta: no se guarda
+                if flight.error is None and version == self._version:
+                    self._entries[key] = flight.value
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            flight.done.set()
+        return flight.value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self.hits = self.misses = self.coalesced = self.invalidations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "invalidations": self.invalidations,
+                "hitRate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+                "corpusVersion": self._version
+            }
+
+
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """Obtiene o crea la cache global del proceso"""
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache()
+    return _search_cache
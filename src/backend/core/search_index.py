@@ -0,0 +1,455 @@
+"""
+Índice invertido para la búsqueda de texto del corpus
+Posting lists por término sobre nombre, descripción, tags y autor, con
+ranking BM25 (frecuencias ponderadas por campo) mezclado con un prior de
+popularidad. Se actualiza incrementalmente con las recargas del corpus:
+los documentos borrados o reemplazados quedan como tombstones hasta la
+siguiente compactación.
+"""
+
+import math
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from core.shader_corpus import get_shader_corpus
+
+# Peso de cada campo en la frecuencia del término (BM25F simplificado)
+FIELD_WEIGHTS = {'name': 3.0, 'tags': 2.0, 'author': 1.5, 'description': 1.0}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# score = bm25 * (1 + POPULARITY_WEIGHT * prior), prior en [0, 1]
+POPULARITY_WEIGHT = float(os.getenv("SEARCH_POPULARITY_WEIGHT", 0.5))
+
+# Compacta cuando los tombstones superan esta fracción de los documentos
+COMPACT_DEAD_RATIO = 0.25
+COMPACT_MIN_DOCS = 1024
+
+# Los scores cacheados se recalculan si la longitud media cambia más que esto
+AVGDL_TOLERANCE = 0.1
+
+# Términos con postings en al menos esta fracción del corpus guardan además
+# un bitset para contar coincidencias (ocupa menos que la lista de int32)
+BITSET_MIN_FRACTION = 1 / 32
+BITSET_MIN_DOCS = 64
+# ... y a partir de esta, un array denso de scores para el acceso aleatorio
+DENSE_MIN_FRACTION = 1 / 8
+# El top-k pasa a suma densa cuando una ronda tocaría más de esta fracción
+DENSE_SWITCH_FRACTION = 1 / 256
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], np.uint8)
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is', 'it',
+    'of', 'on', 'or', 'that', 'the', 'this', 'to', 'with'
+}
+
+_WORD_RE = re.compile(r'[^\W_]+')
+_CAMEL_RE = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+
+
+def tokenize_text(text: str) -> List[str]:
+    """Palabras en minúsculas; camelCase se indexa entero y por partes"""
+    tokens = []
+    for word in _WORD_RE.findall(text or ""):
+        lower = word.lower()
+        if lower not in STOPWORDS:
+            tokens.append(lower)
+        if word != lower and not word.isupper():
+            parts = _CAMEL_RE.findall(word)
+            if len(parts) > 1:
+                tokens.extend(p.lower() for p in parts if p.lower() not in STOPWORDS)
+    return tokens
+
+
+class _Column:
+    """Array NumPy que crece por duplicación (append amortizado O(1))"""
+
+    def __init__(self, dtype, capacity: int = 4):
+        self.data = np.zeros(capacity, dtype)
+        self.size = 0
+
+    def extend(self, values: np.ndarray):
+        end = self.size + len(values)
+        if end > len(self.data):
+            grown = np.zeros(max(end, 2 * len(self.data)), self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:end] = values
+        self.size = end
+
+    @property
+    def view(self) -> np.ndarray:
+        return self.data[:self.size]
+
+
+class _Postings:
+    """Documentos (ascendentes) y frecuencia ponderada de un término"""
+
+    def __init__(self):
+        self.docs = _Column(np.int32)
+        self.tfs = _Column(np.float32)
+
+
+@dataclass(frozen=True)
+class _RankedPostings:
+    """Postings de un término listos para consulta"""
+    docs: np.ndarray  # ascendentes
+    scores: np.ndarray  # BM25 sin idf, con el prior de popularidad
+    order: np.ndarray  # índices por score descendente
+    bits: Optional[np.ndarray]  # bitset empaquetado (solo términos frecuentes)
+    dense: Optional[np.ndarray]  # score por documento (solo términos muy frecuentes)
+
+
+class SearchIndex:
+    """
+    Índice BM25 sobre registros del corpus (dicts con id, name, description,
+    tags, author, views y likes)
+
+    Los números de documento son internos y solo crecen; un shader
+    actualizado se borra (tombstone) y se vuelve a añadir.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, _Postings] = {}
+        self._ranked: Dict[str, _RankedPostings] = {}  # caché por término
+        self._ranked_avgdl = 0.0
+        self._ids: List[str] = []  # documento -> id del shader
+        self._docs: Dict[str, int] = {}  # id del shader -> documento
+        self._lengths = _Column(np.float32)
+        self._popularity = _Column(np.float32)
+        self._alive = _Column(np.bool_)
+        self._alive_bits: Optional[np.ndarray] = None
+        self._total_length = 0.0
+        self._max_popularity = 0.0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @property
+    def dead_documents(self) -> int:
+        return len(self._ids) - len(self._docs)
+
+    # ----- Actualización -----
+
+    def add_many(self, records: Iterable[dict]):
+        """Añade (o reemplaza) shaders; los términos se agrupan para extender cada posting una vez"""
+        with self._lock:
+            grouped: Dict[str, Tuple[List[int], List[float]]] = {}
+            lengths, popularity = [], []
+            max_popularity = self._max_popularity
+            for record in records:
+                if record['id'] in self._docs:
+                    self._remove(record['id'])
+                doc = len(self._ids)
+                self._ids.append(record['id'])
+                self._docs[record['id']] = doc
+
+                frequencies = self._frequencies(record)
+                for term, tf in frequencies.items():
+                    docs, tfs = grouped.setdefault(term, ([], []))
+                    docs.append(doc)
+                    tfs.append(tf)
+                length = sum(frequencies.values())
+                lengths.append(length)
+                self._total_length += length
+                pop = math.log1p(max(record.get('views') or 0, 0) + 10 * max(record.get('likes') or 0, 0))
+                popularity.append(pop)
+                self._max_popularity = max(self._max_popularity, pop)
+
+            if not lengths:
+                return
+            self._alive_bits = None
+            if self._max_popularity != max_popularity:
+                self._ranked.clear()  # el prior está normalizado por el máximo
+            self._lengths.extend(np.array(lengths, np.float32))
+            self._popularity.extend(np.array(popularity, np.float32))
+            self._alive.extend(np.ones(len(lengths), np.bool_))
+            for term, (docs, tfs) in grouped.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = _Postings()
+                postings.docs.extend(np.array(docs, np.int32))
+                postings.tfs.extend(np.array(tfs, np.float32))
+                self._ranked.pop(term, None)
+
+    def add(self, record: dict):
+        self.add_many([record])
+
+    def remove(self, shader_id: str) -> bool:
+        with self._lock:
+            if shader_id not in self._docs:
+                return False
+            self._remove(shader_id)
+            self._maybe_compact()
+            return True
+
+    def apply(self, upserted: List[dict], removed: List[str]):
+        """Listener de ShaderCorpus: aplica los cambios de una recarga"""
+        with self._lock:
+            for shader_id in removed:
+                if shader_id in self._docs:
+                    self._remove(shader_id)
+            self.add_many(upserted)
+            self._maybe_compact()
+
+    def _remove(self, shader_id: str):
+        doc = self._docs.pop(shader_id)
+        self._alive.data[doc] = False
+        self._alive_bits = None
+        self._total_length -= float(self._lengths.data[doc])
+
+    def _frequencies(self, record: dict) -> Dict[str, float]:
+        frequencies: Dict[str, float] = {}
+        fields = {
+            'name': record.get('name'),
+            'description': record.get('description'),
+            'tags': " ".join(record.get('tags') or []),
+            'author': record.get('author')
+        }
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize_text(text if isinstance(text, str) else ""):
+                frequencies[token] = frequencies.get(token, 0.0) + weight
+        return frequencies
+
+    def _maybe_compact(self):
+        dead = self.dead_documents
+        if len(self._ids) >= COMPACT_MIN_DOCS and dead > COMPACT_DEAD_RATIO * len(self._ids):
+            self.compact()
+
+    def compact(self):
+        """Elimina los tombstones renumerando los documentos vivos"""
+        with self._lock:
+            alive = self._alive.view.copy()
+            remap = np.cumsum(alive, dtype=np.int64) - 1
+            for term in list(self._postings):
+                postings = self._postings[term]
+                docs = postings.docs.view
+                keep = alive[docs]
+                if not keep.any():
+                    del self._postings[term]
+                    continue
+                compacted = _Postings()
+                compacted.docs.extend(remap[docs[keep]].astype(np.int32))
+                compacted.tfs.extend(postings.tfs.view[keep])
+                self._postings[term] = compacted
+            self._ranked.clear()
+
+            for name in ('_lengths', '_popularity'):
+                column = _Column(getattr(self, name).data.dtype)
+                column.extend(getattr(self, name).view[alive])
+                setattr(self, name, column)
+            self._alive = _Column(np.bool_)
+            self._alive.extend(np.ones(int(alive.sum()), np.bool_))
+            self._alive_bits = None
+            self._ids = [shader_id for shader_id, keep in zip(self._ids, alive) if keep]
+            self._docs = {shader_id: doc for doc, shader_id in enumerate(self._ids)}
+
+    # ----- Consulta -----
+
+    def _ranked_postings(self, term: str, postings: _Postings, avgdl: float) -> _RankedPostings:
+        """Scores sin idf (prior incluido) y su orden descendente, cacheados por término"""
+        if abs(avgdl - self._ranked_avgdl) > AVGDL_TOLERANCE * max(self._ranked_avgdl, 1e-9):
+            self._ranked.clear()
+            self._ranked_avgdl = avgdl
+        ranked = self._ranked.get(term)
+        if ranked is None:
+            docs, tfs = postings.docs.view, postings.tfs.view
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths.data[docs] / self._ranked_avgdl)
+            scores = tfs * (BM25_K1 + 1) / (tfs + norm)
+            if self._max_popularity > 0:
+                # El prior multiplica: se reparte entre los términos de la consulta
+                scores *= 1 + POPULARITY_WEIGHT * self._popularity.data[docs] / self._max_popularity
+            scores = scores.astype(np.float32)
+            bits = dense = None
+            n = len(self._ids)
+            if len(docs) >= max(BITSET_MIN_DOCS, n * BITSET_MIN_FRACTION):
+                present = np.zeros(n, np.bool_)
+                present[docs] = True
+                bits = np.packbits(present)
+            if len(docs) >= max(BITSET_MIN_DOCS, n * DENSE_MIN_FRACTION):
+                dense = np.zeros(n, np.float32)
+                dense[docs] = scores
+            order = np.argsort(-scores, kind='stable')
+            ranked = self._ranked[term] = _RankedPostings(docs, scores, order, bits, dense)
+        return ranked
+
+    def search(self, query: str, limit: Optional[int] = None,
+               with_scores: bool = False) -> Tuple[List, int]:
+        """
+        Shaders que contienen algún término de la consulta, por relevancia
+
+        Args:
+            limit: Solo ordena los `limit` mejores (None: todos)
+            with_scores: Devuelve pares (id, score) en lugar de ids
+
+        Returns:
+            (ids ordenados, total de coincidencias)
+        """
+        terms = list(dict.fromkeys(tokenize_text(query)))
+        with self._lock:
+            alive_count = len(self._docs)
+            if not terms or not alive_count:
+                return [], 0
+            avgdl = self._total_length / alive_count
+            lists = [
+                (self._idf(self._postings[t], alive_count), self._ranked_postings(t, self._postings[t], avgdl))
+                for t in terms if t in self._postings
+            ]
+            if not lists:
+                return [], 0
+
+            total = self._count_matches([ranked for _, ranked in lists])
+            if limit is None or limit >= total:
+                candidates = self._union([ranked.docs for _, ranked in lists])
+                scores = self._exact_scores(lists, candidates)
+                alive = self._alive.data[candidates]
+                candidates, scores = candidates[alive], scores[alive]
+            else:
+                candidates, scores = self._top_candidates(lists, limit)
+
+            if limit is not None and limit < len(candidates):
+                # Los empatados con el k-ésimo entran todos: el desempate decide
+                kth = np.partition(scores, len(scores) - limit)[len(scores) - limit] if limit > 0 else np.inf
+                top = np.flatnonzero(scores >= kth)
+            else:
+                top = np.arange(len(candidates))
+            # Empates: por orden de inserción (determinista)
+            order = top[np.lexsort((candidates[top], -scores[top]))][:limit]
+            ids = self._ids
+            if with_scores:
+                return [(ids[d], s) for d, s in zip(candidates[order].tolist(), scores[order].tolist())], total
+            return [ids[d] for d in candidates[order]], total
+
+    def _top_candidates(self, lists: List[Tuple[float, _RankedPostings]],
+                        limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Threshold algorithm: recorre las listas por score descendente hasta
+        que el k-ésimo score exacto supera la cota de cualquier documento no
+        visto; con términos frecuentes solo se tocan unos miles de postings.
+        Si la cota baja despacio (varios términos muy frecuentes) termina con
+        una suma densa filtrada por el k-ésimo score ya visto.
+
+        Returns:
+            (documentos vivos candidatos, sus scores exactos)
+        """
+        n = len(self._ids)
+        visited = np.zeros(n, np.bool_)
+        seen, seen_scores = [], []
+        best = np.zeros(0, np.float32)  # los `limit` mejores scores vistos
+        start, depth = 0, max(4 * limit, 64)
+        while True:
+            new = self._union([ranked.docs[ranked.order[start:depth]] for _, ranked in lists])
+            new = new[~visited[new]]
+            visited[new] = True
+            new = new[self._alive.data[new]]
+            scores = self._exact_scores(lists, new)
+            seen.append(new)
+            seen_scores.append(scores)
+            best = np.concatenate((best, scores))
+            if len(best) > limit:
+                best = np.partition(best, len(best) - limit)[len(best) - limit:]
+
+            open_lists = [(idf, ranked) for idf, ranked in lists if depth < len(ranked.order)]
+            if not open_lists:
+                break
+            if len(best) == limit:
+                kth = best.min()
+                # Misma aritmética float32 que _exact_scores: la cota no queda por debajo por redondeo
+                bound = np.float32(0)
+                for idf, ranked in open_lists:
+                    bound += ranked.scores[ranked.order[depth]] * np.float32(idf)
+                if kth > bound:
+                    break
+                if sum(min(2 * depth, len(ranked.order)) - depth for _, ranked in open_lists) > n * DENSE_SWITCH_FRACTION:
+                    return self._dense_candidates(lists, kth)
+            start, depth = depth, depth * 2
+        return np.concatenate(seen), np.concatenate(seen_scores)
+
+    def _dense_candidates(self, lists: List[Tuple[float, _RankedPostings]],
+                          kth: np.float32) -> Tuple[np.ndarray, np.ndarray]:
+        """Score de todo el corpus y solo los documentos vivos con score >= kth"""
+        scores = np.zeros(len(self._ids), np.float32)
+        buffer = np.empty(len(self._ids), np.float32)
+        for idf, ranked in lists:
+            if ranked.dense is not None:
+                m = len(ranked.dense)
+                np.multiply(ranked.dense, np.float32(idf), out=buffer[:m])
+                np.add(scores[:m], buffer[:m], out=scores[:m])
+            else:
+                scores[ranked.docs] += ranked.scores * np.float32(idf)
+        candidates = np.flatnonzero(scores >= kth)
+        candidates = candidates[self._alive.data[candidates]]
+        return candidates, scores[candidates]
+
+    def _exact_scores(self, lists: List[Tuple[float, _RankedPostings]], candidates: np.ndarray) -> np.ndarray:
+        """Score completo de documentos ascendentes (acceso aleatorio por array denso o búsqueda binaria)"""
+        scores = np.zeros(len(candidates), np.float32)
+        for idf, ranked in lists:
+            if ranked.dense is not None:
+                if len(candidates) and candidates.max() >= len(ranked.dense):
+                    # Documentos añadidos después de cachear el término: no lo contienen
+                    inside = candidates < len(ranked.dense)
+                    scores[inside] += ranked.dense[candidates[inside]] * np.float32(idf)
+                else:
+                    scores += ranked.dense[candidates] * np.float32(idf)
+                continue
+            positions = np.minimum(np.searchsorted(ranked.docs, candidates), len(ranked.docs) - 1)
+            hit = ranked.docs[positions] == candidates
+            scores += np.where(hit, ranked.scores[positions] * np.float32(idf), np.float32(0))
+        return scores
+
+    def _union(self, doc_lists: List[np.ndarray]) -> np.ndarray:
+        return doc_lists[0] if len(doc_lists) == 1 else np.unique(np.concatenate(doc_lists))
+
+    def _count_matches(self, lists: List[_RankedPostings]) -> int:
+        """
+        Documentos vivos con algún término: los términos frecuentes cuentan
+        con OR de bitsets + popcount y los raros se comprueban contra ese bitset
+        """
+        if len(lists) == 1 and not self.dead_documents:
+            return len(lists[0].docs)
+        if self._alive_bits is None:
+            self._alive_bits = np.packbits(self._alive.view)
+        matched = np.zeros_like(self._alive_bits)
+        for ranked in lists:
+            if ranked.bits is not None:
+                matched[:len(ranked.bits)] |= ranked.bits
+        matched &= self._alive_bits
+        total = int(_POPCOUNT[matched].sum(dtype=np.int64))
+
+        rare = [ranked.docs for ranked in lists if ranked.bits is None]
+        if rare:
+            docs = self._union(rare)
+            docs = docs[self._alive.data[docs]]
+            in_bits = (matched[docs >> 3] >> (7 - (docs & 7)).astype(np.uint8)) & 1
+            total += int(len(docs) - np.count_nonzero(in_bits))
+        return total
+
+    def _idf(self, postings: _Postings, alive_count: int) -> float:
+        # df incluye tombstones hasta la compactación (como Lucene)
+        df = min(postings.docs.size, alive_count)
+        return math.log(1 + (alive_count - df + 0.5) / (df + 0.5))
+
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """Obtiene o crea el índice del corpus global (se suscribe a sus recargas)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = SearchIndex()
+            get_shader_corpus().subscribe(index.apply)
+            _index = index
+    return _index
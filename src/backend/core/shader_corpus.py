@@ -0,0 +1,419 @@
+"""
+Corpus de shaders residente en memoria para la búsqueda
+Carga data/raw/shadertoy/*.json una sola vez (en paralelo) en un índice
+id -> registro y aplica recargas incrementales: un watcher compara el
+mtime y el tamaño de cada archivo y solo vuelve a leer los que cambiaron.
+Las peticiones nunca tocan el disco (salvo las páginas del snapshot mapeado).
+El complexity_score no se calcula al leer: un scorer en segundo plano
+analiza por lotes los registros pendientes (-1) y publica las versiones
+con el score; el snapshot lo persiste, así que solo se recalcula para los
+archivos nuevos o modificados.
+"""
+
+import heapq
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, Iterator, List, Mapping, Optional, Tuple
+
+from core.corpus_snapshot import (
+    CORPUS_SNAPSHOT_PATH, CorpusSnapshotFile, SnapshotError, open_snapshot, write_snapshot
+)
+from core.code_terms import code_terms
+from core.complexity import analyze_complexity
+from core.corpus_validation import CORPUS_DIR
+from core.techniques import detect_techniques
+
+CORPUS_LOAD_WORKERS = int(os.getenv("SEARCH_CORPUS_LOAD_WORKERS", 8))
+CORPUS_RELOAD_INTERVAL = float(os.getenv("SEARCH_CORPUS_RELOAD_INTERVAL", 5))  # segundos; 0 = sin watcher
+COMPLEXITY_BATCH_SIZE = int(os.getenv("SEARCH_COMPLEXITY_BATCH_SIZE", 256))  # registros por versión publicada
+COMPLEXITY_POOL_MIN = 32  # con menos pendientes se analizan en el propio hilo
+
+_Signature = Tuple[int, int]  # (mtime_ns, tamaño)
+
+# listener(registros nuevos o modificados, ids eliminados)
+CorpusListener = Callable[[List[Dict[str, Any]], List[str]], None]
+
+
+def shader_record(data: Any) -> Optional[Dict[str, Any]]:
+    """Registro de búsqueda a partir del JSON de Shadertoy (None si no es un shader)"""
+    if not isinstance(data, dict) or 'info' not in data:
+        return None
+    info = data['info']
+    passes = data.get('renderpass', [])
+    code = "\n".join(
+        p.get('code', '') for p in passes if p.get('type') in ('common', 'image')
+    )
+    techniques = detect_techniques(code)
+    return {
+        "id": f"shadertoy_{info.get('id', 'unknown')}",
+        "name": info.get('name', 'Unknown'),
+        "description": info.get('description', ''),
+        "views": info.get('viewed', 0),
+        "likes": info.get('likes', 0),
+        "author": info.get('username', 'Anonymous'),
+        "category": "general",
+        "tags": info.get('tags', []),
+        "techniques": techniques,
+        "code_terms": code_terms(code, techniques),
+        # -1 = sin analizar: lo calcula ShaderCorpus.score_pending fuera de la carga
+        "complexity_score": -1,
+        "code": code
+    }
+
+
+def _load_record(path: Path) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return shader_record(json.load(f)), None
+    except (OSError, ValueError) as e:
+        return None, str(e)
+
+
+def _complexity_score(code: str) -> int:
+    return analyze_complexity(code).score
+
+
+class CorpusSnapshot:
+    """
+    Estado inmutable del corpus (se reemplaza entero al recargar)
+
+    Los registros del snapshot mapeado no se copian: cada versión es ese
+    snapshot menos sus archivos borrados o modificados (hidden) más los
+    JSON leídos después (records por archivo, by_id por id).
+    """
+
+    def __init__(self, base: Optional[CorpusSnapshotFile], records: Dict[str, Mapping],
+                 by_id: Dict[str, Mapping], hidden: FrozenSet[str], version: int):
+        self.base = base
+        self.records = records
+        self.by_id = by_id
+        self.hidden = hidden
+        self.version = version  # crece con cada recarga (tras actualizar los índices derivados): clave de caches
+
+    def __len__(self) -> int:
+        return (len(self.base) if self.base is not None else 0) - len(self.hidden) + len(self.records)
+
+    def get(self, shader_id: str) -> Optional[Mapping]:
+        record = self.by_id.get(shader_id)
+        if record is None and self.base is not None:
+            row = self.base.find(shader_id)
+            if row is not None and self.base.files[row] not in self.hidden:
+                record = self.base.record(row)
+        return record
+
+    def items(self) -> Iterator[Tuple[str, Mapping]]:
+        """(archivo, registro) en orden de archivo"""
+        base: Iterator[Tuple[str, Mapping]] = iter(())
+        if self.base is not None:
+            base = (
+                (name, self.base.record(row)) for row, name in enumerate(self.base.files) if name not in self.hidden
+            )
+        return heapq.merge(base, sorted(self.records.items(), key=lambda item: item[0]), key=lambda item: item[0])
+
+    @cached_property
+    def shaders(self) -> List[Mapping]:
+        """Todos los registros en orden de archivo (solo se arma si alguien los recorre)"""
+        return [record for _, record in self.items()]
+
+
+class ShaderCorpus:
+    """
+    Corpus residente con recarga incremental
+
+    Los registros se comparten entre peticiones: los handlers no deben
+    modificarlos (copiar antes de añadir campos). Si hay snapshot binario,
+    la carga inicial parte de él y solo lee los JSON modificados después.
+    """
+
+    def __init__(self, directory: Path = CORPUS_DIR, workers: int = CORPUS_LOAD_WORKERS,
+                 reload_interval: float = CORPUS_RELOAD_INTERVAL, snapshot_path: Optional[Path] = None):
+        self.directory = Path(directory)
+        self.workers = workers
+        self.reload_interval = reload_interval
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self._lock = threading.Lock()
+        self._files: Dict[str, _Signature] = {}
+        self._base: Optional[CorpusSnapshotFile] = None  # snapshot mapeado
+        self._hidden: set = set()  # archivos del snapshot borrados o releídos
+        self._records: Dict[str, Dict[str, Any]] = {}  # archivo -> registro leído del JSON
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._snapshot = CorpusSnapshot(None, {}, {}, frozenset(), 0)
+        self._loaded = False
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._scorer: Optional[threading.Thread] = None
+        self._scoring = threading.Lock()  # un solo score_pending a la vez
+        self._listeners: List[CorpusListener] = []
+
+    @property
+    def snapshot(self) -> CorpusSnapshot:
+        if not self._loaded:
+            self.reload_if_changed()
+        return self._snapshot
+
+    def get(self, shader_id: str) -> Optional[Dict[str, Any]]:
+        """Búsqueda O(1) por id"""
+        return self.snapshot.get(shader_id)
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    def subscribe(self, listener: CorpusListener):
+        """
+        Registra un índice derivado: recibe el corpus actual como alta
+        inicial y después los cambios de cada recarga (bajo el mismo lock,
+        así que no se pierde ninguna)
+        """
+        self.snapshot
+        with self._lock:
+            listener(list(self._snapshot.shaders), [])
+            self._listeners.append(listener)
+
+    def _scan(self) -> Dict[str, _Signature]:
+        files: Dict[str, _Signature] = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.json') and entry.is_file():
+                        stat = entry.stat()
+                        files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            pass
+        return files
+
+    def reload_if_changed(self) -> bool:
+        """
+        Lee solo los archivos nuevos o modificados y quita los borrados
+
+        Un archivo que no se puede leer (p. ej. a medio escribir por el
+        scraper) conserva su registro anterior y se reintenta en la
+        siguiente comprobación.
+
+        Returns:
+            True si el snapshot cambió
+        """
+        with self._lock:
+            if not self._loaded and self.snapshot_path is not None:
+                self._load_snapshot()
+            current = self._scan()
+            changed = [name for name, signature in current.items() if self._files.get(name) != signature]
+            removed = [name for name in self._files if name not in current]
+            first_load = not self._loaded
+            self._loaded = True
+            if not changed and not removed and not first_load:
+                return False
+
+            paths = [self.directory / name for name in changed]
+            with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+                loaded = list(pool.map(_load_record, paths))
+
+            upserted: List[Dict[str, Any]] = []
+            removed_ids: List[str] = []
+            for name in removed:
+                self._files.pop(name, None)
+                old = self._forget(name)
+                if old is not None:
+                    removed_ids.append(old['id'])
+            for name, (record, error) in zip(changed, loaded):
+                if error is not None:
+                    print(f"⚠️ Error loading {name}: {error}")
+                    continue
+                self._files[name] = current[name]
+                old = self._forget(name)
+                if old is not None and (record is None or old['id'] != record['id']):
+                    removed_ids.append(old['id'])
+                if record is not None:
+                    self._records[name] = record
+                    self._by_id[record['id']] = record
+                    upserted.append(record)
+
+            # Los índices derivados se actualizan antes de publicar la versión
+            # nueva: una respuesta cacheada con esa versión ya los ve al día
+            for listener in self._listeners:
+                listener(upserted, removed_ids)
+            self._snapshot = CorpusSnapshot(
+                self._base, dict(self._records), dict(self._by_id), frozenset(self._hidden),
+                version=self._snapshot.version + 1
+            )
+            return True
+
+    def _forget(self, name: str) -> Optional[Mapping]:
+        """Quita el registro actual de un archivo (del overlay o del snapshot); lo retorna"""
+        old = self._records.pop(name, None)
+        if old is not None:
+            if self._by_id.get(old['id']) is old:
+                del self._by_id[old['id']]
+        elif self._base is not None and name not in self._hidden:
+            row = self._base_rows.get(name)
+            if row is not None:
+                old = self._base.record(row)
+        if self._base is not None and name in self._base_rows:
+            self._hidden.add(name)
+        return old
+
+    @cached_property
+    def _base_rows(self) -> Dict[str, int]:
+        """Archivo -> fila del snapshot (solo se arma si algún archivo del snapshot cambia)"""
+        return dict(zip(self._base.files, range(len(self._base)))) if self._base is not None else {}
+
+    def _load_snapshot(self):
+        """Registros y firmas de archivo del snapshot mapeado (si existe y es válido)"""
+        try:
+            snapshot = open_snapshot(self.snapshot_path)
+        except FileNotFoundError:
+            return
+        except (OSError, SnapshotError) as e:
+            print(f"⚠️ Ignoring corpus snapshot {self.snapshot_path}: {e}")
+            return
+        # Sin recorrer los registros: solo las firmas para detectar los JSON modificados
+        self._base = snapshot
+        self._files.update(snapshot.signatures())
+        print(f"📦 Corpus snapshot mapped: {len(snapshot)} shaders from {self.snapshot_path}")
+
+    def write_snapshot(self, path: Path) -> int:
+        """Compacta el corpus cargado en un snapshot binario; retorna los shaders escritos"""
+        self.snapshot
+        with self._lock:
+            entries = [(name, self._files[name], record) for name, record in self._snapshot.items()]
+            return write_snapshot(path, entries)
+
+    def score_pending(self) -> int:
+        """
+        Calcula el complexity_score de los registros sin analizar (-1)
+
+        El análisis corre fuera del lock (en procesos si hay muchos
+        pendientes: es CPU puro y con hilos lo serializa el GIL). Cada lote
+        se publica como una versión nueva a través de los listeners; un
+        registro que cambió mientras tanto se descarta (lo recoge la
+        siguiente pasada).
+
+        Returns:
+            Registros actualizados
+        """
+        self.snapshot
+        with self._scoring:
+            with self._lock:
+                pending = self._unscored()
+            if not pending:
+                return 0
+            scored = 0
+            pool = self._score_pool(len(pending))
+            try:
+                for start in range(0, len(pending), COMPLEXITY_BATCH_SIZE):
+                    batch = pending[start:start + COMPLEXITY_BATCH_SIZE]
+                    scores = self._score_batch(pool, [record['code'] for _, record in batch])
+                    if pool is not None and scores is None:
+                        pool = None  # sin procesos (p. ej. sandbox): se sigue en este hilo
+                        scores = self._score_batch(None, [record['code'] for _, record in batch])
+                    with self._lock:
+                        scored += self._publish_scores(batch, scores)
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+            return scored
+
+    def _unscored(self) -> List[Tuple[str, Mapping]]:
+        """(archivo, registro) con complexity_score < 0 (del overlay y del snapshot)"""
+        pending = [(name, record) for name, record in self._records.items() if record.get('complexity_score', -1) < 0]
+        if self._base is not None:
+            files = self._base.files
+            for row in (self._base.column('complexity_score') < 0).nonzero()[0].tolist():
+                if files[row] not in self._hidden:
+                    pending.append((files[row], self._base.record(row)))
+        return pending
+
+    def _score_pool(self, pending: int) -> Optional[ProcessPoolExecutor]:
+        workers = min(max(1, self.workers), os.cpu_count() or 1)
+        if pending < COMPLEXITY_POOL_MIN or workers < 2:
+            return None
+        try:
+            return ProcessPoolExecutor(max_workers=workers)
+        except (OSError, NotImplementedError):
+            return None
+
+    @staticmethod
+    def _score_batch(pool: Optional[ProcessPoolExecutor], codes: List[str]) -> Optional[List[int]]:
+        if pool is None:
+            return [_complexity_score(code) for code in codes]
+        try:
+            return list(pool.map(_complexity_score, codes, chunksize=16))
+        except (OSError, BrokenProcessPool):
+            return None
+
+    def _publish_scores(self, batch: List[Tuple[str, Mapping]], scores: List[int]) -> int:
+        """Reemplaza los registros aún vigentes por copias con el score (bajo el lock)"""
+        upserted: List[Dict[str, Any]] = []
+        for (name, record), score in zip(batch, scores):
+            if name in self._records:
+                if self._records[name] is not record:
+                    continue
+            elif self._base is None or name in self._hidden or name not in self._files:
+                continue
+            else:
+                self._hidden.add(name)  # el registro con score pasa al overlay
+            scored = {**record, 'complexity_score': score}
+            self._records[name] = scored
+            self._by_id[scored['id']] = scored
+            upserted.append(scored)
+        if upserted:
+            for listener in self._listeners:
+                listener(upserted, [])
+            self._snapshot = CorpusSnapshot(
+                self._base, dict(self._records), dict(self._by_id), frozenset(self._hidden),
+                version=self._snapshot.version + 1
+            )
+        return len(upserted)
+
+    def start(self):
+        """Carga inicial, scorer y watcher en segundo plano (idempotente)"""
+        self.reload_if_changed()
+        if self._scorer is None or not self._scorer.is_alive():
+            self._scorer = threading.Thread(target=self._score_in_background, name="shader-corpus-scorer", daemon=True)
+            self._scorer.start()
+        if self.reload_interval > 0 and self._watcher is None:
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="shader-corpus-watcher", daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.reload_interval + 1)
+            self._watcher = None
+
+    def _score_in_background(self):
+        try:
+            scored = self.score_pending()
+            if scored:
+                print(f"🧮 Complexity scored: {scored} shaders")
+        except Exception as e:
+            print(f"⚠️ Complexity scoring error: {e}")
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                if self.reload_if_changed():
+                    print(f"🔄 Shader corpus reloaded: {len(self._snapshot)} shaders")
+                    self._score_in_background()
+            except Exception as e:
+                print(f"⚠️ Shader corpus reload error: {e}")
+
+
+_corpus: Optional[ShaderCorpus] = None
+
+
+def get_shader_corpus() -> ShaderCorpus:
+    """
+    Obtiene o crea el corpus global del proceso (SEARCH_CORPUS_DIR o
+    data/raw/shadertoy, arrancando desde SEARCH_CORPUS_SNAPSHOT si existe)
+    """
+    global _corpus
+    if _corpus is None:
+        directory = os.getenv("SEARCH_CORPUS_DIR")
+        _corpus = ShaderCorpus(Path(directory) if directory else CORPUS_DIR, snapshot_path=CORPUS_SNAPSHOT_PATH)
+    return _corpus
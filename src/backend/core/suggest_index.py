@@ -0,0 +1,255 @@
+"""
+Índice de autocompletado (type-ahead) sobre nombres, tags y autores
+Array ordenado de claves normalizadas: un prefijo es un rango contiguo
+que se localiza con bisect. Cada clave apunta a una entrada (tipo, texto)
+con su popularidad agregada (views + 10·likes de sus shaders) y su número
+de shaders. Los nombres también se indexan desde cada palabra ("ripple"
+sugiere "Water Ripple Effect").
+
+Los prefijos con rangos grandes ("f", "wa"...) guardan su top-k
+precalculado; los demás ordenan su rango, que es pequeño. Las recargas
+del corpus actualizan los agregados en su sitio y las claves nuevas van a
+un array auxiliar hasta la siguiente reconstrucción.
+"""
+
+import bisect
+import threading
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from core.shader_corpus import get_shader_corpus
+from core.trigram_index import normalize
+
+SUGGEST_KINDS = ('name', 'tag', 'author')
+
+# Sugerencias por consulta (máximo) y tamaño del top-k precalculado
+SUGGEST_TOP_K = 20
+
+# Un prefijo guarda su top-k si su rango tiene al menos estas claves
+HEAVY_PREFIX_KEYS = 512
+
+# Palabras de un nombre desde las que también se indexa
+MAX_NAME_WORDS = 6
+
+# Reconstruye cuando las claves auxiliares o las entradas vacías superan esta fracción
+REBUILD_RATIO = 0.25
+REBUILD_MIN_KEYS = 1024
+
+_INITIAL_CAPACITY = 1024
+
+_END = "\U0010ffff"
+
+
+def popularity(record: Dict[str, Any]) -> int:
+    """views + 10·likes (el mismo criterio que /popular)"""
+    return max(int(record.get('views') or 0), 0) + 10 * max(int(record.get('likes') or 0), 0)
+
+
+@lru_cache(maxsize=65536)
+def _normalized(text: str) -> str:
+    """normalize memoizado (tags y autores se repiten mucho)"""
+    return normalize(text)
+
+
+def record_entries(record: Dict[str, Any]) -> Dict[Tuple[str, str], str]:
+    """(tipo, texto normalizado) -> texto original de un registro"""
+    entries: Dict[Tuple[str, str], str] = {}
+    values = [('name', record.get('name')), ('author', record.get('author'))]
+    values += [('tag', tag) for tag in record.get('tags') or []]
+    for kind, label in values:
+        if isinstance(label, str):
+            text = _normalized(label)
+            if text:
+                entries.setdefault((kind, text), label.strip())
+    return entries
+
+
+def entry_keys(kind: str, text: str) -> List[str]:
+    """Claves de búsqueda de una entrada (los nombres, desde cada palabra)"""
+    if kind != 'name':
+        return [text]
+    words = text.split(' ')
+    return [' '.join(words[i:]) for i in range(min(len(words), MAX_NAME_WORDS))]
+
+
+class SuggestIndex:
+    """
+    Entradas con agregados incrementales y claves en un array ordenado
+
+    Las entradas nunca se borran: con 0 shaders dejan de sugerirse hasta
+    la siguiente reconstrucción.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._records: Dict[str, Dict[str, Any]] = {}  # id -> registro indexado
+        self._entry_ids: Dict[Tuple[str, str], int] = {}
+        self._entries: List[Tuple[str, str]] = []  # entrada -> (tipo, texto normalizado)
+        self._labels: List[str] = []
+        self._weights = np.zeros(_INITIAL_CAPACITY, np.int64)
+        self._counts = np.zeros(_INITIAL_CAPACITY, np.int64)
+        self._reset_keys()
+
+    def _reset_keys(self):
+        self._keys: List[str] = []  # ordenadas
+        self._key_entries = np.zeros(0, np.int32)
+        self._extra_keys: List[str] = []  # claves de entradas nuevas, ordenadas
+        self._extra_entries = array('i')
+        self._pending: List[int] = []  # entradas nuevas sin claves todavía
+        self._changed: Set[int] = set()  # entradas con agregados cambiados
+        self._top: Dict[str, List[int]] = {}  # prefijo pesado -> top-k de entradas
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    # ----- Actualización -----
+
+    def add_many(self, records: Iterable[Dict[str, Any]]):
+        self.apply(list(records), [])
+
+    def apply(self, upserted: List[Dict[str, Any]], removed: List[str]):
+        """Listener de ShaderCorpus: ajusta los agregados de las entradas de cada shader"""
+        with self._lock:
+            ids, weights, signs = array('q'), array('q'), array('q')
+            for shader_id in removed:
+                old = self._records.pop(shader_id, None)
+                if old is not None:
+                    self._account(old, -1, ids, weights, signs)
+            for record in upserted:
+                old = self._records.get(record['id'])
+                if old is not None:
+                    self._account(old, -1, ids, weights, signs)
+                self._records[record['id']] = record
+                self._account(record, 1, ids, weights, signs)
+            # Agregados en bloque (sumar escalares NumPy uno a uno es lo que más cuesta)
+            ids = np.frombuffer(ids, np.int64)
+            np.add.at(self._weights, ids, np.frombuffer(weights, np.int64))
+            np.add.at(self._counts, ids, np.frombuffer(signs, np.int64))
+            self._changed.update(ids.tolist())
+            self._sync()
+
+    def _account(self, record: Dict[str, Any], sign: int, ids: array, weights: array, signs: array):
+        weight = sign * popularity(record)
+        for entry, label in record_entries(record).items():
+            entry_id = self._entry_ids.get(entry)
+            if entry_id is None:
+                entry_id = self._new_entry(entry, label)
+            ids.append(entry_id)
+            weights.append(weight)
+            signs.append(sign)
+
+    def _new_entry(self, entry: Tuple[str, str], label: str) -> int:
+        entry_id = self._entry_ids[entry] = len(self._entries)
+        self._entries.append(entry)
+        self._labels.append(label)
+        if entry_id >= len(self._weights):
+            grow = np.zeros(len(self._weights), np.int64)
+            self._weights = np.concatenate((self._weights, grow))
+            self._counts = np.concatenate((self._counts, grow))
+        self._pending.append(entry_id)
+        return entry_id
+
+    def _sync(self):
+        """Incorpora entradas nuevas y descarta los top-k afectados por cambios"""
+        n = len(self._entries)
+        extra = len(self._extra_keys) + len(self._pending)
+        dead = n - int(np.count_nonzero(self._counts[:n]))
+        if extra > max(REBUILD_MIN_KEYS, REBUILD_RATIO * len(self._keys)) or (
+                n >= REBUILD_MIN_KEYS and dead > REBUILD_RATIO * n):
+            self._rebuild()
+            return
+        for entry_id in self._pending:
+            for key in entry_keys(*self._entries[entry_id]):
+                position = bisect.bisect_left(self._extra_keys, key)
+                self._extra_keys.insert(position, key)
+                self._extra_entries.insert(position, entry_id)
+        self._pending = []
+        if self._changed and self._top:
+            for entry_id in self._changed:
+                for key in entry_keys(*self._entries[entry_id]):
+                    for end in range(1, len(key) + 1):
+                        self._top.pop(key[:end], None)
+        self._changed = set()
+
+    def _rebuild(self):
+        """Array ordenado con las claves de todas las entradas vivas (las vacías se olvidan)"""
+        n = len(self._entries)
+        alive = np.flatnonzero(self._counts[:n] > 0).tolist()
+        entries = [self._entries[i] for i in alive]
+        labels = [self._labels[i] for i in alive]
+        weights, counts = self._weights[alive], self._counts[alive]
+
+        self._entry_ids = {entry: i for i, entry in enumerate(entries)}
+        self._entries, self._labels = entries, labels
+        capacity = max(_INITIAL_CAPACITY, 2 * len(entries))
+        self._weights = np.zeros(capacity, np.int64)
+        self._counts = np.zeros(capacity, np.int64)
+        self._weights[:len(entries)], self._counts[:len(entries)] = weights, counts
+
+        pairs = sorted((key, i) for i, entry in enumerate(entries) for key in entry_keys(*entry))
+        self._reset_keys()
+        self._keys = [key for key, _ in pairs]
+        self._key_entries = np.fromiter((i for _, i in pairs), np.int32, len(pairs))
+
+    # ----- Consulta -----
+
+    def _best(self, candidates: np.ndarray, k: int) -> List[int]:
+        """Las k entradas con más popularidad (sin repetir, con shaders)"""
+        candidates = np.unique(candidates)
+        candidates = candidates[self._counts[candidates] > 0]
+        weights = self._weights[candidates]
+        if k < len(candidates):
+            keep = np.argpartition(-weights, k - 1)[:k]
+            candidates, weights = candidates[keep], weights[keep]
+        return candidates[np.lexsort((candidates, -weights))].tolist()
+
+    def _range_top(self, prefix: str) -> List[int]:
+        lo = bisect.bisect_left(self._keys, prefix)
+        hi = bisect.bisect_left(self._keys, prefix + _END, lo)
+        if hi - lo < HEAVY_PREFIX_KEYS:
+            return self._best(self._key_entries[lo:hi], SUGGEST_TOP_K)
+        top = self._top.get(prefix)
+        if top is None:
+            top = self._top[prefix] = self._best(self._key_entries[lo:hi], SUGGEST_TOP_K)
+        return top
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """
+        Completados de un prefijo por popularidad
+
+        Returns:
+            [{"text", "type", "count"}] (count: shaders con ese nombre, tag o autor)
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        limit = min(limit, SUGGEST_TOP_K)
+        with self._lock:
+            candidates = self._range_top(prefix)
+            lo = bisect.bisect_left(self._extra_keys, prefix)
+            hi = bisect.bisect_left(self._extra_keys, prefix + _END, lo)
+            if hi > lo:
+                extra = np.frombuffer(self._extra_entries, np.int32)[lo:hi]
+                candidates = self._best(np.concatenate((np.array(candidates, np.int32), extra)), limit)
+            return [
+                {"text": self._labels[i], "type": self._entries[i][0], "count": int(self._counts[i])}
+                for i in candidates[:limit]
+            ]
+
+
+_index: Optional[SuggestIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_suggest_index() -> SuggestIndex:
+    """Obtiene o crea el índice de autocompletado del corpus global (se suscribe a sus recargas)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = SuggestIndex()
+            get_shader_corpus().subscribe(index.apply)
+            _index = index
+    return _index
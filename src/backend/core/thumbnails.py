@@ -0,0 +1,201 @@
+"""
+Previews de shaders sin GPU
+Renderiza el pass Image (con Common antepuesto) con core.glsl_interpreter
+en un pool de procesos, guarda un PNG pequeño por shader y marca durante
+la ingesta los shaders cuya salida es completamente negra o tiene NaN.
+"""
+
+import json
+import os
+import re
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+from functools import partial
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from core.corpus_validation import CORPUS_DIR
+from core.glsl_interpreter import RenderError, UnsupportedFeature, render_shader
+from core.glsl_parser import get_driver
+from db.models import Shader
+
+THUMBNAILS_DIR = Path(os.getenv("THUMBNAILS_DIR") or CORPUS_DIR.parents[1] / "processed" / "thumbnails")
+THUMBNAIL_URL_PREFIX = os.getenv("THUMBNAIL_URL_PREFIX", "/thumbnails")
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", 160))
+THUMBNAIL_HEIGHT = int(os.getenv("THUMBNAIL_HEIGHT", 90))
+THUMBNAIL_TIME = float(os.getenv("THUMBNAIL_TIME", 1.0))  # segundos de iTime
+
+# El id de Shadertoy da el nombre del PNG: sin separadores ni "..", el
+# archivo no puede quedar fuera de THUMBNAILS_DIR
+SHADER_ID_RE = re.compile(r'[A-Za-z0-9_-]+')
+
+# Un píxel es negro si ningún canal llega a 1/255
+BLACK_THRESHOLD = 1 / 255
+
+# ok: preview útil; black/nan: el shader renderiza pero la salida está rota;
+# unsupported: fuera del subconjunto del intérprete; error: fallo al ejecutar
+RENDER_STATUSES = ('ok', 'black', 'nan', 'unsupported', 'error')
+
+
+@dataclass
+class Thumbnail:
+    status: str
+    png: Optional[bytes] = None
+    nan_pixels: int = 0
+    message: Optional[str] = None
+
+
+def encode_png(rgb: np.ndarray) -> bytes:
+    """PNG RGB de 8 bits a partir de un array (alto, ancho, 3) uint8"""
+    height, width, _ = rgb.shape
+    raw = b"".join(b"\x00" + row.tobytes() for row in np.ascontiguousarray(rgb, np.uint8))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) +
+            chunk(b"IDAT", zlib.compress(raw, 9)) + chunk(b"IEND", b""))
+
+
+def classify(color: np.ndarray) -> Dict[str, Any]:
+    """Estado de la salida de render_shader (el alpha se ignora, como en Shadertoy)"""
+    rgb = color[..., :3]
+    invalid = ~np.isfinite(rgb).all(axis=-1)
+    nan_pixels = int(invalid.sum())
+    if nan_pixels:
+        status = 'nan'
+    elif (rgb < BLACK_THRESHOLD).all():
+        status = 'black'
+    else:
+        status = 'ok'
+    return {"status": status, "nan_pixels": nan_pixels}
+
+
+def render_thumbnail(
+    code: str,
+    width: int = THUMBNAIL_WIDTH,
+    height: int = THUMBNAIL_HEIGHT,
+    time_s: float = THUMBNAIL_TIME
+) -> Thumbnail:
+    """Renderiza y clasifica un shader; los NaN se pintan en negro como en la GPU"""
+    try:
+        color = render_shader(code, width, height, time_s)
+    except UnsupportedFeature as e:
+        return Thumbnail(status='unsupported', message=str(e))
+    except RenderError as e:
+        return Thumbnail(status='error', message=str(e))
+
+    info = classify(color)
+    rgb = np.nan_to_num(color[..., :3], nan=0.0, posinf=1.0, neginf=0.0)
+    pixels = np.round(np.clip(rgb, 0, 1) * 255).astype(np.uint8)
+    return Thumbnail(status=info["status"], png=encode_png(pixels), nan_pixels=info["nan_pixels"])
+
+
+def render_shader_file(
+    path: Path,
+    output_dir: Path = THUMBNAILS_DIR,
+    width: int = THUMBNAIL_WIDTH,
+    height: int = THUMBNAIL_HEIGHT,
+    time_s: float = THUMBNAIL_TIME
+) -> Dict[str, Any]:
+    """
+    Renderiza el pass Image de un shader de Shadertoy y guarda <id>.png
+
+    Los buffers no se simulan: sus iChannel se leen vacíos.
+
+    Returns:
+        {"id", "status", "nan_pixels", "message", "thumbnail", "time_ms"} o
+        {"id", "skipped"} si el archivo no es un shader válido (o su id no
+        sirve como nombre de archivo)
+    """
+    start_time = time.perf_counter()
+    path = Path(path)
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        shader_id = data['info'].get('id', path.stem)
+        render_passes = data['renderpass']
+        image = next(p for p in render_passes if p.get('type') == 'image')
+    except StopIteration:
+        return {"id": path.stem, "skipped": "No image pass"}
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return {"id": path.stem, "skipped": f"Invalid shader file: {e}"}
+    if not isinstance(shader_id, str) or not SHADER_ID_RE.fullmatch(shader_id):
+        return {"id": path.stem, "skipped": f"Invalid shader id: {shader_id!r}"}
+
+    common = "".join(p.get('code', '') for p in render_passes if p.get('type') == 'common')
+    code = (common + "\n" if common else "") + image.get('code', '')
+    thumbnail = render_thumbnail(code, width, height, time_s)
+
+    filename = None
+    if thumbnail.png is not None:
+        filename = f"{shader_id}.png"
+        (Path(output_dir) / filename).write_bytes(thumbnail.png)
+
+    return {
+        "id": shader_id,
+        "status": thumbnail.status,
+        "nan_pixels": thumbnail.nan_pixels,
+        "message": thumbnail.message,
+        "thumbnail": filename,
+        "time_ms": round((time.perf_counter() - start_time) * 1000, 2)
+    }
+
+
+def render_corpus(
+    paths: Iterable[Path],
+    output_dir: Path = THUMBNAILS_DIR,
+    workers: Optional[int] = None,
+    chunksize: int = 4,
+    width: int = THUMBNAIL_WIDTH,
+    height: int = THUMBNAIL_HEIGHT,
+    time_s: float = THUMBNAIL_TIME
+) -> Iterator[Dict[str, Any]]:
+    """
+    Renderiza el corpus en paralelo y produce resultados a medida que terminan
+
+    Igual que validate_corpus: los paths se consumen en streaming y
+    workers=1 renderiza en el proceso actual.
+    """
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    render = partial(render_shader_file, output_dir=output_dir, width=width, height=height, time_s=time_s)
+    if workers == 1:
+        yield from map(render, paths)
+        return
+
+    # La tabla LALR se construye una vez por proceso, no por shader
+    with Pool(processes=workers, initializer=get_driver) as pool:
+        yield from pool.imap_unordered(render, paths, chunksize=chunksize)
+
+
+def persist_thumbnails(db: Session, results: List[Dict[str, Any]]) -> int:
+    """
+    Copia render_status y thumbnail_url a los Shader de Shadertoy
+    correspondientes (sin commit); solo los previews 'ok' se publican
+
+    Returns:
+        Número de shaders actualizados
+    """
+    by_id = {r['id']: r for r in results if 'skipped' not in r}
+    if not by_id:
+        return 0
+
+    shaders = db.query(Shader).filter(
+        Shader.source == "shadertoy",
+        Shader.source_id.in_(list(by_id))
+    ).all()
+
+    for shader in shaders:
+        result = by_id[shader.source_id]
+        shader.render_status = result['status']
+        if result['status'] == 'ok' and result.get('thumbnail'):
+            shader.thumbnail_url = f"{THUMBNAIL_URL_PREFIX}/{result['thumbnail']}"
+
+    return len(shaders)
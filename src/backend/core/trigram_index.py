@@ -0,0 +1,274 @@
+"""
+Índice de trigramas para búsqueda tolerante a erratas y por substring
+Trabaja sobre el vocabulario de palabras de nombres y tags, no sobre los
+documentos:
+
+- substring: los trigramas de la consulta compactada (sin espacios ni
+  signos) se buscan intersectando posting lists y solo se verifican los
+  candidatos ("ray march" encuentra "Raymarching")
+- fuzzy: similitud de Jaccard entre trigramas de palabras con padding, al
+  estilo de pg_trgm ("voronio" encuentra "voronoi")
+
+Cada entrada del vocabulario apunta a los shaders que la contienen.
+"""
+
+import os
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from core.pagination import id_array, keyset_page
+from core.shader_corpus import get_shader_corpus
+
+TRIGRAM_SIMILARITY_THRESHOLD = float(os.getenv("SEARCH_TRIGRAM_THRESHOLD", 0.3))
+
+# Reconstruye cuando los shaders borrados superan esta fracción
+REBUILD_DEAD_RATIO = 0.25
+REBUILD_MIN_DOCS = 1024
+
+_SEPARATOR_RE = re.compile(r'[\W_]+')
+
+
+def normalize(text: str) -> str:
+    """Minúsculas con cualquier separador reducido a un espacio"""
+    return _SEPARATOR_RE.sub(' ', (text or "").lower()).strip()
+
+
+def compact(text: str) -> str:
+    """Minúsculas sin separadores: "Ray-March" -> "raymarch\""""
+    return normalize(text).replace(' ', '')
+
+
+def word_trigrams(word: str) -> Set[str]:
+    """Trigramas con padding de una palabra ("  w", " wo", ..., "rd ")"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def substring_trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    Vocabulario de nombres y tags con posting lists de trigramas
+
+    Las listas solo crecen (ids ascendentes); los shaders borrados quedan
+    como tombstones hasta la siguiente reconstrucción.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._records: List[Optional[dict]] = []  # documento -> registro
+        self._docs: Dict[str, int] = {}  # id del shader -> documento
+        self._dead: Set[int] = set()
+        self._dead_sorted: Optional[np.ndarray] = None
+
+        self._vocab: Dict[str, int] = {}  # entrada -> id
+        self._entries: List[str] = []
+        self._entry_docs: List[array] = []
+        self._entry_sizes = array('i')  # trigramas con padding por entrada
+        self._fuzzy: Dict[str, array] = {}  # trigrama con padding -> entradas
+        self._substring: Dict[str, array] = {}  # trigrama de la entrada -> entradas
+
+        self._arrays: Dict[tuple, Tuple[int, np.ndarray]] = {}  # (tipo, clave) -> (longitud, array)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # ----- Actualización -----
+
+    def add_many(self, records: Iterable[dict]):
+        with self._lock:
+            for record in records:
+                if record['id'] in self._docs:
+                    self._remove(record['id'])
+                doc = len(self._records)
+                self._records.append(record)
+                self._docs[record['id']] = doc
+                for entry in self._entries_of(record):
+                    self._entry(entry).append(doc)
+
+    def add(self, record: dict):
+        self.add_many([record])
+
+    def remove(self, shader_id: str) -> bool:
+        with self._lock:
+            if shader_id not in self._docs:
+                return False
+            self._remove(shader_id)
+            self._maybe_rebuild()
+            return True
+
+    def apply(self, upserted: List[dict], removed: List[str]):
+        """Listener de ShaderCorpus: aplica los cambios de una recarga"""
+        with self._lock:
+            for shader_id in removed:
+                if shader_id in self._docs:
+                    self._remove(shader_id)
+            self.add_many(upserted)
+            self._maybe_rebuild()
+
+    def _remove(self, shader_id: str):
+        doc = self._docs.pop(shader_id)
+        self._records[doc] = None
+        self._dead.add(doc)
+        self._dead_sorted = None
+
+    def _maybe_rebuild(self):
+        total = len(self._records)
+        if total >= REBUILD_MIN_DOCS and len(self._dead) > REBUILD_DEAD_RATIO * total:
+            records = [record for record in self._records if record is not None]
+            self._reset()
+            self.add_many(records)
+
+    def _entries_of(self, record: dict) -> Set[str]:
+        """Palabras del nombre y de los tags"""
+        tags = record.get('tags') or []
+        texts = [record.get('name') or ""] + [tag for tag in tags if isinstance(tag, str)]
+        return {word for text in texts for word in normalize(text).split()}
+
+    def _entry(self, entry: str) -> array:
+        entry_id = self._vocab.get(entry)
+        if entry_id is None:
+            entry_id = self._vocab[entry] = len(self._entries)
+            self._entries.append(entry)
+            self._entry_docs.append(array('i'))
+            trigrams = word_trigrams(entry)
+            self._entry_sizes.append(len(trigrams))
+            for trigram in trigrams:
+                self._fuzzy.setdefault(trigram, array('i')).append(entry_id)
+            for trigram in substring_trigrams(entry):
+                self._substring.setdefault(trigram, array('i')).append(entry_id)
+        return self._entry_docs[entry_id]
+
+    # ----- Consulta -----
+
+    def _array(self, kind: str, key, postings: array) -> np.ndarray:
+        """Copia NumPy cacheada de una lista (válida mientras no crezca: solo se añade al final)"""
+        cached = self._arrays.get((kind, key))
+        if cached is None or cached[0] != len(postings):
+            cached = self._arrays[(kind, key)] = (len(postings), np.array(postings, np.int64))
+        return cached[1]
+
+    def _substring_entries(self, text: str) -> np.ndarray:
+        """Entradas que contienen `text`: intersección de posting lists, luego verificación"""
+        if len(text) < 3:
+            # Consultas de 1-2 caracteres: unión de los trigramas que la contienen
+            lists = [self._array('s', t, p) for t, p in self._substring.items() if text in t]
+            return np.unique(np.concatenate(lists)) if lists else np.zeros(0, np.int64)
+        lists = []
+        for trigram in substring_trigrams(text):
+            postings = self._substring.get(trigram)
+            if postings is None:
+                return np.zeros(0, np.int64)
+            lists.append(self._array('s', trigram, postings))
+        lists.sort(key=len)
+        candidates = lists[0]
+        for postings in lists[1:]:
+            candidates = np.intersect1d(candidates, postings, assume_unique=True)
+            if not len(candidates):
+                break
+        entries = self._entries
+        return np.array([e for e in candidates.tolist() if text in entries[e]], np.int64)
+
+    def _fuzzy_entries(self, word: str, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Entradas con similitud >= threshold (conteo de trigramas compartidos por bincount)"""
+        trigrams = word_trigrams(word)
+        lists = [self._array('f', t, self._fuzzy[t]) for t in trigrams if t in self._fuzzy]
+        if not lists:
+            return np.zeros(0, np.int64), np.zeros(0, np.float32)
+        shared = np.bincount(np.concatenate(lists))
+        # Jaccard >= t exige compartir al menos t * |trigramas de la consulta|
+        candidates = np.flatnonzero(shared >= max(1.0, threshold * len(trigrams)))
+        sizes = np.frombuffer(self._entry_sizes, np.int32)[candidates]
+        scores = shared[candidates] / (len(trigrams) + sizes - shared[candidates])
+        keep = scores >= threshold
+        return candidates[keep], scores[keep].astype(np.float32)
+
+    def _entry_docs_array(self, entries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Documentos de cada entrada, concatenados, y la posición de su entrada"""
+        arrays = [self._array('d', int(e), self._entry_docs[e]) for e in entries]
+        if not arrays:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+        lengths = np.array([len(a) for a in arrays])
+        return np.concatenate(arrays), np.repeat(np.arange(len(arrays)), lengths)
+
+    def _word_scores(self, word: str, threshold: float, n: int) -> np.ndarray:
+        """Mejor similitud por documento para una palabra (array denso)"""
+        entries, entry_scores = self._fuzzy_entries(word, threshold)
+        docs, owner = self._entry_docs_array(entries)
+        scores = np.zeros(n, np.float32)
+        np.maximum.at(scores, docs, entry_scores[owner])
+        return scores
+
+    def search(self, query: str, threshold: Optional[float] = None,
+               limit: Optional[int] = None) -> Tuple[List[Tuple[str, float]], int]:
+        """
+        Shaders cuyo nombre o tags contienen la consulta (similitud 1.0) o
+        se le parecen (similitud de trigramas)
+
+        Con varias palabras cuenta la media de la mejor similitud de cada
+        una, o la de la consulta compactada si es mayor.
+
+        Args:
+            threshold: Similitud mínima (por defecto TRIGRAM_SIMILARITY_THRESHOLD)
+            limit: Máximo de resultados devueltos
+
+        Returns:
+            ([(id, similitud)] por similitud desc e id asc, el mismo orden que
+            el cursor de /search/shaders; total de coincidencias)
+        """
+        threshold = TRIGRAM_SIMILARITY_THRESHOLD if threshold is None else threshold
+        words = normalize(query).split()
+        if not words:
+            return [], 0
+        joined = compact(query)
+        with self._lock:
+            n = len(self._records)
+            scores = sum(self._word_scores(word, threshold, n) for word in words) / len(words)
+            scores[scores < threshold] = 0
+            if len(words) > 1:
+                np.maximum(scores, self._word_scores(joined, threshold, n), out=scores)
+            docs, _ = self._entry_docs_array(self._substring_entries(joined))
+            scores[docs] = 1.0
+            if self._dead:
+                if self._dead_sorted is None:
+                    self._dead_sorted = np.fromiter(self._dead, np.int64, len(self._dead))
+                scores[self._dead_sorted] = 0
+
+            candidates = np.flatnonzero(scores > 0)
+            total = len(candidates)
+            # Se ordena por la similitud que se devuelve (redondeada): el
+            # cursor pagina sobre esos mismos valores
+            values = np.round(scores[candidates].astype(np.float64), 4)
+            if limit is not None and limit < total:
+                # Solo los ids de los que pueden entrar en el top se materializan
+                kth = np.partition(values, total - limit)[total - limit] if limit > 0 else np.inf
+                keep = values >= kth
+                candidates, values = candidates[keep], values[keep]
+            records = self._records
+            ids = id_array([records[doc]['id'] for doc in candidates.tolist()])
+            order, _ = keyset_page(values, ids, None, len(values) if limit is None else limit)
+            return [(str(ids[i]), float(values[i])) for i in order], total
+
+
+_index: Optional[TrigramIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_trigram_index() -> TrigramIndex:
+    """Obtiene o crea el índice de trigramas del corpus global (se suscribe a sus recargas)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = TrigramIndex()
+            get_shader_corpus().subscribe(index.apply)
+            _index = index
+    return _index
@@ -0,0 +1,193 @@
+"""
+Cache de resultados de validación GLSL
+El frontend revalida el mismo código una y otra vez (idle, cambio de
+panel...). Los resultados se guardan por hash del source + versión del
+validador: un acierto cuesta un sha256 en lugar de una validación completa.
+
+Dos niveles: LRU en memoria por worker y, opcionalmente, Redis compartido
+entre workers (VALIDATION_CACHE_REDIS_URL).
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, replace
+from typing import Any, Dict, Optional
+
+from core.compiler import ShaderMetadata
+from core.glsl_lint import PerformanceHint
+from core.glsl_validator import (
+    GLSLValidator, ValidationResult, MAX_SOURCE_SIZE, TIME_BUDGET_MS, VALIDATOR_VERSION
+)
+
+VALIDATION_CACHE_SIZE = int(os.getenv("VALIDATION_CACHE_SIZE", 1024))
+VALIDATION_CACHE_REDIS_URL = os.getenv("VALIDATION_CACHE_REDIS_URL")
+VALIDATION_CACHE_TTL = int(os.getenv("VALIDATION_CACHE_TTL", 24 * 3600))
+
+# Salida del compilador marcada como trusted: validación completa solo en
+# modo debug o para una muestra (detecta regresiones del compilador)
+COMPILED_VALIDATION_FULL = os.getenv("COMPILED_VALIDATION_FULL", "false").lower() == "true"
+COMPILED_VALIDATION_SAMPLE_RATE = float(os.getenv("COMPILED_VALIDATION_SAMPLE_RATE", 0.01))
+
+REDIS_KEY_PREFIX = "glsl-validation:"
+
+
+def cache_key(code: str) -> str:
+    """sha256 del source junto con todo lo que cambia el resultado"""
+    digest = hashlib.sha256(f"{VALIDATOR_VERSION}\0{MAX_SOURCE_SIZE}\0{TIME_BUDGET_MS}\0".encode())
+    digest.update(code.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+def _copy(result: ValidationResult) -> ValidationResult:
+    """Copia de las listas para que el llamador no altere la entrada cacheada"""
+    return ValidationResult(
+        is_valid=result.is_valid,
+        errors=list(result.errors),
+        warnings=list(result.warnings),
+        suggestions=list(result.suggestions),
+        truncated=result.truncated,
+        timed_out=result.timed_out,
+        performance=[replace(hint) for hint in result.performance]
+    )
+
+
+class ValidationCache:
+    """LRU de ValidationResult con nivel Redis opcional"""
+
+    def __init__(self, max_entries: int = VALIDATION_CACHE_SIZE, redis_url: Optional[str] = None,
+                 ttl: int = VALIDATION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, ValidationResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.trusted_skips = 0
+        self._redis = self._connect(redis_url) if redis_url else None
+
+    @staticmethod
+    def _connect(redis_url: str):
+        try:
+            import redis
+            client = redis.Redis.from_url(redis_url, socket_timeout=0.05)
+            client.ping()
+            print(f"✓ Validation cache connected to Redis: {redis_url}")
+            return client
+        except Exception as e:
+            print(f"⚠️ Validation cache running without Redis: {e}")
+            return None
+
+    def validate(self, code: str) -> ValidationResult:
+        """
+        Resultado cacheado o validación completa (que queda cacheada)
+
+        Un resultado cortado por el presupuesto de tiempo no se cachea:
+        depende de la carga del momento y puede dar por válido un source
+        revisado a medias. El corte por tamaño es determinista y sí se cachea.
+        """
+        key = cache_key(code)
+        result = self.get(key)
+        if result is None:
+            result = GLSLValidator().validate(code)
+            if not result.timed_out:
+                self.put(key, result)
+        return _copy(result)
+
+    def validate_compiled(self, code: str, metadata: Optional[ShaderMetadata]) -> ValidationResult:
+        """Validación de la salida del compilador (fast path si es trusted)"""
+        trusted = metadata is not None and metadata.trusted
+        if trusted and not COMPILED_VALIDATION_FULL and random.random() >= COMPILED_VALIDATION_SAMPLE_RATE:
+            with self._lock:
+                self.trusted_skips += 1
+            return GLSLValidator().validate_compiled(code, metadata)
+
+        result = self.validate(code)
+        if trusted and not result.is_valid:
+            print(f"⚠️ Compiler output marked trusted failed validation: {result.errors[:3]}")
+        return result
+
+    def get(self, key: str) -> Optional[ValidationResult]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+
+        result = self._redis_get(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.redis_hits += 1
+        self._store(key, result)
+        return result
+
+    def put(self, key: str, result: ValidationResult):
+        self._store(key, result)
+        self._redis_set(key, result)
+
+    def _store(self, key: str, result: ValidationResult):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _redis_get(self, key: str) -> Optional[ValidationResult]:
+        if self._redis is None:
+            return None
+        try:
+            payload = self._redis.get(REDIS_KEY_PREFIX + key)
+        except Exception as e:
+            print(f"⚠️ Validation cache Redis read failed: {e}")
+            return None
+        if not payload:
+            return None
+        data = json.loads(payload)
+        data['performance'] = [PerformanceHint(**hint) for hint in data.get('performance', [])]
+        return ValidationResult(**data)
+
+    def _redis_set(self, key: str, result: ValidationResult):
+        if self._redis is None:
+            return
+        try:
+            self._redis.set(REDIS_KEY_PREFIX + key, json.dumps(asdict(result)), ex=self.ttl)
+        except Exception as e:
+            print(f"⚠️ Validation cache Redis write failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.redis_hits = self.misses = self.trusted_skips = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.redis_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "redisHits": self.redis_hits,
+                "misses": self.misses,
+                "trustedSkips": self.trusted_skips,
+                "hitRate": (self.hits + self.redis_hits) / lookups if lookups else 0.0,
+                "redis": self._redis is not None,
+                "validatorVersion": VALIDATOR_VERSION
+            }
+
+
+_validation_cache: Optional[ValidationCache] = None
+
+
+def get_validation_cache() -> ValidationCache:
+    """Obtiene o crea la cache global del proceso"""
+    global _validation_cache
+    if _validation_cache is None:
+        _validation_cache = ValidationCache(redis_url=VALIDATION_CACHE_REDIS_URL)
+    return _validation_cache
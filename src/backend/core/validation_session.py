@@ -0,0 +1,836 @@
+"""
+Validación incremental para el editor
+El cliente abre una sesión con el documento y después envía solo ediciones
+(rango + texto). El documento se divide en declaraciones de nivel superior
+(chunks de líneas completas); tras cada edición solo se re-tokenizan los
+chunks tocados. Cada chunk guarda los símbolos globales que usa y lo que
+vio de ellos (firma, sin el cuerpo): solo se re-analiza un chunk si su
+texto cambió o si cambió la firma de algo que usa. El resto de
+diagnósticos se reutiliza, así la latencia no crece con el tamaño del
+archivo.
+"""
+
+import heapq
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from core import glsl_ast as ast
+from core.glsl_analyzer import AnalysisResult, GLSLAnalyzer
+from core.glsl_lint import PerformanceHint, lint_performance
+from core.glsl_parser import BudgetExceeded, GLSLSyntaxError, Macro, Preprocessor, TimeBudgetExceeded, parse_tokens
+from core.glsl_tokenizer import Token, tokenize
+from core.glsl_validator import GLSLValidator, ValidationResult, TIME_BUDGET_MS, match_brackets
+
+SESSION_MAX_SIZE = int(os.getenv("VALIDATION_SESSION_MAX_SIZE", 4 * 1024 * 1024))
+MAX_SESSIONS = int(os.getenv("VALIDATION_MAX_SESSIONS", 256))
+SESSION_TTL = int(os.getenv("VALIDATION_SESSION_TTL", 30 * 60))
+
+# Un #if de nivel superior puede abarcar varios chunks: validación completa
+_CONDITIONAL_DIRECTIVES = {'if', 'ifdef', 'ifndef', 'elif', 'else', 'endif'}
+_MACRO_DIRECTIVES = {'define', 'undef'}
+
+# Tablas globales que un chunk lee de los anteriores (uniforms y variables solo se reportan)
+_GLOBAL_TABLES = ('symbols', 'functions', 'structs')
+
+# "line 3", "line 3:7", "at 3:7" (brackets mal cerrados)
+_LOCATION_RE = re.compile(r'(\b[Ll]ine |\bat )(\d+)')
+
+# (tabla, nombre) de una entrada del scope global
+GlobalKey = Tuple[str, str]
+
+
+class SessionError(ValueError):
+    """Edición que no se puede aplicar al documento de la sesión"""
+    pass
+
+
+@dataclass
+class TextEdit:
+    """
+    Reemplazo de un rango del documento
+
+    start/end son (línea, carácter) 0-based, con end exclusivo (como LSP).
+    Sin rango, text reemplaza el documento entero.
+    """
+    text: str
+    start: Optional[Tuple[int, int]] = None
+    end: Optional[Tuple[int, int]] = None
+
+
+@dataclass(eq=False)
+class Chunk:
+    """Declaración de nivel superior: line_count líneas completas del documento"""
+    text: str
+    line_count: int
+
+
+@dataclass
+class _ParsedChunk:
+    """Resultado sintáctico de un chunk (depende de su texto y de las macros y structs que usa)"""
+    errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+    declarations: List[ast.Stmt] = field(default_factory=list)
+    macros: Optional[Dict[str, Macro]] = None  # macros tras el chunk si define/undef
+    macro_signatures: Optional[Dict[str, tuple]] = None
+    struct_names: Set[str] = field(default_factory=set)
+    conditional: bool = False
+
+
+@dataclass
+class _AnalyzedChunk:
+    """Diagnósticos semánticos del chunk y lo que dejó en el scope global"""
+    errors: List[str]
+    warnings: List[str]
+    writes: Dict[GlobalKey, Any]
+    signatures: Dict[GlobalKey, Any]  # lo que los chunks siguientes ven de cada escritura
+    performance: List[PerformanceHint] = field(default_factory=list)
+
+
+@dataclass(eq=False)
+class _ChunkState:
+    """Lo que la sesión sabe de un chunk desde su última revisión"""
+    text: Optional[str] = None  # texto tokenizado
+    tokens: List[Token] = field(default_factory=list)
+    unterminated_comment: bool = False
+    idents: FrozenSet[str] = frozenset()
+    defines_macros: bool = False
+    parse_key: Optional[tuple] = None
+    parsed: Optional[_ParsedChunk] = None
+    reads: FrozenSet[str] = frozenset()  # nombres globales que puede usar
+    deps: Dict[GlobalKey, Any] = field(default_factory=dict)  # firma de lo que vio de cada uno
+    analysis_key: Optional[tuple] = None
+    analyzed: Optional[_AnalyzedChunk] = None
+
+    @property
+    def diagnosed(self) -> bool:
+        parsed, analyzed = self.parsed, self.analyzed
+        return bool(
+            (parsed and (parsed.errors or parsed.warnings))
+            or (analyzed and (analyzed.errors or analyzed.warnings or analyzed.performance))
+        )
+
+
+class _RecordingDict(dict):
+    """Dict que anota las claves escritas (lo que el chunk deja en el scope global)"""
+
+    def __init__(self, target: str, log: List[Tuple[str, str]]):
+        super().__init__()
+        self.target = target
+        self.log = log
+
+    def __setitem__(self, key, value):
+        self.log.append((self.target, key))
+        super().__setitem__(key, value)
+
+    def setdefault(self, key, default=None):
+        self.log.append((self.target, key))
+        return super().setdefault(key, default)
+
+
+def split_lines(text: str) -> List[str]:
+    """Líneas con su '\\n' (solo '\\n' separa líneas, igual que el tokenizer)"""
+    lines = text.split('\n')
+    last = lines.pop()
+    result = [line + '\n' for line in lines]
+    if last:
+        result.append(last)
+    return result
+
+
+def _directive(token: Token) -> str:
+    parts = token.value[1:].split(None, 1)
+    return parts[0] if parts else ''
+
+
+def split_chunks(lines: List[str]) -> Tuple[List[Chunk], bool]:
+    """
+    Divide líneas en declaraciones de nivel superior
+
+    Se corta tras un `;` o `}` de profundidad 0 cuando el siguiente token
+    empieza otra línea, y alrededor de cada directiva de nivel superior.
+
+    Returns:
+        (chunks, abierto): abierto si queda un bracket o comentario sin cerrar
+    """
+    text = "".join(lines)
+    tokenized = tokenize(text)
+    cuts = [0]
+    depth = 0
+    boundary = None  # línea (1-based) tras la que se puede cortar
+
+    for token in tokenized.tokens:
+        line_start = token.pos - token.col + 1
+        if (
+            token.line - 1 > cuts[-1]
+            and (
+                (boundary is not None and token.line > boundary)
+                or (token.kind == 'preproc' and depth == 0)
+            )
+            and not text[line_start:token.pos].strip()
+        ):
+            cuts.append(token.line - 1)
+        boundary = None
+
+        if token.kind == 'preproc':
+            if depth == 0:
+                boundary = token.line + token.value.count('\n')
+            continue
+        if token.kind != 'op':
+            continue
+        if token.value in '({[':
+            depth += 1
+        elif token.value in ')}]':
+            depth = max(depth - 1, 0)
+        if depth == 0 and token.value in (';', '}'):
+            boundary = token.line
+
+    ends = cuts[1:] + [len(lines)]
+    chunks = [
+        Chunk("".join(lines[start:end]), end - start)
+        for start, end in zip(cuts, ends) if end > start
+    ]
+    return chunks, depth > 0 or tokenized.unterminated_comment
+
+
+def _prototype(tokens: List[Token]) -> Optional[List[Token]]:
+    """`firma {` de un chunk con errores -> tokens del prototipo `firma;`"""
+    for i, token in enumerate(tokens):
+        if token.kind == 'op' and token.value == '{':
+            if i and tokens[i - 1].value == ')':
+                return tokens[:i] + [token._replace(value=';')]
+            return None
+    return None
+
+
+def _relocate(message: str, offset: int) -> str:
+    """Líneas relativas al chunk -> líneas del documento"""
+    return _LOCATION_RE.sub(lambda m: f"{m.group(1)}{int(m.group(2)) + offset}", message)
+
+
+def _macro_signature(macro: Macro) -> tuple:
+    return None if macro.params is None else tuple(macro.params), tuple(t.value for t in macro.body)
+
+
+def _signature(table: str, value: Any) -> Any:
+    """
+    Lo que otro chunk puede observar de una entrada global
+
+    Sin el AST: editar el cuerpo de una función o el valor de una
+    constante no cambia su firma, y no re-analiza a quien la usa.
+    """
+    if table == 'symbols':
+        return value.kind, value.type, tuple(value.qualifiers)
+    if table == 'functions':
+        return tuple(
+            (f.return_type, tuple(f.param_types), f.defined, tuple(tuple(p.qualifiers) for p in f.node.params))
+            for f in value
+        )
+    return tuple(value.items())
+
+
+def _value_types(table: str, value: Any) -> Set[str]:
+    """Tipos que menciona una entrada global (un struct puede llegar sin nombrarlo: `make().field`)"""
+    if table == 'symbols':
+        types = [value.type]
+    elif table == 'functions':
+        types = [t for f in value for t in (f.return_type, *f.param_types)]
+    else:
+        types = list(value.values())
+    return {t[:-2] if t.endswith('[]') else t for t in types if t}
+
+
+def _chunk_starts(start: int, chunks: List[Chunk]) -> np.ndarray:
+    counts = np.fromiter((c.line_count for c in chunks), np.int64, len(chunks))
+    starts = np.zeros(len(chunks), np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+    return starts + start
+
+
+class ValidationSession:
+    """Documento abierto en el editor con los diagnósticos cacheados por chunk"""
+
+    def __init__(self, code: str = "", session_id: Optional[str] = None,
+                 time_budget_ms: Optional[float] = None):
+        self.id = session_id or uuid.uuid4().hex
+        self.version = 0
+        self.time_budget_ms = TIME_BUDGET_MS if time_budget_ms is None else time_budget_ms
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.lines: List[str] = []
+        self.chunks: List[Chunk] = []
+        self.stats: Dict[str, Any] = {}
+        self._replace_all(code)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.lines)
+
+    # ----- Ediciones -----
+
+    def apply(self, edits: List[TextEdit]):
+        """
+        Aplica ediciones en orden (cada rango se refiere al documento tras la anterior)
+
+        Raises:
+            SessionError: rango fuera del documento o documento demasiado grande
+        """
+        for edit in edits:
+            if edit.start is None or edit.end is None:
+                self._replace_all(edit.text)
+            else:
+                self._apply_range(edit)
+        self.version += 1
+
+    def _replace_all(self, code: str):
+        self._check_size(len(code))
+        self.lines = split_lines(code)
+        self._size = len(code)
+        self.chunks, _ = split_chunks(self.lines)
+        self._starts = _chunk_starts(0, self.chunks)  # línea inicial de cada chunk
+        self._positions: Dict[Chunk, int] = {chunk: i for i, chunk in enumerate(self.chunks)}
+        self._states: Dict[Chunk, _ChunkState] = {}
+        # Chunks por revisar: None revisa todo, un set solo esas entradas globales
+        self._pending: Dict[Chunk, Optional[Set[GlobalKey]]] = {}
+        self._marked: List[int] = []
+        self._readers: Dict[str, Set[Chunk]] = {}
+        self._writers: Dict[GlobalKey, Set[Chunk]] = {}
+        self._struct_chunks: Dict[str, Set[Chunk]] = {}
+        self._macro_chunks: Set[Chunk] = set()
+        self._conditional: Set[Chunk] = set()
+        self._diagnosed: Set[Chunk] = set()
+        self._content = 0  # chunks con algo más que espacios
+        for chunk in self.chunks:
+            self._add(chunk)
+
+    def _apply_range(self, edit: TextEdit):
+        (start_line, start_char), (end_line, end_char) = edit.start, edit.end
+        line_count = len(self.lines)
+        if not (0 <= start_line <= end_line <= line_count) or min(start_char, end_char) < 0:
+            raise SessionError(f"Edit range {edit.start}-{edit.end} outside document ({line_count} lines)")
+        if (start_line, start_char) > (end_line, end_char):
+            raise SessionError(f"Edit range {edit.start}-{edit.end} is reversed")
+
+        def line_at(index: int) -> str:
+            return self.lines[index] if index < line_count else ""
+
+        start_text = line_at(start_line)
+        end_text = line_at(end_line)
+        start_char = min(start_char, len(start_text.rstrip('\n')))
+        end_char = min(end_char, len(end_text.rstrip('\n')))
+        replaced = min(end_line + 1, line_count) - start_line
+
+        new_lines = split_lines(start_text[:start_char] + edit.text + end_text[end_char:])
+        size = self._size - sum(map(len, self.lines[start_line:start_line + replaced])) + sum(map(len, new_lines))
+        self._check_size(size)
+        self.lines[start_line:start_line + replaced] = new_lines
+        self._size = size
+
+        if not self.chunks:
+            self._splice(0, -1, split_chunks(self.lines)[0])
+            return
+        first = self._chunk_index(start_line)
+        last = self._chunk_index(end_line)
+        self._rechunk(first, last, len(new_lines) - replaced)
+
+    def _chunk_index(self, line: int) -> int:
+        return min(max(int(np.searchsorted(self._starts, line, 'right')) - 1, 0), len(self.chunks) - 1)
+
+    def _rechunk(self, first: int, last: int, line_delta: int):
+        """Re-divide las líneas de los chunks first..last (ya editadas)"""
+        start = int(self._starts[first])
+        end = int(self._starts[last]) + self.chunks[last].line_count + line_delta
+        while True:
+            chunks, unclosed = split_chunks(self.lines[start:end])
+            # Una llave abierta se come las declaraciones siguientes
+            if not unclosed or last + 1 >= len(self.chunks):
+                break
+            last += 1
+            end += self.chunks[last].line_count
+        self._splice(first, last, chunks)
+
+    def _splice(self, first: int, last: int, chunks: List[Chunk]):
+        """Reemplaza los chunks first..last; los siguientes solo se desplazan"""
+        old = self.chunks[first:last + 1]
+        start = int(self._starts[first]) if old else 0
+        shift = sum(c.line_count for c in chunks) - sum(c.line_count for c in old)
+
+        if len(chunks) == len(old):
+            # Mismas declaraciones: cada chunk conserva su estado (lo que exponía) para comparar
+            for chunk, new in zip(old, chunks):
+                if chunk.text != new.text:
+                    self._content += bool(new.text.strip()) - bool(chunk.text.strip())
+                    chunk.text, chunk.line_count = new.text, new.line_count
+                    self._mark(chunk)
+            chunks = old
+        else:
+            removed = [self._forget(chunk) for chunk in old]
+            self.chunks[first:last + 1] = chunks
+            for chunk in old:
+                del self._positions[chunk]
+            self._positions.update(zip(self.chunks[first:], range(first, len(self.chunks))))
+            for chunk in chunks:
+                self._add(chunk)
+            # Quien usaba lo que declaraban los chunks quitados vuelve a mirar
+            for writes, names, macros in removed:
+                self._notify(first - 1, writes, names, macros)
+
+        self._starts = np.concatenate((self._starts[:first], _chunk_starts(start, chunks), self._starts[last + 1:] + shift))
+
+    def _add(self, chunk: Chunk):
+        self._states[chunk] = _ChunkState()
+        self._content += bool(chunk.text.strip())
+        self._mark(chunk)
+
+    def _forget(self, chunk: Chunk) -> Tuple[List[GlobalKey], Set[str], bool]:
+        """Quita un chunk de los índices; retorna lo que declaraba (escrituras, structs y macros)"""
+        state = self._states.pop(chunk)
+        self._content -= bool(chunk.text.strip())
+        self._pending.pop(chunk, None)
+        self._conditional.discard(chunk)
+        self._diagnosed.discard(chunk)
+        for name in state.reads:
+            self._readers[name].discard(chunk)
+        writes = list(state.analyzed.signatures) if state.analyzed else []
+        for key in writes:
+            self._writers[key].discard(chunk)
+        names: Set[str] = set()
+        parsed = state.parsed
+        if parsed:
+            for name in parsed.struct_names:
+                self._struct_chunks[name].discard(chunk)
+            names |= parsed.struct_names | set(parsed.macro_signatures or ())
+        is_macro = chunk in self._macro_chunks
+        self._macro_chunks.discard(chunk)
+        return writes, names, is_macro
+
+    @staticmethod
+    def _check_size(size: int):
+        if size > SESSION_MAX_SIZE:
+            raise SessionError(f"Document exceeds {SESSION_MAX_SIZE} bytes")
+
+    # ----- Dependencias entre chunks -----
+
+    def _mark(self, chunk: Chunk, key: Optional[GlobalKey] = None):
+        """Pone un chunk a revisar: entero, o solo si cambió lo que ve de key"""
+        checks = self._pending.get(chunk, ())
+        if checks is None:
+            return
+        if chunk not in self._pending:
+            self._marked.append(self._positions[chunk])
+        self._pending[chunk] = None if key is None else {*checks, key}
+
+    def _notify(self, position: int, writes: Iterable[GlobalKey], names: Iterable[str] = (),
+                macros: bool = False):
+        """
+        Avisa a los chunks posteriores a position de un cambio
+
+        writes: entradas globales con otra firma (cada lector solo compara esa)
+        names: structs o macros cambiados (cambia el parseo: revisión completa)
+        macros: las macros tras position cambiaron (los chunks con #define las copian)
+        """
+        positions = self._positions
+        for table, name in writes:
+            for reader in self._readers.get(name, ()):
+                if positions[reader] > position:
+                    self._mark(reader, (table, name))
+        for name in names:
+            for reader in self._readers.get(name, ()):
+                if positions[reader] > position:
+                    self._mark(reader)
+        if macros:
+            for chunk in self._macro_chunks:
+                if positions[chunk] > position:
+                    self._mark(chunk)
+
+    def _visible(self, key: GlobalKey, position: int) -> Tuple[Any, Any]:
+        """(firma, valor) de una entrada global antes del chunk en position"""
+        best, best_position = None, -1
+        for writer in self._writers.get(key, ()):
+            p = self._positions[writer]
+            if best_position < p < position:
+                best, best_position = writer, p
+        if best is None:
+            return None, None
+        analyzed = self._states[best].analyzed
+        return analyzed.signatures[key], analyzed.writes[key]
+
+    def _macros_before(self, position: int) -> Optional[_ParsedChunk]:
+        best, best_position = None, -1
+        for chunk in self._macro_chunks:
+            p = self._positions[chunk]
+            if best_position < p < position:
+                best, best_position = chunk, p
+        return self._states[best].parsed if best is not None else None
+
+    def _struct_before(self, name: str, position: int) -> bool:
+        return any(self._positions[c] < position for c in self._struct_chunks.get(name, ()))
+
+    @staticmethod
+    def _used_macros(idents: Iterable[str], macros: Dict[str, Macro]) -> Set[str]:
+        """Macros que expande un chunk (incluidas las que usan otras macros)"""
+        used: Set[str] = set()
+        pending = [name for name in idents if name in macros]
+        while pending:
+            name = pending.pop()
+            if name not in used:
+                used.add(name)
+                pending.extend(t.value for t in macros[name].body if t.kind == 'ident' and t.value in macros)
+        return used
+
+    # ----- Diagnósticos -----
+
+    def diagnostics(self) -> ValidationResult:
+        """
+        Valida el documento actual reutilizando lo que no cambió
+
+        Returns:
+            ValidationResult equivalente al de GLSLValidator; los detalles
+            del trabajo hecho quedan en self.stats
+        """
+        start_time = time.perf_counter()
+        self.last_used = time.monotonic()
+        deadline = start_time + self.time_budget_ms / 1000 if self.time_budget_ms > 0 else None
+
+        if not self._content:
+            self.stats = {"chunks": 0, "reparsed": 0, "reanalyzed": 0, "incremental": True}
+            return ValidationResult(is_valid=False, errors=["Empty shader code"], warnings=[], suggestions=[])
+        # Un #if de nivel superior que no se editó desde la última vez
+        if any(chunk not in self._pending for chunk in self._conditional):
+            return self._full_validation(start_time)
+
+        truncation: Optional[str] = None
+        timed_out = False
+        reparsed = reanalyzed = 0
+        analyzer = GLSLAnalyzer(deadline)
+
+        # En orden del documento: al revisar un chunk los anteriores ya están al día
+        queue = [self._positions[chunk] for chunk in self._pending]
+        heapq.heapify(queue)
+        self._marked = []
+        while queue:
+            position = heapq.heappop(queue)
+            chunk = self.chunks[position]
+            try:
+                outcome = self._review(chunk, position, self._pending[chunk], analyzer, deadline)
+            except BudgetExceeded as e:
+                self._pending[chunk] = None
+                truncation = f"Validation truncated: {e}"
+                timed_out = isinstance(e, TimeBudgetExceeded)
+                break
+            del self._pending[chunk]
+            if outcome is None:
+                return self._full_validation(start_time)
+            reparsed += outcome[0]
+            reanalyzed += outcome[1]
+            for marked in self._marked:
+                heapq.heappush(queue, marked)
+            self._marked.clear()
+
+        errors: List[str] = []
+        warnings: List[str] = []
+        performance: List[PerformanceHint] = []
+        for chunk in sorted(self._diagnosed, key=self._positions.__getitem__):
+            if chunk in self._pending:
+                continue  # sin revisar tras el truncado
+            state = self._states[chunk]
+            offset = int(self._starts[self._positions[chunk]])
+            parsed, analyzed = state.parsed, state.analyzed
+            errors.extend(_relocate(m, offset) for m in parsed.errors + analyzed.errors)
+            warnings.extend(_relocate(m, offset) for m in parsed.warnings + analyzed.warnings)
+            performance.extend(replace(h, line=h.line + offset) for h in analyzed.performance)
+
+        if truncation:
+            warnings.append(truncation)
+        elif not (self._writers.get(('functions', 'main')) or self._writers.get(('functions', 'mainImage'))):
+            errors.insert(0, "Missing main function (void mainImage or void main)")
+
+        self.stats = {
+            "chunks": len(self.chunks),
+            "reparsed": reparsed,
+            "reanalyzed": reanalyzed,
+            "incremental": True,
+            "time_ms": round((time.perf_counter() - start_time) * 1000, 2)
+        }
+        return ValidationResult(
+            is_valid=not errors,
+            errors=errors,
+            warnings=warnings,
+            suggestions=[],
+            truncated=truncation is not None,
+            timed_out=timed_out,
+            performance=performance
+        )
+
+    def _review(self, chunk: Chunk, position: int, checks: Optional[Set[GlobalKey]], analyzer: GLSLAnalyzer,
+                deadline: Optional[float]) -> Optional[Tuple[int, int]]:
+        """
+        Pone al día un chunk pendiente
+
+        Returns:
+            (reparseado, re-analizado), o None si tiene un #if de nivel superior
+        """
+        state = self._states[chunk]
+        if checks is not None and state.analysis_key is not None and all(
+            state.deps.get(key) == self._visible(key, position)[0] for key in checks
+        ):
+            return 0, 0  # lo que cambió no altera lo que este chunk ve
+
+        if state.text != chunk.text:
+            tokenized = tokenize(chunk.text)
+            state.text, state.tokens = chunk.text, tokenized.tokens
+            state.unterminated_comment = tokenized.unterminated_comment
+            state.idents = frozenset(t.value for t in state.tokens if t.kind == 'ident')
+            state.defines_macros = any(
+                t.kind == 'preproc' and _directive(t) in _MACRO_DIRECTIVES for t in state.tokens
+            )
+
+        # Parseo: depende del texto, de las macros que expande y de qué identificadores son structs
+        before = self._macros_before(position)
+        macros = before.macros if before else None
+        used = self._used_macros(state.idents, macros) if macros else set()
+        if state.defines_macros:
+            macro_key = tuple(sorted(before.macro_signatures.items())) if before else None
+        else:
+            macro_key = tuple(sorted((name, before.macro_signatures[name]) for name in used))
+        structs = frozenset(name for name in state.idents if self._struct_before(name, position))
+        parse_key = (chunk.text, macro_key, structs)
+
+        reparsed = reanalyzed = 0
+        if parse_key != state.parse_key:
+            parsed = self._parse_chunk(state, macros, set(structs), deadline)
+            reparsed = 1
+            previous, state.parse_key, state.parsed = state.parsed, parse_key, parsed
+            self._update_declared(chunk, position, previous, parsed)
+        if state.parsed.conditional:
+            self._conditional.add(chunk)
+            return None
+        self._conditional.discard(chunk)
+
+        # Análisis: depende de lo que ve de los nombres globales que usa
+        reads = set(state.idents)
+        reads.update(t.value for name in used for t in macros[name].body if t.kind == 'ident')
+        deps: Dict[GlobalKey, Any] = {}
+        visible: Dict[GlobalKey, Any] = {}
+        names = list(reads)
+        while names:
+            name = names.pop()
+            for table in _GLOBAL_TABLES:
+                signature, value = self._visible((table, name), position)
+                if value is None:
+                    continue
+                deps[(table, name)] = signature
+                visible[(table, name)] = value
+                for type_name in _value_types(table, value) - reads:
+                    reads.add(type_name)
+                    names.append(type_name)
+
+        if state.analysis_key != parse_key or state.deps != deps:
+            analyzed = self._analyze_chunk(state.parsed, visible, analyzer)
+            reanalyzed = 1
+            previous, state.analysis_key, state.analyzed = state.analyzed, parse_key, analyzed
+            self._update_writes(chunk, position, previous, analyzed)
+        state.deps = deps
+
+        for name in state.reads - reads:
+            self._readers[name].discard(chunk)
+        for name in reads - state.reads:
+            self._readers.setdefault(name, set()).add(chunk)
+        state.reads = frozenset(reads)
+        if state.diagnosed:
+            self._diagnosed.add(chunk)
+        else:
+            self._diagnosed.discard(chunk)
+        return reparsed, reanalyzed
+
+    def _update_declared(self, chunk: Chunk, position: int, previous: Optional[_ParsedChunk], parsed: _ParsedChunk):
+        """Structs y macros que declara un chunk re-parseado"""
+        old_structs = previous.struct_names if previous else set()
+        for name in old_structs - parsed.struct_names:
+            self._struct_chunks[name].discard(chunk)
+        for name in parsed.struct_names - old_structs:
+            self._struct_chunks.setdefault(name, set()).add(chunk)
+        changed = old_structs ^ parsed.struct_names
+
+        if parsed.macros is not None:
+            self._macro_chunks.add(chunk)
+        else:
+            self._macro_chunks.discard(chunk)
+        old_macros = (previous.macro_signatures if previous else None) or {}
+        new_macros = parsed.macro_signatures or {}
+        macros_changed = old_macros != new_macros
+        if macros_changed:
+            changed |= {name for name in old_macros.keys() | new_macros.keys() if old_macros.get(name) != new_macros.get(name)}
+        self._notify(position, (), changed, macros_changed)
+
+    def _update_writes(self, chunk: Chunk, position: int, previous: Optional[_AnalyzedChunk],
+                       analyzed: _AnalyzedChunk):
+        """Entradas globales que escribe un chunk re-analizado (avisa si cambió alguna firma)"""
+        old = previous.signatures if previous else {}
+        new = analyzed.signatures
+        for key in old.keys() - new.keys():
+            self._writers[key].discard(chunk)
+        for key in new.keys() - old.keys():
+            self._writers.setdefault(key, set()).add(chunk)
+        self._notify(position, [key for key in old.keys() | new.keys() if old.get(key) != new.get(key)])
+
+    @staticmethod
+    def _parse_chunk(state: _ChunkState, macros: Optional[Dict[str, Macro]], struct_names: Set[str],
+                     deadline: Optional[float]) -> _ParsedChunk:
+        text, tokens = state.text, state.tokens
+        parsed = _ParsedChunk()
+        if state.unterminated_comment:
+            parsed.warnings.append("Unterminated block comment")
+
+        depth = 0
+        for token in tokens:
+            if token.kind == 'invalid':
+                parsed.errors.append(f"Unexpected character '{token.value}' at line {token.location}")
+            elif token.kind == 'preproc':
+                directive = _directive(token)
+                parsed.conditional = parsed.conditional or (depth == 0 and directive in _CONDITIONAL_DIRECTIVES)
+            elif token.kind == 'op':
+                if token.value in '({[':
+                    depth += 1
+                elif token.value in ')}]':
+                    depth -= 1
+        parsed.struct_names = {
+            b.value for a, b in zip(tokens, tokens[1:]) if a.value == 'struct' and b.kind == 'ident'
+        }
+        if parsed.conditional:
+            return parsed
+
+        if state.defines_macros:
+            preprocessor = Preprocessor(deadline=deadline, macros=macros)
+            preprocessor.run(tokens)
+            parsed.macros = preprocessor.macros
+            parsed.macro_signatures = {name: _macro_signature(m) for name, m in parsed.macros.items()}
+
+        _, bracket_errors = match_brackets(tokens)
+        parsed.errors.extend(bracket_errors)
+        if parsed.errors:
+            return parsed
+
+        try:
+            result = parse_tokens(tokens, text, deadline, macros=macros, struct_names=struct_names)
+        except GLSLSyntaxError as e:
+            parsed.errors.append(str(e))
+            # Mientras se edita un cuerpo roto la función sigue declarada
+            prototype = _prototype(tokens)
+            if prototype is not None:
+                try:
+                    result = parse_tokens(prototype, text, deadline, macros=macros, struct_names=struct_names)
+                    parsed.declarations = result.unit.declarations
+                except GLSLSyntaxError:
+                    pass
+            return parsed
+
+        parsed.warnings.extend(result.warnings)
+        parsed.declarations = result.unit.declarations
+        return parsed
+
+    @staticmethod
+    def _analyze_chunk(parsed: _ParsedChunk, visible: Dict[GlobalKey, Any], analyzer: GLSLAnalyzer) -> _AnalyzedChunk:
+        analyzer.result = result = AnalysisResult()
+        scope = analyzer.new_global_scope()
+        log: List[Tuple[str, str]] = []
+        scope.symbols = _RecordingDict('symbols', log)
+        result.functions = _RecordingDict('functions', log)
+        result.structs = _RecordingDict('structs', log)
+        targets = {'symbols': scope.symbols, 'functions': result.functions, 'structs': result.structs}
+        # Lo que ve de los chunks anteriores, sin pasar por el registro (no lo escribe él)
+        for (table, name), value in visible.items():
+            dict.__setitem__(targets[table], name, list(value) if table == 'functions' else value)
+
+        for declaration in parsed.declarations:
+            try:
+                analyzer.declaration(declaration, scope, isolated=True)
+            except RecursionError:
+                result.warnings.append("Shader too deeply nested for semantic analysis")
+
+        performance = []
+        if any(isinstance(d, ast.FunctionDecl) and d.body for d in parsed.declarations):
+            # Constantes y firmas de los chunks anteriores
+            performance = lint_performance(parsed.declarations, scope, result.functions)
+
+        writes = {}
+        for table, name in dict.fromkeys(log):
+            value = targets[table][name]
+            writes[(table, name)] = list(value) if table == 'functions' else value
+        return _AnalyzedChunk(
+            errors=result.errors,
+            warnings=result.warnings,
+            writes=writes,
+            signatures={key: _signature(key[0], value) for key, value in writes.items()},
+            performance=performance
+        )
+
+    def _full_validation(self, start_time: float) -> ValidationResult:
+        """Fallback para lo que no se puede validar por partes (#if de nivel superior)"""
+        result = GLSLValidator(max_source_size=SESSION_MAX_SIZE, time_budget_ms=self.time_budget_ms).validate(self.text)
+        self.stats = {
+            "chunks": len(self.chunks),
+            "reparsed": len(self.chunks),
+            "reanalyzed": len(self.chunks),
+            "incremental": False,
+            "time_ms": round((time.perf_counter() - start_time) * 1000, 2)
+        }
+        return result
+
+class SessionStore:
+    """Sesiones abiertas (LRU con expiración por inactividad)"""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl: int = SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, ValidationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, code: str) -> ValidationSession:
+        session = ValidationSession(code)
+        with self._lock:
+            self._expire()
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id: str) -> Optional[ValidationSession]:
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                session.last_used = time.monotonic()
+            return session
+
+    def close(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self):
+        limit = time.monotonic() - self.ttl
+        expired = [sid for sid, s in self._sessions.items() if s.last_used < limit]
+        for session_id in expired:
+            del self._sessions[session_id]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+_session_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    """Obtiene o crea el store global de sesiones del proceso"""
+    global _session_store
+    if _session_store is None:
+        _session_store = SessionStore()
+    return _session_store
@@ -3,7 +3,10 @@ Database connection and initialization for ShaderForge AI
 """
 
 import os
-from sqlalchemy import create_engine
+from typing import List
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import NullPool
 
@@ -40,13 +43,47 @@ def get_db() -> Session:
     finally:
         db.close()
 
-def init_db():
+def init_db(bind: Engine = engine):
     """
     Initialize database - create all tables
     
-    Should be called once on startup
+    Should be called once on startup. create_all no altera tablas que ya
+    existen: upgrade_schema añade las columnas e índices nuevos del modelo
+    """
+    Base.metadata.create_all(bind=bind)
+    for column in upgrade_schema(bind):
+        print(f"🛠️ Added column {column}")
+
+def upgrade_schema(bind: Engine = engine) -> List[str]:
+    """
+    Añade a las tablas existentes las columnas e índices del modelo que les faltan
+
+    Las columnas se crean nullable y sin default: las filas anteriores
+    quedan en NULL (sin analizar / sin compilar) y los comandos de
+    backfill las completan.
+
+    Returns:
+        Columnas añadidas ("tabla.columna")
     """
-    Base.metadata.create_all(bind=engine)
+    inspector = inspect(bind)
+    quote = bind.dialect.identifier_preparer.quote
+    added = []
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                connection.execute(text(
+                    f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"
+                ))
+                added.append(f"{table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+    return added
 
 def drop_db():
     """
@@ -2,7 +2,7 @@
 Database models for ShaderForge AI
 """
 
-from sqlalchemy import Column, String, Integer, Text, DateTime, Boolean, JSON, ForeignKey, Table
+from sqlalchemy import Column, String, Integer, Text, DateTime, Boolean, JSON, ForeignKey, Table, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -61,7 +61,21 @@ class Shader(Base):
     tags = relationship("ShaderTag", back_populates="shader", cascade="all, delete-orphan")
     techniques = Column(JSON, default=list)  # ["raymarching", "sdf", ...]
     uniforms = Column(JSON, default=list)  # [{"name": "iTime", "type": "float"}, ...]
-    complexity_score = Column(Integer, default=0)  # 0-100
+    
+    # Complejidad estática por fragmento (ver core.complexity)
+    complexity_score = Column(Integer, default=0, index=True)  # 0-100
+    complexity = Column(JSON)  # {"cost": n, "transcendentals": n, "texture_fetches": n, ...}
+    complexity_version = Column(String(20), index=True)
+    
+    # Validación (etapa Validate del pipeline, ver core.corpus_validation)
+    is_valid = Column(Boolean, index=True)  # None = sin validar
+    validation = Column(JSON)  # {"errors": [...], "warnings": [...], "error_count": n, "time_ms": ...}
+    validator_version = Column(String(20), index=True)
+    validated_at = Column(DateTime)
+    
+    # Preview renderizado sin GPU (ver core.thumbnails)
+    thumbnail_url = Column(String(500))
+    render_status = Column(String(20), index=True)  # ok, black, nan, unsupported, error
     
     # Stats
     views = Column(Integer, default=0, index=True)
@@ -92,6 +106,13 @@ class Shader(Base):
     node_graph = relationship("NodeGraph", back_populates="shader", uselist=False, cascade="all, delete-orphan")
     embedding = relationship("ShaderEmbedding", back_populates="shader", uselist=False, cascade="all, delete-orphan")
     
+    # Listados filtrados por visibilidad y complejidad máxima; keyset de
+    # /api/v1/shaders por (views desc, id desc): el índice se recorre hacia atrás
+    __table_args__ = (
+        Index("ix_shaders_visibility_complexity", "visibility", "complexity_score"),
+        Index("ix_shaders_visibility_views_id", "visibility", "views", "id"),
+    )
+    
     def to_dict(self):
         return {
             "id": self.id,
@@ -103,6 +124,10 @@ class Shader(Base):
             "tags": [tag.name for tag in self.tags] if self.tags else [],
             "techniques": self.techniques,
             "complexity_score": self.complexity_score,
+            "uniforms": self.uniforms or [],
+            "is_valid": self.is_valid,
+            "thumbnail_url": self.thumbnail_url,
+            "render_status": self.render_status,
             "views": self.views,
             "likes": self.likes,
             "forks": self.forks,
@@ -135,10 +160,31 @@ class NodeGraph(Base):
     graph_data = Column(JSON, nullable=False)  # {nodes: [...], edges: [...]}
     thumbnail_url = Column(String(500))
     
+    # Artefacto compilado (se materializa al guardar el grafo)
+    compiled_code = Column(Text)
+    compiled_uniforms = Column(JSON, default=list)  # [{"name": "iTime", "type": "float"}, ...]
+    compile_error = Column(Text)
+    compiler_version = Column(String(20), index=True)
+    registry_hash = Column(String(64))  # codegen_hash del registro de nodos (packs) al compilar
+    content_hash = Column(String(64))  # sha256 del grafo normalizado que produjo compiled_code
+    failed_hash = Column(String(64))  # sha256 del grafo cuya última compilación falló (None si fue correcta)
+    compiled_at = Column(DateTime)
+    
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     shader = relationship("Shader", back_populates="node_graph")
+    
+    def artifact_dict(self):
+        return {
+            "code": self.compiled_code or "",
+            "uniforms": self.compiled_uniforms or [],
+            "error": self.compile_error,
+            "compiler_version": self.compiler_version,
+            "registry_hash": self.registry_hash,
+            "content_hash": self.content_hash,
+            "compiled_at": self.compiled_at.isoformat() if self.compiled_at else None
+        }
 
 class ShaderEmbedding(Base):
     """Embeddings vectoriales para búsqueda semántica"""
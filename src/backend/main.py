@@ -1,6 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 from api.search import router as search_router
@@ -8,6 +11,15 @@ from api.nodes import router as nodes_router
 from api.ai import router as ai_router
 from api.shaders import router as shaders_router
 from db.database import init_db
+from core.node_registry import get_registry
+from core.code_index import get_code_index
+from core.corpus_columns import get_corpus_columns
+from core.facet_index import get_facet_index
+from core.search_index import get_search_index
+from core.shader_corpus import get_shader_corpus
+from core.suggest_index import get_suggest_index
+from core.trigram_index import get_trigram_index
+from core.thumbnails import THUMBNAILS_DIR, THUMBNAIL_URL_PREFIX
 
 # Cargar variables de entorno
 load_dotenv()
@@ -36,6 +48,23 @@ app.include_router(nodes_router)
 app.include_router(ai_router)
 app.include_router(shaders_router)
 
+# Previews generados por commands.render_thumbnails
+app.mount(THUMBNAIL_URL_PREFIX, StaticFiles(directory=THUMBNAILS_DIR, check_dir=False), name="thumbnails")
+
+def warm_search_indexes():
+    """
+    Arma los índices derivados en segundo plano (el arranque no los espera):
+    una petición que llega antes solo espera al índice que necesita
+    """
+    start_time = time.time()
+    try:
+        for build in (get_corpus_columns, get_search_index, get_facet_index, get_suggest_index,
+                      get_trigram_index, get_code_index):
+            build()
+        print(f"✅ Search indexes warmed in {time.time() - start_time:.1f}s")
+    except Exception as e:
+        print(f"⚠️ Search index warmup error: {e}")
+
 # Inicializar base de datos
 @app.on_event("startup")
 def startup_event():
@@ -46,6 +75,22 @@ def startup_event():
     except Exception as e:
         print(f"⚠️ Database initialization error: {e}")
 
+    # Cargar y validar el registro de nodos una sola vez
+    registry = get_registry()
+    print(f"✅ Node registry loaded: {len(registry.snapshot.nodes)} node types")
+
+    # Corpus de búsqueda residente (carga en paralelo + watcher de cambios)
+    corpus = get_shader_corpus()
+    corpus.start()
+    print(f"✅ Shader corpus loaded: {len(corpus)} shaders")
+    # Los índices derivados (BM25, trigramas, facetas...) se arman fuera del arranque
+    threading.Thread(target=warm_search_indexes, name="search-index-warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Detiene el watcher del corpus"""
+    get_shader_corpus().stop()
+
 # Rutas básicas
 @app.get("/")
 def read_root():
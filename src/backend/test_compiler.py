@@ -3,8 +3,14 @@ Test suite exhaustivo para el compilador GLSL
 Valida sintaxis, tipos, y generación correcta de código
 """
 
+import json
+import os
+import random
 import pytest
 from core.compiler import GLSLCompiler, CompiledShader
+from core.glsl_validator import GLSLValidator
+from core.graph_schema import decode_compile_request, decode_graph, to_compiler_graph
+from core.node_registry import NodeRegistry, NodeRegistryError
 
 class TestGLSLCompiler:
     """Tests para el compilador de GLSL"""
@@ -349,6 +355,43 @@ class TestGLSLCompiler:
         assert "iResolution" in uniform_names
         assert "iTime" in uniform_names
 
+    def test_std140_uniform_block(self):
+        """Test modo WebGL2: uniforms empaquetados en un bloque std140"""
+        compiler = GLSLCompiler(uniform_block=True)
+        graph = {
+            "nodes": [
+                {"id": "uv", "data": {"type": "uv_input"}},
+                {"id": "time", "data": {"type": "time_input"}},
+                {"id": "add", "data": {"type": "add"}},
+                {"id": "output", "data": {"type": "fragment_output"}}
+            ],
+            "edges": [
+                {"source": "uv", "target": "add", "targetHandle": "input"},
+                {"source": "time", "target": "add", "targetHandle": "input1"},
+                {"source": "add", "target": "output"}
+            ]
+        }
+        result = compiler.compile(graph)
+        assert result.error is None
+        assert "layout(std140) uniform ShaderUniforms {" in result.code
+        assert "uniform float iTime;" not in result.code
+
+        layout = result.uniform_layout
+        assert layout["size"] == 16
+        offsets = {m["name"]: m["offset"] for m in layout["members"]}
+        assert offsets == {"iResolution": 0, "iTime": 8}
+
+    def test_std140_layout_alignment(self):
+        """Test reglas de alineación std140 (vec3 alinea a 16 bytes)"""
+        layout = self.compiler.build_std140_layout([
+            {"name": "a", "type": "float"},
+            {"name": "b", "type": "vec3"},
+            {"name": "c", "type": "vec2"}
+        ])
+        offsets = {m["name"]: m["offset"] for m in layout["members"]}
+        assert offsets == {"b": 0, "c": 16, "a": 24}
+        assert layout["size"] == 32
+
     # ===== TESTS DE FUNCIONES HELPER =====
 
     def test_helper_functions_included(self):
@@ -393,6 +436,55 @@ class TestGLSLCompiler:
         assert "float simplex(vec2 p)" in result.code
         assert len(result.functions) == 2
 
+    # ===== TESTS DE EXTRACCIÓN DE FUNCIONES =====
+
+    def _noise_motif_graph(self):
+        """Dos copias de clamp(perlin(uv * k), 0, 1) con distinto k"""
+        graph = {"nodes": [{"id": "uv", "data": {"type": "uv_input"}}], "edges": []}
+        for i, k in enumerate([2.0, 5.0]):
+            graph["nodes"] += [
+                {"id": f"k{i}", "data": {"type": "float_constant", "parameters": {"value": k}}},
+                {"id": f"mul{i}", "data": {"type": "multiply"}},
+                {"id": f"noise{i}", "data": {"type": "perlin_noise"}},
+                {"id": f"clamp{i}", "data": {"type": "clamp", "parameters": {"input1": 0.0, "input2": 1.0}}}
+            ]
+            graph["edges"] += [
+                {"source": "uv", "target": f"mul{i}", "targetHandle": "input"},
+                {"source": f"k{i}", "target": f"mul{i}", "targetHandle": "input1"},
+                {"source": f"mul{i}", "target": f"noise{i}"},
+                {"source": f"noise{i}", "target": f"clamp{i}", "targetHandle": "input"}
+            ]
+        graph["nodes"] += [
+            {"id": "sum", "data": {"type": "add"}},
+            {"id": "output", "data": {"type": "fragment_output"}}
+        ]
+        graph["edges"] += [
+            {"source": "clamp0", "target": "sum", "targetHandle": "input"},
+            {"source": "clamp1", "target": "sum", "targetHandle": "input1"},
+            {"source": "sum", "target": "output"}
+        ]
+        return graph
+
+    def test_repeated_subgraph_extracted_to_function(self):
+        """Subgrafos isomorfos con distintos inputs comparten una función"""
+        result = self.compiler.compile(self._noise_motif_graph())
+        assert result.error is None
+        assert "float sf_fn0(vec2 a0, float a1) {" in result.code
+        assert "float v_clamp0 = sf_fn0(v_uv, v_k0);" in result.code
+        assert "float v_clamp1 = sf_fn0(v_uv, v_k1);" in result.code
+        assert "v_noise0" not in result.code
+        assert result.stats["extracted_functions"] == 1
+        assert result.stats["call_sites"] == 2
+        assert result.stats["size"] < result.stats["inline_size"]
+
+    def test_function_extraction_disabled(self):
+        """Con extract_functions=False el código queda inline"""
+        compiler = GLSLCompiler(extract_functions=False)
+        result = compiler.compile(self._noise_motif_graph())
+        assert result.error is None
+        assert "sf_fn0" not in result.code
+        assert "float v_noise0 = perlin(v_mul0);" in result.code
+
     # ===== TESTS DE ESTRUCTURA DEL CÓDIGO =====
 
     def test_code_structure(self):
@@ -463,5 +555,488 @@ def test_full_shader_compilation():
     assert "perlin" in result.functions
 
 
+# ===== TESTS DE METADATA (FAST PATH DE VALIDACIÓN) =====
+
+def test_metadata_trusted_matches_validation():
+    """La tabla de símbolos del compilador coincide con la del validador"""
+    graph = {
+        "nodes": [
+            {"id": "uv", "data": {"type": "uv_input"}},
+            {"id": "mult", "data": {"type": "multiply"}},
+            {"id": "noise", "data": {"type": "perlin_noise"}},
+            {"id": "output", "data": {"type": "fragment_output"}}
+        ],
+        "edges": [
+            {"source": "uv", "target": "mult", "targetHandle": "input"},
+            {"source": "uv", "target": "mult", "targetHandle": "input1"},
+            {"source": "mult", "target": "noise"},
+            {"source": "noise", "target": "output"}
+        ]
+    }
+    result = GLSLCompiler().compile(graph)
+    assert result.metadata.trusted, result.metadata.issues
+
+    full = GLSLValidator()
+    assert full.validate(result.code).is_valid
+    fast = GLSLValidator()
+    assert fast.validate_compiled(result.code, result.metadata).is_valid
+    # El validador completo también registra las locales de los helpers
+    assert fast.declared_variables.items() <= full.declared_variables.items()
+    assert fast.declared_uniforms == full.declared_uniforms
+    assert fast.declared_functions == full.declared_functions
+
+
+def test_metadata_untrusted_falls_back_to_validation():
+    """Un parámetro entero se interpola tal cual: no es correcto por construcción"""
+    graph = {
+        "nodes": [
+            {"id": "c", "data": {"type": "float_constant", "parameters": {"value": 1}}},
+            {"id": "output", "data": {"type": "fragment_output"}}
+        ],
+        "edges": [{"source": "c", "target": "output"}]
+    }
+    result = GLSLCompiler().compile(graph)
+    assert not result.metadata.trusted
+    assert "parameter 'value'" in result.metadata.issues[0]
+    validation = GLSLValidator().validate_compiled(result.code, result.metadata)
+    assert any("Type mismatch" in e for e in validation.errors)
+
+
+def test_trusted_output_always_validates():
+    """Grafos aleatorios: todo lo que el compilador marca trusted es GLSL válido"""
+    compiler = GLSLCompiler()
+    node_types = [t for t in compiler.NODE_FUNCTIONS if t != "fragment_output"]
+    rng = random.Random(42)
+    trusted = 0
+
+    for _ in range(150):
+        nodes, edges = [], []
+        for i in range(rng.randint(1, 8)):
+            node_type = rng.choice(node_types)
+            params = {k: rng.choice([0.5, 2.0, 3]) for k in "xyz"}
+            params["value"] = rng.choice([1.5, "0.25", 2])
+            nodes.append({"id": f"n{i}", "data": {"type": node_type, "parameters": params}})
+            for k in range(compiler.NODE_FUNCTIONS[node_type]["inputs"]):
+                if i and rng.random() < 0.8:
+                    edges.append({"source": f"n{rng.randrange(i)}", "target": f"n{i}",
+                                  "targetHandle": f"input{k}" if k else "input"})
+        nodes.append({"id": "output", "data": {"type": "fragment_output"}})
+        edges.append({"source": nodes[-2]["id"], "target": "output"})
+
+        result = compiler.compile({"nodes": nodes, "edges": edges})
+        if result.error is None and result.metadata.trusted:
+            trusted += 1
+            assert GLSLValidator().validate(result.code).errors == []
+
+    assert trusted > 0
+
+
+# ===== TESTS DE DECODIFICACIÓN TIPADA =====
+
+def test_decode_graph_discards_ui_fields():
+    """Los campos de UI se descartan y el grafo queda listo para compilar"""
+    payload = json.dumps({
+        "nodes": [
+            {"id": "uv", "position": {"x": 1, "y": 2}, "data": {"type": "uv_input", "label": "UV"}},
+            {"id": "output", "selected": True, "data": {"type": "fragment_output"}}
+        ],
+        "edges": [
+            {"id": "e1", "source": "uv", "target": "output", "sourceHandle": None, "animated": True}
+        ]
+    }).encode()
+
+    graph = decode_graph(payload)
+    assert graph["nodes"][0] == {"id": "uv", "data": {"type": "uv_input"}}
+    assert graph["edges"][0] == {"source": "uv", "target": "output"}
+
+    result = GLSLCompiler().compile(graph)
+    assert result.error is None
+    assert "fragColor = vec4(v_uv, 0.0, 1.0);" in result.code
+
+
+def test_decode_compile_request_rejects_invalid_payload():
+    """Payloads que no cumplen el esquema fallan al decodificar"""
+    with pytest.raises(ValueError):
+        decode_compile_request(b'{"graph": {"nodes": [{"data": {}}]}}')
+
+    request = decode_compile_request(b'{"graph": {"nodes": [], "edges": []}, "target": "webgl2"}')
+    assert request.target == "webgl2"
+    assert to_compiler_graph(request.graph) == {"nodes": [], "edges": []}
+
+
+# ===== TESTS DE ARTEFACTOS COMPILADOS =====
+
+SAVED_GRAPH = {
+    "nodes": [
+        {"id": "uv", "position": {"x": 0, "y": 0}, "data": {"type": "uv_input"}},
+        {"id": "output", "position": {"x": 300, "y": 0}, "data": {"type": "fragment_output"}}
+    ],
+    "edges": [{"id": "e1", "source": "uv", "target": "output"}]
+}
+
+
+@pytest.fixture
+def db():
+    """Base de datos SQLite en memoria compartida entre hilos (TestClient)"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from db.models import Base
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def saved_graph(db, name="graph", graph_data=SAVED_GRAPH):
+    from db.models import NodeGraph, Shader
+
+    shader = Shader(name=name, code="void mainImage(out vec4 f, in vec2 c) { f = vec4(0.0); }")
+    node_graph = NodeGraph(graph_data=graph_data, shader=shader)
+    db.add_all([shader, node_graph])
+    db.flush()
+    return node_graph
+
+
+def count_compiles(monkeypatch):
+    """Cuenta las compilaciones que hace core.artifacts"""
+    from core import artifacts
+
+    calls = []
+    original = GLSLCompiler.compile
+    monkeypatch.setattr(artifacts.GLSLCompiler, "compile", lambda self, graph: calls.append(1) or original(self, graph))
+    return calls
+
+
+def test_materialize_stores_artifact_and_syncs_shader(db):
+    """El código compilado, la versión y el hash quedan en el NodeGraph y en Shader.code"""
+    from core.artifacts import materialize_node_graph
+    from core.compiler import COMPILER_VERSION
+    from core.complexity import COMPLEXITY_VERSION, analyze_complexity
+    from core.graph_schema import graph_content_hash, normalize_graph
+
+    node_graph = saved_graph(db)
+    result = materialize_node_graph(node_graph)
+    assert result.error is None and "fragColor = vec4(v_uv, 0.0, 1.0);" in result.code
+    assert node_graph.compiled_code == result.code and node_graph.compile_error is None
+    assert node_graph.compiler_version == COMPILER_VERSION and node_graph.compiled_at is not None
+    assert node_graph.content_hash == graph_content_hash(normalize_graph(SAVED_GRAPH))
+    assert node_graph.shader.code == result.code
+    assert node_graph.shader.uniforms == result.uniforms
+    assert node_graph.shader.complexity_score == analyze_complexity(result.code).score
+    assert node_graph.shader.complexity_version == COMPLEXITY_VERSION
+
+
+def test_content_hash_ignores_ui_fields(db, monkeypatch):
+    """Mover o seleccionar nodos no cambia el hash ni recompila"""
+    from core.artifacts import materialize_node_graph
+    from core.graph_schema import graph_content_hash, normalize_graph
+
+    moved = json.loads(json.dumps(SAVED_GRAPH))
+    moved["nodes"][0]["position"] = {"x": 120, "y": -40}
+    moved["nodes"][1]["selected"] = True
+    moved["edges"][0]["animated"] = True
+    assert graph_content_hash(normalize_graph(moved)) == graph_content_hash(normalize_graph(SAVED_GRAPH))
+
+    node_graph = saved_graph(db)
+    materialize_node_graph(node_graph)
+    calls = count_compiles(monkeypatch)
+    node_graph.graph_data = moved
+    assert materialize_node_graph(node_graph).error is None
+    assert calls == []
+
+    changed = json.loads(json.dumps(SAVED_GRAPH))
+    changed["nodes"][0]["data"]["type"] = "time_input"
+    assert graph_content_hash(normalize_graph(changed)) != graph_content_hash(normalize_graph(SAVED_GRAPH))
+
+
+def test_rematerialize_only_stale(db, monkeypatch):
+    """Solo se recompilan los artefactos de otra versión del compilador o sin compilar"""
+    from core.artifacts import is_stale, materialize_node_graph, rematerialize_stale
+
+    graphs = [saved_graph(db, f"graph {i}") for i in range(4)]
+    for node_graph in graphs:
+        materialize_node_graph(node_graph)
+    graphs[1].compiler_version = "0.0.1"
+    graphs[2].compiler_version = None
+    db.commit()
+    assert [is_stale(g) for g in graphs] == [False, True, True, False]
+
+    calls = count_compiles(monkeypatch)
+    assert rematerialize_stale(db, batch_size=1) == {"recompiled": 2, "failed": 0}
+    assert len(calls) == 2 and not any(is_stale(g) for g in graphs)
+    assert rematerialize_stale(db) == {"recompiled": 0, "failed": 0}
+
+
+def test_pack_reload_makes_artifacts_stale(db, monkeypatch, tmp_path):
+    """Un pack recargado que cambia el GLSL generado invalida los artefactos guardados"""
+    from core import node_registry
+    from core.artifacts import is_stale, materialize_node_graph, rematerialize_stale
+
+    registry = NodeRegistry(packs_dir=tmp_path)
+    monkeypatch.setattr(node_registry, "_registry", registry)
+    graphs = [saved_graph(db, f"graph {i}") for i in range(2)]
+    for node_graph in graphs:
+        materialize_node_graph(node_graph)
+    db.commit()
+    assert not any(is_stale(g) for g in graphs)
+
+    (tmp_path / "custom.json").write_text(json.dumps({"name": "custom", "helpers": {"unused": "float unused() { return 0.0; }"}}))
+    assert registry.reload_if_changed() is True
+    assert all(is_stale(g) for g in graphs)
+    calls = count_compiles(monkeypatch)
+    assert materialize_node_graph(graphs[0]).error is None and len(calls) == 1
+    assert rematerialize_stale(db) == {"recompiled": 1, "failed": 0}
+    assert not any(is_stale(g) for g in graphs)
+    assert graphs[0].registry_hash == registry.snapshot.codegen_hash
+
+
+def test_init_db_adds_artifact_columns():
+    """Una base con node_graphs anterior a los artefactos se actualiza y se rematerializa"""
+    from sqlalchemy import create_engine, inspect, text
+    from sqlalchemy.orm import sessionmaker
+    from core.artifacts import rematerialize_stale
+    from db.database import init_db
+    from db.models import NodeGraph
+
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE node_graphs (id VARCHAR(36) PRIMARY KEY, shader_id VARCHAR(36) NOT NULL UNIQUE, "
+            "graph_data JSON NOT NULL, thumbnail_url VARCHAR(500), created_at DATETIME, updated_at DATETIME)"
+        ))
+        connection.execute(text("INSERT INTO node_graphs (id, shader_id, graph_data) VALUES ('g', 's', :graph)"),
+                           {"graph": json.dumps(SAVED_GRAPH)})
+    init_db(engine)
+    columns = {column["name"] for column in inspect(engine).get_columns("node_graphs")}
+    assert {"compiled_code", "compiled_uniforms", "compile_error", "compiler_version",
+            "registry_hash", "content_hash", "failed_hash", "compiled_at"} <= columns
+
+    db = sessionmaker(bind=engine)()
+    assert rematerialize_stale(db) == {"recompiled": 1, "failed": 0}
+    assert "fragColor" in db.query(NodeGraph).one().compiled_code
+    db.close()
+
+
+def test_compile_failure_keeps_last_good_code(db, monkeypatch):
+    """Un grafo que no compila guarda el error sin pisar el último código correcto ni su hash"""
+    from core.artifacts import materialize_node_graph
+    from core.graph_schema import graph_content_hash, normalize_graph
+
+    node_graph = saved_graph(db)
+    good = materialize_node_graph(node_graph).code
+    good_hash = node_graph.content_hash
+
+    broken = {"nodes": [{"id": "uv", "data": {"type": "uv_input"}}], "edges": []}
+    node_graph.graph_data = broken
+    result = materialize_node_graph(node_graph)
+    assert result.error and "No fragment output node found" in result.error
+    assert node_graph.compile_error == result.error
+    assert node_graph.compiled_code == good and node_graph.shader.code == good
+    assert node_graph.content_hash == good_hash
+    assert node_graph.failed_hash == graph_content_hash(normalize_graph(broken))
+
+    calls = count_compiles(monkeypatch)
+    assert materialize_node_graph(node_graph).error == result.error and calls == []
+    node_graph.graph_data = SAVED_GRAPH  # volver al grafo correcto recompila y limpia el error
+    assert materialize_node_graph(node_graph).error is None and len(calls) == 1
+    assert node_graph.compile_error is None and node_graph.failed_hash is None
+
+    node_graph.graph_data = {"nodes": "not a list"}
+    assert materialize_node_graph(node_graph).error.startswith("Invalid node graph")
+    assert node_graph.compiled_code == good and node_graph.content_hash == good_hash
+    node_graph.graph_data = SAVED_GRAPH
+    assert materialize_node_graph(node_graph).error is None and len(calls) == 2
+
+
+def test_node_graph_endpoints(db):
+    """Guardar compila y devuelve el artefacto; leer regenera los desactualizados"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from api import shaders
+    from core.compiler import COMPILER_VERSION
+    from db.database import get_db
+    from db.models import NodeGraph, Shader
+
+    app = FastAPI()
+    app.include_router(shaders.router)
+    app.dependency_overrides[get_db] = lambda: db
+    client = TestClient(app)
+    shader = Shader(name="saved", code="")
+    db.add(shader)
+    db.commit()
+
+    body = client.post(f"/api/v1/shaders/{shader.id}/save-node-graph", json=SAVED_GRAPH).json()
+    assert body["compiled"]["error"] is None and body["compiled"]["compiler_version"] == COMPILER_VERSION
+    db.refresh(shader)
+    assert shader.code == body["compiled"]["code"]
+
+    db.query(NodeGraph).update({"compiler_version": "0.0.1"})
+    db.commit()
+    body = client.get(f"/api/v1/shaders/{shader.id}/node-graph").json()
+    assert body["graph"] == SAVED_GRAPH and body["compiled"]["compiler_version"] == COMPILER_VERSION
+    assert client.get("/api/v1/shaders/missing/node-graph").status_code == 404
+
+
+def test_shader_list_cursor_matches_offset(db):
+    """Con empates en views, el cursor recorre el mismo orden (views, id desc) que skip"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from api import shaders
+    from db.database import get_db
+    from db.models import Shader
+
+    app = FastAPI()
+    app.include_router(shaders.router)
+    app.dependency_overrides[get_db] = lambda: db
+    client = TestClient(app)
+    db.add_all([Shader(id=f"s{i}", name=f"s{i}", code="", views=i % 3) for i in range(7)])
+    db.commit()
+
+    by_offset = [s["id"] for skip in range(0, 7, 2)
+                 for s in client.get("/api/v1/shaders", params={"skip": skip, "limit": 2}).json()["results"]]
+    assert by_offset == ["s5", "s2", "s4", "s1", "s6", "s3", "s0"]
+    by_cursor, cursor = [], None
+    while True:
+        body = client.get("/api/v1/shaders", params={"limit": 2, **({"cursor": cursor} if cursor else {})}).json()
+        by_cursor += [s["id"] for s in body["results"]]
+        cursor = body["pagination"]["nextCursor"]
+        if cursor is None:
+            break
+    assert by_cursor == by_offset and body["pagination"]["total"] == 7
+
+
+def test_shader_list_filters_validation(db):
+    """is_valid filtra por el resultado persistido de la validación (sin validar no entra)"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from api import shaders
+    from db.database import get_db
+    from db.models import Shader
+
+    app = FastAPI()
+    app.include_router(shaders.router)
+    app.dependency_overrides[get_db] = lambda: db
+    client = TestClient(app)
+    db.add_all([Shader(id="ok", name="ok", code="", is_valid=True), Shader(id="bad", name="bad", code="", is_valid=False),
+                Shader(id="new", name="new", code="")])
+    db.commit()
+
+    for is_valid, expected in (("true", ["ok"]), ("false", ["bad"]), (None, ["ok", "new", "bad"])):
+        params = {"exact_total": True, **({"is_valid": is_valid} if is_valid else {})}
+        body = client.get("/api/v1/shaders", params=params).json()
+        assert [s["id"] for s in body["results"]] == expected and body["pagination"]["total"] == len(expected)
+
+
+# ===== TESTS DEL REGISTRO DE NODOS =====
+
+def test_registry_hot_reloads_custom_pack(tmp_path):
+    """Un pack nuevo en el directorio se carga y cambia el ETag de la librería"""
+    registry = NodeRegistry(packs_dir=tmp_path)
+    etag = registry.snapshot.etag
+    assert "perlin_noise" in registry.snapshot.node_functions
+    assert registry.reload_if_changed() is False
+
+    (tmp_path / "custom.json").write_text(json.dumps({
+        "name": "custom",
+        "nodes": [{
+            "type": "invert", "name": "Invert", "category": "operation", "group": "Math",
+            "inputs": 1, "outputs": 1, "output_type": "mixed", "infer_type": True,
+            "glsl": "{type} {output} = 1.0 - {input1};"
+        }]
+    }))
+
+    assert registry.reload_if_changed() is True
+    assert "invert" in registry.snapshot.node_functions
+    assert registry.snapshot.etag != etag
+    assert b'"invert"' in registry.snapshot.category_bodies["Math"][0]
+
+
+def test_registry_rejects_invalid_pack(tmp_path):
+    """Templates que usan más inputs de los declarados son inválidos"""
+    (tmp_path / "broken.json").write_text(json.dumps({
+        "nodes": [{
+            "type": "broken", "name": "Broken", "category": "operation", "group": "Math",
+            "inputs": 1, "outputs": 1, "output_type": "float",
+            "glsl": "float {output} = {input1} + {input2};"
+        }]
+    }))
+    with pytest.raises(NodeRegistryError):
+        NodeRegistry(packs_dir=tmp_path)
+
+
+def test_registry_keeps_last_good_snapshot_on_broken_pack(tmp_path):
+    """Un pack roto se avisa una vez y se sigue sirviendo el snapshot anterior"""
+    registry = NodeRegistry(packs_dir=tmp_path)
+    etag = registry.snapshot.etag
+    broken = tmp_path / "broken.json"
+    broken.write_text("{not json")
+
+    with pytest.raises(NodeRegistryError):
+        registry.reload_if_changed()
+    assert registry.snapshot.etag == etag
+    assert "broken.json" in registry.last_error
+
+    # El escaneo fallido queda registrado: no se relee en cada petición
+    assert registry.reload_if_changed() is False
+    assert registry.snapshot.etag == etag
+
+    broken.unlink()
+    assert registry.reload_if_changed() is True
+    assert registry.last_error is None
+
+
+def test_registry_falls_back_to_builtin_pack(tmp_path, capsys):
+    """Sin strict, un pack roto al arrancar deja solo el builtin hasta que se arregle"""
+    broken = tmp_path / "custom.json"
+    broken.write_text("{not json")
+
+    registry = NodeRegistry(packs_dir=tmp_path, strict=False)
+    assert registry.snapshot.packs == ("builtin",)
+    assert "Node packs failed to load" in capsys.readouterr().out
+    assert registry.reload_if_changed() is False
+
+    broken.write_text(json.dumps({"name": "custom", "nodes": []}))
+    os.utime(broken, (broken.stat().st_atime, broken.stat().st_mtime + 1))
+    assert registry.reload_if_changed() is True
+    assert registry.snapshot.packs == ("builtin", "custom")
+
+
+def test_registry_skips_vanished_pack(tmp_path, monkeypatch):
+    """Un pack borrado entre el glob y el stat (o la lectura) cuenta como ausente"""
+    registry = NodeRegistry(packs_dir=tmp_path)
+    files = registry._pack_files()
+    monkeypatch.setattr(registry, "_pack_files", lambda: files + [tmp_path / "gone.json"])
+    assert registry.reload_if_changed() is False
+    assert registry.snapshot.packs == ("builtin",)
+
+
+@pytest.mark.parametrize("if_none_match, matches", [
+    (None, False),
+    ('"other"', False),
+    ("{etag}", True),
+    ('"other", {etag}', True),
+    ("W/{etag}", True),
+    ('W/"other" ,W/{etag}', True),
+    ("*", True),
+])
+def test_library_if_none_match(if_none_match, matches):
+    """If-None-Match acepta listas, ETags débiles y '*'"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from api import nodes
+    from core.node_registry import get_registry
+
+    app = FastAPI()
+    app.include_router(nodes.router)
+    etag = get_registry().snapshot.etag
+    headers = {"If-None-Match": if_none_match.format(etag=etag)} if if_none_match else {}
+    response = TestClient(app).get("/api/v1/nodes/library", headers=headers)
+    assert response.status_code == (304 if matches else 200)
+    assert response.headers["ETag"] == etag
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,176 @@
+"""
+Tests para el intérprete NumPy de GLSL y los previews sin GPU
+Verifica la semántica por fragmento (máscaras, loops, funciones) y la
+clasificación de salidas negras o con NaN
+"""
+
+import json
+import zlib
+
+import numpy as np
+import pytest
+from core.glsl_interpreter import RenderError, UnsupportedFeature, render_shader
+from core.thumbnails import persist_thumbnails, render_corpus, render_shader_file, render_thumbnail
+
+GRADIENT_SHADER = """void mainImage(out vec4 fragColor, in vec2 fragCoord) {
+  vec2 uv = fragCoord / iResolution.xy;
+  fragColor = vec4(uv, 0.0, 1.0);
+}"""
+
+RAYMARCH_SHADER = """#define MAX_STEPS 64
+float map(vec3 p) { return length(p - vec3(0.0, 0.0, 3.0)) - 1.0; }
+
+void mainImage(out vec4 fragColor, in vec2 fragCoord) {
+  vec2 uv = (fragCoord - 0.5 * iResolution.xy) / iResolution.y;
+  vec3 rd = normalize(vec3(uv, 1.0));
+  float t = 0.0;
+  for (int i = 0; i < MAX_STEPS; i++) {
+    float d = map(rd * t);
+    if (d < 0.001) break;
+    t += d;
+    if (t > 20.0) break;
+  }
+  fragColor = vec4(vec3(t < 20.0 ? 1.0 : 0.0), 1.0);
+}"""
+
+
+def pixels(code: str, width: int = 4, height: int = 2) -> np.ndarray:
+    return render_shader(code, width, height, time_s=1.0)
+
+
+class TestGLSLInterpreter:
+    """Tests para core.glsl_interpreter"""
+
+    def test_frag_coord_and_orientation(self):
+        """fragCoord en centros de píxel con el origen abajo; la fila 0 es la de arriba"""
+        image = pixels(GRADIENT_SHADER)
+        assert image.shape == (2, 4, 4)
+        assert image[1, 0, :2].tolist() == pytest.approx([0.125, 0.25])
+        assert image[0, 3, :2].tolist() == pytest.approx([0.875, 0.75])
+
+    def test_divergent_loops_and_breaks(self):
+        """Cada fragmento sale del loop en su propia iteración"""
+        image = render_shader(RAYMARCH_SHADER, 32, 32)
+        assert image[16, 16, 0] == 1.0  # centro: la esfera
+        assert image[0, 0, 0] == 0.0  # esquina: fondo
+
+    def test_functions_structs_and_switch(self):
+        """inout, structs, arrays, switch con fall-through y continue"""
+        code = """struct Ray { vec3 o; vec3 d; };
+        const float K[3] = float[3](0.1, 0.5, 0.9);
+        void paint(inout vec3 c, int k) {
+          switch (k) { case 0: c.r = 1.0; break; case 1: c.g = 1.0; default: c.b = 1.0; }
+        }
+        void mainImage(out vec4 f, in vec2 c) {
+          Ray r = Ray(vec3(0.0), vec3(2.0));
+          int k = int(c.x) % 3;
+          vec3 col = vec3(K[k]);
+          paint(col, k);
+          int n = 0;
+          for (int i = 0; i < 10; i++) { if (i == 3) continue; n++; }
+          f = vec4(col * r.d.x * float(n) / 18.0, 1.0);
+        }"""
+        image = pixels(code, width=3, height=1)
+        assert image[0, :, :3].tolist() == [
+            pytest.approx([1.0, 0.1, 0.1]),
+            pytest.approx([0.5, 1.0, 1.0]),
+            pytest.approx([0.9, 0.9, 1.0])
+        ]
+
+    def test_matrices_and_builtins(self):
+        """Matrices column-major y built-ins componente a componente"""
+        code = """void mainImage(out vec4 f, in vec2 c) {
+          mat2 m = mat2(0.0, 1.0, -1.0, 0.0);
+          vec2 v = m * vec2(1.0, 0.0);
+          f = vec4(v, clamp(mix(0.0, 4.0, 0.5), 0.0, 1.5), smoothstep(0.0, 1.0, 0.5));
+        }"""
+        assert pixels(code)[0, 0].tolist() == pytest.approx([0.0, 1.0, 1.5, 0.5])
+
+    def test_unsupported_and_runtime_errors(self):
+        with pytest.raises(UnsupportedFeature):
+            pixels("void main() { gl_FragColor = vec4(1.0); }")
+        with pytest.raises(UnsupportedFeature):
+            pixels("void mainImage(out vec4 f, in vec2 c) { f = vec4(noise1(c.x)); }")
+        with pytest.raises(RenderError, match="iterations"):
+            pixels("void mainImage(out vec4 f, in vec2 c) { for (;;) { f += vec4(0.1); } }")
+        with pytest.raises(RenderError, match="Syntax"):
+            pixels("void mainImage(out vec4 f, in vec2 c) { f = ; }")
+
+    def test_time_budget(self):
+        code = "void mainImage(out vec4 f, in vec2 c) { for (int i = 0; i < 1000; i++) { f += vec4(sin(c.x)); } }"
+        with pytest.raises(RenderError, match="budget"):
+            render_shader(code, 64, 64, time_budget_ms=1)
+
+
+class TestThumbnails:
+    """Previews del corpus con core.thumbnails"""
+
+    def _write_shader(self, directory, shader_id, passes):
+        path = directory / f"{shader_id}.json"
+        path.write_text(json.dumps({"info": {"id": shader_id, "name": shader_id}, "renderpass": passes}))
+        return path
+
+    def test_black_and_nan_outputs_are_flagged(self):
+        assert render_thumbnail(GRADIENT_SHADER, 8, 4).status == "ok"
+        assert render_thumbnail("void mainImage(out vec4 f, in vec2 c) { f = vec4(0.0, 0.0, 0.0, 1.0); }", 8, 4).status == "black"
+        nan = render_thumbnail("void mainImage(out vec4 f, in vec2 c) { f = vec4(sqrt(c.x - 4.0)); }", 8, 4)
+        assert nan.status == "nan" and nan.nan_pixels == 16
+
+    def test_png_encoding(self):
+        png = render_thumbnail(GRADIENT_SHADER, 8, 4).png
+        assert png.startswith(b"\x89PNG\r\n\x1a\n")
+        # IDAT: filas de 8 píxeles RGB con un byte de filtro
+        idat_start = png.index(b"IDAT") + 4
+        length = int.from_bytes(png[idat_start - 8:idat_start - 4], "big")
+        assert len(zlib.decompress(png[idat_start:idat_start + length])) == 4 * (1 + 8 * 3)
+
+    def test_corpus_render_and_persist(self, tmp_path):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from db.models import Base, Shader
+
+        corpus, output = tmp_path / "corpus", tmp_path / "thumbnails"
+        corpus.mkdir()
+        self._write_shader(corpus, "grad", [
+            {"type": "common", "name": "Common", "code": "vec3 tint(vec2 uv) { return vec3(uv, 0.5); }"},
+            {"type": "image", "name": "Image", "code": "void mainImage(out vec4 f, in vec2 c) { f = vec4(tint(c / iResolution.xy), 1.0); }"}
+        ])
+        self._write_shader(corpus, "dark", [
+            {"type": "image", "name": "Image", "code": "void mainImage(out vec4 f, in vec2 c) { f = vec4(0.0); }"}
+        ])
+        self._write_shader(corpus, "sound", [{"type": "sound", "name": "Sound", "code": ""}])
+
+        results = {
+            r["id"]: r for r in render_corpus(sorted(corpus.glob("*.json")), output, workers=1, width=8, height=4)
+        }
+        assert results["grad"]["status"] == "ok" and (output / "grad.png").exists()
+        assert results["dark"]["status"] == "black"
+        assert "skipped" in results["sound"]
+        assert render_shader_file(corpus / "grad.json", output, 8, 4)["thumbnail"] == "grad.png"
+
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        for shader_id in ("grad", "dark"):
+            db.add(Shader(name=shader_id, code="", source="shadertoy", source_id=shader_id))
+        db.commit()
+
+        assert persist_thumbnails(db, list(results.values())) == 2
+        shaders = {s.source_id: s for s in db.query(Shader)}
+        assert shaders["grad"].render_status == "ok" and shaders["grad"].thumbnail_url.endswith("/grad.png")
+        assert shaders["dark"].render_status == "black" and shaders["dark"].thumbnail_url is None
+        db.close()
+
+    @pytest.mark.parametrize("shader_id", ["../escape", "a/b", "..", "", 42])
+    def test_unsafe_id_is_skipped(self, tmp_path, shader_id):
+        """El id del JSON no puede sacar el PNG del directorio de previews"""
+        corpus, output = tmp_path / "corpus", tmp_path / "out" / "thumbnails"
+        corpus.mkdir()
+        output.mkdir(parents=True)
+        path = corpus / "evil.json"
+        path.write_text(json.dumps({"info": {"id": shader_id}, "renderpass": [
+            {"type": "image", "name": "Image", "code": GRADIENT_SHADER}
+        ]}))
+        result = render_shader_file(path, output, 8, 4)
+        assert result["id"] == "evil" and result["skipped"].startswith("Invalid shader id")
+        assert not any(tmp_path.rglob("*.png"))
@@ -0,0 +1,120 @@
+"""
+Tests para el parser y el análisis semántico de GLSL
+Verifica el AST, el preprocesador, las tablas de símbolos y los tipos
+"""
+
+import pytest
+from core import glsl_ast as ast
+from core.glsl_analyzer import analyze
+from core.glsl_parser import GLSLSyntaxError, parse
+
+
+def errors_of(code: str):
+    return analyze(parse(code).unit).errors
+
+
+class TestGLSLParser:
+    """Tests para core.glsl_parser y core.glsl_analyzer"""
+
+    # ===== TESTS DEL PARSER =====
+
+    def test_function_ast(self):
+        """Funciones con parámetros, cuerpo y precedencia de operadores"""
+        unit = parse("float f(in vec3 p, float r) { return length(p) - r * 2.0; }").unit
+        function = unit.functions[0]
+        assert function.name == "f"
+        assert [(p.qualifiers, p.type.name, p.name) for p in function.params] == [
+            (["in"], "vec3", "p"), ([], "float", "r")
+        ]
+        value = function.body.statements[0].value
+        assert isinstance(value, ast.BinaryOp) and value.op == "-"
+        assert isinstance(value.right, ast.BinaryOp) and value.right.op == "*"
+
+    def test_declarations(self):
+        """Structs, arrays, bloques de uniforms y precisión"""
+        code = (
+            "precision highp float;\n"
+            "struct Ray { vec3 o; vec3 d; };\n"
+            "layout(std140) uniform Block { vec2 res; } u;\n"
+            "const float K[2] = float[2](1.0, 2.0);\n"
+        )
+        kinds = [type(d).__name__ for d in parse(code).unit.declarations]
+        assert kinds == ["PrecisionDecl", "VarDecl", "InterfaceBlock", "VarDecl"]
+
+    def test_preprocessor(self):
+        """#define con parámetros e #ifdef/#else"""
+        code = (
+            "#define SQ(x) ((x) * (x))\n"
+            "#ifdef MISSING\n"
+            "  esto no es GLSL\n"
+            "#else\n"
+            "float g = SQ(2.0);\n"
+            "#endif\n"
+        )
+        result = parse(code)
+        declaration = result.unit.declarations[0]
+        assert declaration.declarators[0].name == "g"
+        assert isinstance(declaration.declarators[0].initializer, ast.BinaryOp)
+        assert "SQ" in result.macros
+
+    @pytest.mark.parametrize("condition, taken", [
+        ("1 << 3 == 8", True),
+        ("defined(GL_ES) && !defined(MISSING)", True),
+        ("-7 / 2 == -3 && -7 % 2 == -1", True),
+        ("0x10 == 16 && 010 == 8", True),
+        ("1 ? 0 : 1", False),
+        ("__VERSION__ >= 300 || UNDEFINED", True),
+        ("9 * * 9", True),  # no es C: se toma la rama
+        ("1 << 100000000", True),
+        ("1 / 0", True),
+    ])
+    def test_if_conditions(self, condition, taken):
+        """#if se evalúa con enteros de 64 bits, sin eval"""
+        unit = parse(f"#if {condition}\nfloat a;\n#else\nfloat b;\n#endif\n").unit
+        assert unit.declarations[0].declarators[0].name == ("a" if taken else "b")
+
+    def test_syntax_error_location(self):
+        """Los errores de sintaxis llevan línea:columna"""
+        with pytest.raises(GLSLSyntaxError) as error:
+            parse("void main() {\n  x = ;\n}")
+        assert (error.value.line, error.value.col) == (2, 7)
+
+    # ===== TESTS DEL ANÁLISIS SEMÁNTICO =====
+
+    def test_expression_types(self):
+        """Tipos inferidos para constructores, swizzles, built-ins y matrices"""
+        unit = parse(
+            "void main() { mat3 m = mat3(1.0); vec3 v = m * vec3(1.0).zyx; float d = dot(v, v); }"
+        ).unit
+        analyze(unit)
+        declarations = unit.functions[0].body.statements
+        assert [d.declarators[0].initializer.type for d in declarations] == ["mat3", "vec3", "float"]
+
+    def test_redefinition_and_scopes(self):
+        """Redefinir en el mismo scope es error; en un bloque anidado no"""
+        assert errors_of("void main() { float a = 1.0; { float a = 2.0; } }") == []
+        assert errors_of("void main() { float a = 1.0; float a = 2.0; }") == [
+            "Redefinition of 'a' (line 1:36)"
+        ]
+
+    def test_return_and_jump_checks(self):
+        """return con tipo incorrecto y break fuera de un loop"""
+        errors = errors_of("float f() { return vec2(1.0); }\nvoid main() { break; }")
+        assert errors == [
+            "Type mismatch: Function 'f' returns float, got vec2 (line 1:13)",
+            "'break' outside of a loop or switch (line 2:15)"
+        ]
+
+    def test_user_function_overloads(self):
+        """Llamadas con un número de argumentos que ninguna sobrecarga acepta"""
+        errors = errors_of("float f(float x) { return x; }\nvoid main() { float y = f(1.0, 2.0); }")
+        assert errors == ["No overload of 'f' takes 2 arguments (line 2:25)"]
+
+    def test_readonly_assignment(self):
+        """No se puede asignar a uniforms ni constantes"""
+        errors = errors_of("uniform float t;\nvoid main() { t = 1.0; }")
+        assert errors == ["Cannot assign to read-only variable 't' (line 2:15)"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,655 @@
+"""
+Tests para el validador GLSL
+Verifica estructura, declaraciones, tipos y ubicaciones de errores
+"""
+
+import json
+import random
+import time
+
+import pytest
+from core import glsl_validator
+from core.compiler import GLSLCompiler
+from core.complexity import COMPLEXITY_VERSION, analyze_complexity, backfill_complexity
+from core.corpus_validation import persist_results, validate_corpus, validate_shader_file
+from core.glsl_tokenizer import tokenize
+from core.glsl_validator import GLSLValidator, MAX_BRACKET_ERRORS, TIME_BUDGET_MS
+from core.validation_cache import ValidationCache, cache_key
+from core.validation_session import SessionError, TextEdit, ValidationSession
+
+
+SIMPLE_SHADER = """uniform float iTime;
+uniform vec2 iResolution;
+
+void mainImage(out vec4 fragColor, in vec2 fragCoord) {
+  vec2 uv = fragCoord / iResolution.xy;
+  float t = iTime;
+  fragColor = vec4(uv, t, 1.0);
+}"""
+
+
+class TestGLSLValidator:
+    """Tests para GLSLValidator"""
+
+    def setup_method(self):
+        """Setup antes de cada test"""
+        self.validator = GLSLValidator()
+
+    # ===== TESTS DEL TOKENIZADOR =====
+
+    def test_tokenizer_tracks_line_and_column(self):
+        """Los tokens llevan línea:columna y se descartan comentarios"""
+        result = tokenize("/* a\n b */ float x; // c\nvec2 y;")
+        values = [(t.value, t.line, t.col) for t in result.tokens]
+        assert values == [
+            ("float", 2, 7), ("x", 2, 13), (";", 2, 14),
+            ("vec2", 3, 1), ("y", 3, 6), (";", 3, 7)
+        ]
+
+    def test_tokenizer_flags_unterminated_comment(self):
+        """Un comentario sin cerrar se consume hasta el final"""
+        result = tokenize("float x; /* sin cerrar")
+        assert result.unterminated_comment
+        assert len(result.tokens) == 3
+
+    # ===== TESTS DE VALIDACIÓN =====
+
+    def test_valid_shader(self):
+        """Shader correcto no tiene errores ni advertencias"""
+        result = self.validator.validate(SIMPLE_SHADER)
+        assert result.is_valid
+        assert result.errors == []
+        assert result.warnings == []
+
+    def test_empty_code(self):
+        """Código vacío es inválido"""
+        result = self.validator.validate("   ")
+        assert not result.is_valid
+        assert "Empty shader code" in result.errors
+
+    def test_missing_main(self):
+        """Sin mainImage ni main es inválido"""
+        result = self.validator.validate("float f(float x) { return x; }")
+        assert "Missing main function (void mainImage or void main)" in result.errors
+
+    def test_bracket_errors_report_line_and_column(self):
+        """Errores de llaves reportan línea:columna"""
+        code = "void main() {\n  float x = (1.0;\n}"
+        result = self.validator.validate(code)
+        assert not result.is_valid
+        assert "Mismatched brackets: '(' at 2:13 closed with '}' at 3:1" in result.errors
+
+    def test_type_mismatch(self):
+        """Asignar un vector a un float es un error"""
+        code = "void main() {\n  float x = vec3(1.0);\n}"
+        result = self.validator.validate(code)
+        assert "Type mismatch: Cannot assign vec3 to float variable 'x' (line 2:3)" in result.errors
+
+    def test_swizzles_are_not_variables(self):
+        """Los swizzles (.xy) no se reportan como variables sin declarar"""
+        result = self.validator.validate(SIMPLE_SHADER)
+        assert not any("'xy'" in w for w in result.warnings)
+
+    def test_undeclared_variable(self):
+        """Variables sin declarar son un error con ubicación"""
+        code = "void main() {\n  float x = y * 2.0;\n}"
+        result = self.validator.validate(code)
+        assert "Undeclared identifier 'y' (line 2:13)" in result.errors
+
+    def test_missing_semicolon(self):
+        """Statement sin punto y coma es un error de sintaxis"""
+        code = "void main() {\n  float x = 1.0\n  float y = 2.0;\n}"
+        result = self.validator.validate(code)
+        assert "Line 2: Missing semicolon: 'float x = 1.0'" in result.errors
+
+    def test_multiline_call_is_not_missing_semicolon(self):
+        """Una llamada repartida en varias líneas no es un error"""
+        code = "void main() {\n  vec3 c = mix(\n    vec3(0.0),\n    vec3(1.0),\n    0.5\n  );\n}"
+        result = self.validator.validate(code)
+        assert not any("Missing semicolon" in w for w in result.warnings)
+
+    def test_uniform_block_members_declared(self):
+        """Los miembros de un bloque std140 cuentan como uniforms"""
+        code = "layout(std140) uniform U {\n  vec2 iResolution;\n  float iTime;\n};\n" + SIMPLE_SHADER.split("\n\n", 1)[1]
+        result = self.validator.validate(code)
+        assert result.is_valid
+        assert set(self.validator.declared_uniforms) == {"iResolution", "iTime"}
+
+    def test_parameters_and_block_scopes(self):
+        """Los parámetros son visibles en la función; las locales de un bloque no salen de él"""
+        code = (
+            "float f(float k) { return k * 2.0; }\n"
+            "void main() {\n"
+            "  if (true) { float inner = f(1.0); }\n"
+            "  float outer = inner;\n"
+            "}"
+        )
+        result = self.validator.validate(code)
+        assert result.errors == ["Undeclared identifier 'inner' (line 4:17)"]
+
+    def test_macros_are_expanded(self):
+        """Las macros de Shadertoy se expanden antes de validar"""
+        code = (
+            "#define PI 3.14159\n"
+            "#define rot(a) mat2(cos(a), sin(a), -sin(a), cos(a))\n"
+            "void mainImage(out vec4 fragColor, in vec2 fragCoord) {\n"
+            "  vec2 uv = rot(PI) * (fragCoord / iResolution.xy);\n"
+            "  fragColor = vec4(uv, 0.0, 1.0);\n"
+            "}"
+        )
+        result = self.validator.validate(code)
+        assert result.is_valid, result.errors
+
+    def test_invalid_swizzle(self):
+        """Un swizzle fuera del tamaño del vector es un error"""
+        code = "void main() {\n  vec2 v = vec2(1.0);\n  float z = v.z;\n}"
+        result = self.validator.validate(code)
+        assert "Invalid swizzle '.z' on vec2 (line 3:15)" in result.errors
+
+    def test_compiler_output_is_valid(self):
+        """El código que genera GLSLCompiler valida sin errores ni advertencias"""
+        graph = {
+            "nodes": [
+                {"id": "uv", "data": {"type": "uv_input"}},
+                {"id": "time", "data": {"type": "time_input"}},
+                {"id": "noise", "data": {"type": "perlin_noise"}},
+                {"id": "mix", "data": {"type": "lerp", "parameters": {"input1": 1.0}}},
+                {"id": "out", "data": {"type": "fragment_output"}}
+            ],
+            "edges": [
+                {"source": "uv", "target": "noise"},
+                {"source": "noise", "target": "mix", "targetHandle": "input"},
+                {"source": "time", "target": "mix", "targetHandle": "input2"},
+                {"source": "mix", "target": "out"}
+            ]
+        }
+        for uniform_block in (False, True):
+            compiled = GLSLCompiler(uniform_block=uniform_block).compile(graph)
+            result = self.validator.validate(compiled.code)
+            assert result.errors == [] and result.warnings == []
+
+
+class TestValidationCache:
+    """Cache de resultados por hash del source"""
+
+    def test_repeated_validation_hits_cache(self):
+        cache = ValidationCache(max_entries=8)
+        first = cache.validate(SIMPLE_SHADER)
+        second = cache.validate(SIMPLE_SHADER)
+        assert first == second
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+        assert cache.stats()["hitRate"] == 0.5
+
+    def test_cached_result_is_not_shared(self):
+        """Mutar un resultado devuelto no altera la entrada cacheada"""
+        cache = ValidationCache(max_entries=8)
+        cache.validate("float x = y;").errors.clear()
+        assert cache.validate("float x = y;").errors
+
+    def test_lru_eviction(self):
+        cache = ValidationCache(max_entries=2)
+        for code in ("float a;", "float b;", "float a;", "float c;"):
+            cache.validate(code)
+        assert cache.get(cache_key("float a;")) is not None
+        assert cache.get(cache_key("float b;")) is None
+        assert cache.stats()["entries"] == 2
+
+    def test_time_budget_truncation_is_not_cached(self, monkeypatch):
+        """El corte por tiempo depende de la carga: se revalida la próxima vez"""
+        monkeypatch.setattr(glsl_validator, "TIME_BUDGET_MS", 1e-6)
+        code = "void mainImage(out vec4 f, in vec2 c) {\n" + "  f.x += 1.0;\n" * 2000 + "}\n"
+        cache = ValidationCache(max_entries=8)
+        result = cache.validate(code)
+        assert result.truncated and result.timed_out
+        assert cache.stats()["entries"] == 0
+        cache.validate(code)
+        assert cache.stats()["misses"] == 2
+
+    def test_size_truncation_is_cached(self, monkeypatch):
+        monkeypatch.setattr(glsl_validator, "MAX_SOURCE_SIZE", 4096)
+        code = MAIN + "float c = 2.0;\n" * 1000
+        cache = ValidationCache(max_entries=8)
+        result = cache.validate(code)
+        assert result.truncated and not result.timed_out
+        assert cache.validate(code) == result
+        assert cache.stats()["hits"] == 1
+
+    def test_unreachable_redis_falls_back_to_memory(self):
+        cache = ValidationCache(max_entries=8, redis_url="redis://127.0.0.1:1/0")
+        assert cache.stats()["redis"] is False
+        assert cache.validate(SIMPLE_SHADER).is_valid
+
+
+class TestCorpusValidation:
+    """Validación masiva del corpus de Shadertoy"""
+
+    def _write_shader(self, directory, shader_id, passes):
+        path = directory / f"{shader_id}.json"
+        path.write_text(json.dumps({"info": {"id": shader_id, "name": shader_id}, "renderpass": passes}))
+        return path
+
+    def test_common_pass_is_prepended(self, tmp_path):
+        """El código Common se valida con cada pass y los errores se ubican por pass"""
+        path = self._write_shader(tmp_path, "abc", [
+            {"type": "common", "name": "Common", "code": "float helper(float x) { return x; }\nfloat bad = nope;"},
+            {"type": "image", "name": "Image", "code": "void mainImage(out vec4 f, in vec2 c) {\n  f = vec4(helper(1.0));\n  f.x = missing;\n}"},
+            {"type": "buffer", "name": "Buffer A", "code": "void mainImage(out vec4 f, in vec2 c) { f = vec4(helper(2.0)); }"},
+            {"type": "sound", "name": "Sound", "code": "vec2 mainSound(int s, float t) { return vec2(0.0); }"}
+        ])
+        result = validate_shader_file(path)
+        assert result["passes"] == 2 and not result["is_valid"]
+        assert result["errors"] == [
+            "Common: Undeclared identifier 'nope' (line 2:13)",
+            "Image: Undeclared identifier 'missing' (line 3:9)"
+        ]
+
+    def test_invalid_file_is_skipped(self, tmp_path):
+        (tmp_path / "broken.json").write_text("{not json")
+        results = list(validate_corpus(sorted(tmp_path.glob("*.json")), workers=1))
+        assert results[0]["id"] == "broken" and "skipped" in results[0]
+
+    def test_results_persisted_to_shader(self, tmp_path):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from db.models import Base, Shader
+
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        db.add(Shader(name="ok", code=SIMPLE_SHADER, source="shadertoy", source_id="ok"))
+        db.commit()
+
+        path = self._write_shader(tmp_path, "ok", [{"type": "image", "name": "Image", "code": SIMPLE_SHADER}])
+        assert persist_results(db, [validate_shader_file(path)]) == 1
+        shader = db.query(Shader).one()
+        assert shader.is_valid is True
+        assert shader.validation["error_count"] == 0
+        assert shader.complexity_version == COMPLEXITY_VERSION
+        assert shader.complexity_score == analyze_complexity(SIMPLE_SHADER).score
+        assert [u["name"] for u in shader.uniforms] == ["iResolution", "iTime"]
+        db.close()
+
+
+class TestComplexity:
+    """Coste estático por fragmento y uniforms usados"""
+
+    LOOP = """const int STEPS = 100;
+uniform float uSpeed;
+uniform float uUnused;
+void mainImage(out vec4 fragColor, in vec2 fragCoord) {
+    float t = 0.0;
+    for (int i = 0; i < STEPS; i++) {
+        t += sin(t * uSpeed) + texture(iChannel0, fragCoord).r;
+    }
+    fragColor = vec4(t);
+}"""
+
+    def test_loop_bound_multiplies_body(self):
+        result = analyze_complexity(self.LOOP)
+        assert result.exact and result.max_loop_iterations == 100
+        assert result.transcendentals == 100 and result.texture_fetches == 100
+        assert result.score > analyze_complexity(SIMPLE_SHADER).score
+
+    def test_score_is_bounded(self):
+        heavy = self.LOOP.replace("i < STEPS", "i < 1000").replace("t += sin", "for (int j = 0; j < 1000; j++) t += sin")
+        assert 0 < analyze_complexity(SIMPLE_SHADER).score < analyze_complexity(heavy).score <= 100
+
+    def test_used_uniforms_only(self):
+        uniforms = analyze_complexity(self.LOOP).uniforms
+        assert uniforms == [
+            {"name": "uSpeed", "type": "float"},
+            {"name": "iChannel0", "type": "sampler2D"}
+        ]
+
+    def test_unparseable_code_is_estimated(self):
+        result = analyze_complexity(self.LOOP.replace("float t = 0.0;", "float t = ;"))
+        assert not result.exact
+        assert result.texture_fetches > 0 and result.max_loop_iterations > 0
+        assert {"name": "iChannel0", "type": "sampler2D"} in result.uniforms
+
+    def test_backfill_only_stale(self):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from db.models import Base, Shader
+
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        db.add_all([Shader(name="a", code=SIMPLE_SHADER), Shader(name="b", code=self.LOOP)])
+        db.commit()
+
+        assert backfill_complexity(db, batch_size=1) == {"analyzed": 2, "estimated": 0}
+        assert backfill_complexity(db) == {"analyzed": 0, "estimated": 0}
+        scores = dict(db.query(Shader.name, Shader.complexity_score))
+        assert scores["b"] > scores["a"] > 0
+        db.close()
+
+    def test_init_db_adds_missing_columns(self):
+        """Una base creada antes de las columnas de complejidad se actualiza al arrancar"""
+        from sqlalchemy import create_engine, inspect, text
+        from sqlalchemy.orm import sessionmaker
+        from db.database import init_db
+        from db.models import Shader
+
+        engine = create_engine("sqlite://")
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE shaders (id VARCHAR(36) PRIMARY KEY, name VARCHAR(255) NOT NULL, code TEXT NOT NULL)"
+            ))
+            connection.execute(text("INSERT INTO shaders (id, name, code) VALUES ('old', 'old', :code)"),
+                               {"code": SIMPLE_SHADER})
+        init_db(engine)
+        columns = {column["name"] for column in inspect(engine).get_columns("shaders")}
+        assert {"complexity_score", "complexity", "complexity_version", "uniforms"} <= columns
+        indexes = {index["name"] for index in inspect(engine).get_indexes("shaders")}
+        assert "ix_shaders_visibility_complexity" in indexes
+
+        db = sessionmaker(bind=engine)()
+        assert db.query(Shader).one().complexity_score is None
+        assert backfill_complexity(db) == {"analyzed": 1, "estimated": 0}
+        assert [u["name"] for u in db.query(Shader).one().uniforms] == ["iResolution", "iTime"]
+        init_db(engine)  # idempotente
+        db.close()
+
+
+MAIN = "void mainImage(out vec4 f, in vec2 c) { f = vec4(0.0); }\n"
+
+# Techo de latencia por validación (presupuesto por defecto 750 ms + margen para CI)
+LATENCY_CEILING_S = 2.0
+
+
+def _random_soup(seed: int, size: int) -> str:
+    rng = random.Random(seed)
+    vocab = ['float', 'vec3', 'x', '(', ')', '{', '}', ';', '=', '+', '1.0', 'if', 'for',
+             '#define A B\n', '.', 'xyz', ',', '[', ']', 'return', 'void', 'mainImage', '/*', '@']
+    return " ".join(rng.choice(vocab) for _ in range(size))
+
+
+PATHOLOGICAL_INPUTS = {
+    'huge_expression': "float a = " + " + ".join(["x"] * 400000) + ";\n" + MAIN,
+    'unclosed_braces': MAIN + "{" * 200000,
+    'deep_nesting': "float a = " + "-(" * 20000 + "1.0" + ")" * 20000 + ";\n" + MAIN,
+    'object_macro_bomb': "#define A0 x\n"
+                         + "".join(f"#define A{i} A{i - 1} A{i - 1}\n" for i in range(1, 40))
+                         + "float f() { return A39; }\n" + MAIN,
+    'function_macro_bomb': "#define F0(x) x x\n"
+                           + "".join(f"#define F{i}(x) F{i - 1}(F{i - 1}(x))\n" for i in range(1, 30))
+                           + "float f() { return F29(1.0); }\n" + MAIN,
+    'unterminated_comment': MAIN + "/*" + "x" * 2000000,
+    'token_soup': _random_soup(7, 200000),
+    'if_power': "#if 9**9**9 > 1\nfloat a;\n#endif\n" + MAIN,
+    'if_huge_shift': "#if (1 << 100000000) << (1 << 62)\nfloat a;\n#endif\n" + MAIN,
+    'if_nested_directives': "#if 1\n" * 20000 + "float a;\n" + "#endif\n" * 20000 + MAIN,
+    'if_nested_parens': "#if " + "(" * 200000 + "1" + ")" * 200000 + "\nfloat a;\n#endif\n" + MAIN,
+}
+
+
+class TestPathologicalInputs:
+    """Entradas hostiles: la validación termina en tiempo acotado"""
+
+    @pytest.mark.parametrize("name", sorted(PATHOLOGICAL_INPUTS))
+    def test_latency_ceiling(self, name):
+        start = time.perf_counter()
+        result = GLSLValidator().validate(PATHOLOGICAL_INPUTS[name])
+        assert time.perf_counter() - start < LATENCY_CEILING_S
+        assert len(result.errors) <= MAX_BRACKET_ERRORS + 2
+
+    @pytest.mark.parametrize("name", sorted(n for n in PATHOLOGICAL_INPUTS if n.startswith('if_')))
+    def test_conditionals_within_time_budget(self, name):
+        """Las condiciones de #if no escapan al presupuesto de tiempo (ni por la sesión del editor)"""
+        ceiling = TIME_BUDGET_MS / 1000 + 0.5  # el presupuesto más lo que queda fuera (tokenizar, cortar)
+        start = time.perf_counter()
+        GLSLValidator().validate(PATHOLOGICAL_INPUTS[name])
+        assert time.perf_counter() - start < ceiling
+        session = ValidationSession(PATHOLOGICAL_INPUTS[name])
+        start = time.perf_counter()
+        session.diagnostics()
+        assert time.perf_counter() - start < ceiling
+
+    def test_oversized_source_is_truncated(self):
+        """Se valida el prefijo completo; los errores previos al corte se reportan"""
+        code = "float a = 1.0;\nvec2 b = 1.0;\n" + "float c = 2.0;\n" * 20000
+        result = GLSLValidator(max_source_size=4096).validate(code)
+        assert result.truncated
+        assert any(w.startswith("Validation truncated") for w in result.warnings)
+        assert any("Type mismatch" in e for e in result.errors)
+        assert not any("Missing main" in e for e in result.errors)
+
+    def test_macro_bomb_is_truncated(self):
+        result = GLSLValidator().validate(PATHOLOGICAL_INPUTS['object_macro_bomb'])
+        assert result.truncated
+        assert "macro expansion" in result.warnings[-1]
+
+    def test_time_budget_is_truncated(self):
+        code = "void mainImage(out vec4 f, in vec2 c) {\n" + "  f.x += 1.0;\n" * 5000 + "}\n"
+        result = GLSLValidator(time_budget_ms=1).validate(code)
+        assert result.truncated
+        assert "time budget" in result.warnings[-1]
+
+    def test_deep_nesting_is_rejected(self):
+        result = GLSLValidator().validate(PATHOLOGICAL_INPUTS['deep_nesting'])
+        assert result.errors[0].startswith("Brackets nested deeper than")
+
+    def test_bracket_errors_are_capped(self):
+        result = GLSLValidator().validate(MAIN + "(" * 100 + ")]" * 200)
+        assert len(result.errors) <= MAX_BRACKET_ERRORS + 2
+        assert any(e.startswith("... and") for e in result.errors)
+
+
+EDITOR_SHADER = """uniform float iTime;
+struct Ray { vec3 o; vec3 d; };
+#define SCALE 2.0
+
+float helper(float x) {
+    return x * SCALE;
+}
+
+Ray make(vec2 uv) {
+    return Ray(vec3(0.0), normalize(vec3(uv, 1.0)));
+}
+
+void mainImage(out vec4 fragColor, in vec2 fragCoord) {
+    Ray r = make(fragCoord);
+    fragColor = vec4(helper(iTime) + r.d.x);
+}
+"""
+
+
+class TestValidationSession:
+    """Validación incremental por rangos editados"""
+
+    def test_matches_full_validation(self):
+        session = ValidationSession(EDITOR_SHADER)
+        assert session.diagnostics().errors == []
+        assert [c.text.split('(')[0] for c in session.chunks][3:] == [
+            "float helper", "Ray make", "void mainImage"
+        ]
+
+        # Usar una variable no declarada dentro de helper
+        session.apply([TextEdit("x * SCALE + y", (5, 11), (5, 20))])
+        result = session.diagnostics()
+        assert result.errors == GLSLValidator().validate(session.text).errors
+        assert result.errors == ["Undeclared identifier 'y' (line 6:24)"]
+
+    def test_unchanged_functions_are_reused(self):
+        session = ValidationSession(EDITOR_SHADER)
+        session.diagnostics()
+        session.apply([TextEdit("0.5 * ", (5, 11), (5, 11))])
+        assert session.diagnostics().is_valid
+        # Solo cambió el cuerpo de helper: su firma no afecta a los demás
+        assert session.stats["reparsed"] == 1 and session.stats["reanalyzed"] == 1
+
+    def test_signature_change_reanalyzes_dependents(self):
+        session = ValidationSession(EDITOR_SHADER)
+        session.diagnostics()
+        session.apply([TextEdit("vec2", (4, 13), (4, 18))])
+        result = session.diagnostics()
+        # helper y mainImage (make no la usa)
+        assert session.stats["reanalyzed"] == 2
+        assert result.errors == GLSLValidator().validate(session.text).errors
+        assert result.errors
+
+    def test_lines_shift_after_insert_above(self):
+        session = ValidationSession(EDITOR_SHADER)
+        session.apply([TextEdit("x * SCALE + y", (5, 11), (5, 20))])
+        session.diagnostics()
+        session.apply([TextEdit("// header\n\n", (0, 0), (0, 0))])
+        result = session.diagnostics()
+        assert result.errors == ["Undeclared identifier 'y' (line 8:24)"]
+        assert session.stats["reanalyzed"] == 1
+
+    def test_unclosed_brace_merges_following_chunks(self):
+        session = ValidationSession(EDITOR_SHADER)
+        session.apply([TextEdit("", (6, 0), (6, 1))])
+        assert any("Unclosed bracket" in e for e in session.diagnostics().errors)
+        session.apply([TextEdit("}", (6, 0), (6, 0))])
+        assert session.diagnostics().is_valid
+        assert session.text == EDITOR_SHADER
+
+    def test_top_level_conditional_falls_back(self):
+        session = ValidationSession("#ifdef FAST\nfloat q = 1.0;\n#endif\n" + EDITOR_SHADER)
+        assert session.diagnostics().is_valid
+        assert session.stats["incremental"] is False
+
+    def test_invalid_range(self):
+        session = ValidationSession(EDITOR_SHADER)
+        with pytest.raises(SessionError):
+            session.apply([TextEdit("x", (500, 0), (500, 0))])
+
+    def test_edit_latency_is_flat(self):
+        """Una edición en un archivo de ~20K líneas no re-valida el archivo entero"""
+        functions = "".join(
+            f"float f{i}(float x) {{\n    float y = x * {i}.0;\n    return y + 1.0;\n}}\n\n"
+            for i in range(4000)
+        )
+        code = functions + "void mainImage(out vec4 c, in vec2 p) {\n    c = vec4(f1(1.0));\n}\n"
+        session = ValidationSession(code, time_budget_ms=0)
+        assert session.diagnostics().is_valid
+
+        start = time.perf_counter()
+        session.apply([TextEdit(" + 2.0", (502, 18), (502, 18))])
+        result = session.diagnostics()
+        assert time.perf_counter() - start < 0.25
+        assert result.is_valid and session.stats["reanalyzed"] == 1
+
+    def test_global_edit_reanalyzes_only_readers(self):
+        """Cambiar una constante del principio no re-analiza las funciones que no la usan"""
+        functions = "".join(f"float f{i}(float x) {{\n    return x * {i}.0;\n}}\n\n" for i in range(3000))
+        code = ("const float K = 1.0;\n\n" + functions
+                + "void mainImage(out vec4 c, in vec2 p) {\n    c = vec4(f1(K));\n}\n")
+        session = ValidationSession(code, time_budget_ms=0)
+        assert session.diagnostics().is_valid
+
+        session.apply([TextEdit("2.0", (0, 16), (0, 19))])
+        assert session.diagnostics().is_valid
+        assert session.stats["reanalyzed"] == 1
+
+        start = time.perf_counter()
+        session.apply([TextEdit("int", (0, 6), (0, 11))])
+        result = session.diagnostics()
+        assert time.perf_counter() - start < 0.25
+        assert session.stats["reanalyzed"] == 2
+        assert result.errors == GLSLValidator().validate(session.text).errors
+
+    def test_removed_declaration_updates_users(self):
+        session = ValidationSession(EDITOR_SHADER)
+        session.diagnostics()
+        session.apply([TextEdit("", (3, 0), (7, 0))])  # sin helper
+        result = session.diagnostics()
+        assert result.errors == GLSLValidator().validate(session.text).errors
+        assert any("helper" in e for e in result.errors)
+        session.apply([TextEdit("float helper(float x) {\n    return x;\n}\n\n", (3, 0), (3, 0))])
+        assert session.diagnostics().is_valid
+
+    def test_struct_change_reaches_indirect_users(self):
+        """mainImage usa Ray a través de make() sin nombrarlo en la expresión"""
+        session = ValidationSession(EDITOR_SHADER.replace("Ray r = make(fragCoord);\n", "")
+                                    .replace("r.d.x", "make(fragCoord).d.x"))
+        assert session.diagnostics().is_valid
+        session.apply([TextEdit("dir", (1, 26), (1, 27))])
+        result = session.diagnostics()
+        assert result.errors == GLSLValidator().validate(session.text).errors
+        assert not result.is_valid
+
+
+LINT_SHADER = """uniform float iTime;
+uniform sampler2D iChannel0;
+uniform int iSteps;
+const int STEPS = 64;
+
+float scene(vec3 p) { return length(p) - 1.0; }
+
+void mainImage(out vec4 fragColor, in vec2 fragCoord) {
+    vec2 uv = fragCoord / 800.0;
+    vec3 rd = normalize(vec3(uv, 1.0));
+    float t = pow(uv.x, 2.0);
+    for (int i = 0; i < 1000; i++) {
+        float k = sin(iTime * 2.0);
+        t += scene(rd * t) * k;
+        t += texture(iChannel0, uv * t).r;
+    }
+    for (int i = 0; i < STEPS; i++) { t += sin(t); }
+    for (int i = 0; i < iSteps; i++) { t += 1.0; }
+    while (true) { t += 1.0; if (t > 10.0) break; }
+    if (uv.x > 0.5) { t += scene(rd); }
+    if (iTime > 0.5) { t += scene(rd); }
+    fragColor = vec4(normalize(rd), t);
+}
+"""
+
+
+class TestPerformanceLint:
+    """Avisos de rendimiento con severidad y ubicación"""
+
+    def setup_method(self):
+        self.result = GLSLValidator().validate(LINT_SHADER)
+        self.hints = {(h.rule, h.line): h for h in self.result.performance}
+
+    def test_lint_does_not_affect_validity(self):
+        assert self.result.is_valid and self.result.errors == []
+
+    def test_rules_and_locations(self):
+        assert sorted(self.hints) == [
+            ("divergent-branch", 20),
+            ("loop-invariant-call", 13),
+            ("loop-iterations", 12),
+            ("pow-small-exponent", 11),
+            ("redundant-normalize", 22),
+            ("texture-in-loop", 15),
+            ("unbounded-loop", 18),
+            ("unbounded-loop", 19),
+        ]
+        assert self.hints[("pow-small-exponent", 11)].col == 15
+        assert "x * x" in self.hints[("pow-small-exponent", 11)].message
+
+    def test_severities(self):
+        assert self.hints[("unbounded-loop", 19)].severity == "critical"
+        assert self.hints[("unbounded-loop", 18)].severity == "warning"
+        assert self.hints[("loop-invariant-call", 13)].severity == "warning"
+        assert self.hints[("texture-in-loop", 15)].severity == "info"
+
+    def test_out_arguments_are_writes(self):
+        code = """void shade(inout vec3 n) { n = n * 2.0; }
+void mainImage(out vec4 fragColor, in vec2 fragCoord) {
+    vec3 n = normalize(vec3(fragCoord, 1.0));
+    shade(n);
+    fragColor = vec4(normalize(n), 1.0);
+}"""
+        result = GLSLValidator().validate(code)
+        assert result.performance == []
+
+    def test_cache_returns_hints(self):
+        cache = ValidationCache(max_entries=8)
+        cache.validate(LINT_SHADER)
+        assert cache.validate(LINT_SHADER).performance == self.result.performance
+
+    def test_session_relocates_hints(self):
+        session = ValidationSession(LINT_SHADER)
+        assert session.diagnostics().performance == self.result.performance
+        session.apply([TextEdit("\n\n", (0, 0), (0, 0))])
+        lines = [h.line for h in session.diagnostics().performance]
+        assert lines == [h.line + 2 for h in self.result.performance]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
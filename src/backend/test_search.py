@@ -0,0 +1,779 @@
+"""
+Tests para la búsqueda sobre el corpus de Shadertoy
+Verifica el corpus residente, sus recargas y los endpoints de /search
+"""
+
+import json
+import os
+import random
+import threading
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import search
+from core import (
+    code_index, corpus_columns, facet_index, search_cache, search_index, shader_corpus, suggest_index, trigram_index
+)
+from core.code_index import CodeIndex, CodeQueryError, parse_code_query
+from core.code_terms import code_terms
+from core.corpus_columns import CorpusColumns
+from core.corpus_snapshot import SnapshotError, SnapshotRecord, open_snapshot
+from core.facet_index import FacetIndex
+from core.pagination import CursorError, decode_cursor, encode_cursor, id_array, keyset_page
+from core.search_cache import SearchCache
+from core.search_index import SearchIndex, tokenize_text
+from core.shader_corpus import ShaderCorpus
+from core.suggest_index import SuggestIndex
+from core.techniques import detect_techniques
+from core.trigram_index import TrigramIndex
+
+
+def write_shader(directory, shader_id, name, views=0, likes=0, tags=(), code="void mainImage(out vec4 f, in vec2 c) { f = vec4(1.0); }"):
+    path = directory / f"{shader_id}.json"
+    path.write_text(json.dumps({
+        "info": {"id": shader_id, "name": name, "description": f"{name} shader", "viewed": views,
+                 "likes": likes, "username": "tester", "tags": list(tags)},
+        "renderpass": [{"type": "image", "name": "Image", "code": code}]
+    }))
+    return path
+
+
+def touch(path, offset_ns=1_000_000):
+    """Fuerza un mtime distinto aunque el sistema de archivos tenga poca resolución"""
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + offset_ns))
+
+
+@pytest.fixture
+def corpus_dir(tmp_path):
+    write_shader(tmp_path, "aaa", "Fire Storm", views=10, likes=1, tags=["fire"])
+    write_shader(tmp_path, "bbb", "Ocean Waves", views=30, likes=2, tags=["water"])
+    write_shader(tmp_path, "ccc", "Water Fire", views=20, likes=9, tags=["water", "fire"])
+    return tmp_path
+
+
+@pytest.fixture
+def client(corpus_dir, monkeypatch):
+    corpus = ShaderCorpus(corpus_dir, workers=2, reload_interval=0)
+    monkeypatch.setattr(shader_corpus, "_corpus", corpus)
+    monkeypatch.setattr(search_index, "_index", None)
+    monkeypatch.setattr(corpus_columns, "_columns", None)
+    monkeypatch.setattr(trigram_index, "_index", None)
+    monkeypatch.setattr(facet_index, "_index", None)
+    monkeypatch.setattr(code_index, "_index", None)
+    monkeypatch.setattr(search_cache, "_search_cache", None)
+    monkeypatch.setattr(suggest_index, "_index", None)
+    app = FastAPI()
+    app.include_router(search.router)
+    return TestClient(app)
+
+
+class TestShaderCorpus:
+    """Corpus residente con recarga incremental"""
+
+    def test_loads_once_with_id_index(self, corpus_dir):
+        corpus = ShaderCorpus(corpus_dir, workers=2, reload_interval=0)
+        assert [s["id"] for s in corpus.snapshot.shaders] == ["shadertoy_aaa", "shadertoy_bbb", "shadertoy_ccc"]
+        assert corpus.get("shadertoy_bbb")["name"] == "Ocean Waves"
+        assert corpus.get("missing") is None
+        assert corpus.reload_if_changed() is False
+
+    def test_incremental_reload(self, corpus_dir, monkeypatch):
+        corpus = ShaderCorpus(corpus_dir, workers=2, reload_interval=0)
+        version = corpus.snapshot.version
+
+        loaded = []
+        original = shader_corpus._load_record
+        monkeypatch.setattr(shader_corpus, "_load_record", lambda path: loaded.append(path.name) or original(path))
+
+        touch(write_shader(corpus_dir, "aaa", "Fire Storm II", views=10))
+        write_shader(corpus_dir, "ddd", "New One")
+        (corpus_dir / "bbb.json").unlink()
+
+        assert corpus.reload_if_changed() is True
+        assert sorted(loaded) == ["aaa.json", "ddd.json"]
+        assert corpus.snapshot.version == version + 1
+        assert corpus.get("shadertoy_aaa")["name"] == "Fire Storm II"
+        assert corpus.get("shadertoy_bbb") is None
+        assert len(corpus) == 3
+
+    def test_partial_file_keeps_previous_record(self, corpus_dir):
+        corpus = ShaderCorpus(corpus_dir, workers=2, reload_interval=0)
+        assert len(corpus) == 3
+        path = corpus_dir / "aaa.json"
+        path.write_text('{"info": {"id": "aaa", "na')
+        touch(path)
+        corpus.reload_if_changed()
+        assert corpus.get("shadertoy_aaa")["name"] == "Fire Storm"
+
+        touch(write_shader(corpus_dir, "aaa", "Fire Storm Fixed"), 2_000_000)
+        assert corpus.reload_if_changed() is True
+        assert corpus.get("shadertoy_aaa")["name"] == "Fire Storm Fixed"
+
+
+class TestCorpusSnapshot:
+    """Snapshot binario mapeado con mmap"""
+
+    def test_round_trip(self, corpus_dir):
+        write_shader(corpus_dir, "uni", "Ñandú \u2728", tags=["ü", "fire"], code="float sdBox(vec3 p) { return 0.0; }")
+        corpus = ShaderCorpus(corpus_dir, workers=2, reload_interval=0)
+        path = corpus_dir / "corpus.snapshot"
+        assert corpus.write_snapshot(path) == 4
+
+        snapshot = open_snapshot(path)
+        entries = list(snapshot.entries())
+        assert [name for name, _, _ in entries] == ["aaa.json", "bbb.json", "ccc.json", "uni.json"]
+        for (_, _, stored), original in zip(entries, corpus.snapshot.shaders):
+            assert stored == original and dict(stored) == original
+        assert entries[3][2]["techniques"] == ["sdf"] and entries[3][2]["tags"] == ["ü", "fire"]
+        assert snapshot.column("views").tolist() == [10, 30, 20, 0]
+
+    def test_startup_reads_only_newer_json(self, corpus_dir, monkeypatch):
+        path = corpus_dir / "corpus.snapshot"
+        ShaderCorpus(corpus_dir, workers=2, reload_interval=0).write_snapshot(path)
+        touch(write_shader(corpus_dir, "bbb", "Ocean Storm", views=31))
+
+        loaded = []
+        original = shader_corpus._load_record
+        monkeypatch.setattr(shader_corpus, "_load_record", lambda p: loaded.append(p.name) or original(p))
+        corpus = ShaderCorpus(corpus_dir, workers=2, reload_interval=0, snapshot_path=path)
+        assert len(corpus) == 3 and loaded == ["bbb.json"]
+        assert corpus.get("shadertoy_bbb")["name"] == "Ocean Storm"
+        assert isinstance(corpus.get("shadertoy_aaa"), SnapshotRecord)
+
+        monkeypatch.setattr(shader_corpus, "_corpus", corpus)
+        monkeypatch.setattr(search_index, "_index", None)
+        app = FastAPI()
+        app.include_router(search.router)
+        client = TestClient(app)
+        body = client.get("/api/v1/search/shaders", params={"q": "fire"}).json()
+        assert [s["id"] for s in body["results"]] == ["shadertoy_ccc", "shadertoy_aaa"]
+        shader = client.get("/api/v1/search/shaders/shadertoy_aaa").json()["shader"]
+        assert shader["name"] == "Fire Storm" and "mainImage" in shader["code"]
+
+    def test_complexity_scores_persist_in_snapshot(self, corpus_dir, monkeypatch):
+        """Solo se analizan los registros sin score: los del snapshot lo conservan"""
+        path = corpus_dir / "corpus.snapshot"
+        unscored = ShaderCorpus(corpus_dir, workers=2, reload_interval=0, snapshot_path=path)
+        unscored.write_snapshot(path)  # sin analizar: -1 en el snapshot
+        corpus = ShaderCorpus(corpus_dir, workers=2, reload_interval=0, snapshot_path=path)
+        assert corpus.score_pending() == 3
+        assert corpus.get("shadertoy_aaa")["complexity_score"] == 0 and corpus.snapshot.version == 2
+        corpus.write_snapshot(path)
+
+        touch(write_shader(corpus_dir, "bbb", "Ocean Storm", views=31))
+        analyzed = []
+        monkeypatch.setattr(shader_corpus, "_complexity_score", lambda code: analyzed.append(code) or 7)
+        corpus = ShaderCorpus(corpus_dir, workers=2, reload_interval=0, snapshot_path=path)
+        assert corpus.score_pending() == 1 and len(analyzed) == 1
+        assert corpus.get("shadertoy_bbb")["complexity_score"] == 7
+        assert isinstance(corpus.get("shadertoy_aaa"), SnapshotRecord)
+
+    def test_invalid_snapshot_falls_back_to_json(self, corpus_dir):
+        path = corpus_dir / "corpus.snapshot"
+        path.write_bytes(b"not a snapshot")
+        with pytest.raises(SnapshotError):
+            open_snapshot(path)
+        corpus = ShaderCorpus(corpus_dir, workers=2, reload_interval=0, snapshot_path=path)
+        assert len(corpus) == 3
+
+    def test_reload_over_snapshot_is_incremental(self, corpus_dir):
+        """Arrancar y recargar no arman la lista completa de registros"""
+        path = corpus_dir / "corpus.snapshot"
+        ShaderCorpus(corpus_dir, workers=2, reload_interval=0).write_snapshot(path)
+        corpus = ShaderCorpus(corpus_dir, workers=2, reload_interval=0, snapshot_path=path)
+        assert len(corpus) == 3 and "shaders" not in vars(corpus.snapshot)
+
+        (corpus_dir / "aaa.json").unlink()
+        touch(write_shader(corpus_dir, "bbb", "Ocean Storm", views=31))
+        write_shader(corpus_dir, "ddd", "New One")
+        assert corpus.reload_if_changed() is True
+        assert len(corpus) == 3 and "shaders" not in vars(corpus.snapshot)
+        assert corpus.get("shadertoy_aaa") is None
+        assert corpus.get("shadertoy_bbb")["name"] == "Ocean Storm"
+        assert isinstance(corpus.get("shadertoy_ccc"), SnapshotRecord)
+        assert [s["id"] for s in corpus.snapshot.shaders] == ["shadertoy_bbb", "shadertoy_ccc", "shadertoy_ddd"]
+
+        (corpus_dir / "bbb.json").unlink()
+        assert corpus.reload_if_changed() is True
+        assert corpus.get("shadertoy_bbb") is None and len(corpus) == 2
+
+
+def record(shader_id, name, description="", tags=(), author="someone", views=0, likes=0):
+    return {"id": shader_id, "name": name, "description": description, "tags": list(tags),
+            "author": author, "views": views, "likes": likes}
+
+
+class TestSearchIndex:
+    """Índice invertido con ranking BM25 y actualización incremental"""
+
+    def test_tokenizer(self):
+        assert tokenize_text("WaterRipple of the GLSL-fire_2") == ["waterripple", "water", "ripple", "glsl", "fire", "2"]
+
+    def test_ranking_by_field_and_popularity(self):
+        index = SearchIndex()
+        index.add_many([
+            record("name", "Plasma Tunnel"),
+            record("desc", "Something", description="a plasma effect with a long description of many words"),
+            record("other", "Voronoi")
+        ])
+        ids, total = index.search("plasma")
+        assert ids == ["name", "desc"] and total == 2
+        assert index.search("unknown") == ([], 0)
+
+        # Con igual relevancia decide la popularidad
+        index.add(record("popular", "Plasma Tunnel", views=5000, likes=100))
+        assert index.search("plasma tunnel", limit=1) == (["popular"], 3)
+
+    def test_top_k_matches_full_ranking(self):
+        """El threshold algorithm devuelve los mismos k primeros que ordenar todo"""
+        rng = random.Random(3)
+        words = ["fire", "water", "noise", "fractal", "tunnel", "plasma"] + [f"rare{i}" for i in range(200)]
+        records = [
+            record(f"s{i}", " ".join(rng.choices(words[:6], k=2)), " ".join(rng.choices(words, k=6)),
+                   views=rng.randrange(10_000), likes=rng.randrange(50))
+            for i in range(3000)
+        ]
+        index = SearchIndex()
+        index.add_many(records)
+        for i in range(0, 3000, 7):
+            index.remove(f"s{i}")
+        for q in ("fire", "water noise", "tunnel plasma fractal", "rare3 rare4", "fire rare5"):
+            ranked, total = index.search(q)
+            expected = sum(
+                1 for i, r in enumerate(records)
+                if i % 7 and set(q.split()) & set(f"{r['name']} {r['description']}".lower().split())
+            )
+            assert total == len(ranked) == expected
+            assert index.search(q, limit=10) == (ranked[:10], total)
+
+    def test_incremental_updates(self):
+        index = SearchIndex()
+        index.add_many([record(f"s{i}", f"Shader {i}") for i in range(5)])
+        index.add(record("s1", "Renamed"))
+        assert index.search("renamed")[0] == ["s1"]
+        assert "s1" not in index.search("shader")[0]
+        assert index.remove("s2") and not index.remove("s2")
+        assert index.search("shader")[1] == 3 and len(index) == 4
+
+        index.compact()
+        assert index.dead_documents == 0
+        assert sorted(index.search("shader")[0]) == ["s0", "s3", "s4"]
+
+    def test_follows_corpus_reloads(self, corpus_dir):
+        corpus = ShaderCorpus(corpus_dir, workers=2, reload_interval=0)
+        index = SearchIndex()
+        corpus.subscribe(index.apply)
+        assert len(index) == 3
+
+        touch(write_shader(corpus_dir, "aaa", "Lava Storm"))
+        write_shader(corpus_dir, "ddd", "Fire Lake")
+        (corpus_dir / "ccc.json").unlink()
+        corpus.reload_if_changed()
+        assert index.search("fire")[0] == ["shadertoy_ddd"]
+        assert index.search("lava")[0] == ["shadertoy_aaa"]
+
+
+class TestTrigramIndex:
+    """Búsqueda por substring y tolerante a erratas sobre nombre y tags"""
+
+    @pytest.fixture
+    def index(self):
+        index = TrigramIndex()
+        index.add_many([
+            record("sphere", "Raymarching Sphere", tags=["sdf"], views=10),
+            record("demo", "Ray March Demo", views=5),
+            record("cells", "Voronoi Cells", tags=["cellular"], views=30),
+            record("fire", "Fire", tags=["fire", "noise"], views=50)
+        ])
+        return index
+
+    def test_substring_ignores_spaces(self, index):
+        matches, _ = index.search("raymarch")
+        assert matches[0] == ("sphere", 1.0) and matches[1][0] == "demo" and matches[1][1] < 1.0
+        for query in ("ray march", "Ray-March"):
+            assert index.search(query) == ([("demo", 1.0), ("sphere", 1.0)], 2)  # empates: id asc
+        assert index.search("cell")[0] == [("cells", 1.0)]
+
+    def test_typos_and_threshold(self, index):
+        matches, total = index.search("voronio")
+        assert [m[0] for m in matches] == ["cells"] and 0.3 < matches[0][1] < 1.0
+        assert index.search("voronio", threshold=0.6) == ([], 0)
+        assert index.search("ocean") == ([], 0)
+        assert index.search("fire noize")[0][0][0] == "fire"
+
+    def test_updates(self, index):
+        index.remove("sphere")
+        assert index.search("ray march")[0] == [("demo", 1.0)]
+        index.add(record("demo", "Plasma"))
+        assert index.search("ray march") == ([], 0)
+        assert index.search("plasma", limit=1) == ([("demo", 1.0)], 1)
+
+
+class TestCorpusColumns:
+    """Columnas numéricas con agregados incrementales y top-k"""
+
+    def test_aggregates_and_top_follow_updates(self):
+        columns = CorpusColumns()
+        columns.apply([record(f"s{i}", f"Shader {i}", views=i * 10, likes=i) for i in range(5)], [])
+        assert columns.stats()["total_views"] == 100 and columns.stats()["total_likes"] == 10
+        assert [r["id"] for r in columns.top("popularity", 2)] == ["s4", "s3"]
+
+        columns.apply([record("s0", "Shader 0", views=1000)], ["s4"])
+        stats = columns.stats()
+        assert stats["total_shaders"] == 4 and stats["total_views"] == 1060 and stats["total_likes"] == 6
+        assert stats["top_shader"]["id"] == "s0"
+        assert [r["id"] for r in columns.top("popularity", 10)] == ["s0", "s3", "s2", "s1"]
+        assert [r["id"] for r in columns.ranked("views")] == ["s0", "s3", "s2", "s1"]
+
+        # El slot liberado se reutiliza
+        columns.apply([record("s9", "Shader 9", views=5)], [])
+        assert len(columns._records) == 5 and columns.top("views", 10)[-1]["id"] == "s9"
+
+    def test_top_k_matches_full_sort(self):
+        rng = random.Random(5)
+        records = [record(f"s{i}", "x", views=rng.randrange(100), likes=rng.randrange(10)) for i in range(2500)]
+        columns = CorpusColumns()
+        columns.apply(records, [])
+        expected = sorted(records, key=lambda r: r["views"] + r["likes"] * 10, reverse=True)
+        assert columns.top("popularity", 150) == expected[:150]
+        assert columns.stats()["memory"]["bytes_per_shader"] > 0
+
+    def test_complexity_filter_on_column(self):
+        records = [{**record(f"s{i}", "x", views=i), "complexity_score": i * 10} for i in range(10)]
+        records.append(record("unscored", "x", views=100))
+        columns = CorpusColumns()
+        columns.apply(records, [])
+        columns.apply([], ["s9"])
+
+        page, total = columns.ranked_page("views", 2, max_complexity=40)
+        assert [r["id"] for r in page] == ["s4", "s3"] and total == 5
+        assert columns.count(40) == 5 and columns.count() == 10
+        assert columns.complexity_scores(["s2", "unscored", "s9"]).tolist() == [20, -1, -1]
+
+        chunk, remaining = columns.after("views", (3, "s3"), 10, max_complexity=40)
+        assert [r["id"] for _, r in chunk] == ["s2", "s1", "s0"] and remaining == 3
+
+
+class TestFacetIndex:
+    """Filtros y conteos de facetas con bitsets"""
+
+    def test_detect_techniques(self):
+        code = "float sdBox(vec3 p) {...} float fbm(vec2 p) { return noise(p); } // raymarch loop"
+        assert detect_techniques(code) == ["raymarching", "sdf", "noise", "fbm"]
+        assert detect_techniques("") == []
+
+    def test_filters_and_counts_match_brute_force(self):
+        rng = random.Random(3)
+        tags = ["fire", "water", "noise", "Retro", "cells"]
+        records = [
+            {**record(f"s{i}", "x", tags=rng.sample(tags, rng.randrange(3)), author=f"a{rng.randrange(40)}",
+                      views=rng.randrange(1000)),
+             "category": rng.choice(["effects", "fractal", "space"]),
+             "techniques": rng.sample(["sdf", "fbm"], rng.randrange(3))}
+            for i in range(3000)
+        ]
+        index = FacetIndex()
+        index.add_many(records[:2000])
+        index.select({})  # promueve a bitset los valores frecuentes
+        index.apply(records[2000:], [f"s{i}" for i in range(0, 300, 3)])
+        assert index._bitmaps and len(index._bitmaps) < len(index._labels)
+        alive = [r for r in records if not (int(r["id"][1:]) < 300 and int(r["id"][1:]) % 3 == 0)]
+
+        filters = {"category": ["effects", "space"], "tags": ["retro"], "author": [], "techniques": ["fbm"]}
+        expected = [
+            r for r in alive
+            if r["category"] in ("effects", "space") and "Retro" in r["tags"] and "fbm" in r["techniques"]
+        ]
+        selection = index.select(filters, limit=5, facet_top=50)
+        assert selection.total == len(expected)
+        by_views = sorted(expected, key=lambda r: (-r["views"], int(r["id"][1:])))
+        assert selection.ids == [r["id"] for r in by_views[:5]]
+        authors = {}
+        for r in expected:
+            authors[r["author"]] = authors.get(r["author"], 0) + 1
+        assert {f["value"]: f["count"] for f in selection.facets["author"]} == authors
+        assert selection.facets["tags"][0] == {"value": "Retro", "count": len(expected)}
+
+        # Sobre un resultado de texto conserva su orden
+        ids = [r["id"] for r in reversed(alive[:500])]
+        selection = index.select({"category": ["FRACTAL"]}, ids=ids, facet_top=3)
+        assert selection.ids == [r["id"] for r in reversed(alive[:500]) if r["category"] == "fractal"]
+        assert selection.facets["category"] == [{"value": "fractal", "count": selection.total}]
+        assert len(selection.facets["author"]) == 3
+        few = alive[300:303]
+        tags = {}
+        for r in few:
+            for t in r["tags"]:
+                tags[t] = tags.get(t, 0) + 1
+        facets = index.select({}, ids=[r["id"] for r in few], facet_top=10).facets
+        assert {f["value"]: f["count"] for f in facets["tags"]} == tags
+
+        assert index.select({"tags": ["unknown"]}).total == 0
+        assert index.select({}, facet_top=5).facets["category"][0]["count"] == max(
+            sum(r["category"] == c for r in alive) for c in ("effects", "fractal", "space"))
+
+
+MARCH_SHADER = """
+#define STEPS 64
+uniform float uGlow;
+float sdBox(vec3 p, vec3 b) { vec3 q = abs(p) - b; return length(max(q, 0.0)); }
+float map(vec3 p) { return sdBox(p, vec3(1.0)); }
+void mainImage(out vec4 fragColor, in vec2 fragCoord) {
+    vec2 uv = fragCoord / iResolution.xy;  // for (x) { texture(); }
+    float t = 0.0;
+    for (int i = 0; i < STEPS; i++) {
+        float d = map(vec3(uv, t));
+        t += d * smoothstep(0.0, 1.0, d);
+        vec4 c = texture(iChannel0, uv);
+    }
+    for (int j = 0; j < 4; j++) t += sin(t);
+    fragColor = vec4(t);
+}
+"""
+
+
+class TestCodeIndex:
+    """Términos de código extraídos en la ingesta y consultas booleanas"""
+
+    def test_code_terms(self):
+        terms = code_terms(MARCH_SHADER, detect_techniques(MARCH_SHADER))
+        for term in ("defines:sdbox", "defines:map", "defines:mainimage", "calls:sdbox", "calls:length",
+                     "uniform:ichannel0", "uniform:iresolution", "uniform:uglow", "technique:sdf",
+                     "march:smoothstep", "march:texture", "loop:sin", "calls:sin"):
+            assert term in terms
+        # El bucle sin llaves no llama a funciones de distancia; los comentarios y tipos no cuentan
+        assert "march:sin" not in terms and "calls:vec3" not in terms and "calls:x" not in terms
+        assert "loop:length" not in terms and terms == sorted(set(terms))
+
+    def test_parse_query(self):
+        assert parse_code_query("march:smoothstep march:texture") == (
+            'and', [('term', ('march',), 'smoothstep'), ('term', ('march',), 'texture')])
+        assert parse_code_query("calls:a OR NOT (calls:b AND -Calls:C)") == (
+            'or', [('term', ('calls',), 'a'),
+                   ('not', ('and', [('term', ('calls',), 'b'), ('not', ('term', ('calls',), 'c'))]))])
+        assert parse_code_query("fbm")[1] == ('defines', 'calls', 'uniform', 'technique')
+        for bad in ("", "calls:", "(calls:a", "calls:a OR", "color:red", "AND calls:a"):
+            with pytest.raises(CodeQueryError):
+                parse_code_query(bad)
+
+    def test_boolean_queries_and_updates(self):
+        index = CodeIndex()
+        index.add_many([
+            {**record("s1", "March", views=10), "code": MARCH_SHADER},
+            {**record("s2", "Noise", views=30), "code": "float fbm(vec2 p) { return noise(p); }"},
+            {**record("s3", "Flat", views=20), "code": "void mainImage(out vec4 f, in vec2 c) { f = vec4(smoothstep(0.0, 1.0, c.x)); }"},
+        ])
+        assert index.select("march:smoothstep march:texture") == (["s1"], 1)
+        assert index.select("calls:smoothstep") == (["s3", "s1"], 2)
+        assert index.select("calls:smoothstep NOT march:smoothstep") == (["s3"], 1)
+        assert index.select("defines:sd* OR technique:fbm") == (["s2", "s1"], 2)
+        assert index.select("smoothstep", limit=1) == (["s3"], 2)
+        assert index.select("calls:smoothstep", ids=["s1", "s2", "zzz", "s3"]) == (["s1", "s3"], 2)
+
+        index.apply([{**record("s3", "Flat", views=20), "code": "float f;"}], ["s2"])
+        assert index.select("calls:smoothstep") == (["s1"], 1)
+        assert index.select("NOT calls:noise") == (["s3", "s1"], 2)
+        assert len(index) == 2
+
+
+class TestSearchCache:
+    """Cache de respuestas por versión del corpus con single-flight"""
+
+    def test_hits_and_version_invalidation(self):
+        cache = SearchCache(max_entries=2)
+        calls = []
+        compute = lambda: calls.append(1) or len(calls)
+        assert cache.get_or_compute("a", 1, compute) == 1
+        assert cache.get_or_compute("a", 1, compute) == 1
+        assert cache.get_or_compute("a", 2, compute) == 2  # recarga: la entrada deja de valer
+        assert cache.get_or_compute("a", 1, compute) == 3  # versión superada: no se cachea
+        assert cache.get_or_compute("a", 2, compute) == 2
+        cache.get_or_compute("b", 2, compute)
+        cache.get_or_compute("c", 2, compute)
+        stats = cache.stats()
+        assert stats["entries"] == 2 and stats["invalidations"] == 1 and stats["corpusVersion"] == 2
+        assert (stats["hits"], stats["misses"]) == (2, 5) and stats["hitRate"] == 2 / 7
+
+    def test_single_flight(self):
+        cache = SearchCache()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return "result"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("q", 1, compute)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        while cache.stats()["coalesced"] < 7:
+            threading.Event().wait(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert results == ["result"] * 8 and len(calls) == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_errors_are_shared_and_not_cached(self):
+        cache = SearchCache()
+
+        def fail():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            cache.get_or_compute("q", 1, fail)
+        assert cache.get_or_compute("q", 1, lambda: "ok") == "ok"
+
+
+class TestPagination:
+    """Cursores opacos y páginas keyset por (valor desc, id asc)"""
+
+    def test_keyset_pages_match_full_sort(self):
+        rng = random.Random(5)
+        ids = [f"s{i:04d}" for i in range(500)]
+        rng.shuffle(ids)
+        values = np.array([rng.randrange(20) for _ in ids], np.int64)
+        expected = sorted(range(len(ids)), key=lambda i: (-values[i], ids[i]))
+        keys, pages, after = id_array(ids), [], None
+        while True:
+            page, remaining = keyset_page(values, keys, after, 37)
+            assert remaining == len(ids) - len(pages)
+            if not page:
+                break
+            pages.extend(page)
+            after = (values[page[-1]].item(), ids[page[-1]])
+        assert pages == expected
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor((0.125, "shadertoy_aaa"), "abc")
+        assert decode_cursor(cursor, "abc") == (0.125, "shadertoy_aaa")
+        for bad, owner in ((cursor, "other"), ("%%%", "abc"), (encode_cursor(("x", "a"), "abc"), "abc")):
+            with pytest.raises(CursorError):
+                decode_cursor(bad, owner)
+
+
+class TestSuggestIndex:
+    """Autocompletado por prefijo con popularidad agregada"""
+
+    def test_prefixes_and_words(self):
+        index = SuggestIndex()
+        index.add_many([
+            record("s1", "Water Ripple", tags=["water", "waves"], author="Wanda", views=10),
+            record("s2", "Warp Tunnel", tags=["warp"], author="bob", views=500),
+            {**record("s3", "water ripple", tags=["Water"], views=5), "likes": 2},
+        ])
+        assert index.suggest("wa", limit=3) == [
+            {"text": "Warp Tunnel", "type": "name", "count": 1},
+            {"text": "warp", "type": "tag", "count": 1},
+            {"text": "water", "type": "tag", "count": 2},
+        ]
+        assert index.suggest("RIPP") == [{"text": "Water Ripple", "type": "name", "count": 2}]
+        assert index.suggest("wan") == [{"text": "Wanda", "type": "author", "count": 1}]
+        assert index.suggest("  ") == [] and index.suggest("zz") == []
+
+    def test_incremental_updates_match_brute_force(self, monkeypatch):
+        monkeypatch.setattr(suggest_index, "HEAVY_PREFIX_KEYS", 8)
+        rng = random.Random(11)
+        words = ["fire", "fireball", "firefly", "fluid", "fractal", "flame", "water", "wave"]
+
+        def make(i):
+            return record(f"s{i}", " ".join(rng.sample(words, 2)), tags=rng.sample(words, 2),
+                          author=rng.choice(["fiona", "walt"]), views=rng.randrange(1000))
+
+        records = {f"s{i}": make(i) for i in range(3000)}
+        index = SuggestIndex()
+        index.add_many(records.values())
+        index.suggest("f")  # top-k precalculado de los prefijos pesados
+        updated = [make(i) for i in range(0, 600, 2)] + [
+            record("new1", "Fizz Buzz", views=10 ** 6), record("new2", "flame", tags=["fizz"], views=7)]
+        removed = [f"s{i}" for i in range(1, 900, 3)]
+        index.apply(updated, removed)
+        for shader_id in removed:
+            records.pop(shader_id)
+        records.update({r["id"]: r for r in updated})
+
+        for prefix in ("f", "fi", "fire", "fiz", "wa", "flame wa", "walt"):
+            totals = {}
+            for r in records.values():
+                values = [("name", r["name"]), ("author", r["author"])] + [("tag", t) for t in r["tags"]]
+                for kind, text in {(kind, text.lower()) for kind, text in values}:
+                    keys = [text] if kind != "name" else [" ".join(text.split()[i:]) for i in range(len(text.split()))]
+                    if any(key.startswith(prefix) for key in keys):
+                        weight, count = totals.get((kind, text), (0, 0))
+                        totals[(kind, text)] = (weight + r["views"] + 10 * r["likes"], count + 1)
+            expected = sorted(totals.items(), key=lambda item: -item[1][0])[:5]
+            got = index.suggest(prefix, limit=5)
+            assert [(s["type"], s["text"].lower(), s["count"]) for s in got] == [
+                (kind, text, count) for (kind, text), (_, count) in expected]
+
+
+class TestSearchAPI:
+    """Endpoints de /api/v1/search sobre el corpus residente"""
+
+    def test_search_and_lookup(self, client):
+        body = client.get("/api/v1/search/shaders", params={"q": "fire"}).json()
+        assert [s["id"] for s in body["results"]] == ["shadertoy_ccc", "shadertoy_aaa"]
+        assert all("code" not in s for s in body["results"])
+        assert body["pagination"]["total"] == 2
+
+        page = client.get("/api/v1/search/shaders", params={"q": "water fire", "limit": 1, "offset": 1}).json()
+        assert [s["id"] for s in page["results"]] == ["shadertoy_aaa"]
+        assert page["pagination"]["total"] == 3 and page["pagination"]["hasMore"] is True
+
+        shader = client.get("/api/v1/search/shaders/shadertoy_bbb").json()["shader"]
+        assert shader["name"] == "Ocean Waves" and "mainImage" in shader["code"]
+        assert "code_terms" not in shader
+        assert client.get("/api/v1/search/shaders/shadertoy_zzz").status_code == 404
+
+    def test_fuzzy_search(self, client):
+        body = client.get("/api/v1/search/shaders", params={"q": "stor"}).json()
+        assert body["match"] == "fuzzy"
+        assert [(s["id"], s["similarity"]) for s in body["results"]] == [("shadertoy_aaa", 1.0)]
+
+        body = client.get("/api/v1/search/shaders", params={"q": "ocean", "fuzzy": True}).json()
+        assert body["match"] == "fuzzy" and [s["id"] for s in body["results"]] == ["shadertoy_bbb"]
+        assert client.get("/api/v1/search/shaders", params={"q": "fire"}).json()["match"] == "text"
+
+    def test_facets(self, client, corpus_dir):
+        write_shader(corpus_dir, "ddd", "Noise Field", views=5, tags=["Fire"],
+                     code="float fbm(vec2 p) { return noise(p); }")
+        shader_corpus.get_shader_corpus().reload_if_changed()
+
+        body = client.get("/api/v1/search/shaders", params={"tag": "fire", "facets": True}).json()
+        assert [s["id"] for s in body["results"]] == ["shadertoy_ccc", "shadertoy_aaa", "shadertoy_ddd"]
+        assert body["pagination"]["total"] == 3
+        assert body["facets"]["tags"][:2] == [{"value": "fire", "count": 3}, {"value": "water", "count": 1}]
+        assert body["facets"]["techniques"] == [{"value": "fbm", "count": 1}, {"value": "noise", "count": 1}]
+
+        body = client.get("/api/v1/search/shaders", params={"q": "fire", "technique": "fbm"}).json()
+        assert [s["id"] for s in body["results"]] == ["shadertoy_ddd"] and "facets" not in body
+        body = client.get("/api/v1/search/shaders", params={"q": "fire", "tag": ["water", "nope"], "facets": True}).json()
+        assert [s["id"] for s in body["results"]] == ["shadertoy_ccc"]
+        assert body["facets"]["author"] == [{"value": "tester", "count": 1}]
+        body = client.get("/api/v1/search/shaders", params={"q": "stor", "author": "nobody"}).json()
+        assert body["match"] == "fuzzy" and body["results"] == []
+
+    def test_code_query(self, client, corpus_dir):
+        write_shader(corpus_dir, "ddd", "Fire March", views=5, code=MARCH_SHADER)
+        shader_corpus.get_shader_corpus().reload_if_changed()
+
+        body = client.get("/api/v1/search/shaders", params={"code": "march:smoothstep march:texture"}).json()
+        assert [s["id"] for s in body["results"]] == ["shadertoy_ddd"]
+        assert all("code_terms" not in s for s in body["results"])
+        body = client.get("/api/v1/search/shaders", params={"q": "fire", "code": "NOT defines:sdbox"}).json()
+        assert [s["id"] for s in body["results"]] == ["shadertoy_ccc", "shadertoy_aaa"]
+        assert body["pagination"]["total"] == 2
+        body = client.get("/api/v1/search/shaders", params={"code": "defines:mainimage", "tag": "water", "facets": True}).json()
+        assert [s["id"] for s in body["results"]] == ["shadertoy_bbb", "shadertoy_ccc"]
+        assert body["facets"]["tags"][0] == {"value": "water", "count": 2}
+        assert client.get("/api/v1/search/shaders", params={"code": "(calls:sin"}).status_code == 400
+
+    def test_cached_responses_follow_reloads(self, client, corpus_dir):
+        first = client.get("/api/v1/search/shaders", params={"q": "fire", "tag": ["Water", "fire"]}).json()
+        again = client.get("/api/v1/search/shaders", params={"q": "  fire ", "tag": ["fire", "water"]}).json()
+        assert again["results"] == first["results"] and again["query"] == "  fire "
+        stats = client.get("/api/v1/search/cache/stats").json()["cache"]
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+        write_shader(corpus_dir, "ddd", "Fire Flower", views=100, tags=["fire"])
+        shader_corpus.get_shader_corpus().reload_if_changed()
+        body = client.get("/api/v1/search/shaders", params={"q": "fire", "tag": "fire"}).json()
+        assert body["results"][0]["id"] == "shadertoy_ddd"
+        assert client.get("/api/v1/search/cache/stats").json()["cache"]["invalidations"] == 1
+
+    def test_cursor_pagination(self, client, corpus_dir):
+        first = client.get("/api/v1/search/shaders", params={"limit": 2, "cursor": ""}).json()
+        assert [s["id"] for s in first["results"]] == ["shadertoy_bbb", "shadertoy_ccc"]
+        assert first["pagination"]["total"] == 3 and first["pagination"]["hasMore"] is True
+
+        # Un shader nuevo por delante del cursor no desplaza la página siguiente
+        write_shader(corpus_dir, "ddd", "Top Fire", views=99, tags=["fire"])
+        shader_corpus.get_shader_corpus().reload_if_changed()
+        cursor = first["pagination"]["nextCursor"]
+        second = client.get("/api/v1/search/shaders", params={"limit": 2, "cursor": cursor}).json()
+        assert [s["id"] for s in second["results"]] == ["shadertoy_aaa"]
+        assert second["pagination"]["nextCursor"] is None and second["pagination"]["hasMore"] is False
+
+        pages, cursor = [], ""
+        while cursor is not None:
+            body = client.get("/api/v1/search/shaders", params={"q": "fire", "limit": 1, "cursor": cursor}).json()
+            pages += [s["id"] for s in body["results"]]
+            cursor = body["pagination"]["nextCursor"]
+        offset = client.get("/api/v1/search/shaders", params={"q": "fire", "limit": 10}).json()
+        assert pages == [s["id"] for s in offset["results"]] and len(pages) == 3
+
+        # Fuzzy: empates de similitud por id asc, igual con offset que con cursor
+        for shader_id in ("eee", "ddd"):
+            write_shader(corpus_dir, shader_id, "Firestorm", views=1000 if shader_id == "eee" else 0)
+        shader_corpus.get_shader_corpus().reload_if_changed()
+        params = {"q": "firestorm", "fuzzy": True}
+        total = client.get("/api/v1/search/shaders", params=params).json()["pagination"]["total"]
+        by_offset = [s["id"] for skip in range(total) for s in client.get(
+            "/api/v1/search/shaders", params={**params, "limit": 1, "offset": skip}).json()["results"]]
+        pages, cursor = [], ""
+        while cursor is not None:
+            body = client.get("/api/v1/search/shaders", params={**params, "limit": 1, "cursor": cursor}).json()
+            pages += [s["id"] for s in body["results"]]
+            cursor = body["pagination"]["nextCursor"]
+        assert pages == by_offset and pages[:2] == ["shadertoy_ddd", "shadertoy_eee"]
+
+        other = client.get("/api/v1/search/shaders", params={"q": "water", "cursor": first["pagination"]["nextCursor"]})
+        assert other.status_code == 400
+
+    def test_suggest(self, client, corpus_dir):
+        body = client.get("/api/v1/search/suggest", params={"q": "wa"}).json()
+        assert body["suggestions"][0] == {"text": "water", "type": "tag", "count": 2}
+        assert [s["text"] for s in body["suggestions"]] == ["water", "Water Fire", "Ocean Waves"]
+
+        write_shader(corpus_dir, "ddd", "Warp Drive", views=500)
+        shader_corpus.get_shader_corpus().reload_if_changed()
+        body = client.get("/api/v1/search/suggest", params={"q": "wa", "limit": 1}).json()
+        assert body["suggestions"] == [{"text": "Warp Drive", "type": "name", "count": 1}]
+        assert client.get("/api/v1/search/suggest", params={"q": ""}).status_code == 422
+
+    def test_requests_do_not_mutate_corpus(self, client):
+        client.get("/api/v1/search/shaders", params={"q": "fire", "fuzzy": True})
+        client.get("/api/v1/search/popular")
+        corpus = shader_corpus.get_shader_corpus()
+        assert [s["id"] for s in corpus.snapshot.shaders] == ["shadertoy_aaa", "shadertoy_bbb", "shadertoy_ccc"]
+        assert all("similarity" not in s for s in corpus.snapshot.shaders)
+
+    def test_max_complexity_uses_ingested_score(self, client, corpus_dir, monkeypatch):
+        write_shader(corpus_dir, "ddd", "Fire March", views=99, tags=["fire"], code=MARCH_SHADER)
+        corpus = shader_corpus.get_shader_corpus()
+        corpus.reload_if_changed()
+        assert corpus.get("shadertoy_ddd")["complexity_score"] == -1  # la carga no analiza código
+        body = client.get("/api/v1/search/shaders", params={"max_complexity": 60}).json()
+        assert "shadertoy_ddd" not in [s["id"] for s in body["results"]]
+        assert corpus.score_pending() == 4 and corpus.score_pending() == 0
+        assert corpus.get("shadertoy_ddd")["complexity_score"] == 55
+        monkeypatch.setattr(search, "analyze_complexity", None)  # en la petición no se analiza código
+
+        body = client.get("/api/v1/search/shaders", params={"max_complexity": 50, "limit": 2}).json()
+        assert [s["id"] for s in body["results"]] == ["shadertoy_bbb", "shadertoy_ccc"]
+        assert body["results"][0]["complexity_score"] == 0 and body["pagination"]["total"] == 3
+        body = client.get("/api/v1/search/shaders", params={"q": "fire", "max_complexity": 50}).json()
+        assert [s["id"] for s in body["results"]] == ["shadertoy_ccc", "shadertoy_aaa"]
+        assert body["pagination"]["total"] == 2
+        body = client.get("/api/v1/search/shaders", params={"max_complexity": 60, "limit": 1, "cursor": ""}).json()
+        assert [s["id"] for s in body["results"]] == ["shadertoy_ddd"] and body["pagination"]["total"] == 4
+
+    def test_popular_and_stats(self, client):
+        popular = client.get("/api/v1/search/popular", params={"limit": 2}).json()
+        assert [s["id"] for s in popular["results"]] == ["shadertoy_ccc", "shadertoy_bbb"]
+        assert all("code" not in s and "code_terms" not in s for s in popular["results"])
+        stats = client.get("/api/v1/search/stats").json()["stats"]
+        assert stats["total_shaders"] == 3 and stats["total_views"] == 60
+        assert stats["top_shader"]["id"] == "shadertoy_bbb" and stats["memory"]["bytes_per_shader"] > 0
+        assert "code" not in stats["top_shader"] and "code_terms" not in stats["top_shader"]
+
+        listing = client.get("/api/v1/search/shaders", params={"limit": 2, "offset": 1}).json()
+        assert [s["id"] for s in listing["results"]] == ["shadertoy_ccc", "shadertoy_aaa"]
+        assert listing["pagination"]["total"] == 3